@@ -0,0 +1,146 @@
+import streamlit as st
+import pandas as pd
+from modules.agriculture.simulator_agri import TYPE_HISTORIQUE as TYPE_HISTORIQUE_AGRICOLE
+from modules.finances.pipeline import TYPE_HISTORIQUE
+from utils.historique_simulations import obtenir_historique
+from utils.reduction_graphiques import QUANTILES_EVENTAIL
+from utils.reduction_scenarios import trajectoires_representatives
+
+TYPES_SIMULATION = {"Boursière": TYPE_HISTORIQUE, "Agricole": TYPE_HISTORIQUE_AGRICOLE}
+
+LIBELLES_METRIQUES = {
+    "capital_final": "Capital final médian",
+    "capital_final_p5": "Capital final P5",
+    "capital_final_p95": "Capital final P95",
+    "dividendes_cumules_final": "Dividendes cumulés médians",
+    "frais_cumules": "Frais cumulés médians",
+    "rotation_moyenne": "Rotation moyenne",
+    "n_titres": "Nombre de titres",
+    "benefice_median": "Bénéfice net médian",
+    "benefice_p5": "Bénéfice net P5",
+    "benefice_p95": "Bénéfice net P95",
+    "probabilite_perte": "Probabilité de perte",
+    "van_mediane": "VAN médiane",
+    "tri_median": "TRI médian",
+    "proba_van_negative": "Probabilité de VAN négative",
+}
+
+
+def _nom(entree):
+    return f"#{entree['id']}"
+
+
+def _superposer(entrees, tableau, quantile, avec_eventail):
+    # Une colonne par simulation (et par borne de l'éventail), alignées sur les années
+    colonnes = {}
+    for entree in entrees:
+        eventail = entree["resultats"]["agregation"][tableau]
+        colonnes[f"{_nom(entree)} {quantile}"] = eventail[quantile]
+        if avec_eventail:
+            colonnes[f"{_nom(entree)} P5"] = eventail["P5"]
+            colonnes[f"{_nom(entree)} P95"] = eventail["P95"]
+    return pd.DataFrame(colonnes)
+
+
+def _parametres_differents(entrees):
+    parametres = pd.DataFrame({_nom(e): {cle: str(valeur) for cle, valeur in e["parametres"].items()}
+                               for e in entrees})
+    return parametres[parametres.nunique(axis=1, dropna=False) > 1]
+
+
+def _comparer_bourse(entrees):
+    col1, col2 = st.columns(2)
+    quantile = col1.selectbox("Quantile superposé", list(QUANTILES_EVENTAIL), index=list(QUANTILES_EVENTAIL).index("P50"))
+    avec_eventail = col2.checkbox("Afficher les bornes P5 et P95", value=False)
+
+    st.subheader("📈 Évolution du portefeuille")
+    st.line_chart(_superposer(entrees, "eventail_capital", quantile, avec_eventail), use_container_width=True)
+
+    st.subheader("💵 Dividendes cumulés")
+    st.line_chart(_superposer(entrees, "eventail_dividendes", quantile, avec_eventail), use_container_width=True)
+
+    _afficher_metriques(entrees)
+
+    st.subheader("⚖️ Poids des portefeuilles")
+    poids = pd.DataFrame({_nom(e): e["resultats"]["optimisation"]["portefeuille"].set_index("entreprise")["poids"]
+                          for e in entrees}).fillna(0.0)
+    st.bar_chart(poids, use_container_width=True)
+
+
+def _comparer_agricole(entrees):
+    st.subheader("📈 Distribution des bénéfices nets")
+    quantiles = pd.DataFrame({_nom(e): e["resultats"]["quantiles_benefices"]["Benefice"] for e in entrees})
+    st.line_chart(quantiles, use_container_width=True)
+    st.caption("Bénéfice net cumulé au niveau de quantile donné (fonction quantile) : une courbe plus haute "
+               "domine à tous les niveaux de risque.")
+
+    _afficher_metriques(entrees)
+
+    st.subheader("💰 VAN et TRI")
+    for indicateur in ("VAN", "TRI"):
+        st.markdown(f"**{indicateur}**")
+        st.dataframe(pd.DataFrame({_nom(e): e["resultats"]["indicateurs"].loc[indicateur] for e in entrees}).T)
+
+    st.subheader("🧭 Scénarios représentatifs")
+    for entree in entrees:
+        with st.expander(f"{_nom(entree)} · {entree['libelle']}"):
+            st.line_chart(trajectoires_representatives(entree["resultats"]["scenarios"]))
+
+
+def _afficher_metriques(entrees):
+    st.subheader("📋 Indicateurs")
+    metriques = pd.DataFrame({_nom(e): e["metriques"] for e in entrees})
+    st.dataframe(metriques.rename(index=LIBELLES_METRIQUES).style.format("{:,.2f}"))
+
+
+def run():
+    st.title("📊 Comparaison des simulations")
+    st.markdown("""
+        Superposez les simulations boursières ou agricoles enregistrées dans l'historique local :
+        les résultats sont relus tels quels, rien n'est recalculé.
+    """)
+
+    type_simulation = TYPES_SIMULATION[st.radio("Simulations", list(TYPES_SIMULATION), horizontal=True)]
+    historique = obtenir_historique()
+    tableau = historique.lister(type_simulation)
+    if tableau.empty:
+        page = "Simulation Boursière" if type_simulation == TYPE_HISTORIQUE else "Simulation Agricole"
+        st.info(f"Aucune simulation enregistrée. Lancez une simulation depuis la page {page}.")
+        return
+
+    st.subheader("🗂️ Historique")
+    colonnes = ["cree_le", "libelle"] + [m for m in LIBELLES_METRIQUES if m in tableau.columns]
+    st.dataframe(tableau[colonnes].rename(columns=dict(LIBELLES_METRIQUES, cree_le="Date", libelle="Simulation")),
+                 column_config={"Date": st.column_config.DatetimeColumn(format="DD/MM/YYYY HH:mm")})
+    st.caption(f"{len(tableau)} simulation(s), {tableau['taille'].sum() / 2 ** 20:.1f} Mo de résultats compressés.")
+
+    identifiants = tableau.index.to_list()
+    selection = st.multiselect(
+        "Simulations à comparer", identifiants, default=identifiants[:2], key=f"selection_{type_simulation}",
+        format_func=lambda i: f"#{i} · {tableau.at[i, 'cree_le']:%d/%m/%Y %H:%M} · {tableau.at[i, 'libelle']}"
+    )
+    if not selection:
+        return
+    entrees = historique.charger(selection)
+
+    if type_simulation == TYPE_HISTORIQUE:
+        _comparer_bourse(entrees)
+    else:
+        _comparer_agricole(entrees)
+
+    if len(entrees) > 1:
+        st.subheader("🎯 Paramètres différents")
+        differences = _parametres_differents(entrees)
+        if differences.empty:
+            st.caption("Mêmes paramètres : seules les données utilisées diffèrent.")
+        else:
+            st.table(differences)
+
+    st.markdown("---")
+    if st.button("🗑️ Supprimer les simulations sélectionnées"):
+        historique.supprimer(selection)
+        st.rerun()
+
+
+if __name__ == "__main__":
+    run()
@@ -1,9 +1,46 @@
 # interface_streamlit.py
+import logging
+import sqlite3
 import streamlit as st
+import numpy as np
 import pandas as pd
-from modules.agriculture.simulator_agri import simuler_projet_agricole_multi
+from modules.agriculture.simulator_agri import (
+    TYPE_HISTORIQUE,
+    libelle_simulation,
+    metriques_simulation,
+    scenarios_representatifs,
+    simuler_projet_agricole_multi,
+    sorties_historisables
+)
+from modules.agriculture.finagri import calculer_investissement_serre
+from modules.agriculture.indicateurs_financiers import construire_matrice_flux, calculer_indicateurs_financiers
+from modules.agriculture.optimiseur_surfaces import optimiser_allocation_surfaces
+from modules.agriculture.sensibilite import INDICATEURS_SENSIBILITE, AnalyseSensibilite, definir_facteurs
+from modules.agriculture.tresorerie_mensuelle import simuler_tresorerie_agricole
+from modules.agriculture.emulateur_agricole import contexte_emulation, entrainer_emulateur_agricole, point_emulation
 from config import cultures_db
-from utils.export_tools import export_excel
+from config.settings import PARAMETRES_AGRICOLES_DEFAUT
+from service.client_calcul import client_depuis_environnement
+from utils.bouton_export import bouton_export
+from utils.etat_partage import empreinte_contenu
+from utils.historique_simulations import obtenir_historique
+from utils.panneau_emulateur import panneau_emulateur
+from utils.reduction_graphiques import densite_kde, histogramme
+from utils.reduction_scenarios import trajectoires_representatives
+from utils.taches import lancer_tache, obtenir_tache, suivre_tache
+
+journal = logging.getLogger(__name__)
+
+LIBELLES_EMULATION = {
+    "benefice_median": "Bénéfice net médian",
+    "benefice_p5": "Bénéfice net P5",
+    "benefice_p95": "Bénéfice net P95",
+    "probabilite_perte": "Probabilité de perte",
+}
+FORMATS_EMULATION = dict({sortie: "{:,.0f} FCFA" for sortie in LIBELLES_EMULATION}, probabilite_perte="{:.0%}")
+
+# Méthode d'analyse de sensibilité -> colonne classant les leviers
+METHODES_SENSIBILITE = {"Tornado": "Amplitude", "Morris": "mu_etoile", "Sobol": "ST"}
 
 
 def run():
@@ -24,79 +61,337 @@ def run():
         surface_ha = st.number_input("Surface totale (en hectares)", min_value=0.1, value=1.0, step=0.1)
         part_serre = st.slider("Part de la surface en serre (%)", 0, 100, 0)
         cultures = st.multiselect("Cultures sélectionnées", list(cultures_db.keys()))
+        part_stockee = st.slider("Part de la récolte stockée avant vente (%)", 0, 100, 0)
+        duree_stockage = st.number_input("Durée de stockage (mois)", min_value=1, max_value=12, value=1)
 
     with col2:
         n_scenarios = st.slider("Nombre de scénarios Monte Carlo", 10, 500, 100, step=10)
         taux_emprunt = st.number_input("Taux d'emprunt (%)", value=2.0) / 100
         montant_emprunt = st.number_input("Montant emprunté (FCFA)", value=0.0)
         mode_financement = "emprunt" if montant_emprunt > 0 else "autofinancement"
+        taux_actualisation = st.number_input("Taux d'actualisation (%)", value=8.0) / 100
 
     st.divider()
 
-    if st.button("Lancer la simulation"):
+    parametres = PARAMETRES_AGRICOLES_DEFAUT
+    financement = dict(
+        mode_financement=mode_financement,
+        montant_emprunt=montant_emprunt,
+        taux_emprunt=taux_emprunt
+    )
 
-        resultats, scen_min, scen_max, scen_med = simuler_projet_agricole_multi(
-            n_scenarios=n_scenarios,
+    # Aperçu par l'émulateur ; la confirmation lance la simulation exacte
+    confirmer = False
+    if cultures:
+        parametres_simulation = dict(
+            n_scenarios=n_scenarios, surface_totale=surface_ha, duree_projet=duree, part_serre=part_serre / 100,
+            cultures=cultures, cultures_db=cultures_db, **parametres, **financement
+        )
+        confirmer = panneau_emulateur(
+            "agricole", point_emulation(parametres_simulation), contexte_emulation(parametres_simulation),
+            lambda n_points, rappel=None: entrainer_emulateur_agricole(parametres_simulation, n_points, rappel=rappel),
+            LIBELLES_EMULATION, FORMATS_EMULATION
+        )
+
+    if st.button("Lancer la simulation") or confirmer:
+        lancer_tache(
+            "simulation_agricole", simuler_et_analyser,
+            n_scenarios=n_scenarios, surface_ha=surface_ha, duree=duree, part_serre=part_serre / 100,
+            cultures=cultures, taux_actualisation=taux_actualisation, part_stockee=part_stockee / 100,
+            duree_stockage=duree_stockage, parametres=parametres, financement=financement
+        )
+
+    tache = obtenir_tache("simulation_agricole")
+    if tache is not None:
+        if not tache.terminee:
+            suivre_tache(tache, rendu_partiel=afficher_distribution_partielle)
+        elif tache.etat == "annulee":
+            st.warning("Simulation annulée.")
+        elif tache.etat == "erreur":
+            st.error(f"La simulation a échoué : {tache.erreur.splitlines()[0]}")
+        else:
+            afficher_resultats_simulation(tache.resultat)
+
+    st.divider()
+    st.subheader("🧮 Optimisation de l'allocation des surfaces")
+    st.markdown("""
+    Recherche la répartition des surfaces par culture et la part sous serre qui maximisent
+    la VAN espérée, pénalisée par la moyenne des 5 % pires scénarios (CVaR).
+    """)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        budget_serre = st.number_input("Budget d'investissement en serres (FCFA)", min_value=0.0, value=5000000.0)
+    with col2:
+        penalite_cvar = st.slider("Pénalité de risque (CVaR 5 %)", 0.0, 5.0, 1.0, step=0.1)
+
+    if st.button("Optimiser l'allocation"):
+        if not cultures:
+            st.warning("Veuillez sélectionner au moins une culture.")
+            return
+
+        lancer_tache(
+            "optimisation_surfaces", optimiser_allocation_en_tache,
+            cultures=cultures,
+            cultures_db=cultures_db,
             surface_totale=surface_ha,
             duree_projet=duree,
-            part_serre=part_serre / 100,
+            budget_investissement=budget_serre,
+            penalite_cvar=penalite_cvar,
+            taux_actualisation=taux_actualisation,
+            n_scenarios=n_scenarios,
+            **parametres,
+            **financement
+        )
+
+    tache = obtenir_tache("optimisation_surfaces")
+    if tache is not None:
+        if not tache.terminee:
+            suivre_tache(tache)
+        elif tache.etat == "erreur":
+            st.error(f"L'optimisation a échoué : {tache.erreur.splitlines()[0]}")
+        elif tache.etat == "terminee":
+            afficher_optimum(tache.resultat)
+
+    st.divider()
+    st.subheader("🎛️ Analyse de sensibilité")
+    st.markdown("""
+    Classe les leviers du modèle (seuils climatiques, probabilités d'aléas, fiscalité, coûts)
+    selon leur influence sur le bénéfice total, chacun variant autour de sa valeur de référence.
+    Tornado : un levier à la fois ; Morris : criblage global ; Sobol : part de variance expliquée.
+    """)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        methode_sensibilite = st.selectbox("Méthode", list(METHODES_SENSIBILITE))
+        indicateur_sensibilite = st.selectbox("Indicateur", INDICATEURS_SENSIBILITE)
+    with col2:
+        variation_sensibilite = st.slider("Variation des leviers autour de la référence (%)", 5, 50, 25)
+
+    if st.button("Lancer l'analyse de sensibilité"):
+        if not cultures:
+            st.warning("Veuillez sélectionner au moins une culture.")
+            return
+
+        lancer_tache(
+            "analyse_sensibilite", analyser_sensibilite_en_tache,
+            methode=methode_sensibilite,
+            indicateur=indicateur_sensibilite,
+            variation=variation_sensibilite / 100,
             cultures=cultures,
-            cultures_db=cultures_db,
-            seuil_pluie_basse=1000,
-            seuil_temp_haute=30.0,
-            aleas_climatiques={
-                "sécheresse": {"proba": 0.15, "impact": 0.4},
-                "inondation": {"proba": 0.10, "impact": 0.5},
-                "tempête": {"proba": 0.05, "impact": 0.3},
-            },
-            impact_climatique_moyen=0.3,
-            taux_assurance=0.02,
-            taux_imposition=0.15,
-            seuil_exoneration_surface=5.0,
-            taux_charges_sociales=0.20,
-            cout_cmu_par_ouvrier=12000,
-            nb_ouvriers_par_hectare=0.5,
-            assurance_par_hectare=5000,
-            surface_serre_unite=0.05,
-            cout_serre_unite=1200000,
-            amortissement_serre_annee=10,
-            mode_financement=mode_financement,
-            montant_emprunt=montant_emprunt,
-            taux_emprunt=taux_emprunt
+            surface_totale=surface_ha,
+            part_serre=part_serre / 100,
+            duree_projet=duree,
+            n_scenarios=n_scenarios,
+            parametres=dict(parametres, part_stockee=part_stockee / 100, duree_stockage_mois=duree_stockage,
+                            **financement)
         )
 
-        st.success("Simulation terminée ✅")
+    tache = obtenir_tache("analyse_sensibilite")
+    if tache is not None:
+        if not tache.terminee:
+            suivre_tache(tache)
+        elif tache.etat == "erreur":
+            st.error(f"L'analyse de sensibilité a échoué : {tache.erreur.splitlines()[0]}")
+        elif tache.etat == "terminee":
+            afficher_sensibilite(tache.resultat)
+
 
-        st.subheader("📊 Résumé des scénarios clés")
+def simuler_et_analyser(n_scenarios, surface_ha, duree, part_serre, cultures, taux_actualisation,
+                        part_stockee, duree_stockage, parametres, financement, rappel=None):
+    """
+    Simulation Monte Carlo, indicateurs actualisés et trésorerie mensuelle, exécutés en tâche
+    de fond ; la simulation publie la distribution partielle des bénéfices par lots de scénarios.
+    Simulation et trésorerie partagent les mêmes tirages (même graine) et la même convention
+    de stockage avant vente. La simulation est enregistrée dans l'historique local (paramètres
+    et graine, version du catalogue des cultures) ; un échec d'enregistrement n'empêche pas
+    l'affichage des résultats.
+    """
+    parametres_simulation = dict(
+        n_scenarios=n_scenarios,
+        surface_totale=surface_ha,
+        duree_projet=duree,
+        part_serre=part_serre,
+        cultures=cultures,
+        cultures_db=cultures_db,
+        part_stockee=part_stockee,
+        duree_stockage_mois=duree_stockage,
+        **parametres,
+        **financement
+    )
+    graine = int(np.random.default_rng().integers(2 ** 31))
+    client = client_depuis_environnement()
+    if client is not None:
+        # Service de calcul partagé : pas de distribution partielle ; le service refait les
+        # mêmes tirages à partir de la graine
+        if rappel is not None:
+            rappel(0.0, "Simulation sur le service de calcul")
+        resultats, scen_min, scen_max, scen_med = client.soumettre(
+            "simuler_projet_agricole_multi", graine=graine, **parametres_simulation)
+    else:
+        rappel_simulation = None if rappel is None else (
+            lambda f, message, partiel: rappel(0.8 * f, message, partiel))
+        resultats, scen_min, scen_max, scen_med = simuler_projet_agricole_multi(
+            graine=graine, rappel=rappel_simulation, **parametres_simulation)
 
-        col1, col2, col3 = st.columns(3)
+    if rappel is not None:
+        rappel(0.8, "Indicateurs financiers")
+    investissement_serre = calculer_investissement_serre(
+        surface_ha * part_serre, parametres["surface_serre_unite"], parametres["cout_serre_unite"]
+    )
+    flux = construire_matrice_flux(resultats, duree, investissement_serre, financement["montant_emprunt"])
+    indicateurs = calculer_indicateurs_financiers(flux, taux_actualisation)
 
-        col1.metric("Scénario Minimum", f"{scen_min['Benefice_net_cycle'].sum():,.0f} FCFA")
-        col2.metric("Scénario Médian", f"{scen_med['Benefice_net_cycle'].sum():,.0f} FCFA")
-        col3.metric("Scénario Maximum", f"{scen_max['Benefice_net_cycle'].sum():,.0f} FCFA")
+    if rappel is not None:
+        rappel(0.9, "Trésorerie mensuelle")
+    tresorerie = simuler_tresorerie_agricole(graine=graine, **parametres_simulation)
+    sortie = {
+        "resultats": resultats,
+        "scen_min": scen_min,
+        "scen_max": scen_max,
+        "scen_med": scen_med,
+        "indicateurs": indicateurs,
+        "tresorerie": tresorerie,
+        "scenarios": scenarios_representatifs(resultats),
+    }
 
-        st.divider()
-        st.subheader("📈 Distribution des bénéfices nets")
+    parametres_historique = {k: v for k, v in parametres_simulation.items() if k != "cultures_db"}
+    parametres_historique.update(taux_actualisation=taux_actualisation, graine=graine)
+    try:
+        obtenir_historique().enregistrer(
+            TYPE_HISTORIQUE, parametres_historique, sorties_historisables(sortie), metriques_simulation(sortie),
+            version=empreinte_contenu(cultures_db), libelle=libelle_simulation(parametres_historique))
+    except (sqlite3.Error, OSError):
+        journal.warning("Enregistrement de la simulation dans l'historique impossible", exc_info=True)
+    return sortie
 
-        chart_data = resultats.groupby("Scenario")["Benefice_net_cycle"].sum().reset_index()
-        st.bar_chart(chart_data.set_index("Scenario"))
 
-        st.divider()
-        st.subheader("📤 Exporter les résultats")
+def optimiser_allocation_en_tache(rappel=None, **kwargs):
+    if rappel is not None:
+        rappel(0.0, "Recherche de l'allocation optimale")
+    return optimiser_allocation_surfaces(**kwargs)
 
-        export_data = {
-            "Tous les scénarios": resultats,
-            "Scénario Minimum": scen_min,
-            "Scénario Maximum": scen_max,
-            "Scénario Médian": scen_med,
-        }
 
-        st.download_button(
-            label="📥 Exporter en Excel",
-            data=export_excel(export_data),
-            file_name="simulation_agricole_montecarlo.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+def analyser_sensibilite_en_tache(methode, indicateur, variation, cultures, surface_totale, part_serre,
+                                  duree_projet, n_scenarios, parametres, rappel=None):
+    """
+    Tornado, criblage de Morris ou indices de Sobol des leviers sur des tirages communs.
+    """
+    if rappel is not None:
+        rappel(0.0, f"Analyse de sensibilité ({methode})")
+    analyse = AnalyseSensibilite(cultures, cultures_db, surface_totale, part_serre, duree_projet, parametres,
+                                 facteurs=definir_facteurs(parametres, variation), n_scenarios=n_scenarios)
+    if methode == "Tornado":
+        tableau = analyse.tornado(indicateur)
+    elif methode == "Morris":
+        tableau = analyse.morris(n_trajectoires=10)[indicateur]
+    else:
+        tableau = analyse.sobol(n_base=128)[indicateur]
+    return {"methode": methode, "indicateur": indicateur, "tableau": tableau}
+
+
+def afficher_sensibilite(sortie):
+    tableau = sortie["tableau"]
+    colonne = METHODES_SENSIBILITE[sortie["methode"]]
+    st.markdown(f"**{sortie['methode']} — {sortie['indicateur']}** (leviers classés par {colonne})")
+    st.bar_chart(tableau.set_index("Facteur")[colonne])
+    st.dataframe(tableau, use_container_width=True)
+    bouton_export({"Sensibilité": tableau}, f"sensibilite_{sortie['methode'].lower()}", "sensibilite")
+
+
+def afficher_distribution_partielle(benefices_totaux):
+    st.bar_chart(histogramme(benefices_totaux, n_classes=min(30, max(5, len(benefices_totaux) // 3))))
+
+
+def afficher_resultats_simulation(sortie):
+    resultats = sortie["resultats"]
+    scen_min, scen_max, scen_med = sortie["scen_min"], sortie["scen_max"], sortie["scen_med"]
+    indicateurs = sortie["indicateurs"]
+    tresorerie = sortie["tresorerie"]
+
+    st.success("Simulation terminée ✅")
+
+    st.subheader("📊 Résumé des scénarios clés")
+
+    col1, col2, col3 = st.columns(3)
+
+    col1.metric("Scénario Minimum", f"{scen_min['Benefice_net_cycle'].sum():,.0f} FCFA")
+    col2.metric("Scénario Médian", f"{scen_med['Benefice_net_cycle'].sum():,.0f} FCFA")
+    col3.metric("Scénario Maximum", f"{scen_max['Benefice_net_cycle'].sum():,.0f} FCFA")
+
+    st.divider()
+    st.subheader("📈 Distribution des bénéfices nets")
+
+    # Histogramme et densité de taille fixe plutôt qu'une barre par scénario
+    benefices_scenarios = resultats.groupby("Scenario")["Benefice_net_cycle"].sum()
+    onglet_histogramme, onglet_densite = st.tabs(["Histogramme", "Densité"])
+    onglet_histogramme.bar_chart(histogramme(benefices_scenarios))
+    onglet_densite.area_chart(densite_kde(benefices_scenarios))
+    st.caption(f"Bénéfice net cumulé sur {len(benefices_scenarios):,} scénarios.")
+
+    st.divider()
+    st.subheader("🧭 Scénarios représentatifs")
+    scenarios = sortie["scenarios"]
+    trajectoires = trajectoires_representatives(scenarios["trajectoires"])
+    st.line_chart(trajectoires)
+    st.caption(f"Bénéfice net cumulé de {len(trajectoires.columns)} scénarios pondérés résumant les "
+               f"{len(benefices_scenarios):,} scénarios simulés (écart de transport : "
+               f"{scenarios['reduction']['distance_relative']:.0%} de celui d'un scénario moyen unique). "
+               "Ils remplacent l'ensemble des scénarios dans les exports.")
+
+    st.divider()
+    st.subheader("💰 Rentabilité actualisée (VAN, TRI, délai de récupération)")
+
+    van_mediane = indicateurs["distribution"].loc["VAN", "P50"]
+    tri_median = indicateurs["distribution"].loc["TRI", "P50"]
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("VAN médiane", f"{van_mediane:,.0f} FCFA")
+    col2.metric("TRI médian", f"{tri_median:.1%}" if pd.notna(tri_median) else "n.d.")
+    col3.metric("Probabilité de VAN négative", f"{indicateurs['proba_van_negative']:.0%}")
+    st.dataframe(indicateurs["distribution"])
+
+    st.divider()
+    st.subheader("🏦 Trésorerie mensuelle")
+
+    col1, col2 = st.columns(2)
+    col1.metric("Probabilité de déficit de trésorerie", f"{tresorerie['proba_deficit']:.0%}")
+    col2.metric("Besoin de financement (P95)",
+                f"{np.quantile(tresorerie['besoin_financement'], 0.95):,.0f} FCFA")
+    st.line_chart(tresorerie["bandes"])
+
+    st.divider()
+    st.subheader("📤 Exporter les résultats")
+
+    export_data = {
+        "Scénarios représentatifs": scenarios["trajectoires"],
+        "Détail des représentatifs": scenarios["detail"],
+        "Scénario Minimum": scen_min,
+        "Scénario Maximum": scen_max,
+        "Scénario Médian": scen_med,
+        "Indicateurs financiers": indicateurs["par_scenario"],
+        "Trésorerie mensuelle": tresorerie["bandes"],
+    }
+
+    graphiques = {
+        "Densité des bénéfices nets": densite_kde(benefices_scenarios),
+        "Scénarios représentatifs": trajectoires,
+        "Trésorerie mensuelle": tresorerie["bandes"],
+    }
+    bouton_export(export_data, "simulation_agricole_montecarlo", "agricole", graphiques=graphiques)
+    st.caption("Simulation enregistrée dans l'historique : comparez-la aux précédentes depuis la page "
+               "« Comparaison des simulations ».")
+
+
+def afficher_optimum(optimum):
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Part sous serre optimale", f"{optimum['part_serre']:.0%}")
+    col2.metric("VAN espérée", f"{optimum['van_esperee']:,.0f} FCFA",
+                delta=f"{optimum['van_esperee'] - optimum['reference']['van_esperee']:,.0f} vs répartition égale")
+    col3.metric("CVaR 5 % de la VAN", f"{optimum['cvar_van']:,.0f} FCFA")
+    st.table(optimum["allocation"])
+
+    st.bar_chart(histogramme(optimum["distribution_van"], n_classes=30))
 
 if __name__ == "__main__":
     run()
@@ -1,37 +1,76 @@
+import logging
+import os
+import sqlite3
 import streamlit as st
 import pandas as pd
-from modules.finances.simulator_brvm import run_simulation
-from modules.finances.optimizer import optimiser_portefeuille
-from modules.finances.data_loader import charger_donnees_boursieres
+from modules.finances.pipeline import (
+    PARAMETRES_BOURSIERS_DEFAUT,
+    TYPE_HISTORIQUE,
+    creer_pipeline_boursier,
+    libelle_simulation,
+    metriques_simulation,
+    sorties_historisables
+)
+from modules.finances.optimizer import PortefeuilleInfaisable
+from modules.finances.emulateur_boursier import contexte_emulation, entrainer_emulateur_boursier, point_emulation
 from config.settings import DUREE_INVESTISSEMENT_YEARS
-from utils.export_tools import *
-
-
-if "simulations" not in st.session_state:
-    st.session_state["simulations"] = []
-
-
-@st.cache_data
-def get_portefeuille_optimal(
-    df,
-    rendement_dividende_min,
-    aversion_risque,
-    taux_sans_risque,
-    filtrer_stables,
-    min_entreprises,
-    pond_dividende,
-    mode
-):
-    return optimiser_portefeuille(
-        df=df,
-        rendement_dividende_min=rendement_dividende_min,
-        aversion_risque=aversion_risque,
-        taux_sans_risque=taux_sans_risque,
-        filtrer_stables=filtrer_stables,
-        min_entreprises=min_entreprises,
-        pond_dividende=pond_dividende,
-        mode=mode
-    )
+from service.client_calcul import client_depuis_environnement
+from modules.finances.entrepot_marche import DOSSIER_ENTREPOT, FREQUENCES
+from utils.bouton_export import bouton_export
+from utils.etat_partage import signature_fichier
+from utils.historique_simulations import obtenir_historique
+from utils.panneau_emulateur import panneau_emulateur
+from utils.reduction_scenarios import trajectoires_representatives
+from utils.taches import lancer_tache, obtenir_tache, oublier_tache, suivre_tache
+
+journal = logging.getLogger(__name__)
+
+LIBELLES_EMULATION = {
+    "capital_final": "Capital final médian",
+    "capital_final_p5": "Capital final P5",
+    "capital_final_p95": "Capital final P95",
+    "dividendes_cumules_final": "Dividendes cumulés",
+}
+
+
+def get_pipeline():
+    """
+    Pipeline mémoïsé propre à la session : seules les étapes touchées par un
+    paramètre modifié sont recalculées d'une simulation à l'autre. L'optimisation passe
+    par le service de calcul partagé s'il est configuré (AGRIBOURSE_SERVICE_CALCUL).
+    """
+    if "pipeline_boursier" not in st.session_state:
+        st.session_state["pipeline_boursier"] = creer_pipeline_boursier(client_calcul=client_depuis_environnement())
+    return st.session_state["pipeline_boursier"]
+
+
+def relire_historique(parametres):
+    """
+    Simulation déjà enregistrée pour ces paramètres sur la version courante du classeur
+    de marché, ou None.
+    """
+    try:
+        return obtenir_historique().rechercher(TYPE_HISTORIQUE, parametres,
+                                               version=signature_fichier(parametres["fichier"]))
+    except (sqlite3.Error, OSError):
+        journal.warning("Lecture de l'historique des simulations impossible", exc_info=True)
+        return None
+
+
+def simuler_et_historiser(pipeline, parametres, rappel=None):
+    """
+    Exécute le pipeline en tâche de fond puis enregistre la simulation dans l'historique
+    local ; un échec d'enregistrement n'empêche pas l'affichage des résultats.
+    """
+    version = signature_fichier(parametres["fichier"])
+    sorties = pipeline.executer(parametres, rappel=rappel)
+    try:
+        obtenir_historique().enregistrer(
+            TYPE_HISTORIQUE, parametres, sorties_historisables(sorties), metriques_simulation(sorties),
+            version=version, libelle=libelle_simulation(parametres))
+    except (sqlite3.Error, OSError):
+        journal.warning("Enregistrement de la simulation dans l'historique impossible", exc_info=True)
+    return sorties
 
 
 def run():
@@ -86,6 +125,27 @@ def run():
     fiscalite_dividendes = st.number_input(
         "Fiscalité sur dividendes (%)", min_value=0.0, max_value=50.0, value=15.0
     ) / 100
+    politiques = {
+        "Continu (sans coût)": None,
+        "Jamais": "jamais",
+        "Annuel": "annuel",
+        "Par bandes": "bandes",
+    }
+    politique_reequilibrage = politiques[st.selectbox(
+        "Rééquilibrage du portefeuille", list(politiques),
+        help="Hors mode continu, les positions par titre sont suivies avec frais et limites de liquidité"
+    )]
+    seuil_bande = 0.05
+    if politique_reequilibrage == "bandes":
+        seuil_bande = st.slider("Écart de poids déclenchant le rééquilibrage (%)", 1, 20, 5) / 100
+    dossier_entrepot = None
+    frequence_estimation = "mensuelle"
+    if os.path.isdir(os.path.join(DOSSIER_ENTREPOT, "journalier")) and st.checkbox(
+        "Estimer les titres sur les cours journaliers",
+        help="Rendements moyens et covariances estimés sur l'entrepôt de cours journaliers, puis annualisés"
+    ):
+        dossier_entrepot = DOSSIER_ENTREPOT
+        frequence_estimation = st.selectbox("Fréquence d'estimation", [f for f in FREQUENCES if f != "annuelle"], index=2)
 
 
     st.subheader("💰 Mode de financement")
@@ -161,10 +221,37 @@ def run():
 
         params_financement["prets"] = prets
 
-    if st.button("🚀 Lancer la simulation"):
+    parametres = dict(
+        PARAMETRES_BOURSIERS_DEFAUT,
+        rendement_dividende_min=objectif_rendement_dividende,
+        aversion_risque=aversion_risque,
+        taux_sans_risque=taux_sans_risque,
+        filtrer_stables=filtrer_stables,
+        min_entreprises=min_entreprises,
+        pond_dividende=pond_dividende,
+        mode=mode,
+        duree_investissement=duree_investissement,
+        mode_financement=mode_financement,
+        params_financement=params_financement,
+        reinvestir_dividendes=reinvestir_dividendes,
+        frais_achat=frais_achat,
+        fiscalite_dividendes=fiscalite_dividendes,
+        politique_reequilibrage=politique_reequilibrage,
+        seuil_bande=seuil_bande,
+        dossier_entrepot=dossier_entrepot,
+        frequence_estimation=frequence_estimation
+    )
+
+    # Aperçu par l'émulateur ; la confirmation lance la simulation exacte
+    confirmer = panneau_emulateur(
+        "bourse", point_emulation(parametres), contexte_emulation(parametres),
+        lambda n_points, rappel=None: entrainer_emulateur_boursier(
+            parametres, n_points, client_calcul=client_depuis_environnement(), rappel=rappel),
+        LIBELLES_EMULATION, {sortie: "{:,.0f} FCFA" for sortie in LIBELLES_EMULATION}
+    )
+
+    if st.button("🚀 Lancer la simulation") or confirmer:
 
-        #Chargement des données
-        df = charger_donnees_boursieres()
         # Validation de base
         if mode_financement == "Apport mensuel" and montant_apport_mensuel == 0:
             st.warning("Veuillez saisir un apport mensuel ou choisir un autre mode de financement.")
@@ -180,86 +267,91 @@ def run():
                 st.warning("Veuillez configurer au moins un prêt.")
                 return
 
-        st.info("🔍 Optimisation du portefeuille en cours...")
-        portefeuille_optimal = get_portefeuille_optimal(
-            df=df,
-            rendement_dividende_min=objectif_rendement_dividende,
-            aversion_risque=aversion_risque,
-            taux_sans_risque=taux_sans_risque,
-            filtrer_stables=filtrer_stables,
-            min_entreprises=min_entreprises,
-            pond_dividende=pond_dividende,
-            mode=mode
-        )
-
-        if len(portefeuille_optimal) == 0:
-            st.error("⚠️ Aucun portefeuille ne satisfait le rendement minimum spécifié. Essayez de réduire l'objectif ou vérifiez les données disponibles.")
-            return
-
-        st.success("Portefeuille optimal généré ✅")
-        st.subheader("📌 Détail du portefeuille optimal")
-        st.table(portefeuille_optimal['portefeuille'])
-
-        st.info("📊 Lancement de la simulation ...")
-        resultats = run_simulation(
-            df=df,
-            mode_financement=mode_financement,
-            params_financement=params_financement,
-            duree_investissement=duree_investissement,
-            rendement_min_dividendes=objectif_rendement_dividende,
-            n_simulations=1000,
-            aversion_risque=aversion_risque,
-            filtrer_stables=filtrer_stables,
-            reinvestir_dividendes=reinvestir_dividendes,
-            frais_achat=frais_achat,
-            fiscalite_dividendes=fiscalite_dividendes,
-            taux_sans_risque=taux_sans_risque,
-            min_entreprises=min_entreprises,
-            pond_dividende=pond_dividende,
-            mode=mode
-        )
-
-        st.success("Simulation terminée ✅")
-
-        df_valeurs = resultats["valeurs_portefeuille"]
-        df_dividendes = resultats["dividendes_cumulees"]
-        df_resume = resultats["resume"]
-        capital_series = df_valeurs.T.squeeze()
-        dividende_series = df_dividendes.T.squeeze()
-
-        st.subheader("📈 Évolution du portefeuille")
-        st.line_chart(capital_series, use_container_width=True)
-
-        st.subheader("💵 Evolution des dividendes")
-        st.bar_chart(dividende_series, use_container_width=True)
-
-        st.subheader("📋 Résumé de la simulation")
-        resume_df = pd.DataFrame(resultats["resume"].items(), columns=["Clé", "Valeur"])
-        st.table(resume_df)
-
-        
-        st.metric("Capital final simulé", f"{resultats['resume']['capital_final']:,.0f} FCFA")
-
-        # Mémorisation des résultats
-        st.session_state["resultats_export"] = {
-            "Portefeuille Optimal": portefeuille_optimal,
-            "Valeurs du Portefeuille": resultats["valeurs_portefeuille"],
-            "Revenus de Dividendes": resultats["dividendes_cumulees"],
-            "Résumé": resultats["resume"]
-        }
-
-
-        st.markdown("---")
-        st.subheader("📤 Exporter les résultats")
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.download_button(
-                label="📥 Exporter en Excel",
-                data=export_excel(st.session_state["resultats_export"]),
-                file_name="simulation_boursiere.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+        # Spécification déjà simulée sur les mêmes données : résultats relus sans recalcul
+        entree = relire_historique(parametres)
+        if entree is not None:
+            oublier_tache("simulation_boursiere")
+            st.session_state["simulation_boursiere_historique"] = entree
+        else:
+            # Optimisation et simulation en arrière-plan : la page reste utilisable pendant le calcul
+            st.session_state.pop("simulation_boursiere_historique", None)
+            lancer_tache("simulation_boursiere", simuler_et_historiser, get_pipeline(), parametres)
+
+    entree = st.session_state.get("simulation_boursiere_historique")
+    if entree is not None:
+        afficher_resultats(entree["resultats"], entree)
+        return
+    tache = obtenir_tache("simulation_boursiere")
+    if tache is None:
+        return
+    if not tache.terminee:
+        st.info("🔍 Optimisation du portefeuille et simulation en cours...")
+        suivre_tache(tache, rendu_partiel=lambda eventail: st.line_chart(eventail, use_container_width=True))
+    elif tache.etat == "annulee":
+        st.warning("Simulation annulée.")
+    elif isinstance(tache.exception, PortefeuilleInfaisable):
+        st.error(f"⚠️ Aucun portefeuille ne satisfait les contraintes spécifiées ({tache.erreur.splitlines()[0]}). Essayez de réduire l'objectif ou vérifiez les données disponibles.")
+    elif tache.etat == "erreur":
+        st.error(f"⚠️ La simulation a échoué : {tache.erreur.splitlines()[0]}")
+    else:
+        afficher_resultats(tache.resultat)
+
+
+def afficher_resultats(sorties, entree_historique=None):
+    portefeuille_optimal = sorties["optimisation"]
+    resultats = sorties["agregation"]
+
+    st.success("Portefeuille optimal généré ✅")
+    st.subheader("📌 Détail du portefeuille optimal")
+    st.table(portefeuille_optimal['portefeuille'])
+    if entree_historique is not None:
+        st.caption(f"Résultats relus de l'historique (simulation du {entree_historique['cree_le']:%d/%m/%Y à %H:%M}), "
+                   "aucun recalcul.")
+    else:
+        st.caption("Étapes recalculées : " + (", ".join(get_pipeline().etapes_recalculees) or "aucune (résultats en cache)"))
+
+    st.success("Simulation terminée ✅")
+
+    st.subheader("📈 Évolution du portefeuille")
+    st.line_chart(resultats["eventail_capital"], use_container_width=True)
+    st.caption("Quantiles P5 à P95 de la valeur du portefeuille sur l'ensemble des trajectoires simulées.")
+
+    st.subheader("🎯 Distribution du capital final")
+    st.bar_chart(resultats["distribution_capital_final"], use_container_width=True)
+
+    st.subheader("💵 Evolution des dividendes")
+    st.line_chart(resultats["eventail_dividendes"], use_container_width=True)
+    st.caption("Quantiles des dividendes cumulés perçus.")
+
+    scenarios = sorties.get("scenarios")
+    if scenarios is not None:
+        st.subheader("🧭 Scénarios représentatifs")
+        st.line_chart(trajectoires_representatives(scenarios["capital"]), use_container_width=True)
+        st.dataframe(scenarios["capital"][["Scénario d'origine", "Poids"]].join(
+            scenarios["capital"].iloc[:, -1].rename("Capital final")),
+            column_config={"Poids": st.column_config.NumberColumn(format="percent"),
+                           "Capital final": st.column_config.NumberColumn(format="%.0f")})
+        st.caption(f"{len(scenarios['capital'])} trajectoires pondérées résument l'ensemble des simulations "
+                   f"(écart de transport : {scenarios['reduction']['distance_relative']:.0%} de celui d'une "
+                   "trajectoire moyenne unique) ; elles alimentent les exports et le rapport PDF.")
+
+    st.subheader("📋 Résumé de la simulation")
+    resume_df = pd.DataFrame(resultats["resume"].items(), columns=["Clé", "Valeur"])
+    st.table(resume_df)
+
+    st.metric("Capital final simulé", f"{resultats['resume']['capital_final']:,.0f} FCFA")
+
+    st.caption("Simulation enregistrée dans l'historique : comparez-la aux précédentes depuis la page "
+               "« Comparaison des simulations ».")
+
+    st.markdown("---")
+    st.subheader("📤 Exporter les résultats")
+    graphiques = {"Évolution du portefeuille": resultats["eventail_capital"],
+                  "Dividendes cumulés": resultats["eventail_dividendes"]}
+    if scenarios is not None:
+        graphiques["Scénarios représentatifs"] = trajectoires_representatives(scenarios["capital"])
+    bouton_export(sorties["export"], "simulation_boursiere", "bourse",
+                  graphiques=graphiques)
 
 if __name__ == "__main__":
     run()
@@ -1,6 +1,7 @@
 import streamlit as st
 from config.settings import APP_NAME, VERSION, APP_LOGO
 from pathlib import Path
+from utils.panneau_debug import afficher_panneau_debug
 
 # 💡 Load custom style
 def load_css():
@@ -22,7 +23,7 @@ load_css()
 # 🧭 Barre de navigation latérale
 st.sidebar.image(APP_LOGO, width=120)
 st.sidebar.title("Navigation")
-page = st.sidebar.radio("Aller vers :", ["🏠 Accueil", "📈 Simulation Boursière", "🌾 Simulation Agricole"])
+page = st.sidebar.radio("Aller vers :", ["🏠 Accueil", "📈 Simulation Boursière", "🌾 Simulation Agricole", "📊 Comparaison des simulations"])
 
 
 # 📂 Navigation dynamique
@@ -38,6 +39,13 @@ elif page == "🌾 Simulation Agricole":
     import Simulation_Agricole as agricole
     agricole.run()
 
+elif page == "📊 Comparaison des simulations":
+    import Comparaison_Simulations as comparaison
+    comparaison.run()
+
 # 📎 Footer
 st.markdown("---")
 st.markdown(f"<small>Version {VERSION} • Développé par Franck Emmanuel Djidji Kadjo</small>", unsafe_allow_html=True)
+
+# 🛠️ Rapport d'instrumentation des calculs de la session
+afficher_panneau_debug()
@@ -0,0 +1,105 @@
+# cas.py
+import itertools
+import os
+from typing import Any, Callable, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.donnees_synthetiques import (
+    ecrire_classeur_marche,
+    generer_catalogue_cultures,
+    generer_panneau_marche,
+    parametres_projet_agricole
+)
+
+
+class CasBenchmark:
+    """
+    Fonction mesurée sur une grille de tailles : preparer(parametres, dossier) construit les
+    données hors mesure et renvoie l'appel sans argument à chronométrer.
+    """
+
+    def __init__(self, nom: str, grille: Dict[str, Sequence[Any]],
+                 preparer: Callable[[Dict[str, Any], str], Callable[[], Any]]):
+        self.nom = nom
+        self.grille = grille
+        self.preparer = preparer
+
+    def points(self, rapide: bool = False) -> List[Dict[str, Any]]:
+        valeurs = [v[:1] if rapide else v for v in self.grille.values()]
+        return [dict(zip(self.grille, combinaison)) for combinaison in itertools.product(*valeurs)]
+
+
+def _preparer_chargement(p, dossier):
+    from modules.finances.data_loader import charger_donnees_boursieres
+    chemin = ecrire_classeur_marche(generer_panneau_marche(p["n_titres"], p["n_annees"]),
+                                    os.path.join(dossier, f"marche_{p['n_titres']}_{p['n_annees']}.xlsx"))
+    return lambda: charger_donnees_boursieres(chemin)
+
+
+def _preparer_optimisation(p, dossier):
+    from modules.finances.optimizer import optimiser_portefeuille
+    df = generer_panneau_marche(p["n_titres"], p["n_annees"])
+    return lambda: optimiser_portefeuille(df, rendement_dividende_min=2, mode="montecarlo",
+                                          n_simulations=p["n_simulations"])
+
+
+def _preparer_simulation(p, dossier):
+    from modules.finances.simulator_brvm import run_simulation
+    df = generer_panneau_marche(p["n_titres"], 8)
+    return lambda: run_simulation(df, "Apport unique", {"apport_unique": 5_000_000}, duree_investissement=10,
+                                  rendement_min_dividendes=2, n_simulations=p["n_simulations"], mode="montecarlo",
+                                  politique_reequilibrage=p["politique_reequilibrage"])
+
+
+def _preparer_agricole(p, dossier):
+    from modules.agriculture.simulator_agri import simuler_projet_agricole_multi
+    parametres = parametres_projet_agricole(generer_catalogue_cultures(p["n_cultures"]))
+
+    return lambda: simuler_projet_agricole_multi(n_scenarios=p["n_scenarios"], graine=0, **parametres)
+
+
+def _preparer_export(p, dossier):
+    from utils.export_tools import export_excel
+    rng = np.random.default_rng(0)
+    resultats = {f"Feuille{i + 1}": pd.DataFrame(rng.normal(size=(p["n_lignes"], p["n_colonnes"])))
+                 for i in range(2)}
+    return lambda: export_excel(resultats)
+
+
+def _preparer_rapport_pdf(p, dossier):
+    from modules.agriculture.simulator_agri import simuler_projet_agricole_multi
+    from utils.export_tools import export_pdf
+    resultats, scen_min, scen_max, scen_med = simuler_projet_agricole_multi(
+        n_scenarios=p["n_scenarios"], graine=0,
+        **parametres_projet_agricole(generer_catalogue_cultures(3)))
+    benefices = resultats.groupby("Scenario")["Benefice_net_cycle"].sum()
+    tables = {"Tous les scénarios": resultats, "Scénario Minimum": scen_min,
+              "Scénario Maximum": scen_max, "Scénario Médian": scen_med}
+    graphiques = {"Bénéfices nets": benefices.sort_values(ignore_index=True),
+                  "Bénéfice par cycle": resultats.groupby("Cycle")["Benefice_net_cycle"].describe()[["25%", "50%", "75%"]]}
+    return lambda: export_pdf(tables, graphiques)
+
+
+def _preparer_reduction(p, dossier):
+    from utils.reduction_scenarios import reduire_scenarios
+    rng = np.random.default_rng(0)
+    trajectoires = 1e6 * np.cumprod(1 + rng.normal(0.05, 0.2, (p["n_scenarios"], 10)), axis=1)
+    return lambda: reduire_scenarios(trajectoires, 10, p["methode"])
+
+
+CAS_BENCHMARKS = [
+    CasBenchmark("charger_donnees_boursieres", {"n_titres": [46, 200, 800], "n_annees": [8]}, _preparer_chargement),
+    CasBenchmark("optimiser_portefeuille",
+                 {"n_titres": [46, 150], "n_annees": [8, 20], "n_simulations": [2000]}, _preparer_optimisation),
+    CasBenchmark("run_simulation",
+                 {"n_titres": [46, 150], "n_simulations": [250, 1000], "politique_reequilibrage": [None, "annuel"]},
+                 _preparer_simulation),
+    CasBenchmark("simuler_projet_agricole_multi", {"n_cultures": [3, 10], "n_scenarios": [50, 200]},
+                 _preparer_agricole),
+    CasBenchmark("export_excel", {"n_lignes": [1000, 20000], "n_colonnes": [10]}, _preparer_export),
+    CasBenchmark("rapport_pdf", {"n_scenarios": [200, 1000]}, _preparer_rapport_pdf),
+    CasBenchmark("reduire_scenarios", {"n_scenarios": [1000, 5000], "methode": ["kmedoides", "selection_avant"]},
+                 _preparer_reduction),
+]
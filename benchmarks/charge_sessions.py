@@ -0,0 +1,146 @@
+# charge_sessions.py
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.donnees_synthetiques import ecrire_classeur_marche, generer_panneau_marche
+from modules.finances.pipeline import PARAMETRES_BOURSIERS_DEFAUT, creer_pipeline_boursier
+
+# Paramètres d'une session de conseiller ; chaque simulation suivante modifie un réglage
+PARAMETRES_SESSION = dict(
+    PARAMETRES_BOURSIERS_DEFAUT, rendement_dividende_min=2, aversion_risque=3.0, taux_sans_risque=0.03,
+    filtrer_stables=False, min_entreprises=5, pond_dividende=0.5, mode="montecarlo", duree_investissement=10,
+    mode_financement="Apport unique", params_financement={"apport_unique": 5_000_000},
+    reinvestir_dividendes=True, frais_achat=0.012, fiscalite_dividendes=0.15,
+)
+VARIANTES = [{}, {"frais_achat": 0.02}, {"aversion_risque": 2.0}, {"politique_reequilibrage": "annuel"}]
+
+
+def memoire_residente() -> Optional[int]:
+    # Mémoire résidente du processus (Linux) ; None si /proc n'est pas disponible
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _session(i: int, fichier: str, n_simulations: int, n_trajectoires: int, etat_partage: bool,
+             pipelines: List, latences: List, donnees_vues: List):
+    """
+    Une session : son propre pipeline (comme st.session_state), n_simulations exécutions
+    successives avec des réglages différents. Le pipeline est conservé jusqu'à la fin
+    de la mesure, comme une session restée ouverte.
+    """
+    pipeline = creer_pipeline_boursier(etat_partage=etat_partage)
+    pipelines.append(pipeline)
+    parametres = dict(PARAMETRES_SESSION, fichier=fichier, graine=i, n_simulations=n_trajectoires)
+    for k in range(n_simulations):
+        parametres.update(VARIANTES[k % len(VARIANTES)])
+        debut = time.perf_counter()
+        resultats = pipeline.executer(parametres)
+        latences.append(time.perf_counter() - debut)
+        donnees_vues.append(resultats["donnees"])
+
+
+def _reecrire_classeur(fichier: str, df, delai: float):
+    # Réécriture atomique du classeur en cours de mesure (exerce le rechargement à chaud)
+    time.sleep(delai)
+    temporaire = fichier + ".tmp.xlsx"
+    ecrire_classeur_marche(df.assign(Prix_Cloture_Annuel=df["Prix_Cloture_Annuel"] * 1.01), temporaire)
+    os.replace(temporaire, fichier)
+
+
+def mesurer_charge(n_sessions: int = 10, n_simulations: int = 2, n_trajectoires: int = 250,
+                   concurrence: Optional[int] = None, etat_partage: bool = True, n_titres: int = 46,
+                   n_annees: int = 8, reecrire_apres: Optional[float] = None) -> Dict:
+    """
+    Lance n_sessions sessions simulées en parallèle (concurrence fils) sur un classeur
+    synthétique ; débit, latences, mémoire résidente par session et nombre de copies des
+    données de marché effectivement chargées.
+    """
+    with tempfile.TemporaryDirectory(prefix="charge_") as dossier:
+        df = generer_panneau_marche(n_titres, n_annees)
+        fichier = ecrire_classeur_marche(df, os.path.join(dossier, "marche.xlsx"))
+        pipelines, latences, donnees_vues = [], [], []
+        memoire_debut = memoire_residente()
+        if reecrire_apres is not None:
+            threading.Thread(target=_reecrire_classeur, args=(fichier, df, reecrire_apres), daemon=True).start()
+
+        debut = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrence or n_sessions) as executeur:
+            futurs = [executeur.submit(_session, i, fichier, n_simulations, n_trajectoires, etat_partage,
+                                       pipelines, latences, donnees_vues) for i in range(n_sessions)]
+            for futur in futurs:
+                futur.result()
+        duree = time.perf_counter() - debut
+        memoire_fin = memoire_residente()
+
+    return {
+        "mode": "partage" if etat_partage else "par_session",
+        "sessions": n_sessions,
+        "simulations": len(latences),
+        "duree": duree,
+        "debit": len(latences) / duree,
+        "latence_p50": float(np.median(latences)),
+        "latence_p95": float(np.quantile(latences, 0.95)),
+        "memoire_par_session": None if memoire_debut is None else (memoire_fin - memoire_debut) / n_sessions,
+        "copies_donnees": len({id(etat.donnees) for etat in donnees_vues}),
+    }
+
+
+def afficher_charge(lignes: List[Dict]):
+    print(f"\n{'mode':<12} {'sessions':>8} {'simul.':>7} {'débit':>10} {'p50':>8} {'p95':>8} "
+          f"{'Mo/session':>11} {'copies':>7}")
+    for ligne in lignes:
+        memoire = "" if ligne["memoire_par_session"] is None else f"{ligne['memoire_par_session'] / 2 ** 20:.1f}"
+        print(f"{ligne['mode']:<12} {ligne['sessions']:>8} {ligne['simulations']:>7} {ligne['debit']:>8.1f}/s "
+              f"{ligne['latence_p50']:>7.2f}s {ligne['latence_p95']:>7.2f}s {memoire:>11} {ligne['copies_donnees']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge multi-sessions de la simulation boursière")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--simulations", type=int, default=2, help="simulations par session")
+    parser.add_argument("--trajectoires", type=int, default=250)
+    parser.add_argument("--titres", type=int, default=46, help="titres du classeur synthétique")
+    parser.add_argument("--annees", type=int, default=8, help="années du classeur synthétique")
+    parser.add_argument("--concurrence", type=int, help="sessions simultanées (défaut : toutes)")
+    parser.add_argument("--sans-partage", action="store_true", help="une copie des données par session")
+    parser.add_argument("--comparer", action="store_true",
+                        help="mesurer les deux modes, chacun dans un processus neuf")
+    parser.add_argument("--reecrire-apres", type=float, help="réécrire le classeur après ce délai (s)")
+    parser.add_argument("--json", action="store_true", help="résultat au format JSON")
+    args = parser.parse_args()
+
+    if args.comparer:
+        lignes = []
+        for mode in ([], ["--sans-partage"]):
+            commande = [sys.executable, "-m", "benchmarks.charge_sessions", "--json",
+                        "--sessions", str(args.sessions), "--simulations", str(args.simulations),
+                        "--trajectoires", str(args.trajectoires), "--titres", str(args.titres),
+                        "--annees", str(args.annees)] + mode
+            if args.concurrence:
+                commande += ["--concurrence", str(args.concurrence)]
+            lignes.append(json.loads(subprocess.run(commande, capture_output=True, text=True, check=True)
+                                     .stdout.strip().splitlines()[-1]))
+    else:
+        lignes = [mesurer_charge(args.sessions, args.simulations, args.trajectoires, args.concurrence,
+                                 not args.sans_partage, args.titres, args.annees, args.reecrire_apres)]
+    if args.json:
+        print(json.dumps(lignes[0] if len(lignes) == 1 else lignes))
+    else:
+        afficher_charge(lignes)
+
+
+if __name__ == "__main__":
+    main()
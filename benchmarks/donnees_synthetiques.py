@@ -0,0 +1,121 @@
+# donnees_synthetiques.py
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.settings import PARAMETRES_AGRICOLES_DEFAUT
+
+SECTEURS_BRVM = ["FINANCES", "INDUSTRIE", "DISTRIBUTION", "TRANSPORT", "SERVICES PUBLICS",
+                 "AGRICULTURE", "AUTRES SECTEURS"]
+
+
+def generer_panneau_marche(n_titres: int = 46, n_annees: int = 8, n_secteurs: int = 7,
+                           annee_debut: int = 2017, graine: Optional[int] = 0) -> pd.DataFrame:
+    """
+    Panneau annuel synthétique au format de charger_donnees_boursieres : n_titres titres
+    répartis sur n_secteurs secteurs, cours suivant un facteur de marché, un facteur
+    sectoriel et un bruit propre, dividendes proportionnels au cours.
+    """
+    rng = np.random.default_rng(graine)
+    secteurs = [SECTEURS_BRVM[s] if s < len(SECTEURS_BRVM) else f"SECTEUR {s + 1}" for s in range(n_secteurs)]
+    secteur_titre = rng.integers(0, n_secteurs, size=n_titres)
+
+    choc_marche = rng.normal(0.05, 0.15, size=n_annees)
+    choc_secteur = rng.normal(0.0, 0.10, size=(n_annees, n_secteurs))
+    choc_propre = rng.normal(0.0, 0.20, size=(n_annees, n_titres))
+    variations = np.maximum(choc_marche[:, None] + choc_secteur[:, secteur_titre] + choc_propre, -0.8)
+    prix = np.round(rng.lognormal(8.0, 1.0, size=n_titres) * np.cumprod(1 + variations, axis=0)).clip(min=5)
+
+    stable = rng.random(n_titres) < 0.7
+    rendement_cible = np.where(stable, rng.uniform(0.03, 0.10, n_titres), rng.uniform(0.0, 0.05, n_titres))
+    dividendes = np.round(prix * rendement_cible * rng.uniform(0.7, 1.3, size=prix.shape), 2)
+    dividendes[:, ~stable] *= rng.random((n_annees, (~stable).sum())) < 0.6
+    actions = rng.integers(1_000, 50_000, size=(n_annees, n_titres))
+
+    return pd.DataFrame({
+        "Nom_Entreprise": np.tile([f"TITRE {i + 1:04d}" for i in range(n_titres)], n_annees),
+        "Secteur": np.tile([secteurs[s] for s in secteur_titre], n_annees),
+        "Annee": np.repeat(np.arange(annee_debut, annee_debut + n_annees), n_titres),
+        "Prix_Cloture_Annuel": prix.ravel().astype(np.int64),
+        "Variation(annee_precedente)": np.round(variations.ravel() * 100, 2),
+        "Nombre_Actions_restant": actions.ravel(),
+        "Capital_restant": (prix * actions).ravel().astype(np.int64),
+        "Dividende_Verse": dividendes.ravel(),
+        "Rendement_Dividende": np.round(dividendes / prix * 100, 2).ravel(),
+        "Payeur_Stable": np.tile(stable, n_annees),
+    }).sort_values(["Nom_Entreprise", "Annee"], ignore_index=True)
+
+
+def ecrire_classeur_marche(df: pd.DataFrame, chemin: str) -> str:
+    df.to_excel(chemin, index=False)
+    return chemin
+
+
+def _parametres_methode(rng: np.random.Generator, rendement: float, prix: float, cycles: int) -> Dict:
+    return {
+        "rendement": round(rendement, 2),
+        "prix": round(prix),
+        "sigma": round(rng.uniform(0.05, 0.25), 3),
+        "risque_rendement": {"proba": round(rng.uniform(0.05, 0.2), 3), "impact": round(rng.uniform(0.1, 0.4), 3)},
+        "risque_prix": {"proba": round(rng.uniform(0.05, 0.2), 3), "impact": round(rng.uniform(0.1, 0.3), 3)},
+        "sensibilite_climat": round(rng.uniform(0.2, 0.8), 3),
+        "cycles": cycles,
+        "cout_intrants": round(rng.uniform(1e5, 4e5)),
+        "cout_main_oeuvre": round(rng.uniform(1e5, 3e5)),
+    }
+
+
+def generer_catalogue_cultures(n_cultures: int = 10, part_serre: float = 0.6,
+                               graine: Optional[int] = 0) -> Dict[str, Dict]:
+    """
+    Catalogue synthétique au format de config.cultures_db ; une part_serre des cultures
+    a aussi une variante sous serre (rendement et nombre de cycles plus élevés).
+    """
+    rng = np.random.default_rng(graine)
+    catalogue = {}
+    for i in range(n_cultures):
+        rendement, prix, cycles = rng.uniform(3, 30), rng.uniform(150, 600), int(rng.integers(1, 3))
+        catalogue[f"culture_{i + 1:03d}"] = {
+            "plein_champ": _parametres_methode(rng, rendement, prix, cycles),
+            "serre": (_parametres_methode(rng, rendement * rng.uniform(2, 3), prix * 1.1, cycles + 1)
+                      if rng.random() < part_serre else None),
+        }
+    return catalogue
+
+
+def generer_historique_climat_prix(cultures: List[str], n_annees: int = 30, annee_debut: int = 1995,
+                                   graine: Optional[int] = 0) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Historiques annuels synthétiques au format de charger_historique : météo (Pluie_annuelle,
+    Temp_moyenne, Pluie_<culture>) et prix par culture, avec une pluie commune et des prix
+    autocorrélés.
+    """
+    rng = np.random.default_rng(graine)
+    annees = np.arange(annee_debut, annee_debut + n_annees)
+    pluie = rng.normal(1200, 200, size=n_annees).clip(min=300)
+    meteo = {"Annee": annees, "Pluie_annuelle": pluie, "Temp_moyenne": rng.normal(27, 1.5, size=n_annees)}
+    prix = {"Annee": annees}
+    for culture in cultures:
+        meteo[f"Pluie_{culture}"] = (pluie * rng.normal(1.0, 0.1, size=n_annees)).clip(min=100)
+        chocs = rng.normal(0, 0.1, size=n_annees)
+        prix[culture] = rng.uniform(150, 600) * np.exp(np.cumsum(chocs - chocs.mean()) * 0.5)
+    return pd.DataFrame(meteo), pd.DataFrame(prix)
+
+
+def parametres_projet_agricole(cultures_db: Dict, surface_totale: float = 10.0, duree_projet: int = 5,
+                               part_serre: float = 0.2) -> Dict:
+    """
+    Arguments de simuler_projet_agricole_multi (hors n_scenarios) pour un catalogue synthétique.
+    """
+    return dict(
+        PARAMETRES_AGRICOLES_DEFAUT,
+        surface_totale=surface_totale,
+        duree_projet=duree_projet,
+        part_serre=part_serre,
+        cultures=list(cultures_db),
+        cultures_db=cultures_db,
+        mode_financement="emprunt",
+        montant_emprunt=5_000_000,
+        taux_emprunt=0.06,
+    )
@@ -0,0 +1,141 @@
+# executer.py
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.cas import CAS_BENCHMARKS
+from benchmarks.mesure import comparer_echantillons, mesurer_memoire, mesurer_temps
+from benchmarks.temps_import import afficher_budgets_import, verifier_budgets_import
+
+FICHIER_REFERENCES = "benchmarks/references.json"
+DOSSIER_RESULTATS = "benchmarks/resultats"
+
+
+def cle_mesure(nom_cas: str, parametres: Dict) -> str:
+    return f"{nom_cas}[{','.join(f'{k}={v}' for k, v in parametres.items())}]"
+
+
+def machine() -> Dict:
+    return {"python": platform.python_version(), "processeur": platform.processor() or platform.machine(),
+            "systeme": platform.platform(), "n_coeurs": os.cpu_count()}
+
+
+def executer_benchmarks(noms_cas: Optional[List[str]] = None, repetitions: int = 5, rapide: bool = False,
+                        memoire: bool = True) -> Dict[str, Dict]:
+    """
+    Exécute les cas de benchmarks.cas sur leur grille (premier point seulement si rapide) :
+    durées de chaque répétition et, si memoire, pic d'allocations d'un appel supplémentaire.
+    """
+    cas = [c for c in CAS_BENCHMARKS if not noms_cas or c.nom in noms_cas]
+    mesures = {}
+    with tempfile.TemporaryDirectory(prefix="benchmarks_") as dossier:
+        for cas_benchmark in cas:
+            for parametres in cas_benchmark.points(rapide):
+                cle = cle_mesure(cas_benchmark.nom, parametres)
+                appel = cas_benchmark.preparer(parametres, dossier)
+                durees = mesurer_temps(appel, repetitions=repetitions)
+                mesures[cle] = {
+                    "cas": cas_benchmark.nom,
+                    "parametres": parametres,
+                    "durees": durees,
+                    "memoire_pic": mesurer_memoire(appel) if memoire else None,
+                }
+                print(f"{cle:<85} {np.median(durees) * 1000:10.1f} ms", flush=True)
+    return mesures
+
+
+def charger_references(chemin: str = FICHIER_REFERENCES) -> Dict:
+    if not os.path.exists(chemin):
+        return {}
+    with open(chemin, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def enregistrer_references(mesures: Dict[str, Dict], chemin: str = FICHIER_REFERENCES):
+    """
+    Met à jour les références des mesures fournies (les autres références sont conservées).
+    """
+    references = charger_references(chemin)
+    references.setdefault("mesures", {}).update(mesures)
+    references["machine"] = machine()
+    references["date"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    with open(chemin, "w", encoding="utf-8") as f:
+        json.dump(references, f, indent=2, ensure_ascii=False)
+
+
+def rapport(mesures: Dict[str, Dict], references: Dict, seuil_relatif: float = 0.05,
+            alpha: float = 0.01) -> List[Dict]:
+    """
+    Une ligne par mesure : médiane, pic mémoire et, si une référence existe, comparaison
+    statistique des durées et ratio des pics mémoire.
+    """
+    lignes = []
+    for cle, mesure in mesures.items():
+        ligne = {"mesure": cle, "mediane_ms": float(np.median(mesure["durees"]) * 1000),
+                 "memoire_mo": None if mesure["memoire_pic"] is None else mesure["memoire_pic"] / 2 ** 20,
+                 "verdict": "nouveau"}
+        reference = references.get("mesures", {}).get(cle)
+        if reference is not None:
+            ligne.update(comparer_echantillons(reference["durees"], mesure["durees"], seuil_relatif, alpha))
+            if reference.get("memoire_pic") and mesure["memoire_pic"] is not None:
+                ligne["ratio_memoire"] = mesure["memoire_pic"] / reference["memoire_pic"]
+                if ligne["ratio_memoire"] > 1 + 2 * seuil_relatif and ligne["verdict"] == "stable":
+                    ligne["verdict"] = "regression_memoire"
+        lignes.append(ligne)
+    return lignes
+
+
+def afficher_rapport(lignes: List[Dict], references: Dict):
+    if references.get("machine") and references["machine"] != machine():
+        print("⚠️ Références mesurées sur une autre machine : comparaisons indicatives.")
+    print(f"\n{'mesure':<85} {'médiane':>10} {'mémoire':>9} {'ratio':>6} {'p':>7}  verdict")
+    for ligne in lignes:
+        memoire = "" if ligne["memoire_mo"] is None else f"{ligne['memoire_mo']:.1f} Mo"
+        ratio = f"{ligne['ratio']:.2f}" if "ratio" in ligne else ""
+        p_valeur = f"{ligne['p_valeur']:.3f}" if "p_valeur" in ligne else ""
+        print(f"{ligne['mesure']:<85} {ligne['mediane_ms']:8.1f}ms {memoire:>9} {ratio:>6} {p_valeur:>7}  {ligne['verdict']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks AgriBourseSim sur données synthétiques")
+    parser.add_argument("--cas", nargs="*", help="cas à exécuter (défaut : tous)")
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--rapide", action="store_true", help="premier point de chaque grille seulement")
+    parser.add_argument("--sans-memoire", action="store_true", help="ne pas mesurer le pic mémoire")
+    parser.add_argument("--sans-imports", action="store_true", help="ne pas vérifier les budgets de temps d'import")
+    parser.add_argument("--references", default=FICHIER_REFERENCES)
+    parser.add_argument("--enregistrer-references", action="store_true",
+                        help="enregistrer les mesures comme nouvelles références")
+    parser.add_argument("--seuil", type=float, default=0.05, help="écart relatif minimal signalé")
+    parser.add_argument("--alpha", type=float, default=0.01, help="niveau du test de Mann-Whitney")
+    args = parser.parse_args()
+
+    mesures = executer_benchmarks(args.cas, args.repetitions, args.rapide, not args.sans_memoire)
+    references = charger_references(args.references)
+    lignes = rapport(mesures, references, args.seuil, args.alpha)
+    afficher_rapport(lignes, references)
+    imports = [] if args.sans_imports else verifier_budgets_import()
+    if imports:
+        afficher_budgets_import(imports)
+
+    os.makedirs(DOSSIER_RESULTATS, exist_ok=True)
+    with open(os.path.join(DOSSIER_RESULTATS, time.strftime("%Y%m%d_%H%M%S") + ".json"), "w", encoding="utf-8") as f:
+        json.dump({"machine": machine(), "mesures": mesures, "rapport": lignes, "imports": imports}, f, indent=2, ensure_ascii=False)
+    if args.enregistrer_references:
+        enregistrer_references(mesures, args.references)
+        print(f"Références enregistrées dans {args.references}")
+
+    echec = any(ligne["verdict"].startswith("regression") for ligne in lignes) or \
+        any(ligne["verdict"] == "depassement" for ligne in imports)
+    sys.exit(1 if echec else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# mesure.py
+import gc
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+from scipy.stats import mannwhitneyu
+
+
+def mesurer_temps(fonction: Callable[[], object], repetitions: int = 5, echauffement: int = 1) -> List[float]:
+    """
+    Durées (s) de repetitions appels, après echauffement appels non mesurés ; le ramasse-miettes
+    est désactivé pendant chaque appel pour limiter la variance.
+    """
+    for _ in range(echauffement):
+        fonction()
+    durees = []
+    for _ in range(repetitions):
+        gc.collect()
+        gc.disable()
+        try:
+            debut = time.perf_counter()
+            fonction()
+            durees.append(time.perf_counter() - debut)
+        finally:
+            gc.enable()
+    return durees
+
+
+def mesurer_memoire(fonction: Callable[[], object]) -> int:
+    """
+    Pic d'allocations Python et numpy (octets) pendant un appel, mesuré par tracemalloc.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fonction()
+        _, pic = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return pic
+
+
+def comparer_echantillons(reference: Sequence[float], actuel: Sequence[float],
+                          seuil_relatif: float = 0.05, alpha: float = 0.01) -> Dict:
+    """
+    Compare deux échantillons de durées : ratio des médianes et test unilatéral de
+    Mann-Whitney. Un écart n'est signalé que s'il est à la fois significatif (p < alpha)
+    et supérieur à seuil_relatif, pour ignorer le bruit d'une machine chargée.
+    """
+    ratio = float(np.median(actuel) / np.median(reference))
+    p_lent = mannwhitneyu(actuel, reference, alternative="greater").pvalue
+    p_rapide = mannwhitneyu(actuel, reference, alternative="less").pvalue
+    if p_lent < alpha and ratio > 1 + seuil_relatif:
+        verdict = "regression"
+    elif p_rapide < alpha and ratio < 1 - seuil_relatif:
+        verdict = "amelioration"
+    else:
+        verdict = "stable"
+    return {"ratio": ratio, "p_valeur": float(min(p_lent, p_rapide)), "verdict": verdict}
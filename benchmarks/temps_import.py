@@ -0,0 +1,75 @@
+# temps_import.py
+import json
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+# Durée d'import maximale (s, interpréteur neuf) des modules chargés à l'ouverture des pages
+BUDGETS_IMPORT = {
+    "Accueil": 0.6,
+    "utils.panneau_debug": 0.6,
+    "Simulation_Boursiere": 1.2,
+    "Simulation_Agricole": 1.2,
+}
+# Dépendances qui ne doivent être importées qu'au premier calcul qui les utilise
+MODULES_LOURDS = ("cvxpy", "scipy", "fpdf", "matplotlib", "PIL")
+
+_SCRIPT_MESURE = """
+import json, sys, time
+debut = time.perf_counter()
+import {module}
+duree = time.perf_counter() - debut
+print(json.dumps({{"duree": duree, "lourds": [m for m in {lourds!r} if m in sys.modules]}}))
+"""
+
+
+def mesurer_import(module: str, repetitions: int = 3) -> Dict:
+    """
+    Durée d'import d'un module dans un interpréteur neuf (minimum sur repetitions lancements)
+    et dépendances lourdes qu'il a chargées.
+    """
+    durees, lourds = [], []
+    for _ in range(repetitions):
+        processus = subprocess.run([sys.executable, "-c", _SCRIPT_MESURE.format(module=module, lourds=MODULES_LOURDS)],
+                                   capture_output=True, text=True)
+        if processus.returncode != 0:
+            return {"module": module, "erreur": processus.stderr.strip().splitlines()[-1]}
+        mesure = json.loads(processus.stdout.strip().splitlines()[-1])
+        durees.append(mesure["duree"])
+        lourds = mesure["lourds"]
+    return {"module": module, "duree": min(durees), "lourds": lourds}
+
+
+def verifier_budgets_import(budgets: Optional[Dict[str, float]] = None, repetitions: int = 3) -> List[Dict]:
+    """
+    Une ligne par module : durée d'import, budget, dépendances lourdes chargées et verdict
+    (depassement si la durée dépasse le budget ou si une dépendance lourde est chargée ;
+    import_impossible si le module ne s'importe pas dans cet environnement).
+    """
+    lignes = []
+    for module, budget in (budgets or BUDGETS_IMPORT).items():
+        ligne = dict(mesurer_import(module, repetitions), budget=budget)
+        if "erreur" in ligne:
+            ligne["verdict"] = "import_impossible"
+        elif ligne["duree"] > budget or ligne["lourds"]:
+            ligne["verdict"] = "depassement"
+        else:
+            ligne["verdict"] = "ok"
+        lignes.append(ligne)
+    return lignes
+
+
+def afficher_budgets_import(lignes: List[Dict]):
+    print(f"\n{'module':<30} {'import':>8} {'budget':>8}  verdict")
+    for ligne in lignes:
+        if "erreur" in ligne:
+            print(f"{ligne['module']:<30} {'':>8} {ligne['budget']:7.2f}s  {ligne['verdict']} ({ligne['erreur']})")
+            continue
+        lourds = f" (chargés : {', '.join(ligne['lourds'])})" if ligne["lourds"] else ""
+        print(f"{ligne['module']:<30} {ligne['duree']:7.2f}s {ligne['budget']:7.2f}s  {ligne['verdict']}{lourds}")
+
+
+if __name__ == "__main__":
+    resultats = verifier_budgets_import()
+    afficher_budgets_import(resultats)
+    sys.exit(1 if any(ligne["verdict"] == "depassement" for ligne in resultats) else 0)
@@ -1,4 +1,25 @@
 APP_NAME = "AgriBourseSim"
 VERSION = "1.0.0"
 APP_LOGO = "assets/logo.png"
-DUREE_INVESTISSEMENT_YEARS = 10
\ No newline at end of file
+DUREE_INVESTISSEMENT_YEARS = 10
+# Paramètres du modèle agricole utilisés par défaut par la page Simulation Agricole
+PARAMETRES_AGRICOLES_DEFAUT = {
+    "seuil_pluie_basse": 1000,
+    "seuil_temp_haute": 30.0,
+    "aleas_climatiques": {
+        "sécheresse": {"proba": 0.15, "impact": 0.4, "persistance": 0.4, "duree_mois": 4},
+        "inondation": {"proba": 0.10, "impact": 0.5},
+        "tempête": {"proba": 0.05, "impact": 0.3},
+    },
+    "impact_climatique_moyen": 0.3,
+    "taux_assurance": 0.02,
+    "taux_imposition": 0.15,
+    "seuil_exoneration_surface": 5.0,
+    "taux_charges_sociales": 0.20,
+    "cout_cmu_par_ouvrier": 12000,
+    "nb_ouvriers_par_hectare": 0.5,
+    "assurance_par_hectare": 5000,
+    "surface_serre_unite": 0.05,
+    "cout_serre_unite": 1200000,
+    "amortissement_serre_annee": 10,
+}
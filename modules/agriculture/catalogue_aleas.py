@@ -0,0 +1,169 @@
+# catalogue_aleas.py
+import numpy as np
+from typing import Dict, List, Optional, Union
+
+from utils.chargement_differe import ModuleDiffere
+
+stats = ModuleDiffere("scipy.stats")
+
+PROBA_PERTE_TOTALE = 0.1
+DUREE_MOIS_DEFAUT = 3.0
+CONCENTRATION_SEVERITE_DEFAUT = 20.0
+
+
+class CatalogueAleas:
+    """
+    Catalogue stochastique d'événements climatiques pré-tirés pour
+    n_scenarios x duree_projet années x n_aleas.
+
+    Un même catalogue peut être réutilisé pour plusieurs configurations de projet
+    (surfaces, cultures, financement) afin de les comparer sur les mêmes événements.
+    """
+
+    def __init__(self, noms: List[str], occurrence: np.ndarray, severite: np.ndarray,
+                 debut_mois: np.ndarray, duree_mois: np.ndarray, tirage_perte: np.ndarray,
+                 proba_perte_totale: np.ndarray, duree_annee: int = 12):
+        self.noms = list(noms)
+        self.occurrence = occurrence
+        self.severite = severite
+        self.debut_mois = debut_mois
+        self.duree_mois = duree_mois
+        self.tirage_perte = tirage_perte
+        self.proba_perte_totale = proba_perte_totale
+        self.duree_annee = duree_annee
+
+    @property
+    def n_scenarios(self) -> int:
+        return self.occurrence.shape[0]
+
+    @property
+    def duree_projet(self) -> int:
+        return self.occurrence.shape[1]
+
+    def _facteurs(self, sl, sensibilite, mois_debut, mois_fin) -> np.ndarray:
+        occurrence = self.occurrence[sl]
+        debut = self.debut_mois[sl]
+        touche = occurrence & (debut < mois_fin) & (debut + self.duree_mois[sl] > mois_debut)
+        facteur = np.prod(np.where(touche, 1 - self.severite[sl] * sensibilite, 1.0), axis=-1)
+        perte_totale = np.any(touche & (self.tirage_perte[sl] < self.proba_perte_totale * sensibilite), axis=-1)
+        return np.where(perte_totale, 0.0, facteur)
+
+    def facteur_rendement(self, indice_scenario: int, annee: int, sensibilite: float,
+                          mois_debut: float = 0.0, mois_fin: Optional[float] = None) -> float:
+        """
+        Facteur multiplicatif du rendement pour un cycle [mois_debut, mois_fin) de l'année
+        (1 = première année du projet) d'un scénario. Vaut 0 en cas de perte totale.
+        """
+        if mois_fin is None:
+            mois_fin = self.duree_annee
+        return float(self._facteurs((indice_scenario, annee - 1), sensibilite, mois_debut, mois_fin))
+
+    def facteurs_rendement(self, sensibilite: Union[float, np.ndarray], mois_debut=0.0,
+                           mois_fin=None) -> np.ndarray:
+        """
+        Version vectorisée de facteur_rendement pour tous les scénarios et toutes les années.
+
+        Si mois_debut et mois_fin sont des tableaux 1D (un élément par cycle), les facteurs
+        sont calculés pour chaque cycle.
+
+        Returns:
+            np.ndarray: Facteurs de forme (n_scenarios, duree_projet) ou (n_scenarios, duree_projet, n_cycles).
+        """
+        if mois_fin is None:
+            mois_fin = self.duree_annee
+        mois_debut = np.asarray(mois_debut, dtype=float)
+        mois_fin = np.asarray(mois_fin, dtype=float)
+        if mois_debut.ndim == 0 and mois_fin.ndim == 0:
+            return self._facteurs(slice(None), sensibilite, mois_debut, mois_fin)
+        return self._facteurs((slice(None), slice(None), None), sensibilite,
+                              mois_debut[:, None], mois_fin[:, None])
+
+    def sous_catalogue(self, indices_scenarios) -> "CatalogueAleas":
+        """
+        Extrait un sous-ensemble de scénarios (par exemple un lot de calcul).
+        """
+        return CatalogueAleas(
+            self.noms,
+            self.occurrence[indices_scenarios],
+            self.severite[indices_scenarios],
+            self.debut_mois[indices_scenarios],
+            self.duree_mois[indices_scenarios],
+            self.tirage_perte[indices_scenarios],
+            self.proba_perte_totale,
+            self.duree_annee
+        )
+
+
+def _proba_annuelle(params: Dict[str, float]) -> float:
+    if "frequence" in params:
+        # Processus de Poisson : probabilité d'au moins un événement dans l'année
+        return 1 - np.exp(-params["frequence"])
+    return params["proba"]
+
+
+def generer_catalogue_aleas(aleas_climatiques: Dict[str, Dict[str, float]], n_scenarios: int,
+                            duree_projet: int, graine: Optional[int] = None,
+                            duree_annee: int = 12) -> CatalogueAleas:
+    """
+    Tire en bloc un catalogue d'événements à partir du dictionnaire aleas_climatiques.
+
+    Chaque aléa accepte les clés :
+    - proba (ou frequence, taux de Poisson annuel) : probabilité annuelle d'occurrence
+    - impact : sévérité moyenne (perte de rendement à sensibilité 1)
+    - persistance (optionnel) : probabilité qu'un événement se prolonge l'année suivante
+      (chaîne de Markov, permet les sécheresses pluriannuelles). Par défaut = proba (années indépendantes).
+    - duree_mois (optionnel) : durée moyenne d'un événement dans l'année
+    - concentration_severite (optionnel) : concentration de la loi Beta de la sévérité (0 = sévérité fixe)
+    - proba_perte_totale (optionnel) : probabilité de perte totale à sensibilité 1
+
+    Les tirages uniformes sous-jacents ne dépendent que de la graine : deux catalogues générés
+    avec la même graine et des probabilités différentes restent comparables (nombres aléatoires communs).
+    """
+    rng = np.random.default_rng(graine)
+    noms = list(aleas_climatiques.keys())
+    forme = (n_scenarios, duree_projet, len(noms))
+
+    u_occurrence = rng.random(forme)
+    u_severite = rng.random(forme)
+    u_debut = rng.random(forme)
+    u_duree = rng.random(forme)
+    tirage_perte = rng.random(forme)
+
+    occurrence = np.zeros(forme, dtype=bool)
+    severite = np.zeros(forme)
+    duree_mois = np.zeros(forme)
+    proba_perte_totale = np.zeros(len(noms))
+
+    for h, nom in enumerate(noms):
+        params = aleas_climatiques[nom]
+        p = float(np.clip(_proba_annuelle(params), 0.0, 1.0))
+        persistance = float(params.get("persistance", p))
+        # Transition 0 -> 1 choisie pour conserver la probabilité stationnaire p
+        p_entree = min(1.0, p * (1 - persistance) / (1 - p)) if p < 1 else 1.0
+
+        occurrence[:, 0, h] = u_occurrence[:, 0, h] < p
+        for t in range(1, duree_projet):
+            seuil = np.where(occurrence[:, t - 1, h], persistance, p_entree)
+            occurrence[:, t, h] = u_occurrence[:, t, h] < seuil
+
+        impact = float(params["impact"])
+        concentration = float(params.get("concentration_severite", CONCENTRATION_SEVERITE_DEFAUT))
+        if concentration > 0 and 0 < impact < 1:
+            severite[..., h] = stats.beta.ppf(u_severite[..., h], impact * concentration, (1 - impact) * concentration)
+        else:
+            severite[..., h] = impact
+
+        duree_moyenne = float(params.get("duree_mois", DUREE_MOIS_DEFAUT))
+        # Durée >= 1 mois : 1 + loi géométrique de moyenne duree_moyenne
+        if duree_moyenne > 1:
+            p_fin = 1 / duree_moyenne
+            duree_mois[..., h] = 1 + np.floor(np.log1p(-u_duree[..., h]) / np.log1p(-p_fin))
+        else:
+            duree_mois[..., h] = 1
+        proba_perte_totale[h] = params.get("proba_perte_totale", PROBA_PERTE_TOTALE)
+
+    duree_mois = np.minimum(duree_mois, duree_annee)
+    debut_mois = np.floor(u_debut * (duree_annee - duree_mois + 1))
+
+    return CatalogueAleas(noms, occurrence, severite, debut_mois, duree_mois, tirage_perte,
+                          proba_perte_totale, duree_annee)
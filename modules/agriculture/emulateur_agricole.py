@@ -0,0 +1,71 @@
+# emulateur_agricole.py
+from typing import Dict, Tuple
+
+from modules.agriculture.simulator_agri import simuler_projet_agricole_multi
+from utils.emulateur import Emulateur, entrainer_emulateur
+from utils.etat_partage import empreinte_contenu
+
+# Réglages de la page émulés : bornes fixes ou, pour la surface et l'emprunt, relatives
+# à la valeur saisie lors de l'entraînement
+FACTEURS_SURFACE = (0.5, 2.0)
+MONTANT_EMPRUNT_MIN_BORNE = 1_000_000
+BORNES_AGRICOLES = {
+    "part_serre": (0.0, 1.0),
+    "taux_emprunt": (0.0, 0.15),
+}
+SORTIES_EMULEES = ("benefice_median", "benefice_p5", "benefice_p95", "probabilite_perte")
+
+
+def bornes_emulation(parametres_simulation: Dict) -> Dict[str, Tuple[float, float]]:
+    surface = float(parametres_simulation["surface_totale"])
+    montant = float(parametres_simulation["montant_emprunt"])
+    return {
+        "surface_totale": tuple(surface * f for f in FACTEURS_SURFACE),
+        **BORNES_AGRICOLES,
+        "montant_emprunt": (0.0, max(2 * montant, MONTANT_EMPRUNT_MIN_BORNE)),
+    }
+
+
+def point_emulation(parametres_simulation: Dict) -> Dict[str, float]:
+    return {nom: float(parametres_simulation[nom]) for nom in ("surface_totale", "part_serre",
+                                                                "taux_emprunt", "montant_emprunt")}
+
+
+def appliquer_point(parametres_simulation: Dict, point: Dict[str, float]) -> Dict:
+    parametres_simulation = dict(parametres_simulation, **point)
+    parametres_simulation["mode_financement"] = "emprunt" if point["montant_emprunt"] > 0 else "autofinancement"
+    return parametres_simulation
+
+
+def contexte_emulation(parametres_simulation: Dict) -> str:
+    # Réglages non émulés (cultures, durée, scénarios, modèle, catalogue des cultures)
+    point = point_emulation(parametres_simulation)
+    return empreinte_contenu({nom: valeur for nom, valeur in parametres_simulation.items()
+                              if nom not in point and nom != "mode_financement"})
+
+
+def indicateurs_benefices(df_all) -> Dict[str, float]:
+    benefices = df_all.groupby("Scenario")["Benefice_net_cycle"].sum()
+    return {
+        "benefice_median": float(benefices.median()),
+        "benefice_p5": float(benefices.quantile(0.05)),
+        "benefice_p95": float(benefices.quantile(0.95)),
+        "probabilite_perte": float((benefices < 0).mean()),
+    }
+
+
+def entrainer_emulateur_agricole(parametres_simulation: Dict, n_points: int = 20, graine: int = 0,
+                                 rappel=None) -> Emulateur:
+    """
+    Entraîne l'émulateur des indicateurs de bénéfice de simuler_projet_agricole_multi
+    (parametres_simulation : ses arguments, hors rappel) sur un plan en hypercube latin de
+    la surface, de la part sous serre et de l'emprunt. Tous les points du plan sont simulés
+    sur les mêmes tirages (même graine).
+    """
+    def simuler(point):
+        df_all, _, _, _ = simuler_projet_agricole_multi(graine=graine,
+                                                        **appliquer_point(parametres_simulation, point))
+        return indicateurs_benefices(df_all)
+
+    return entrainer_emulateur(simuler, bornes_emulation(parametres_simulation), n_points, graine=graine,
+                               contexte=contexte_emulation(parametres_simulation), rappel=rappel)
@@ -1,12 +1,17 @@
 # finances.py
 from typing import Dict, Tuple
 
+def calculer_investissement_serre(surface_serre: float,
+                                   surface_serre_unite: float,
+                                   cout_serre_unite: float) -> float:
+    nb_unites = surface_serre / surface_serre_unite
+    return nb_unites * cout_serre_unite
+
 def calculer_amortissement_serre(surface_serre: float,
                                   surface_serre_unite: float,
                                   cout_serre_unite: float,
                                   amortissement_serre_annee: int) -> float:
-    nb_unites = surface_serre / surface_serre_unite
-    cout_total = nb_unites * cout_serre_unite
+    cout_total = calculer_investissement_serre(surface_serre, surface_serre_unite, cout_serre_unite)
     amortissement_annuel = cout_total / amortissement_serre_annee
     return amortissement_annuel
 
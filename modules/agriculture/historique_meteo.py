@@ -0,0 +1,204 @@
+# historique_meteo.py
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Union
+
+from modules.agriculture.utils import ajuster_rendement_par_meteo, calculer_matrices_correlation_lot
+
+DOSSIER_CACHE_HISTORIQUE = "data/cache_historique"
+
+
+class HistoriqueClimatPrix:
+    """
+    Historique long (plusieurs décennies) de météo et de prix annuels, aligné par année
+    et conservé sous forme de tableaux numpy (mappés en mémoire lorsqu'ils viennent du cache).
+    """
+
+    def __init__(self, annees: np.ndarray, colonnes_meteo: List[str], meteo: np.ndarray,
+                 colonnes_prix: List[str], prix: np.ndarray):
+        if meteo.shape[0] != prix.shape[0]:
+            raise ValueError("Les historiques météo et prix doivent couvrir les mêmes années.")
+        self.annees = annees
+        self.colonnes_meteo = list(colonnes_meteo)
+        self.meteo = meteo
+        self.colonnes_prix = list(colonnes_prix)
+        self.prix = prix
+
+    @property
+    def n_annees(self) -> int:
+        return self.meteo.shape[0]
+
+    def generer_scenarios(self, n_scenarios: int, duree_projet: int, taille_bloc: int = 3,
+                          methode: str = "mobile", graine: Optional[int] = None) -> "ScenariosClimatPrix":
+        """
+        Génère n_scenarios séquences de duree_projet années par bootstrap par blocs.
+        Les blocs d'années consécutives préservent l'autocorrélation des séries
+        ainsi que la dépendance entre météo et prix d'une même année.
+        """
+        rng = np.random.default_rng(graine)
+        indices = generer_indices_bootstrap(self.n_annees, n_scenarios, duree_projet,
+                                            taille_bloc, rng, methode=methode)
+        return ScenariosClimatPrix(
+            indices,
+            self.colonnes_meteo, np.asarray(self.meteo[indices]),
+            self.colonnes_prix, np.asarray(self.prix[indices])
+        )
+
+
+class ScenariosClimatPrix:
+    """
+    Années de scénario tirées par bootstrap : tableaux (n_scenarios, duree_projet, n_colonnes).
+    """
+
+    def __init__(self, indices: np.ndarray, colonnes_meteo: List[str], meteo: np.ndarray,
+                 colonnes_prix: List[str], prix: np.ndarray):
+        self.indices = indices
+        self.colonnes_meteo = colonnes_meteo
+        self.meteo = meteo
+        self.colonnes_prix = colonnes_prix
+        self.prix = prix
+
+    @property
+    def n_scenarios(self) -> int:
+        return self.meteo.shape[0]
+
+    def serie_meteo(self, colonne: str) -> np.ndarray:
+        return self.meteo[:, :, self.colonnes_meteo.index(colonne)]
+
+    def serie_prix(self, colonne: str) -> np.ndarray:
+        return self.prix[:, :, self.colonnes_prix.index(colonne)]
+
+    def meteo_dataframe(self, indice_scenario: int) -> pd.DataFrame:
+        return pd.DataFrame(self.meteo[indice_scenario], columns=self.colonnes_meteo)
+
+    def prix_dataframe(self, indice_scenario: int) -> pd.DataFrame:
+        return pd.DataFrame(self.prix[indice_scenario], columns=self.colonnes_prix)
+
+    def sous_ensemble(self, indices_scenarios) -> "ScenariosClimatPrix":
+        """
+        Extrait un sous-ensemble de scénarios (par exemple un lot de calcul).
+        """
+        return ScenariosClimatPrix(self.indices[indices_scenarios], self.colonnes_meteo, self.meteo[indices_scenarios],
+                                   self.colonnes_prix, self.prix[indices_scenarios])
+
+    def ajuster_rendements(self, rendement_base: Union[float, np.ndarray], sensibilite: Union[float, np.ndarray],
+                           seuil_pluie_basse: float, seuil_temp_haute: float) -> np.ndarray:
+        """
+        Rendements ajustés par la météo pour tous les scénarios et années en un seul appel.
+        rendement_base et sensibilite peuvent être des tableaux (par exemple culture x méthode).
+
+        Returns:
+            np.ndarray: Rendements de forme (n_scenarios, duree_projet) + forme de rendement_base.
+        """
+        dimensions = (...,) + (None,) * np.ndim(rendement_base)
+        return ajuster_rendement_par_meteo(
+            rendement_base, self.serie_meteo("Pluie_annuelle")[dimensions], self.serie_meteo("Temp_moyenne")[dimensions],
+            sensibilite, seuil_pluie_basse, seuil_temp_haute
+        )
+
+    def matrices_correlation(self, cultures: List[str]):
+        """
+        Matrices de corrélation climat et prix de chaque scénario, estimées en bloc.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Deux tableaux (n_scenarios, n_cultures, n_cultures).
+        """
+        pluie = np.stack([self.serie_meteo(f"Pluie_{c}") for c in cultures], axis=-1)
+        prix = np.stack([self.serie_prix(c) for c in cultures], axis=-1)
+        return calculer_matrices_correlation_lot(pluie, prix)
+
+
+def generer_indices_bootstrap(n_annees: int, n_scenarios: int, duree_projet: int, taille_bloc: int,
+                              rng: np.random.Generator, methode: str = "mobile") -> np.ndarray:
+    """
+    Indices d'années historiques (n_scenarios, duree_projet) tirés par bootstrap par blocs circulaires.
+
+    - methode = "mobile" : blocs de longueur fixe taille_bloc
+    - methode = "stationnaire" : blocs de longueur géométrique de moyenne taille_bloc (Politis-Romano)
+    """
+    if n_annees == 0:
+        raise ValueError("Historique vide : impossible de générer des scénarios.")
+    taille_bloc = max(1, min(int(taille_bloc), n_annees))
+
+    if methode == "mobile":
+        n_blocs = -(-duree_projet // taille_bloc)
+        debuts = rng.integers(0, n_annees, size=(n_scenarios, n_blocs))
+        indices = (debuts[:, :, None] + np.arange(taille_bloc)) % n_annees
+        return indices.reshape(n_scenarios, -1)[:, :duree_projet]
+
+    elif methode == "stationnaire":
+        nouveaux_blocs = rng.random((n_scenarios, duree_projet)) < 1 / taille_bloc
+        debuts = rng.integers(0, n_annees, size=(n_scenarios, duree_projet))
+        indices = np.empty((n_scenarios, duree_projet), dtype=np.int64)
+        indices[:, 0] = debuts[:, 0]
+        for t in range(1, duree_projet):
+            indices[:, t] = np.where(nouveaux_blocs[:, t], debuts[:, t], (indices[:, t - 1] + 1) % n_annees)
+        return indices
+
+    else:
+        raise ValueError("Méthode inconnue : utiliser 'mobile' ou 'stationnaire'.")
+
+
+def _lire_table(source: Union[str, pd.DataFrame]) -> pd.DataFrame:
+    if isinstance(source, pd.DataFrame):
+        return source
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"Fichier non trouvé : {source}")
+    if source.endswith(".csv"):
+        return pd.read_csv(source)
+    return pd.read_excel(source)
+
+
+def _empreinte_source(source: Union[str, pd.DataFrame]) -> str:
+    if isinstance(source, pd.DataFrame):
+        return str(pd.util.hash_pandas_object(source, index=True).sum())
+    stat = os.stat(source)
+    return f"{os.path.abspath(source)}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def charger_historique(meteo: Union[str, pd.DataFrame], prix: Union[str, pd.DataFrame],
+                       dossier_cache: str = DOSSIER_CACHE_HISTORIQUE,
+                       colonne_annee: str = "Annee") -> HistoriqueClimatPrix:
+    """
+    Charge les historiques météo et prix (fichiers Excel/CSV ou DataFrames) alignés par année.
+
+    Au premier chargement, les colonnes numériques sont converties en fichiers .npy dans
+    dossier_cache ; les chargements suivants les ouvrent en mémoire mappée (mmap_mode="r")
+    sans relire les fichiers sources.
+    """
+    cle = hashlib.sha1(f"{_empreinte_source(meteo)}|{_empreinte_source(prix)}".encode()).hexdigest()[:16]
+    base = os.path.join(dossier_cache, cle)
+
+    if not os.path.exists(base + ".json"):
+        df_meteo = _lire_table(meteo)
+        df_prix = _lire_table(prix)
+        if colonne_annee in df_meteo.columns and colonne_annee in df_prix.columns:
+            df_meteo = df_meteo.set_index(colonne_annee)
+            df_prix = df_prix.set_index(colonne_annee)
+            annees_communes = df_meteo.index.intersection(df_prix.index).sort_values()
+            df_meteo = df_meteo.loc[annees_communes]
+            df_prix = df_prix.loc[annees_communes]
+        elif len(df_meteo) != len(df_prix):
+            raise ValueError(f"Colonne '{colonne_annee}' absente : les historiques doivent avoir la même longueur.")
+
+        df_meteo = df_meteo.select_dtypes("number")
+        df_prix = df_prix.select_dtypes("number")
+
+        os.makedirs(dossier_cache, exist_ok=True)
+        np.save(base + "_annees.npy", np.asarray(df_meteo.index, dtype=np.int64))
+        np.save(base + "_meteo.npy", df_meteo.to_numpy(dtype=np.float64))
+        np.save(base + "_prix.npy", df_prix.to_numpy(dtype=np.float64))
+        with open(base + ".json", "w") as f:
+            json.dump({"colonnes_meteo": list(df_meteo.columns), "colonnes_prix": list(df_prix.columns)}, f)
+
+    with open(base + ".json") as f:
+        colonnes = json.load(f)
+
+    return HistoriqueClimatPrix(
+        np.load(base + "_annees.npy", mmap_mode="r"),
+        colonnes["colonnes_meteo"], np.load(base + "_meteo.npy", mmap_mode="r"),
+        colonnes["colonnes_prix"], np.load(base + "_prix.npy", mmap_mode="r")
+    )
@@ -0,0 +1,152 @@
+# indicateurs_financiers.py
+import numpy as np
+import pandas as pd
+from typing import Dict, Sequence
+
+QUANTILES_RAPPORT = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def construire_matrice_flux(df_scenarios: pd.DataFrame, duree_projet: int,
+                            investissement_initial: float, montant_emprunt: float = 0.0) -> np.ndarray:
+    """
+    Construit la matrice des flux de trésorerie annuels (n_scenarios x (duree_projet + 1)).
+
+    - Année 0 : investissement (serres) diminué du capital emprunté
+    - Années 1..N : bénéfice net des cycles (remboursements et impôts déduits),
+      augmenté de l'amortissement des serres qui n'est pas décaissé
+    """
+    flux_cycles = df_scenarios["Benefice_net_cycle"]
+    if "Amortissement_cycle" in df_scenarios.columns:
+        flux_cycles = flux_cycles + df_scenarios["Amortissement_cycle"]
+
+    flux_annuels = (
+        flux_cycles.groupby([df_scenarios["Scenario"], df_scenarios["Année"]]).sum()
+        .unstack(fill_value=0.0)
+        .reindex(columns=range(1, duree_projet + 1), fill_value=0.0)
+    )
+
+    flux = np.empty((len(flux_annuels), duree_projet + 1))
+    flux[:, 0] = montant_emprunt - investissement_initial
+    flux[:, 1:] = flux_annuels.to_numpy(dtype=float)
+    return flux
+
+
+def calculer_van(flux: np.ndarray, taux_actualisation) -> np.ndarray:
+    """
+    Valeur actuelle nette de chaque ligne de la matrice de flux.
+    taux_actualisation peut être un scalaire ou un tableau (un taux par scénario).
+    """
+    t = np.arange(flux.shape[1])
+    taux = np.asarray(taux_actualisation, dtype=float).reshape(-1, 1)
+    return (flux * (1 + taux) ** -t).sum(axis=1)
+
+
+def calculer_tri(flux: np.ndarray, borne_basse: float = -0.99, borne_haute: float = 10.0,
+                 tolerance: float = 1e-8, max_iterations: int = 100) -> np.ndarray:
+    """
+    Taux de rendement interne de tous les scénarios à la fois.
+
+    Newton sécurisé par bissection : chaque scénario garde un intervalle [bas, haut]
+    encadrant la racine ; un pas de Newton qui sort de l'intervalle est remplacé par
+    le milieu de l'intervalle. Retourne NaN sans investissement initial (premier flux
+    positif ou nul) ou lorsque la VAN ne change pas de signe sur [borne_basse, borne_haute].
+    """
+    t = np.arange(flux.shape[1])
+    n = flux.shape[0]
+
+    def van_et_derivee(r):
+        actualisation = (1 + r[:, None]) ** -t
+        van = (flux * actualisation).sum(axis=1)
+        derivee = -(flux * t * actualisation).sum(axis=1) / (1 + r)
+        return van, derivee
+
+    bas = np.full(n, borne_basse)
+    haut = np.full(n, borne_haute)
+    f_bas, _ = van_et_derivee(bas)
+    f_haut, _ = van_et_derivee(haut)
+    valide = (flux[:, 0] < 0) & (np.sign(f_bas) * np.sign(f_haut) <= 0)
+
+    r = np.clip(np.full(n, 0.1), borne_basse, borne_haute)
+    for _ in range(max_iterations):
+        f, derivee = van_et_derivee(r)
+        meme_signe_bas = np.sign(f) == np.sign(f_bas)
+        bas = np.where(meme_signe_bas, r, bas)
+        f_bas = np.where(meme_signe_bas, f, f_bas)
+        haut = np.where(meme_signe_bas, haut, r)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r_newton = r - f / derivee
+        hors_intervalle = ~np.isfinite(r_newton) | (r_newton <= bas) | (r_newton >= haut)
+        r_suivant = np.where(hors_intervalle, (bas + haut) / 2, r_newton)
+        r_suivant = np.where(f == 0, r, r_suivant)
+
+        converge = np.abs(r_suivant - r) < tolerance
+        r = r_suivant
+        if np.all(converge | ~valide):
+            break
+
+    return np.where(valide, r, np.nan)
+
+
+def calculer_delai_recuperation(flux: np.ndarray) -> np.ndarray:
+    """
+    Délai de récupération (en années, interpolé dans l'année) de chaque scénario :
+    premier instant où les flux cumulés deviennent positifs. NaN si jamais atteint.
+    """
+    cumul = np.cumsum(flux, axis=1)
+    positif = cumul >= 0
+    atteint = positif.any(axis=1)
+    annee = np.argmax(positif, axis=1)
+
+    lignes = np.arange(flux.shape[0])
+    cumul_precedent = np.where(annee > 0, cumul[lignes, np.maximum(annee - 1, 0)], 0.0)
+    flux_annee = flux[lignes, annee]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = np.where(annee > 0, -cumul_precedent / flux_annee, 0.0)
+    delai = np.where(annee > 0, annee - 1 + fraction, 0.0)
+    return np.where(atteint, delai, np.nan)
+
+
+def resumer_distribution(valeurs: Dict[str, np.ndarray],
+                         quantiles: Sequence[float] = QUANTILES_RAPPORT) -> pd.DataFrame:
+    """
+    Tableau de distribution (moyenne, écart-type, quantiles) de chaque indicateur.
+    """
+    lignes = {}
+    for nom, v in valeurs.items():
+        v = v[np.isfinite(v)]
+        ligne = {"Moyenne": np.nan, "Ecart_type": np.nan}
+        ligne.update({f"P{int(q * 100)}": np.nan for q in quantiles})
+        if len(v):
+            ligne["Moyenne"] = v.mean()
+            ligne["Ecart_type"] = v.std()
+            ligne.update({f"P{int(q * 100)}": x for q, x in zip(quantiles, np.quantile(v, quantiles))})
+        lignes[nom] = ligne
+    return pd.DataFrame.from_dict(lignes, orient="index")
+
+
+def calculer_indicateurs_financiers(flux: np.ndarray, taux_actualisation: float) -> Dict:
+    """
+    Calcule en une passe VAN, TRI et délai de récupération de tous les scénarios.
+
+    Returns:
+        Dict: par_scenario (DataFrame), distribution (DataFrame), proba_van_negative,
+        proba_non_recupere.
+    """
+    van = calculer_van(flux, taux_actualisation)
+    tri = calculer_tri(flux)
+    delai = calculer_delai_recuperation(flux)
+
+    par_scenario = pd.DataFrame({
+        "Scenario": np.arange(1, flux.shape[0] + 1),
+        "VAN": van,
+        "TRI": tri,
+        "Delai_recuperation": delai,
+    })
+
+    return {
+        "par_scenario": par_scenario,
+        "distribution": resumer_distribution({"VAN": van, "TRI": tri, "Delai_recuperation": delai}),
+        "proba_van_negative": float(np.mean(van < 0)),
+        "proba_non_recupere": float(np.mean(np.isnan(delai))),
+    }
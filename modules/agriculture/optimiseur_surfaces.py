@@ -0,0 +1,205 @@
+# optimiseur_surfaces.py
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+from modules.agriculture.indicateurs_financiers import calculer_van
+from modules.agriculture.simulateur_lot import (
+    METHODES_LOT,
+    PARAMETRES_RENDEMENTS_PRIX,
+    TiragesAgricoles,
+    calculer_flux_lot,
+    calculer_rendements_prix_lot,
+    surfaces_par_defaut
+)
+
+
+def calculer_cvar(valeurs: np.ndarray, alpha: float = 0.05) -> np.ndarray:
+    """
+    Moyenne des alpha % pires valeurs (dernière dimension) : CVaR exprimée en gain.
+    """
+    valeurs = np.sort(valeurs, axis=-1)
+    n_queue = max(1, int(np.ceil(alpha * valeurs.shape[-1])))
+    return valeurs[..., :n_queue].mean(axis=-1)
+
+
+def _valeurs_actualisees(resultat: Dict, montant_emprunt: float, taux_actualisation: float) -> np.ndarray:
+    flux = np.empty((resultat["benefice_annuel"].shape[0], resultat["benefice_annuel"].shape[1] + 1))
+    flux[:, 0] = montant_emprunt - resultat["investissement_serre"]
+    flux[:, 1:] = resultat["benefice_annuel"] + resultat["amortissement_annuel"]
+    return calculer_van(flux, taux_actualisation)
+
+
+def _repartir(rng: np.random.Generator, parts: np.ndarray, actives: np.ndarray) -> np.ndarray:
+    # Parts restreintes aux cultures actives (au moins une par ligne), renormalisées
+    aucune = ~actives.any(axis=1)
+    actives[aucune, rng.integers(0, actives.shape[1], aucune.sum())] = True
+    parts = np.where(actives, parts, 0.0)
+    return parts / np.maximum(parts.sum(axis=1, keepdims=True), 1e-12)
+
+
+def _tirer_candidats(rng: np.random.Generator, n: int, disponible: np.ndarray, surface_totale: float,
+                     part_serre_max: float) -> np.ndarray:
+    """
+    Allocations aléatoires (n x n_cultures x 2) : part de serre uniforme puis répartition
+    de Dirichlet entre les cultures disponibles de chaque méthode. La moitié des candidats
+    ne cultive qu'un sous-ensemble aléatoire de ces cultures : abandonner une culture
+    supprime ses coûts fixes, qui ne dépendent pas de la surface.
+    """
+    n_cultures = disponible.shape[0]
+    candidats = np.zeros((n, n_cultures, 2))
+    parts_serre = rng.uniform(0, part_serre_max, n) if disponible[:, 0].any() else np.zeros(n)
+    creux = np.arange(n) >= n // 2
+    for m, surfaces_methode in enumerate([surface_totale * parts_serre, surface_totale * (1 - parts_serre)]):
+        idx = np.flatnonzero(disponible[:, m])
+        if len(idx) == 0:
+            continue
+        actives = rng.random((n, len(idx))) < rng.uniform(0.2, 1.0, (n, 1))
+        actives[~creux] = True
+        parts = _repartir(rng, rng.dirichlet(np.ones(len(idx)), n), actives)
+        candidats[:, idx, m] = parts * surfaces_methode[:, None]
+    return candidats
+
+
+def _perturber(rng: np.random.Generator, elites: np.ndarray, n: int, disponible: np.ndarray,
+               surface_totale: float, part_serre_max: float, concentration: float = 50.0,
+               part_min: float = 0.02, proba_bascule: float = 0.1) -> np.ndarray:
+    """
+    Voisins d'allocations élites : répartitions tirées autour des parts existantes. Une part
+    inférieure à part_min est abandonnée, et chaque culture est activée ou abandonnée avec
+    la probabilité proba_bascule.
+    """
+    candidats = np.zeros((n,) + elites.shape[1:])
+    parents = elites[rng.integers(0, len(elites), n)]
+    parts_serre = parents[:, :, 0].sum(axis=1) / surface_totale
+    parts_serre = np.clip(parts_serre + rng.normal(0, 0.05, n), 0, part_serre_max)
+    if not disponible[:, 0].any():
+        parts_serre[:] = 0.0
+    for m, surfaces_methode in enumerate([surface_totale * parts_serre, surface_totale * (1 - parts_serre)]):
+        idx = np.flatnonzero(disponible[:, m])
+        if len(idx) == 0:
+            continue
+        parts = parents[:, idx, m] / np.maximum(parents[:, idx, m].sum(axis=1, keepdims=True), 1e-12)
+        actives = (parts > 0) ^ (rng.random(parts.shape) < proba_bascule)
+        # Une culture activée part d'une part égale
+        parts = np.where(actives & (parts == 0), 1 / len(idx), parts)
+        parts = np.array([rng.dirichlet(concentration * p + 0.05) for p in parts])
+        parts = _repartir(rng, parts, actives & (parts >= part_min))
+        candidats[:, idx, m] = parts * surfaces_methode[:, None]
+    return candidats
+
+
+def optimiser_allocation_surfaces(
+    cultures: List[str],
+    cultures_db: Dict,
+    surface_totale: float,
+    duree_projet: int,
+    aleas_climatiques: Dict[str, Dict[str, float]],
+    budget_investissement: Optional[float] = None,
+    part_serre_max: float = 1.0,
+    penalite_cvar: float = 1.0,
+    alpha_cvar: float = 0.05,
+    taux_actualisation: float = 0.08,
+    n_scenarios: int = 200,
+    n_candidats: int = 300,
+    n_iterations: int = 3,
+    taille_elite: int = 10,
+    graine: Optional[int] = 42,
+    **parametres_simulation
+) -> Dict:
+    """
+    Choisit les surfaces par culture et la part sous serre qui maximisent
+    E[VAN] + penalite_cvar * CVaR_alpha(VAN), sous contraintes de surface totale
+    et de budget d'investissement en serres.
+
+    Toutes les allocations sont évaluées sur les mêmes tirages (nombres aléatoires communs) :
+    rendements et prix ne sont calculés qu'une fois, seule la partie financière est
+    réévaluée pour chaque candidat.
+
+    Returns:
+        Dict: allocation (DataFrame), part_serre, score, distribution_van, benefices_totaux,
+        reference (allocation égale à la même part de serre), candidats (DataFrame).
+    """
+    tirages = TiragesAgricoles(cultures, cultures_db, n_scenarios, duree_projet,
+                               aleas_climatiques, graine=graine,
+                               duree_annee=parametres_simulation.get("duree_annee", 12))
+    if not tirages.cultures:
+        raise ValueError("Aucune culture cultivable parmi les cultures sélectionnées.")
+
+    parametres_rp = {k: v for k, v in parametres_simulation.items() if k in PARAMETRES_RENDEMENTS_PRIX}
+    parametres_flux = {k: v for k, v in parametres_simulation.items()
+                       if k not in PARAMETRES_RENDEMENTS_PRIX and k != "duree_annee"}
+    parametres_flux["surface_totale"] = surface_totale
+    montant_emprunt = parametres_flux.get("montant_emprunt", 0.0) \
+        if parametres_flux.get("mode_financement") == "emprunt" else 0.0
+
+    if budget_investissement is not None:
+        cout_hectare_serre = parametres_flux["cout_serre_unite"] / parametres_flux["surface_serre_unite"]
+        part_serre_max = min(part_serre_max, budget_investissement / (cout_hectare_serre * surface_totale))
+
+    rendements, prix = calculer_rendements_prix_lot(tirages, **parametres_rp)
+
+    def evaluer(lot_surfaces: np.ndarray):
+        vans = np.empty((len(lot_surfaces), n_scenarios))
+        totaux = np.empty((len(lot_surfaces), n_scenarios))
+        for i, surfaces in enumerate(lot_surfaces):
+            resultat = calculer_flux_lot(tirages, rendements, prix, surfaces, **parametres_flux)
+            vans[i] = _valeurs_actualisees(resultat, montant_emprunt, taux_actualisation)
+            totaux[i] = resultat["benefice_total"]
+        return vans, totaux
+
+    rng = np.random.default_rng(graine)
+    candidats = _tirer_candidats(rng, n_candidats, tirages.disponible, surface_totale, part_serre_max)
+    # Répartitions égales de référence, pour plusieurs parts de serre
+    candidats = np.concatenate([
+        candidats,
+        np.stack([surfaces_par_defaut(tirages, surface_totale, p) for p in np.linspace(0, part_serre_max, 5)])
+    ])
+    vans, totaux = evaluer(candidats)
+
+    for _ in range(n_iterations):
+        scores = vans.mean(axis=1) + penalite_cvar * calculer_cvar(vans, alpha_cvar)
+        elites = candidats[np.argsort(scores)[::-1][:taille_elite]]
+        voisins = _perturber(rng, elites, n_candidats // 2, tirages.disponible, surface_totale, part_serre_max)
+        vans_v, totaux_v = evaluer(voisins)
+        candidats = np.concatenate([candidats, voisins])
+        vans = np.concatenate([vans, vans_v])
+        totaux = np.concatenate([totaux, totaux_v])
+
+    esperances = vans.mean(axis=1)
+    cvars = calculer_cvar(vans, alpha_cvar)
+    scores = esperances + penalite_cvar * cvars
+    meilleur = int(np.argmax(scores))
+    surfaces_opt = candidats[meilleur]
+
+    allocation = pd.DataFrame([
+        {"Culture": culture, "Méthode": "Serre" if methode == "serre" else "Plein champ",
+         "Surface": round(surfaces_opt[c, m], 4)}
+        for c, culture in enumerate(tirages.cultures)
+        for m, methode in enumerate(METHODES_LOT)
+        if tirages.disponible[c, m] and surfaces_opt[c, m] > 0
+    ])
+
+    part_serre = float(surfaces_opt[:, 0].sum() / surface_totale)
+    reference = surfaces_par_defaut(tirages, surface_totale, part_serre)
+    vans_ref, _ = evaluer(reference[None])
+
+    return {
+        "allocation": allocation,
+        "part_serre": part_serre,
+        "score": float(scores[meilleur]),
+        "van_esperee": float(esperances[meilleur]),
+        "cvar_van": float(cvars[meilleur]),
+        "distribution_van": vans[meilleur],
+        "benefices_totaux": totaux[meilleur],
+        "reference": {
+            "van_esperee": float(vans_ref[0].mean()),
+            "cvar_van": float(calculer_cvar(vans_ref[0], alpha_cvar)),
+        },
+        "candidats": pd.DataFrame({
+            "Part_serre": candidats[:, :, 0].sum(axis=1) / surface_totale,
+            "VAN_esperee": esperances,
+            "CVaR_VAN": cvars,
+            "Score": scores,
+        }).sort_values("Score", ascending=False, ignore_index=True),
+    }
@@ -0,0 +1,312 @@
+# sensibilite.py
+import copy
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from modules.agriculture.optimiseur_surfaces import calculer_cvar
+from modules.agriculture.simulateur_lot import (
+    PARAMETRES_RENDEMENTS_PRIX,
+    TiragesAgricoles,
+    calculer_flux_lot,
+    calculer_rendements_prix_lot,
+    surfaces_par_defaut
+)
+from utils.chargement_differe import ModuleDiffere
+
+qmc = ModuleDiffere("scipy.stats.qmc")
+
+# Leviers de simuler_projet_agricole_multi étudiés par défaut (les probabilités d'aléas sont ajoutées
+# sous la forme proba_<nom de l'aléa>)
+LEVIERS_SENSIBILITE = (
+    "seuil_pluie_basse", "seuil_temp_haute", "impact_climatique_moyen", "proba_annee_defavorable",
+    "taux_assurance", "taux_imposition", "taux_charges_sociales", "cout_cmu_par_ouvrier",
+    "nb_ouvriers_par_hectare", "assurance_par_hectare", "cout_serre_unite", "amortissement_serre_annee"
+)
+
+INDICATEURS_SENSIBILITE = ("Benefice_espere", "CVaR_5", "Proba_perte")
+
+_ETAT_TRAVAILLEUR = {}
+
+
+def definir_facteurs(parametres: Dict, variation: float = 0.25,
+                     leviers=LEVIERS_SENSIBILITE) -> Dict[str, Tuple[float, float]]:
+    """
+    Bornes [valeur * (1 - variation), valeur * (1 + variation)] de chaque levier
+    autour des paramètres de référence, probabilités d'aléas comprises.
+    """
+    facteurs = {}
+    for nom in leviers:
+        valeur = parametres.get(nom, 0.2 if nom == "proba_annee_defavorable" else None)
+        if valeur is not None:
+            facteurs[nom] = (valeur * (1 - variation), valeur * (1 + variation))
+    for nom_alea, params in parametres.get("aleas_climatiques", {}).items():
+        p = params["proba"]
+        facteurs[f"proba_{nom_alea}"] = (p * (1 - variation), min(1.0, p * (1 + variation)))
+    return facteurs
+
+
+def _indicateurs(benefice_total: np.ndarray) -> np.ndarray:
+    return np.array([
+        benefice_total.mean(),
+        calculer_cvar(benefice_total, 0.05),
+        np.mean(benefice_total < 0),
+    ])
+
+
+class _Evaluateur:
+    """
+    Évalue des points de paramètres sur des tirages communs. Les rendements et prix
+    du dernier point sont conservés : un point qui ne change que des paramètres
+    financiers ne recalcule que les flux.
+    """
+
+    def __init__(self, tirages: TiragesAgricoles, surfaces: np.ndarray, parametres: Dict, noms: List[str]):
+        self.tirages = tirages
+        self.surfaces = surfaces
+        self.parametres = parametres
+        self.noms = noms
+        self._cle = None
+        self._rendements_prix = None
+
+    def evaluer(self, valeurs: np.ndarray) -> np.ndarray:
+        params = dict(self.parametres)
+        aleas = copy.deepcopy(params.get("aleas_climatiques", {}))
+        for nom, valeur in zip(self.noms, valeurs):
+            if nom.startswith("proba_") and nom[len("proba_"):] in aleas:
+                aleas[nom[len("proba_"):]]["proba"] = float(valeur)
+            else:
+                params[nom] = float(valeur)
+
+        params_rp = {k: v for k, v in params.items() if k in PARAMETRES_RENDEMENTS_PRIX}
+        params_flux = {k: v for k, v in params.items()
+                       if k not in PARAMETRES_RENDEMENTS_PRIX and k not in ("aleas_climatiques", "duree_annee")}
+
+        cle = (tuple(sorted((k, v) for k, v in params_rp.items() if np.isscalar(v))),
+               tuple(a["proba"] for a in aleas.values()))
+        if cle != self._cle:
+            catalogue = self.tirages.generer_catalogue(aleas)
+            self._rendements_prix = calculer_rendements_prix_lot(self.tirages, catalogue_aleas=catalogue, **params_rp)
+            self._cle = cle
+
+        rendements, prix = self._rendements_prix
+        resultat = calculer_flux_lot(self.tirages, rendements, prix, self.surfaces, **params_flux)
+        return _indicateurs(resultat["benefice_total"])
+
+    def evaluer_lot(self, points: np.ndarray) -> np.ndarray:
+        return np.array([self.evaluer(p) for p in points])
+
+
+def _initialiser_travailleur(tirages, surfaces, parametres, noms):
+    _ETAT_TRAVAILLEUR["evaluateur"] = _Evaluateur(tirages, surfaces, parametres, noms)
+
+
+def _evaluer_lot_travailleur(points: np.ndarray) -> np.ndarray:
+    return _ETAT_TRAVAILLEUR["evaluateur"].evaluer_lot(points)
+
+
+def criblage_morris(evaluer: Callable[[np.ndarray], np.ndarray], bornes: np.ndarray, n_trajectoires: int = 20,
+                    n_niveaux: int = 4, graine: Optional[int] = None) -> np.ndarray:
+    """
+    Criblage de Morris : effets élémentaires le long de trajectoires aléatoires sur une grille
+    à n_niveaux du pavé bornes (n_facteurs x 2). Un effet est la variation de la sortie pour
+    un pas delta rapporté au pas, en unités de l'intervalle [borne basse, borne haute].
+    La moyenne des valeurs absolues (mu_etoile) mesure l'influence globale, l'écart-type
+    (sigma) les non-linéarités et interactions.
+
+    Returns:
+        np.ndarray: Effets élémentaires (n_trajectoires x n_facteurs x n_sorties).
+    """
+    rng = np.random.default_rng(graine)
+    k = len(bornes)
+    delta = n_niveaux / (2 * (n_niveaux - 1))
+    niveaux_depart = np.arange(n_niveaux // 2) / (n_niveaux - 1)
+
+    trajectoires = np.empty((n_trajectoires, k + 1, k))
+    directions = np.empty((n_trajectoires, k))
+    ordres = np.empty((n_trajectoires, k), dtype=int)
+    for r in range(n_trajectoires):
+        x = rng.choice(niveaux_depart, size=k)
+        signes = rng.choice([-1.0, 1.0], size=k)
+        # Départ choisi pour que x + signe * delta reste dans [0, 1]
+        x = np.where(signes > 0, x, x + delta)
+        ordre = rng.permutation(k)
+        trajectoires[r, 0] = x
+        for j, i in enumerate(ordre):
+            x = x.copy()
+            x[i] += signes[i] * delta
+            trajectoires[r, j + 1] = x
+        directions[r] = signes
+        ordres[r] = ordre
+
+    points = bornes[:, 0] + trajectoires.reshape(-1, k) * (bornes[:, 1] - bornes[:, 0])
+    resultats = evaluer(points).reshape(n_trajectoires, k + 1, -1)
+
+    effets = np.empty((n_trajectoires, k, resultats.shape[-1]))
+    for r in range(n_trajectoires):
+        differences = np.diff(resultats[r], axis=0)
+        effets[r, ordres[r]] = differences / (directions[r, ordres[r]][:, None] * delta)
+    return effets
+
+
+def indices_sobol(evaluer: Callable[[np.ndarray], np.ndarray], bornes: np.ndarray, n_base: int = 256,
+                  n_bootstrap: int = 200, graine: Optional[int] = None) -> Tuple[np.ndarray, ...]:
+    """
+    Indices de Sobol du premier ordre (S1, estimateur de Saltelli 2010) et totaux
+    (ST, estimateur de Jansen) sur le pavé bornes (n_facteurs x 2), avec demi-largeurs
+    des intervalles de confiance à 95 % par bootstrap.
+    Coût : n_base * (n_facteurs + 2) évaluations.
+
+    Returns:
+        Tuple[np.ndarray, ...]: S1, S1_ic, ST, ST_ic (n_facteurs x n_sorties chacun).
+    """
+    k = len(bornes)
+    echantillon = qmc.Sobol(d=2 * k, scramble=True, seed=graine).random(n_base)
+    A, B = echantillon[:, :k], echantillon[:, k:]
+    AB = np.repeat(A[None], k, axis=0)
+    AB[np.arange(k), :, np.arange(k)] = B.T
+
+    points = np.concatenate([A, B, AB.reshape(-1, k)])
+    resultats = evaluer(bornes[:, 0] + points * (bornes[:, 1] - bornes[:, 0]))
+    if resultats.ndim == 1:
+        resultats = resultats[:, None]
+    f_A = resultats[:n_base]
+    f_B = resultats[n_base:2 * n_base]
+    f_AB = resultats[2 * n_base:].reshape(k, n_base, -1)
+
+    def estimer(idx):
+        a, b, ab = f_A[idx], f_B[idx], f_AB[:, idx]
+        # Sorties centrées : réduit fortement la variance de l'estimateur S1
+        moyenne = np.concatenate([a, b]).mean(axis=0)
+        a, b, ab = a - moyenne, b - moyenne, ab - moyenne
+        variance = np.concatenate([a, b]).var(axis=0)
+        variance = np.where(variance > 0, variance, np.nan)
+        s1 = (b * (ab - a)).mean(axis=1) / variance
+        st = 0.5 * ((a - ab) ** 2).mean(axis=1) / variance
+        return s1, st
+
+    s1, st = estimer(np.arange(n_base))
+    rng = np.random.default_rng(graine)
+    tirages_bootstrap = [estimer(rng.integers(0, n_base, n_base)) for _ in range(n_bootstrap)]
+    s1_ic = 1.96 * np.stack([t[0] for t in tirages_bootstrap]).std(axis=0)
+    st_ic = 1.96 * np.stack([t[1] for t in tirages_bootstrap]).std(axis=0)
+    return s1, s1_ic, st, st_ic
+
+
+class AnalyseSensibilite:
+    """
+    Analyse de sensibilité globale (tornado, criblage de Morris, indices de Sobol)
+    des leviers du modèle agricole sur le bénéfice total du projet.
+
+    Toutes les évaluations réutilisent les mêmes tirages aléatoires (nombres aléatoires
+    communs) et le simulateur vectorisé ; les lots de points sont répartis sur un pool
+    de processus. Les seuils de pluie et de température n'ont d'effet que si parametres
+    contient pluie et temp (tableaux n_scenarios x duree_projet, par exemple issus de
+    historique_meteo).
+    """
+
+    def __init__(self, cultures: List[str], cultures_db: Dict, surface_totale: float, part_serre: float,
+                 duree_projet: int, parametres: Dict, facteurs: Optional[Dict[str, Tuple[float, float]]] = None,
+                 n_scenarios: int = 200, graine: Optional[int] = 42, n_processus: Optional[int] = None,
+                 taille_lot: int = 64):
+        self.tirages = TiragesAgricoles(cultures, cultures_db, n_scenarios, duree_projet,
+                                        parametres["aleas_climatiques"], graine=graine,
+                                        duree_annee=parametres.get("duree_annee", 12))
+        self.surfaces = surfaces_par_defaut(self.tirages, surface_totale, part_serre)
+        self.parametres = dict(parametres, surface_totale=surface_totale)
+        self.facteurs = facteurs if facteurs is not None else definir_facteurs(parametres)
+        self.noms = list(self.facteurs)
+        self.bornes = np.array([self.facteurs[n] for n in self.noms], dtype=float)
+        self.graine = graine
+        self.n_processus = n_processus if n_processus is not None else (os.cpu_count() or 1)
+        self.taille_lot = taille_lot
+
+    def evaluer(self, points: np.ndarray) -> np.ndarray:
+        """
+        Évalue des points (n_points x n_facteurs, en unités physiques).
+
+        Returns:
+            np.ndarray: Indicateurs (n_points x len(INDICATEURS_SENSIBILITE)).
+        """
+        lots = [points[i:i + self.taille_lot] for i in range(0, len(points), self.taille_lot)]
+        if self.n_processus <= 1 or len(lots) <= 1:
+            evaluateur = _Evaluateur(self.tirages, self.surfaces, self.parametres, self.noms)
+            return np.concatenate([evaluateur.evaluer_lot(lot) for lot in lots])
+
+        with ProcessPoolExecutor(
+            max_workers=min(self.n_processus, len(lots)),
+            initializer=_initialiser_travailleur,
+            initargs=(self.tirages, self.surfaces, self.parametres, self.noms)
+        ) as pool:
+            return np.concatenate(list(pool.map(_evaluer_lot_travailleur, lots)))
+
+    def tornado(self, indicateur: str = "Benefice_espere") -> pd.DataFrame:
+        """
+        Sensibilité un-facteur-à-la-fois : chaque levier à sa borne basse puis haute,
+        les autres à leur valeur de référence. Trié par amplitude décroissante.
+        """
+        reference = np.array([self.parametres.get(n, np.mean(self.facteurs[n])) for n in self.noms], dtype=float)
+        for i, nom in enumerate(self.noms):
+            if nom.startswith("proba_") and nom[len("proba_"):] in self.parametres["aleas_climatiques"]:
+                reference[i] = self.parametres["aleas_climatiques"][nom[len("proba_"):]]["proba"]
+
+        points = [reference]
+        for i in range(len(self.noms)):
+            for borne in self.bornes[i]:
+                point = reference.copy()
+                point[i] = borne
+                points.append(point)
+        resultats = self.evaluer(np.array(points))[:, INDICATEURS_SENSIBILITE.index(indicateur)]
+
+        bas = resultats[1::2]
+        haut = resultats[2::2]
+        tableau = pd.DataFrame({
+            "Facteur": self.noms,
+            "Valeur_basse": self.bornes[:, 0],
+            "Valeur_haute": self.bornes[:, 1],
+            "Resultat_bas": bas,
+            "Resultat_haut": haut,
+            "Reference": resultats[0],
+            "Amplitude": np.abs(haut - bas),
+        })
+        return tableau.sort_values("Amplitude", ascending=False, ignore_index=True)
+
+    def morris(self, n_trajectoires: int = 20, n_niveaux: int = 4) -> Dict[str, pd.DataFrame]:
+        """
+        Criblage de Morris (criblage_morris) des leviers.
+
+        Returns:
+            Dict[str, pd.DataFrame]: Un tableau (mu_etoile, mu, sigma) par indicateur.
+        """
+        effets = criblage_morris(self.evaluer, self.bornes, n_trajectoires, n_niveaux, self.graine)
+        tableaux = {}
+        for j, indicateur in enumerate(INDICATEURS_SENSIBILITE):
+            tableaux[indicateur] = pd.DataFrame({
+                "Facteur": self.noms,
+                "mu_etoile": np.abs(effets[:, :, j]).mean(axis=0),
+                "mu": effets[:, :, j].mean(axis=0),
+                "sigma": effets[:, :, j].std(axis=0, ddof=1) if n_trajectoires > 1 else np.nan,
+            }).sort_values("mu_etoile", ascending=False, ignore_index=True)
+        return tableaux
+
+    def sobol(self, n_base: int = 256, n_bootstrap: int = 200) -> Dict[str, pd.DataFrame]:
+        """
+        Indices de Sobol (indices_sobol) des leviers.
+        Coût : n_base * (n_facteurs + 2) évaluations.
+
+        Returns:
+            Dict[str, pd.DataFrame]: Un tableau (S1, S1_ic, ST, ST_ic) par indicateur.
+        """
+        s1, s1_ic, st, st_ic = indices_sobol(self.evaluer, self.bornes, n_base, n_bootstrap, self.graine)
+        tableaux = {}
+        for j, indicateur in enumerate(INDICATEURS_SENSIBILITE):
+            tableaux[indicateur] = pd.DataFrame({
+                "Facteur": self.noms,
+                "S1": s1[:, j],
+                "S1_ic": s1_ic[:, j],
+                "ST": st[:, j],
+                "ST_ic": st_ic[:, j],
+            }).sort_values("ST", ascending=False, ignore_index=True)
+        return tableaux
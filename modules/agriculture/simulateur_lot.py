@@ -0,0 +1,454 @@
+# simulateur_lot.py
+import copy
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+from modules.agriculture.catalogue_aleas import CatalogueAleas, generer_catalogue_aleas
+from modules.agriculture.finagri import calculer_amortissement_serre, calculer_investissement_serre
+from modules.agriculture.historique_meteo import ScenariosClimatPrix
+from modules.agriculture.utils import (
+    ajuster_rendement_par_meteo,
+    allouer_cultures,
+    calculer_mensualite_emprunt,
+    lister_cultures_considerees,
+    saisonnalite_prix
+)
+from utils.etat_partage import ressource_contenu
+
+# Colonnes des tableaux de surfaces (n_cultures x 2)
+METHODES_LOT = ("serre", "plein_champ")
+LIBELLES_METHODES = ("Serre", "Plein champ")
+
+# Paramètres qui agissent sur les rendements et les prix (les autres n'agissent que sur les flux)
+PARAMETRES_RENDEMENTS_PRIX = ("seuil_pluie_basse", "seuil_temp_haute", "impact_climatique_moyen",
+                              "sigma_climat", "sigma_prix", "proba_annee_defavorable",
+                              "pluie", "temp", "matrice_corr_climat", "matrice_corr_prix",
+                              "scenarios_climat_prix")
+
+PARAMETRES_CULTURE = ("rendement", "prix", "sigma", "sensibilite_climat", "cycles",
+                      "cout_intrants", "cout_main_oeuvre")
+
+
+class CatalogueCultures:
+    """
+    Catalogue de cultures compilé en tableaux (culture x méthode) : paramètres, risques et
+    disponibilité. Compilé une fois par contenu du catalogue et partagé en lecture seule
+    par toutes les sessions ; chaque lot n'en extrait que les cultures choisies.
+    """
+
+    def __init__(self, cultures_db: Dict):
+        self.cultures = lister_cultures_considerees(list(cultures_db), cultures_db)
+        self.indices = {culture: c for c, culture in enumerate(self.cultures)}
+        n_cultures = len(self.cultures)
+        self.disponible = np.zeros((n_cultures, 2), dtype=bool)
+        self.parametres = {nom: np.zeros((n_cultures, 2)) for nom in PARAMETRES_CULTURE}
+        self.risque_rendement = np.zeros((2, n_cultures, 2))
+        self.risque_prix = np.zeros((2, n_cultures, 2))
+        for c, culture in enumerate(self.cultures):
+            for m, methode in enumerate(METHODES_LOT):
+                params = cultures_db[culture].get(methode)
+                if not params:
+                    continue
+                self.disponible[c, m] = True
+                for nom in PARAMETRES_CULTURE:
+                    self.parametres[nom][c, m] = params[nom]
+                self.risque_rendement[:, c, m] = params["risque_rendement"]["proba"], params["risque_rendement"]["impact"]
+                self.risque_prix[:, c, m] = params["risque_prix"]["proba"], params["risque_prix"]["impact"]
+        for tableau in [self.disponible, self.risque_rendement, self.risque_prix, *self.parametres.values()]:
+            tableau.flags.writeable = False
+
+    def selection(self, cultures: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Tableaux restreints aux cultures données, dans leur ordre (copies modifiables).
+        """
+        indices = [self.indices[culture] for culture in cultures]
+        return {
+            "disponible": self.disponible[indices],
+            "parametres": {nom: valeurs[indices] for nom, valeurs in self.parametres.items()},
+            "risque_rendement": self.risque_rendement[:, indices],
+            "risque_prix": self.risque_prix[:, indices],
+        }
+
+
+def compiler_catalogue_cultures(cultures_db: Dict) -> CatalogueCultures:
+    """
+    Catalogue compilé partagé du processus, recompilé seulement si le contenu de cultures_db change.
+    """
+    return ressource_contenu("catalogue_cultures", cultures_db, CatalogueCultures)
+
+
+class TiragesAgricoles:
+    """
+    Nombres aléatoires communs d'un lot de scénarios agricoles.
+
+    Les tirages ne dépendent ni des surfaces ni des paramètres économiques : toutes les
+    configurations évaluées sur les mêmes tirages sont comparées sur les mêmes scénarios.
+    Forme des tableaux par cycle : (n_scenarios, duree_projet, n_cultures, 2, n_cycles_max).
+    """
+
+    def __init__(self, cultures: List[str], cultures_db: Dict, n_scenarios: int, duree_projet: int,
+                 aleas_climatiques: Dict[str, Dict[str, float]], graine: Optional[int] = None,
+                 duree_annee: int = 12):
+        self.cultures = lister_cultures_considerees(cultures, cultures_db)
+        self.cultures_db = cultures_db
+        self.graine = graine
+        self.duree_annee = duree_annee
+
+        n_cultures = len(self.cultures)
+        selection = compiler_catalogue_cultures(cultures_db).selection(self.cultures)
+        self.disponible = selection["disponible"]
+        self.parametres = selection["parametres"]
+        self.risque_rendement = selection["risque_rendement"]
+        self.risque_prix = selection["risque_prix"]
+        self.n_cycles_max = int(self.parametres["cycles"].max()) if n_cultures else 0
+
+        rng = np.random.default_rng(graine)
+        forme_annee = (n_scenarios, duree_projet)
+        forme_cycle = (n_scenarios, duree_projet, n_cultures, 2, self.n_cycles_max)
+        self.z_climat = rng.standard_normal(forme_annee + (n_cultures,))
+        self.z_prix_annee = rng.standard_normal(forme_annee + (n_cultures,))
+        self.u_annee_defavorable = rng.random(forme_annee)
+        self.u_risque_rendement = rng.random(forme_cycle)
+        self.u_risque_prix = rng.random(forme_cycle)
+        self.z_prix_cycle = rng.standard_normal(forme_cycle)
+        self.u_perte_defavorable = rng.random(forme_cycle)
+        self.graine_aleas = int(rng.integers(2 ** 31))
+        self.catalogue = self.generer_catalogue(aleas_climatiques)
+
+    @property
+    def n_scenarios(self) -> int:
+        return self.z_climat.shape[0]
+
+    def sous_lot(self, indices_scenarios) -> "TiragesAgricoles":
+        """
+        Sous-ensemble de scénarios (par exemple un lot de calcul) sur les mêmes tirages.
+        """
+        lot = copy.copy(self)
+        for nom in ("z_climat", "z_prix_annee", "u_annee_defavorable", "u_risque_rendement",
+                    "u_risque_prix", "z_prix_cycle", "u_perte_defavorable"):
+            setattr(lot, nom, getattr(self, nom)[indices_scenarios])
+        lot.catalogue = self.catalogue.sous_catalogue(indices_scenarios)
+        return lot
+
+    @property
+    def duree_projet(self) -> int:
+        return self.z_climat.shape[1]
+
+    def generer_catalogue(self, aleas_climatiques: Dict[str, Dict[str, float]]) -> CatalogueAleas:
+        """
+        Catalogue d'aléas tiré avec la graine du lot : changer les probabilités des aléas
+        conserve les nombres aléatoires communs.
+        """
+        return generer_catalogue_aleas(aleas_climatiques, self.n_scenarios, self.duree_projet,
+                                       graine=self.graine_aleas, duree_annee=self.duree_annee)
+
+
+def surfaces_par_defaut(tirages: TiragesAgricoles, surface_totale: float, part_serre: float) -> np.ndarray:
+    """
+    Tableau de surfaces (n_cultures x 2) équivalent à la répartition égale de allouer_cultures.
+    """
+    surfaces = np.zeros((len(tirages.cultures), 2))
+    for m, (methode, surface) in enumerate([("serre", surface_totale * part_serre),
+                                            ("plein_champ", surface_totale * (1 - part_serre))]):
+        for culture, surface_culture in allouer_cultures(surface, methode, tirages.cultures, tirages.cultures_db):
+            surfaces[tirages.cultures.index(culture), m] = surface_culture
+    return surfaces
+
+
+def _correler(z: np.ndarray, matrice_corr: Optional[np.ndarray], sigma: float) -> np.ndarray:
+    if matrice_corr is None:
+        return z * sigma
+    matrice_corr = np.asarray(matrice_corr, dtype=float)
+    try:
+        L = np.linalg.cholesky(matrice_corr)
+    except np.linalg.LinAlgError:
+        L = np.linalg.cholesky(matrice_corr + np.eye(matrice_corr.shape[-1]) * 1e-6)
+    if L.ndim == 3:
+        # Une matrice par scénario (historique rééchantillonné)
+        return np.einsum("snc,sdc->snd", z, L) * sigma
+    return z @ L.T * sigma
+
+
+def calculer_rendements_prix_lot(
+    tirages: TiragesAgricoles,
+    seuil_pluie_basse: float,
+    seuil_temp_haute: float,
+    impact_climatique_moyen: float,
+    sigma_climat: float = 0.1,
+    sigma_prix: float = 0.1,
+    proba_annee_defavorable: float = 0.2,
+    pluie: Optional[np.ndarray] = None,
+    temp: Optional[np.ndarray] = None,
+    matrice_corr_climat: Optional[np.ndarray] = None,
+    matrice_corr_prix: Optional[np.ndarray] = None,
+    catalogue_aleas: Optional[CatalogueAleas] = None,
+    scenarios_climat_prix: Optional[ScenariosClimatPrix] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rendements effectifs (t/ha) et prix de vente de chaque cycle, indépendants des surfaces.
+
+    pluie et temp sont des tableaux (n_scenarios, duree_projet) optionnels. scenarios_climat_prix
+    (une séquence d'années historiques par scénario du lot) les remplace et fournit, à défaut
+    de matrices données, les corrélations climat et prix de chaque scénario.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: rendements et prix (n_scenarios, duree_projet, n_cultures, 2, n_cycles_max).
+    """
+    p = tirages.parametres
+    catalogue = catalogue_aleas if catalogue_aleas is not None else tirages.catalogue
+    sens = p["sensibilite_climat"]
+    n_scenarios, duree_projet = tirages.n_scenarios, tirages.duree_projet
+
+    rendement = np.broadcast_to(p["rendement"], (n_scenarios, duree_projet) + sens.shape).copy()
+    if scenarios_climat_prix is not None:
+        if scenarios_climat_prix.n_scenarios != n_scenarios:
+            raise ValueError("Le nombre de scénarios météo/prix ne correspond pas au lot.")
+        rendement = scenarios_climat_prix.ajuster_rendements(
+            p["rendement"], sens, seuil_pluie_basse, seuil_temp_haute
+        )[:, :duree_projet]
+        if matrice_corr_climat is None or matrice_corr_prix is None:
+            matrice_corr_climat, matrice_corr_prix = scenarios_climat_prix.matrices_correlation(tirages.cultures)
+    elif pluie is not None and temp is not None:
+        rendement = ajuster_rendement_par_meteo(
+            rendement, pluie[:, :, None, None], temp[:, :, None, None], sens, seuil_pluie_basse, seuil_temp_haute
+        )
+    chocs_climat = _correler(tirages.z_climat, matrice_corr_climat, sigma_climat)
+    rendement = (rendement * (1 + chocs_climat[:, :, :, None]))[..., None]
+
+    proba_rr, impact_rr = tirages.risque_rendement[..., None]
+    rendement = rendement * np.where(tirages.u_risque_rendement < proba_rr, 1 - impact_rr, 1.0)
+
+    # Aléas du catalogue, par fenêtre de cycle
+    facteurs_aleas = np.ones_like(rendement)
+    for c in range(len(tirages.cultures)):
+        for m in range(2):
+            n_cycles = int(p["cycles"][c, m])
+            if not tirages.disponible[c, m] or n_cycles == 0:
+                continue
+            duree_cycle = tirages.duree_annee / n_cycles
+            debuts = np.arange(n_cycles) * duree_cycle
+            facteurs_aleas[:, :, c, m, :n_cycles] = catalogue.facteurs_rendement(
+                sens[c, m], debuts, debuts + duree_cycle
+            )
+    rendement = rendement * facteurs_aleas
+
+    annee_defavorable = (tirages.u_annee_defavorable < proba_annee_defavorable)[:, :, None, None, None]
+    sens_cycle = sens[..., None]
+    rendement = rendement * np.where(annee_defavorable, 1 - sens_cycle * impact_climatique_moyen, 1.0)
+    perte_totale = annee_defavorable & (tirages.u_perte_defavorable < sens_cycle * 0.5)
+    rendement = np.where(perte_totale, 0.0, rendement)
+
+    chocs_prix = _correler(tirages.z_prix_annee, matrice_corr_prix, sigma_prix)
+    facteur_saison = saisonnalite_prix(np.arange(1, duree_projet + 1))
+    prix_base = p["prix"] * (1 + chocs_prix[:, :, :, None]) * facteur_saison[None, :, None, None]
+    prix_base = prix_base[..., None]
+    prix = prix_base * (1 + p["sigma"][..., None] * tirages.z_prix_cycle)
+    proba_rp, impact_rp = tirages.risque_prix[..., None]
+    prix = prix * np.where(tirages.u_risque_prix < proba_rp, 1 - impact_rp, 1.0)
+    prix = np.maximum(prix, 0.0)
+
+    return rendement, prix
+
+
+def _ventes_stockees(tirages: TiragesAgricoles, prix: np.ndarray, production: np.ndarray, part_stockee: float,
+                     duree_stockage_mois: int, taux_perte_post_recolte: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Quantités stockées vendues (kg) et prix de vente de chaque cycle récolté, comme le
+    grand livre mensuel : vente duree_stockage_mois mois après la récolte au prix de la
+    dernière récolte de la même culture et méthode, rien au-delà de l'horizon.
+    """
+    if part_stockee <= 0:
+        return np.zeros_like(production), prix
+    duree_annee, duree_projet, n_cycles_max = tirages.duree_annee, tirages.duree_projet, tirages.n_cycles_max
+    forme = (duree_projet,) + tirages.disponible.shape + (n_cycles_max,)
+    annee_prix = np.zeros(forme, dtype=int)
+    cycle_prix = np.zeros(forme, dtype=int)
+    dans_horizon = np.zeros(forme, dtype=bool)
+    for c, m in zip(*np.nonzero(tirages.disponible & (tirages.parametres["cycles"] > 0))):
+        n_cycles = int(tirages.parametres["cycles"][c, m])
+        a, k = np.divmod(np.arange(duree_projet * n_cycles), n_cycles)
+        recolte = a * duree_annee + np.ceil((k + 1) * duree_annee / n_cycles).astype(int) - 1
+        vente = recolte + duree_stockage_mois
+        derniere = np.searchsorted(recolte, vente, side="right") - 1
+        annee_prix[a, c, m, k] = a[derniere]
+        cycle_prix[a, c, m, k] = k[derniere]
+        dans_horizon[a, c, m, k] = vente < duree_projet * duree_annee
+    indices_cultures = np.arange(forme[1])[:, None, None]
+    indices_methodes = np.arange(2)[:, None]
+    prix_vente = prix[:, annee_prix, indices_cultures, indices_methodes, cycle_prix]
+    conservation = (1 - taux_perte_post_recolte) ** duree_stockage_mois
+    return np.where(dans_horizon, part_stockee * production * conservation, 0.0), prix_vente
+
+
+def calculer_flux_lot(
+    tirages: TiragesAgricoles,
+    rendements: np.ndarray,
+    prix: np.ndarray,
+    surfaces: np.ndarray,
+    taux_assurance: float,
+    taux_imposition: float,
+    seuil_exoneration_surface: float,
+    taux_charges_sociales: float,
+    cout_cmu_par_ouvrier: float,
+    nb_ouvriers_par_hectare: float,
+    assurance_par_hectare: float,
+    surface_serre_unite: float,
+    cout_serre_unite: float,
+    amortissement_serre_annee: int,
+    mode_financement: str = "autofinancement",
+    montant_emprunt: float = 0,
+    taux_emprunt: float = 0.02,
+    taux_perte_post_recolte: float = 0.1,
+    part_stockee: float = 0.0,
+    duree_stockage_mois: int = 1,
+    surface_totale: Optional[float] = None,
+    detail: bool = False
+) -> Dict:
+    """
+    Flux financiers de chaque cycle pour un tableau de surfaces (n_cultures x 2, colonnes serre / plein champ).
+
+    Seules les cultures de surface non nulle sont cultivées. Chaque cycle supporte ses coûts
+    (amortissement de la serre compris), une assurance proportionnelle au chiffre d'affaires
+    avec un minimum par hectare, les mensualités d'emprunt de sa durée et l'impôt sur son
+    bénéfice (sauf exonération de surface). Le stockage suit le grand livre de
+    tresorerie_mensuelle : une part_stockee de la récolte est conservée duree_stockage_mois mois
+    (perte de taux_perte_post_recolte par mois) puis vendue au prix de la dernière récolte de
+    la même culture ; la vente est rattachée au cycle récolté et ignorée après l'horizon.
+
+    Returns:
+        Dict: benefice_annuel et amortissement_annuel (n_scenarios, duree_projet),
+        benefice_total (n_scenarios,), investissement_serre ; tableaux par cycle si detail=True.
+    """
+    p = tirages.parametres
+    duree_annee = tirages.duree_annee
+    duree_projet = tirages.duree_projet
+    surfaces = np.where(tirages.disponible, surfaces, 0.0)
+    surface_serre = surfaces[:, 0].sum()
+    if surface_totale is None:
+        surface_totale = surfaces.sum()
+
+    cycles = p["cycles"]
+    actif = (surfaces > 0) & (cycles > 0)
+    masque = actif[..., None] & (np.arange(tirages.n_cycles_max) < cycles[..., None])
+    with np.errstate(divide="ignore"):
+        fraction_annee = np.where(cycles > 0, 1 / np.maximum(cycles, 1), 0.0)
+    duree_cycle_mois = fraction_annee * duree_annee
+
+    amortissement_annuel_serre = calculer_amortissement_serre(
+        surface_serre, surface_serre_unite, cout_serre_unite, amortissement_serre_annee
+    ) if surface_serre > 0 else 0.0
+    investissement_serre = calculer_investissement_serre(
+        surface_serre, surface_serre_unite, cout_serre_unite
+    ) if surface_serre > 0 else 0.0
+
+    mensualite_emprunt = 0.0
+    if mode_financement == "emprunt" and montant_emprunt > 0:
+        mensualite_emprunt = calculer_mensualite_emprunt(montant_emprunt, taux_emprunt, duree_projet)
+
+    amortissement_cycle = np.zeros_like(surfaces)
+    amortissement_cycle[:, 0] = amortissement_annuel_serre * fraction_annee[:, 0]
+    couts_fixes = (
+        p["cout_intrants"] + p["cout_main_oeuvre"] * (1 + taux_charges_sociales)
+        + cout_cmu_par_ouvrier * nb_ouvriers_par_hectare * surfaces * fraction_annee
+        + amortissement_cycle
+    )[..., None]
+    cout_assurance_ha = (assurance_par_hectare * surfaces * fraction_annee)[..., None]
+    remboursement = (mensualite_emprunt * duree_cycle_mois)[..., None]
+
+    production = rendements * surfaces[..., None] * 1000
+    valeur_recolte = production * prix
+    vente_stock, prix_vente = _ventes_stockees(tirages, prix, production, part_stockee,
+                                               duree_stockage_mois, taux_perte_post_recolte)
+    ca = (1 - part_stockee) * valeur_recolte + vente_stock * prix_vente
+    couts = couts_fixes + np.maximum(taux_assurance * valeur_recolte, cout_assurance_ha)
+
+    benefice_brut = ca - couts - remboursement
+    if surface_totale >= seuil_exoneration_surface:
+        impot = np.zeros_like(benefice_brut)
+    else:
+        impot = taux_imposition * np.maximum(benefice_brut, 0.0)
+    benefice = np.where(masque, benefice_brut - impot, 0.0)
+
+    benefice_annuel = benefice.sum(axis=(2, 3, 4))
+    resultat = {
+        "benefice_annuel": benefice_annuel,
+        "benefice_total": benefice_annuel.sum(axis=1),
+        "amortissement_annuel": np.full(
+            benefice_annuel.shape, (amortissement_cycle[..., None] * masque).sum()
+        ),
+        "investissement_serre": investissement_serre,
+    }
+    if detail:
+        resultat.update({
+            "masque": masque,
+            "production": np.where(masque, production, 0.0),
+            "prix": prix,
+            "stock": np.where(masque, part_stockee * production, 0.0),
+            "chiffre_affaires": np.where(masque, ca, 0.0),
+            "couts": np.where(masque, couts, 0.0),
+            "remboursement": np.where(masque, np.broadcast_to(remboursement, masque.shape), 0.0),
+            "amortissement": np.where(masque, np.broadcast_to(amortissement_cycle[..., None], masque.shape), 0.0),
+            "vente_stock": np.where(masque, vente_stock, 0.0),
+            "impots": np.where(masque, impot, 0.0),
+            "benefice": benefice,
+        })
+    return resultat
+
+
+def tableau_cycles_lot(tirages: TiragesAgricoles, flux: Dict, surfaces: np.ndarray,
+                       premier_scenario: int = 1) -> pd.DataFrame:
+    """
+    Une ligne par scénario, année, méthode, culture et cycle cultivé, à partir du détail
+    de calculer_flux_lot(..., detail=True). Les scénarios sont numérotés à partir de
+    premier_scenario.
+    """
+    # Ordre des lignes : scénario, année, méthode (serre d'abord), culture, cycle
+    ordre = (0, 1, 3, 2, 4)
+    forme = flux["benefice"].shape
+    selection = np.nonzero(np.transpose(np.broadcast_to(flux["masque"], forme), ordre))
+
+    def colonne(nom):
+        return np.transpose(np.broadcast_to(flux[nom], forme), ordre)[selection]
+
+    s, annee, m, c, k = selection
+    return pd.DataFrame({
+        "Année": annee + 1,
+        "Méthode": np.array(LIBELLES_METHODES)[m],
+        "Culture": np.array(tirages.cultures, dtype=object)[c],
+        "Surface": np.round(np.where(tirages.disponible, surfaces, 0.0)[c, m], 2),
+        "Cycle": k + 1,
+        "Production_cycle_kg": colonne("production"),
+        "Stock_entrant_kg": colonne("stock"),
+        "Vente_stock_kg": colonne("vente_stock"),
+        "Prix_reel": colonne("prix"),
+        "CA_cycle": np.round(colonne("chiffre_affaires"), 0),
+        "Couts": np.round(colonne("couts"), 0),
+        "Remboursement_cycle": np.round(colonne("remboursement"), 0),
+        "Amortissement_cycle": np.round(colonne("amortissement"), 0),
+        "Impots": np.round(colonne("impots"), 0),
+        "Benefice_net_cycle": np.round(colonne("benefice"), 0),
+        "Scenario": s + premier_scenario,
+    })
+
+
+def simuler_lot(tirages: TiragesAgricoles, surfaces: np.ndarray, seuil_pluie_basse: float,
+                seuil_temp_haute: float, impact_climatique_moyen: float, sigma_climat: float = 0.1,
+                sigma_prix: float = 0.1, proba_annee_defavorable: float = 0.2,
+                pluie: Optional[np.ndarray] = None, temp: Optional[np.ndarray] = None,
+                matrice_corr_climat: Optional[np.ndarray] = None,
+                matrice_corr_prix: Optional[np.ndarray] = None,
+                catalogue_aleas: Optional[CatalogueAleas] = None,
+                scenarios_climat_prix: Optional[ScenariosClimatPrix] = None, **parametres_flux) -> Dict:
+    """
+    Simulation vectorisée de tout un lot de scénarios pour une allocation de surfaces.
+    Voir calculer_rendements_prix_lot et calculer_flux_lot.
+    """
+    rendements, prix = calculer_rendements_prix_lot(
+        tirages, seuil_pluie_basse, seuil_temp_haute, impact_climatique_moyen,
+        sigma_climat=sigma_climat, sigma_prix=sigma_prix,
+        proba_annee_defavorable=proba_annee_defavorable, pluie=pluie, temp=temp,
+        matrice_corr_climat=matrice_corr_climat, matrice_corr_prix=matrice_corr_prix,
+        catalogue_aleas=catalogue_aleas, scenarios_climat_prix=scenarios_climat_prix
+    )
+    return calculer_flux_lot(tirages, rendements, prix, surfaces, **parametres_flux)
@@ -1,14 +1,39 @@
 # simulateur.py
 import numpy as np
 import pandas as pd
-from typing import List, Optional, Dict, Tuple
-from numpy.random import multivariate_normal
+from typing import Callable, List, Optional, Dict, Tuple
 
-from modules.agriculture.utils import *
-from modules.agriculture.finagri import calculer_amortissement_serre
-from modules.agriculture.cashflow_cycle import calculer_cashflows_par_cycle
+from modules.agriculture.utils import calculer_matrices_correlation
+from modules.agriculture.catalogue_aleas import CatalogueAleas
+from modules.agriculture.historique_meteo import ScenariosClimatPrix
+from modules.agriculture.simulateur_lot import (
+    TiragesAgricoles,
+    calculer_flux_lot,
+    calculer_rendements_prix_lot,
+    surfaces_par_defaut,
+    tableau_cycles_lot
+)
+from utils.instrumentation import compter, instrumenter, span
+from utils.reduction_graphiques import histogramme
+from utils.reduction_scenarios import N_SCENARIOS_REPRESENTATIFS, reduire_scenarios, tableau_representatifs
 
-def simuler_projet_agricole(
+
+def _serie_annuelle(meteo_annuelle: pd.DataFrame, colonne: str, duree_projet: int) -> np.ndarray:
+    # Années sans relevé : NaN, sans ajustement météo du rendement
+    serie = np.full(duree_projet, np.nan)
+    valeurs = meteo_annuelle[colonne].to_numpy(dtype=float)[:duree_projet]
+    serie[:len(valeurs)] = valeurs
+    return serie
+
+
+def _matrice_lot(matrice: Optional[np.ndarray], lot: slice) -> Optional[np.ndarray]:
+    # Matrices propres à chaque scénario (historique rééchantillonné) ou communes au lot
+    return matrice[lot] if matrice is not None and np.ndim(matrice) == 3 else matrice
+
+
+@instrumenter("agricole")
+def simuler_projet_agricole_multi(
+    n_scenarios: int,
     surface_totale: float,
     duree_projet: int,
     part_serre: float,
@@ -35,110 +60,89 @@ def simuler_projet_agricole(
     taux_emprunt: float = 0.02,
     duree_annee: int = 12,
     taux_perte_post_recolte: float = 0.1,
+    part_stockee: float = 0.0,
     duree_stockage_mois: int = 1,
     sigma_climat: float = 0.1,
-    sigma_prix: float = 0.1
-) -> pd.DataFrame:
-
-    surface_serre = surface_totale * part_serre
-    surface_plein = surface_totale - surface_serre
-
-    amortissement_annuel_serre = calculer_amortissement_serre(
-        surface_serre, surface_serre_unite, cout_serre_unite, amortissement_serre_annee
-    ) if surface_serre > 0 else 0.0
-
-    allocation_serre = allouer_cultures(surface_serre, "serre", cultures, cultures_db)
-    allocation_plein = allouer_cultures(surface_plein, "plein_champ", cultures, cultures_db)
-
-    mensualite_emprunt = 0
-    if mode_financement == "emprunt" and montant_emprunt > 0:
-        mensualite_emprunt = calculer_mensualite_emprunt(montant_emprunt, taux_emprunt, duree_projet)
-
-    data = []
-    cultures_consideres = [c for c in cultures if cultures_db.get(c, {}).get("plein_champ") or cultures_db.get(c, {}).get("serre")]
-
-    if meteo_annuelle is not None and prix_annuel is not None:
-        matrice_corr_climat, matrice_corr_prix = calculer_matrices_correlation(meteo_annuelle, prix_annuel, cultures_consideres)
-    else:
-        matrice_corr_climat = np.identity(len(cultures_consideres))
-        matrice_corr_prix = np.identity(len(cultures_consideres))
-
-    for annee in range(1, duree_projet + 1):
-        chocs_climat = multivariate_normal(mean=np.zeros(len(cultures_consideres)),
-                                           cov=matrice_corr_climat * sigma_climat ** 2)
-        chocs_prix = multivariate_normal(mean=np.zeros(len(cultures_consideres)),
-                                         cov=matrice_corr_prix * sigma_prix ** 2)
-
-        annee_defavorable = np.random.rand() < 0.2  # peut être rendu paramétrable aussi si besoin
-
-        pluie, temp = None, None
-        if meteo_annuelle is not None and (annee <= len(meteo_annuelle)):
-            meteo = meteo_annuelle.iloc[annee - 1]
-            pluie = meteo.get("Pluie_annuelle", None)
-            temp = meteo.get("Temp_moyenne", None)
-
-        for methode, allocations in [("Serre", allocation_serre), ("Plein champ", allocation_plein)]:
-            for culture, surface in allocations:
-                params = cultures_db[culture][methode.lower()]
-                if params is None:
-                    continue
-
-                idx_culture = cultures_consideres.index(culture) if culture in cultures_consideres else None
-                chocs_climat_culture = chocs_climat[idx_culture] if idx_culture is not None else 0
-                chocs_prix_culture = chocs_prix[idx_culture] if idx_culture is not None else 0
-
-                nb_cycles = params["cycles"]
-
-                flux_cycles = calculer_cashflows_par_cycle(
-                    surface=surface,
-                    params_culture=params,
-                    cycles_par_an=nb_cycles,
-                    chocs_climat_cycle=chocs_climat_culture,
-                    chocs_prix_cycle=chocs_prix_culture,
-                    annee=annee,
-                    pluie=pluie,
-                    temp=temp,
-                    annee_defavorable=annee_defavorable,
-                    mensualite_emprunt_mois=mensualite_emprunt,
-                    seuil_pluie_basse=seuil_pluie_basse,
-                    seuil_temp_haute=seuil_temp_haute,
-                    aleas_climatiques=aleas_climatiques,
-                    impact_climatique_moyen=impact_climatique_moyen,
-                    taux_assurance=taux_assurance,
-                    taux_imposition=taux_imposition,
-                    seuil_exoneration_surface=seuil_exoneration_surface,
-                    taux_charges_sociales=taux_charges_sociales,
-                    cout_cmu_par_ouvrier=cout_cmu_par_ouvrier,
-                    nb_ouvriers_par_hectare=nb_ouvriers_par_hectare,
-                    assurance_par_hectare=assurance_par_hectare,
-                    amortissement_annuel_serre=amortissement_annuel_serre if methode.lower() == "serre" else 0.0,
-                    stockage_mois=duree_stockage_mois,
-                    perte_stock=taux_perte_post_recolte,
-                    surface_totale=surface_totale,
-                    duree_annee=duree_annee
-                )
-
-                for cycle_flux in flux_cycles:
-                    data.append({
-                        "Année": annee,
-                        "Méthode": methode,
-                        "Culture": culture,
-                        "Surface": round(surface, 2),
-                        **cycle_flux
-                    })
-
-    return pd.DataFrame(data)
-
-def simuler_projet_agricole_multi(
-    n_scenarios: int,
-    **kwargs
+    sigma_prix: float = 0.1,
+    matrice_corr_climat: Optional[np.ndarray] = None,
+    matrice_corr_prix: Optional[np.ndarray] = None,
+    graine: Optional[int] = None,
+    catalogue_aleas: Optional[CatalogueAleas] = None,
+    scenarios_climat_prix: Optional[ScenariosClimatPrix] = None,
+    rappel: Optional[Callable[..., None]] = None
 ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    scenarios = []
-    for i in range(n_scenarios):
-        df = simuler_projet_agricole(**kwargs)
-        df["Scenario"] = i + 1
-        scenarios.append(df)
-    df_all = pd.concat(scenarios, ignore_index=True)
+    """
+    Simulation Monte Carlo du projet agricole (répartition égale des surfaces entre les
+    cultures de chaque méthode), calculée par lots de scénarios avec le moteur vectorisé
+    de simulateur_lot : mêmes tirages, donc mêmes résultats, que simuler_lot pour la même graine.
+
+    - graine : graine des tirages (TiragesAgricoles), aléas climatiques compris ;
+    - catalogue_aleas : catalogue d'aléas imposé (partagé entre configurations) ;
+    - meteo_annuelle / prix_annuel : relevés annuels communs à tous les scénarios ;
+    - scenarios_climat_prix : années météo/prix rééchantillonnées, une séquence par scénario ;
+    - part_stockee / duree_stockage_mois : stockage avant vente, selon la convention du grand
+      livre de tresorerie_mensuelle (voir calculer_flux_lot) ;
+    - rappel(fraction, message, partiel) est appelé par lots de scénarios avec les bénéfices
+      totaux des scénarios déjà simulés (voir utils.taches).
+
+    Returns:
+        Tuple: lignes par scénario, année, méthode, culture et cycle, puis scénarios min, max et médian.
+    """
+    compter("agricole.scenarios", n_scenarios)
+    with span("agricole.tirages"):
+        tirages = TiragesAgricoles(cultures, cultures_db, n_scenarios, duree_projet, aleas_climatiques,
+                                   graine=graine, duree_annee=duree_annee)
+    if catalogue_aleas is not None:
+        if catalogue_aleas.n_scenarios < n_scenarios or catalogue_aleas.duree_projet < duree_projet:
+            raise ValueError("Le catalogue d'aléas est trop petit pour le nombre de scénarios ou la durée du projet.")
+        tirages.catalogue = catalogue_aleas.sous_catalogue((slice(None, n_scenarios), slice(None, duree_projet)))
+
+    pluie = temp = None
+    if scenarios_climat_prix is not None:
+        # Années météo/prix rééchantillonnées par bootstrap : rendements et corrélations par scénario
+        if scenarios_climat_prix.n_scenarios < n_scenarios:
+            raise ValueError("Nombre de scénarios météo/prix insuffisant.")
+    elif meteo_annuelle is not None:
+        pluie = np.broadcast_to(_serie_annuelle(meteo_annuelle, "Pluie_annuelle", duree_projet), (n_scenarios, duree_projet))
+        temp = np.broadcast_to(_serie_annuelle(meteo_annuelle, "Temp_moyenne", duree_projet), (n_scenarios, duree_projet))
+        if prix_annuel is not None and (matrice_corr_climat is None or matrice_corr_prix is None):
+            matrice_corr_climat, matrice_corr_prix = calculer_matrices_correlation(meteo_annuelle, prix_annuel, tirages.cultures)
+
+    surfaces = surfaces_par_defaut(tirages, surface_totale, part_serre)
+    parametres_flux = dict(
+        taux_assurance=taux_assurance, taux_imposition=taux_imposition,
+        seuil_exoneration_surface=seuil_exoneration_surface, taux_charges_sociales=taux_charges_sociales,
+        cout_cmu_par_ouvrier=cout_cmu_par_ouvrier, nb_ouvriers_par_hectare=nb_ouvriers_par_hectare,
+        assurance_par_hectare=assurance_par_hectare, surface_serre_unite=surface_serre_unite,
+        cout_serre_unite=cout_serre_unite, amortissement_serre_annee=amortissement_serre_annee,
+        mode_financement=mode_financement, montant_emprunt=montant_emprunt, taux_emprunt=taux_emprunt,
+        taux_perte_post_recolte=taux_perte_post_recolte, part_stockee=part_stockee,
+        duree_stockage_mois=duree_stockage_mois, surface_totale=surface_totale
+    )
+
+    tableaux = []
+    benefices_totaux = []
+    taille_lot = max(1, -(-n_scenarios // 20))
+    for debut in range(0, n_scenarios, taille_lot):
+        lot = slice(debut, min(debut + taille_lot, n_scenarios))
+        tirages_lot = tirages.sous_lot(lot)
+        with span("agricole.rendements_prix"):
+            rendements, prix = calculer_rendements_prix_lot(
+                tirages_lot, seuil_pluie_basse, seuil_temp_haute, impact_climatique_moyen,
+                sigma_climat=sigma_climat, sigma_prix=sigma_prix,
+                pluie=None if pluie is None else pluie[lot], temp=None if temp is None else temp[lot],
+                matrice_corr_climat=_matrice_lot(matrice_corr_climat, lot),
+                matrice_corr_prix=_matrice_lot(matrice_corr_prix, lot),
+                scenarios_climat_prix=None if scenarios_climat_prix is None else scenarios_climat_prix.sous_ensemble(lot)
+            )
+        with span("agricole.flux"):
+            flux = calculer_flux_lot(tirages_lot, rendements, prix, surfaces, detail=True, **parametres_flux)
+        tableaux.append(tableau_cycles_lot(tirages_lot, flux, surfaces, premier_scenario=debut + 1))
+        benefices_totaux.append(flux["benefice_total"])
+        if rappel is not None:
+            rappel(lot.stop / n_scenarios, f"Scénario {lot.stop}/{n_scenarios}", np.concatenate(benefices_totaux))
+    with span("agricole.agregation"):
+        df_all = pd.concat(tableaux, ignore_index=True)
 
     # Calcul des bénéfices nets totaux par scénario
     resume = df_all.groupby("Scenario")["Benefice_net_cycle"].sum().reset_index()
@@ -153,4 +157,75 @@ def simuler_projet_agricole_multi(
     scenario_max = df_all[df_all["Scenario"] == resume.loc[idx_max, "Scenario"]]
     scenario_med = df_all[df_all["Scenario"] == resume.loc[idx_med, "Scenario"]]
 
-    return df_all, scenario_min, scenario_max, scenario_med
\ No newline at end of file
+    return df_all, scenario_min, scenario_max, scenario_med
+
+
+def scenarios_representatifs(df_all: pd.DataFrame, n_representatifs: int = N_SCENARIOS_REPRESENTATIFS,
+                             methode: str = "kmedoides") -> Dict:
+    """
+    Réduit les scénarios de simuler_projet_agricole_multi à quelques scénarios pondérés,
+    choisis sur la trajectoire du bénéfice net cumulé année par année.
+
+    Returns:
+        Dict: reduction (voir utils.reduction_scenarios), trajectoires des représentatifs
+        (poids et bénéfice cumulé par année) et detail (lignes par cycle des scénarios
+        retenus, avec leur représentatif et leur poids).
+    """
+    trajectoires = df_all.pivot_table(index="Scenario", columns="Année", values="Benefice_net_cycle",
+                                      aggfunc="sum").cumsum(axis=1).rename_axis(columns=None)
+    reduction = reduire_scenarios(trajectoires.to_numpy(), n_representatifs, methode)
+    tableau = tableau_representatifs(trajectoires, reduction)
+    detail = pd.concat([df_all[df_all["Scenario"] == scenario].assign(Representatif=nom, Poids=poids)
+                        for nom, scenario, poids in zip(tableau.index, tableau["Scénario d'origine"], tableau["Poids"])],
+                       ignore_index=True)
+    return {"reduction": reduction, "trajectoires": tableau, "detail": detail}
+
+
+TYPE_HISTORIQUE = "agricole"
+# Niveaux de la fonction quantile du bénéfice conservée dans l'historique (1 % à 99 %)
+NIVEAUX_QUANTILES_BENEFICE = np.round(np.arange(0.01, 1.0, 0.01), 2)
+
+
+def libelle_simulation(parametres: Dict) -> str:
+    # Libellé court d'une simulation agricole dans l'historique et la page de comparaison
+    libelle = (f"{', '.join(parametres['cultures'])} · {parametres['surface_totale']:g} ha"
+               f" · serre {parametres['part_serre']:.0%} · {parametres['duree_projet']} ans"
+               f" · {parametres['n_scenarios']} scénarios")
+    if parametres.get("part_stockee"):
+        libelle += f" · stockage {parametres['part_stockee']:.0%}"
+    return libelle
+
+
+def sorties_historisables(sortie: Dict) -> Dict:
+    """
+    Partie d'une simulation agricole conservée dans l'historique des simulations :
+    histogramme et fonction quantile du bénéfice net cumulé, distribution de la VAN,
+    du TRI et du délai de récupération, scénarios représentatifs ; ni les cycles de
+    chaque scénario ni la trésorerie mensuelle.
+    """
+    benefices = sortie["resultats"].groupby("Scenario")["Benefice_net_cycle"].sum().to_numpy(dtype=float)
+    return {
+        "histogramme_benefices": histogramme(benefices),
+        "quantiles_benefices": pd.DataFrame({"Benefice": np.quantile(benefices, NIVEAUX_QUANTILES_BENEFICE)},
+                                            index=pd.Index(NIVEAUX_QUANTILES_BENEFICE, name="Niveau")),
+        "indicateurs": sortie["indicateurs"]["distribution"],
+        "scenarios": sortie["scenarios"]["trajectoires"],
+    }
+
+
+def metriques_simulation(sortie: Dict) -> Dict[str, float]:
+    """
+    Indicateurs comparables d'une simulation agricole à l'autre : bénéfice net cumulé
+    (médiane, P5, P95, probabilité de perte), VAN et TRI médians.
+    """
+    benefices = sortie["resultats"].groupby("Scenario")["Benefice_net_cycle"].sum().to_numpy(dtype=float)
+    distribution = sortie["indicateurs"]["distribution"]
+    return {
+        "benefice_median": float(np.median(benefices)),
+        "benefice_p5": float(np.quantile(benefices, 0.05)),
+        "benefice_p95": float(np.quantile(benefices, 0.95)),
+        "probabilite_perte": float(np.mean(benefices < 0)),
+        "van_mediane": float(distribution.loc["VAN", "P50"]),
+        "tri_median": float(distribution.loc["TRI", "P50"]),
+        "proba_van_negative": sortie["indicateurs"]["proba_van_negative"],
+    }
@@ -0,0 +1,240 @@
+# tresorerie_mensuelle.py
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+from modules.agriculture.catalogue_aleas import CatalogueAleas
+from modules.agriculture.finagri import calculer_investissement_serre
+from modules.agriculture.simulateur_lot import (
+    PARAMETRES_RENDEMENTS_PRIX,
+    TiragesAgricoles,
+    calculer_rendements_prix_lot,
+    surfaces_par_defaut
+)
+from modules.agriculture.utils import calculer_mensualite_emprunt
+
+QUANTILES_TRESORERIE = (0.05, 0.5, 0.95)
+
+
+def _matrice_mois(mois: List[int], n_mois: int) -> np.ndarray:
+    """
+    Matrice d'affectation (n_evenements x n_mois) : 1 au mois de chaque événement
+    (0 partout si l'événement tombe après l'horizon).
+    """
+    matrice = np.zeros((len(mois), n_mois))
+    mois = np.asarray(mois, dtype=int)
+    dans_horizon = mois < n_mois
+    matrice[np.flatnonzero(dans_horizon), mois[dans_horizon]] = 1.0
+    return matrice
+
+
+def _tableau_amortissement_mensuel(montant: float, taux_annuel: float, duree: int):
+    """
+    Mensualités, intérêts et capital restant dû de chaque mois d'un prêt amortissable.
+    """
+    n_mois = duree * 12
+    mensualite = calculer_mensualite_emprunt(montant, taux_annuel, duree)
+    taux_mensuel = taux_annuel / 12
+    capital_restant = np.empty(n_mois)
+    capital = montant
+    for i in range(n_mois):
+        capital_restant[i] = capital
+        capital -= mensualite - capital * taux_mensuel
+    interets = capital_restant * taux_mensuel
+    return np.full(n_mois, mensualite), interets
+
+
+def simuler_tresorerie_mensuelle(
+    tirages: TiragesAgricoles,
+    rendements: np.ndarray,
+    prix: np.ndarray,
+    surfaces: np.ndarray,
+    taux_assurance: float,
+    taux_imposition: float,
+    seuil_exoneration_surface: float,
+    taux_charges_sociales: float,
+    cout_cmu_par_ouvrier: float,
+    nb_ouvriers_par_hectare: float,
+    assurance_par_hectare: float,
+    surface_serre_unite: float,
+    cout_serre_unite: float,
+    amortissement_serre_annee: int,
+    mode_financement: str = "autofinancement",
+    montant_emprunt: float = 0,
+    taux_emprunt: float = 0.02,
+    taux_perte_post_recolte: float = 0.1,
+    part_stockee: float = 0.0,
+    duree_stockage_mois: int = 1,
+    tresorerie_initiale: float = 0.0,
+    surface_totale: Optional[float] = None
+) -> Dict:
+    """
+    Grand livre mensuel de l'exploitation, vectorisé sur tous les scénarios.
+
+    - Récolte au dernier mois de chaque cycle ; une part_stockee de la production est
+      conservée duree_stockage_mois mois (perte de taux_perte_post_recolte par mois de stockage,
+      y compris d'une année sur l'autre) puis vendue au prix en vigueur au mois de vente
+      (prix de la dernière récolte de la même culture).
+    - Intrants payés au premier mois du cycle, main-d'œuvre, charges sociales et CMU
+      répartis sur les mois du cycle, assurance payée à la récolte.
+    - Serres payées au mois 0, capital emprunté encaissé au mois 0, mensualité de
+      calculer_mensualite_emprunt payée une seule fois par mois.
+    - Impôt annuel sur le résultat (ventes - charges - amortissement des serres - intérêts),
+      payé au dernier mois de l'année.
+
+    Returns:
+        Dict: solde (n_scenarios x n_mois), stock_kg, encaissements, decaissements,
+        proba_deficit, besoin_financement (par scénario), resume (DataFrame), bandes (DataFrame).
+    """
+    p = tirages.parametres
+    duree_annee = tirages.duree_annee
+    duree_projet = tirages.duree_projet
+    n_scenarios = tirages.n_scenarios
+    n_mois = duree_projet * duree_annee
+    surfaces = np.where(tirages.disponible, surfaces, 0.0)
+    surface_serre = surfaces[:, 0].sum()
+    if surface_totale is None:
+        surface_totale = surfaces.sum()
+
+    production = rendements * surfaces[None, None, :, :, None] * 1000
+
+    # Événements de récolte (déterministes) : un par année, culture, méthode et cycle
+    evenements = []
+    for c in range(len(tirages.cultures)):
+        for m in range(2):
+            n_cycles = int(p["cycles"][c, m])
+            if surfaces[c, m] <= 0 or n_cycles == 0:
+                continue
+            duree_cycle = duree_annee / n_cycles
+            for a in range(duree_projet):
+                for k in range(n_cycles):
+                    debut = a * duree_annee + int(np.floor(k * duree_cycle))
+                    recolte = a * duree_annee + int(np.ceil((k + 1) * duree_cycle)) - 1
+                    evenements.append((a, c, m, k, debut, recolte))
+
+    encaissements = np.zeros((n_scenarios, n_mois))
+    decaissements = np.zeros((n_scenarios, n_mois))
+    stock_kg = np.zeros((n_scenarios, n_mois))
+
+    if evenements:
+        a, c, m, k, debut, recolte = (np.array(x) for x in zip(*evenements))
+        prod_evt = production[:, a, c, m, k]
+        prix_evt = prix[:, a, c, m, k]
+
+        # Prix en vigueur au mois de vente : dernière récolte de la même culture et méthode
+        vente = recolte + duree_stockage_mois
+        indice_prix = np.empty(len(evenements), dtype=int)
+        for cm in set(zip(c, m)):
+            idx = np.flatnonzero((c == cm[0]) & (m == cm[1]))
+            ordre = idx[np.argsort(recolte[idx], kind="stable")]
+            position = np.searchsorted(recolte[ordre], vente[idx], side="right") - 1
+            indice_prix[idx] = ordre[position]
+        prix_vente = prix[:, a[indice_prix], c[indice_prix], m[indice_prix], k[indice_prix]]
+
+        conservation = (1 - taux_perte_post_recolte) ** duree_stockage_mois
+        ventes_recolte = (1 - part_stockee) * prod_evt * prix_evt
+        ventes_stock = part_stockee * prod_evt * conservation * prix_vente
+        encaissements += ventes_recolte @ _matrice_mois(recolte, n_mois)
+        encaissements += ventes_stock @ _matrice_mois(vente, n_mois)
+
+        for j in range(duree_stockage_mois):
+            stock_kg += (part_stockee * prod_evt * (1 - taux_perte_post_recolte) ** j) @ _matrice_mois(recolte + j, n_mois)
+
+        # Charges de cycle
+        fraction = 1 / p["cycles"][c, m]
+        couts_mensualises = (
+            p["cout_main_oeuvre"][c, m] * (1 + taux_charges_sociales)
+            + cout_cmu_par_ouvrier * nb_ouvriers_par_hectare * surfaces[c, m] * fraction
+        )
+        repartition = np.zeros((len(evenements), n_mois))
+        for e in range(len(evenements)):
+            mois_cycle = np.arange(debut[e], recolte[e] + 1)
+            repartition[e, mois_cycle] = couts_mensualises[e] / len(mois_cycle)
+        decaissements += (p["cout_intrants"][c, m] @ _matrice_mois(debut, n_mois)
+                          + repartition.sum(axis=0))[None, :]
+
+        assurance = np.maximum(taux_assurance * prod_evt * prix_evt,
+                               assurance_par_hectare * surfaces[c, m] * fraction)
+        decaissements += assurance @ _matrice_mois(recolte, n_mois)
+
+    # Investissement et financement
+    investissement_serre = calculer_investissement_serre(
+        surface_serre, surface_serre_unite, cout_serre_unite
+    ) if surface_serre > 0 else 0.0
+    decaissements[:, 0] += investissement_serre
+    interets = np.zeros(n_mois)
+    if mode_financement == "emprunt" and montant_emprunt > 0:
+        encaissements[:, 0] += montant_emprunt
+        mensualites, interets = _tableau_amortissement_mensuel(montant_emprunt, taux_emprunt, duree_projet)
+        decaissements += mensualites[None, :]
+
+    # Impôt annuel
+    if surface_totale < seuil_exoneration_surface:
+        amortissement_annuel = investissement_serre / amortissement_serre_annee
+        charges = decaissements.copy()
+        charges[:, 0] -= investissement_serre
+        if mode_financement == "emprunt" and montant_emprunt > 0:
+            charges -= mensualites[None, :] - interets[None, :]
+        produits = encaissements.copy()
+        if mode_financement == "emprunt" and montant_emprunt > 0:
+            produits[:, 0] -= montant_emprunt
+        resultat_annuel = (produits - charges).reshape(n_scenarios, duree_projet, duree_annee).sum(axis=2) \
+            - amortissement_annuel
+        impots = taux_imposition * np.maximum(resultat_annuel, 0.0)
+        decaissements[:, duree_annee - 1::duree_annee] += impots
+
+    solde = tresorerie_initiale + np.cumsum(encaissements - decaissements, axis=1)
+    besoin_financement = np.maximum(0.0, -solde.min(axis=1))
+
+    bandes = pd.DataFrame(
+        np.quantile(solde, QUANTILES_TRESORERIE, axis=0).T,
+        columns=[f"P{int(q * 100)}" for q in QUANTILES_TRESORERIE]
+    )
+    bandes.index = pd.RangeIndex(1, n_mois + 1, name="Mois")
+
+    resume = pd.DataFrame({
+        "Indicateur": ["Probabilité de déficit de trésorerie", "Besoin de financement moyen",
+                       "Besoin de financement P95", "Besoin de financement maximal",
+                       "Trésorerie finale médiane"],
+        "Valeur": [float(np.mean(besoin_financement > 0)), float(besoin_financement.mean()),
+                   float(np.quantile(besoin_financement, 0.95)), float(besoin_financement.max()),
+                   float(np.median(solde[:, -1]))],
+    })
+
+    return {
+        "solde": solde,
+        "stock_kg": stock_kg,
+        "encaissements": encaissements,
+        "decaissements": decaissements,
+        "proba_deficit": float(np.mean(besoin_financement > 0)),
+        "besoin_financement": besoin_financement,
+        "resume": resume,
+        "bandes": bandes,
+    }
+
+
+def simuler_tresorerie_agricole(
+    cultures: List[str],
+    cultures_db: Dict,
+    surface_totale: float,
+    part_serre: float,
+    duree_projet: int,
+    aleas_climatiques: Dict[str, Dict[str, float]],
+    n_scenarios: int = 200,
+    graine: Optional[int] = None,
+    catalogue_aleas: Optional[CatalogueAleas] = None,
+    **parametres
+) -> Dict:
+    """
+    Enchaîne tirages, rendements/prix vectorisés et grand livre mensuel pour une
+    répartition égale des surfaces (comme simuler_projet_agricole_multi). catalogue_aleas
+    permet de reprendre les aléas climatiques d'une autre simulation des mêmes scénarios.
+    """
+    tirages = TiragesAgricoles(cultures, cultures_db, n_scenarios, duree_projet, aleas_climatiques,
+                               graine=graine, duree_annee=parametres.pop("duree_annee", 12))
+    parametres_rp = {k: v for k, v in parametres.items() if k in PARAMETRES_RENDEMENTS_PRIX}
+    parametres_livre = {k: v for k, v in parametres.items() if k not in PARAMETRES_RENDEMENTS_PRIX}
+    rendements, prix = calculer_rendements_prix_lot(tirages, catalogue_aleas=catalogue_aleas, **parametres_rp)
+    surfaces = surfaces_par_defaut(tirages, surface_totale, part_serre)
+    return simuler_tresorerie_mensuelle(tirages, rendements, prix, surfaces,
+                                        surface_totale=surface_totale, **parametres_livre)
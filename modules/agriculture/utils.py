@@ -44,11 +44,12 @@ def appliquer_risque_rendement(rendement: float, risque: Dict) -> float:
 
 def ajuster_rendement_par_meteo(rendement_base: float, pluie: float, temp: float,
                                  sensibilite: float, seuil_pluie_basse: float, seuil_temp_haute: float) -> float:
-    facteur = 1.0
-    if pluie < seuil_pluie_basse:
-        facteur *= (1 - 0.3 * sensibilite)
-    if temp > seuil_temp_haute:
-        facteur *= (1 - 0.15 * sensibilite)
+    """
+    Ajuste le rendement selon la pluie et la température.
+    Accepte des scalaires ou des tableaux numpy (tous les scénarios et années en un appel).
+    """
+    facteur = np.where(pluie < seuil_pluie_basse, 1 - 0.3 * sensibilite, 1.0)
+    facteur = facteur * np.where(temp > seuil_temp_haute, 1 - 0.15 * sensibilite, 1.0)
     return rendement_base * facteur
 
 def appliquer_aléas_climatiques(rendement: float, sensibilite: float,
@@ -88,6 +89,36 @@ def calculer_matrices_correlation(meteo_annuelle: pd.DataFrame, prix_annuel: pd.
     matrice_corr_prix = rendement_prix.corr().values
     return matrice_corr_climat, matrice_corr_prix
 
+def calculer_matrices_correlation_lot(pluie_cultures: np.ndarray, prix_cultures: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Version vectorisée de calculer_matrices_correlation pour un lot de scénarios.
+
+    Paramètres :
+    - pluie_cultures, prix_cultures : tableaux (n_scenarios, n_annees, n_cultures)
+
+    Retourne deux tableaux (n_scenarios, n_cultures, n_cultures). Les corrélations
+    non définies (série constante) sont remplacées par 0 hors diagonale.
+    """
+    return _correlation_variations_lot(pluie_cultures), _correlation_variations_lot(prix_cultures)
+
+def _correlation_variations_lot(series: np.ndarray) -> np.ndarray:
+    variations = series[:, 1:, :] / series[:, :-1, :] - 1
+    variations = variations - variations.mean(axis=1, keepdims=True)
+    cov = np.einsum("stc,std->scd", variations, variations)
+    ecart = np.sqrt(np.diagonal(cov, axis1=1, axis2=2))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = cov / (ecart[:, :, None] * ecart[:, None, :])
+    corr = np.nan_to_num(corr, nan=0.0, posinf=0.0, neginf=0.0)
+    idx = np.arange(series.shape[-1])
+    corr[:, idx, idx] = 1.0
+    return corr
+
+def lister_cultures_considerees(cultures: List[str], cultures_db: dict) -> List[str]:
+    """
+    Cultures cultivables en plein champ ou sous serre.
+    """
+    return [c for c in cultures if cultures_db.get(c, {}).get("plein_champ") or cultures_db.get(c, {}).get("serre")]
+
 def decouper_cycles_annee(nb_cycles: int, duree_annee: int = 12) -> List[float]:
     if nb_cycles == 0:
         return []
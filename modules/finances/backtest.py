@@ -0,0 +1,259 @@
+# backtest.py
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from modules.finances.finance_tools import calculer_rendements_cours, calculer_rendements_totaux1
+from modules.finances.optimizer import PortefeuilleInfaisable, optimiser_portefeuille
+from modules.finances.requete_marche import IndexMarche
+
+MODES_OPTIMISATION = ("montecarlo", "cvxpy", "hybride")
+METHODES_FENETRE = ("glissante", "croissante")
+
+_ETAT_TRAVAILLEUR = {}
+
+
+class StatistiquesCumulees:
+    """
+    Sommes cumulées des rendements annuels (T x n_titres) : la moyenne et la covariance
+    de n'importe quelle fenêtre [debut, fin) s'obtiennent par différence de deux préfixes,
+    sans recalcul sur les années communes aux fenêtres qui se chevauchent.
+    Les valeurs manquantes sont ignorées paire par paire, comme DataFrame.cov.
+    """
+
+    def __init__(self, rendements: np.ndarray):
+        present = np.isfinite(rendements)
+        x = np.where(present, rendements, 0.0)
+        p = present.astype(float)
+        zero = np.zeros((1, rendements.shape[1], rendements.shape[1]))
+        self._n = np.concatenate([zero, np.cumsum(p[:, :, None] * p[:, None, :], axis=0)])
+        self._sx = np.concatenate([zero, np.cumsum(x[:, :, None] * p[:, None, :], axis=0)])
+        self._sxy = np.concatenate([zero, np.cumsum(x[:, :, None] * x[:, None, :], axis=0)])
+
+    def fenetre(self, debut: int, fin: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Moyenne et covariance (ddof=1) des lignes debut..fin-1.
+        """
+        n = self._n[fin] - self._n[debut]
+        sx = self._sx[fin] - self._sx[debut]
+        sxy = self._sxy[fin] - self._sxy[debut]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            moyenne = np.diag(sx) / np.diag(n)
+            cov = (sxy - sx * sx.T / n) / (n - 1)
+        return moyenne, np.where(np.isfinite(cov), cov, 0.0)
+
+
+def definir_fenetres(annees: Sequence[int], taille_fenetre: int = 4,
+                     methode: str = "glissante") -> List[Tuple[int, int, int]]:
+    """
+    Fenêtres d'estimation walk-forward : (premiere_annee, derniere_annee, annee_test).
+    La fenêtre glissante garde taille_fenetre années, la fenêtre croissante part de la
+    première année disponible.
+    """
+    if methode not in METHODES_FENETRE:
+        raise ValueError(f"Méthode de fenêtre inconnue : {methode}")
+    annees = sorted(int(a) for a in annees)
+    fenetres = []
+    for i in range(taille_fenetre, len(annees)):
+        debut = annees[i - taille_fenetre] if methode == "glissante" else annees[0]
+        fenetres.append((debut, annees[i - 1], annees[i]))
+    return fenetres
+
+
+def _optimiser_fenetre(df: pd.DataFrame, index_marche: IndexMarche, fenetre: Tuple[int, int, int], mode: str,
+                       parametres_optimisation: Dict) -> Dict:
+    # Index du panneau complet construit une fois ; la fenêtre est un prédicat d'années
+    debut, fin, annee_test = fenetre
+    try:
+        resultat = optimiser_portefeuille(df, mode=mode, index_marche=index_marche, annee_min=debut,
+                                          annee_max=fin, **parametres_optimisation)
+    except PortefeuilleInfaisable as e:
+        return {"mode": mode, "fenetre": fenetre, "poids": {}, "statut": str(e)}
+    portefeuille = resultat['portefeuille']
+    return {
+        "mode": mode,
+        "fenetre": fenetre,
+        "poids": dict(zip(portefeuille['entreprise'], portefeuille['poids'])),
+        "statut": "ok",
+    }
+
+
+def _initialiser_travailleur(df, parametres_optimisation):
+    _ETAT_TRAVAILLEUR["df"] = df
+    _ETAT_TRAVAILLEUR["index"] = IndexMarche(df)
+    _ETAT_TRAVAILLEUR["parametres"] = parametres_optimisation
+
+
+def _optimiser_fenetre_travailleur(tache: Tuple[Tuple[int, int, int], str]) -> Dict:
+    fenetre, mode = tache
+    return _optimiser_fenetre(_ETAT_TRAVAILLEUR["df"], _ETAT_TRAVAILLEUR["index"], fenetre, mode,
+                              _ETAT_TRAVAILLEUR["parametres"])
+
+
+def _statistiques_performance(rendements: np.ndarray, taux_sans_risque: float) -> Dict:
+    valeur = np.cumprod(1 + rendements)
+    drawdown = valeur / np.maximum.accumulate(np.concatenate([[1.0], valeur]))[1:] - 1
+    volatilite = rendements.std(ddof=1) if len(rendements) > 1 else np.nan
+    rendement_annualise = valeur[-1] ** (1 / len(rendements)) - 1
+    return {
+        "Rendement_annualise": rendement_annualise,
+        "Volatilite": volatilite,
+        "Sharpe": (rendement_annualise - taux_sans_risque) / volatilite if volatilite else np.nan,
+        "Drawdown_max": drawdown.min(),
+        "Valeur_finale": valeur[-1],
+    }
+
+
+def backtester_portefeuille(
+    df: pd.DataFrame,
+    modes: Sequence[str] = ("hybride",),
+    taille_fenetre: int = 4,
+    methode_fenetre: str = "glissante",
+    frais_achat: float = 0.012,
+    fiscalite_dividendes: float = 0.15,
+    taux_sans_risque: float = 0.03,
+    n_processus: Optional[int] = None,
+    **parametres_optimisation
+) -> Dict:
+    """
+    Backtest walk-forward de optimiser_portefeuille hors échantillon.
+
+    Pour chaque fenêtre d'estimation, le portefeuille est ré-optimisé sur les seules années
+    de la fenêtre puis détenu pendant l'année suivante. Le rendement réalisé de l'année test
+    est le rendement total (cours + dividende) diminué de l'impôt sur les dividendes et des
+    frais d'achat sur les montants achetés au rééquilibrage (positions dérivées de l'année
+    précédente vers les nouveaux poids cibles). Si l'optimisation échoue dans une fenêtre,
+    les positions précédentes sont conservées.
+
+    Un titre sans cours dans l'année test (ou l'année précédente) n'est pas détenu : son
+    poids est reporté sur les autres titres et compté dans Titres_sans_cours. Les positions
+    dérivent avec le seul rendement du cours ; les dividendes nets, encaissés, sont
+    réinvestis (et soumis aux frais d'achat) au rééquilibrage suivant.
+
+    Les optimisations de toutes les fenêtres et de tous les modes sont indépendantes et
+    réparties sur un pool de processus ; les statistiques ex ante des fenêtres (rendement
+    attendu, volatilité) sont obtenues par sommes cumulées (StatistiquesCumulees).
+
+    Returns:
+        Dict: resume (DataFrame, une ligne par mode), details (Dict mode -> DataFrame par année
+        test), poids (Dict mode -> DataFrame année test x titres).
+    """
+    for mode in modes:
+        if mode not in MODES_OPTIMISATION:
+            raise ValueError(f"Mode inconnu : {mode}")
+
+    df = df.copy()
+    df['Annee'] = df['Annee'].astype(int)
+    parametres_optimisation = dict(parametres_optimisation, taux_sans_risque=taux_sans_risque)
+
+    rendements = calculer_rendements_totaux1(df).set_index('Annee').sort_index()
+    rendements_cours = calculer_rendements_cours(df).reindex(index=rendements.index, columns=rendements.columns)
+    titres = list(rendements.columns)
+    annees = list(rendements.index)
+    statistiques = StatistiquesCumulees(rendements.to_numpy(dtype=float))
+
+    fenetres = definir_fenetres(sorted(df['Annee'].unique()), taille_fenetre, methode_fenetre)
+    # Une fenêtre doit contenir au moins une année de rendement pour l'estimation
+    fenetres = [f for f in fenetres if f[2] in annees and f[1] >= annees[0]]
+    if not fenetres:
+        raise ValueError("Historique trop court pour la taille de fenêtre demandée.")
+
+    taches = [(fenetre, mode) for mode in modes for fenetre in fenetres]
+    n_processus = n_processus if n_processus is not None else (os.cpu_count() or 1)
+    if n_processus <= 1 or len(taches) <= 1:
+        index_marche = IndexMarche(df)
+        resultats = [_optimiser_fenetre(df, index_marche, f, m, parametres_optimisation) for f, m in taches]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=min(n_processus, len(taches)),
+            initializer=_initialiser_travailleur,
+            initargs=(df, parametres_optimisation)
+        ) as pool:
+            resultats = list(pool.map(_optimiser_fenetre_travailleur, taches))
+    optimisations = {(r["fenetre"], r["mode"]): r for r in resultats}
+
+    resume, details, historique_poids = [], {}, {}
+    for mode in modes:
+        poids_courants = np.zeros(len(titres))
+        lignes, lignes_poids = [], []
+        for fenetre in fenetres:
+            debut, fin, annee_test = fenetre
+            optimisation = optimisations[(fenetre, mode)]
+            if optimisation["poids"]:
+                cible = np.array([optimisation["poids"].get(t, 0.0) for t in titres])
+                cible /= cible.sum()
+            else:
+                cible = poids_courants
+
+            i_test = annees.index(annee_test)
+            r = rendements.iloc[i_test].to_numpy(dtype=float)
+            cote = np.isfinite(r)
+            sans_cours = int(((cible > 1e-4) & ~cote).sum())
+            if sans_cours:
+                investi = cible.sum()
+                cible = np.where(cote, cible, 0.0)
+                cible = cible * investi / cible.sum() if cible.sum() > 0 else cible
+            r = np.where(cote, r, 0.0)
+            r_cours = np.nan_to_num(rendements_cours.iloc[i_test].to_numpy(dtype=float))
+            # Dividende rapporté au cours de début d'année
+            d = r - r_cours
+
+            achats = np.maximum(cible - poids_courants, 0.0).sum()
+            rotation = 0.5 * np.abs(cible - poids_courants).sum() if poids_courants.any() else 1.0
+            rendement_brut = cible @ r
+            impot = fiscalite_dividendes * (cible @ d)
+            frais = frais_achat * achats
+            rendement_net = rendement_brut - impot - frais
+
+            i_debut = int(np.searchsorted(annees, debut))
+            i_fin = int(np.searchsorted(annees, fin, side="right"))
+            moyenne, cov = statistiques.fenetre(i_debut, i_fin)
+            moyenne = np.nan_to_num(moyenne)
+
+            lignes.append({
+                "Annee_test": annee_test,
+                "Debut_estimation": debut,
+                "Fin_estimation": fin,
+                "Nb_titres": int((cible > 1e-4).sum()),
+                "Rendement_attendu": float(cible @ moyenne),
+                "Volatilite_ex_ante": float(np.sqrt(max(cible @ cov @ cible, 0.0))),
+                "Rendement_brut": rendement_brut,
+                "Impot_dividendes": impot,
+                "Frais": frais,
+                "Rendement_net": rendement_net,
+                "Rotation": rotation,
+                "Titres_sans_cours": sans_cours,
+                "Statut": optimisation["statut"],
+            })
+            lignes_poids.append(cible)
+
+            # Dérive des positions avec le cours, en part de la valeur nette en fin d'année
+            # (le reste est l'encaisse des dividendes nets)
+            poids_courants = cible * (1 + r_cours) / (1 + rendement_net) if rendement_net > -1 else cible
+
+        detail = pd.DataFrame(lignes)
+        stats = _statistiques_performance(detail["Rendement_net"].to_numpy(), taux_sans_risque)
+        valeur = np.cumprod(1 + detail["Rendement_net"].to_numpy())
+        detail["Valeur"] = valeur
+        detail["Drawdown"] = valeur / np.maximum.accumulate(np.concatenate([[1.0], valeur]))[1:] - 1
+        details[mode] = detail
+        historique_poids[mode] = pd.DataFrame(lignes_poids, columns=titres,
+                                              index=pd.Index([f[2] for f in fenetres], name="Annee_test"))
+        resume.append(dict(Mode=mode, **stats, Rotation_moyenne=detail["Rotation"].mean(),
+                           Frais_cumules=detail["Frais"].sum(),
+                           Fenetres_en_echec=int((detail["Statut"] != "ok").sum())))
+
+    return {
+        "resume": pd.DataFrame(resume).set_index("Mode"),
+        "details": details,
+        "poids": historique_poids,
+    }
+
+
+def comparer_modes(df: pd.DataFrame, **kwargs) -> Dict:
+    """
+    Backtest des trois modes d'optimisation sur les mêmes fenêtres.
+    """
+    return backtester_portefeuille(df, modes=MODES_OPTIMISATION, **kwargs)
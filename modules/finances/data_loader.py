@@ -1,11 +1,15 @@
 import pandas as pd
 import os
 
+from utils.instrumentation import instrumenter, span
+
+@instrumenter("donnees.charger_donnees_boursieres")
 def charger_donnees_boursieres(fichier="data/donnees_brvm.xlsx") -> pd.DataFrame:
     if not os.path.exists(fichier):
         raise FileNotFoundError(f"Fichier non trouvé : {fichier}")
     
-    df = pd.read_excel(fichier)
+    with span("donnees.lecture_excel"):
+        df = pd.read_excel(fichier)
 
     # Nettoyage éventuel
     df.columns = [col.strip() for col in df.columns]
@@ -0,0 +1,87 @@
+# emulateur_boursier.py
+import copy
+from typing import Dict, Optional, Tuple
+
+from modules.finances.pipeline import creer_pipeline_boursier, metriques_simulation
+from utils.emulateur import Emulateur, entrainer_emulateur
+from utils.etat_partage import empreinte_contenu, signature_fichier
+
+# Réglages de l'optimisation émulés et leurs bornes d'entraînement
+BORNES_BOURSIERES = {
+    "aversion_risque": (0.0, 10.0),
+    "pond_dividende": (0.0, 1.0),
+    "taux_sans_risque": (0.0, 0.10),
+}
+# Montant de financement émulé selon le mode, entre FACTEURS_MONTANT × le montant saisi
+CHAMPS_MONTANT = {"Apport mensuel": "apport_mensuel", "Apport unique": "apport_unique", "Prêt unique": "montant"}
+FACTEURS_MONTANT = (0.5, 2.0)
+SORTIES_EMULEES = ("capital_final", "capital_final_p5", "capital_final_p95", "dividendes_cumules_final")
+
+
+def _conteneur_montant(parametres: Dict) -> Tuple[Optional[Dict], Optional[str]]:
+    champ = CHAMPS_MONTANT.get(parametres["mode_financement"])
+    if champ is None:
+        return None, None
+    conteneur = parametres["params_financement"]
+    if champ == "montant":
+        conteneur = conteneur.get("prets")
+    if not isinstance(conteneur, dict) or not conteneur.get(champ):
+        return None, None
+    return conteneur, champ
+
+
+def bornes_emulation(parametres: Dict) -> Dict[str, Tuple[float, float]]:
+    """
+    Bornes des entrées émulées : réglages de BORNES_BOURSIERES et, pour un financement à
+    montant unique (apport mensuel, apport unique, prêt unique), le montant de financement.
+    """
+    bornes = dict(BORNES_BOURSIERES)
+    conteneur, champ = _conteneur_montant(parametres)
+    if conteneur is not None:
+        bornes["montant_financement"] = tuple(float(conteneur[champ]) * f for f in FACTEURS_MONTANT)
+    return bornes
+
+
+def point_emulation(parametres: Dict) -> Dict[str, float]:
+    point = {nom: float(parametres[nom]) for nom in BORNES_BOURSIERES}
+    conteneur, champ = _conteneur_montant(parametres)
+    if conteneur is not None:
+        point["montant_financement"] = float(conteneur[champ])
+    return point
+
+
+def appliquer_point(parametres: Dict, point: Dict[str, float]) -> Dict:
+    parametres = dict(parametres, **{nom: point[nom] for nom in BORNES_BOURSIERES})
+    if "montant_financement" in point:
+        parametres["params_financement"] = copy.deepcopy(parametres["params_financement"])
+        conteneur, champ = _conteneur_montant(parametres)
+        conteneur[champ] = point["montant_financement"]
+    return parametres
+
+
+def contexte_emulation(parametres: Dict) -> str:
+    """
+    Empreinte des réglages non émulés et de la version du classeur de marché : un
+    émulateur entraîné dans un autre contexte n'est plus valable.
+    """
+    figes = appliquer_point(parametres, {nom: 0.0 for nom in point_emulation(parametres)})
+    return empreinte_contenu((figes, signature_fichier(parametres["fichier"])))
+
+
+def entrainer_emulateur_boursier(parametres: Dict, n_points: int = 20, client_calcul=None,
+                                 rappel=None) -> Emulateur:
+    """
+    Entraîne l'émulateur des indicateurs de la simulation boursière autour des réglages
+    courants : n_points simulations complètes (optimisation comprise) sur un plan en
+    hypercube latin. Un pipeline dédié est utilisé pour ne pas évincer les résultats
+    mémoïsés de la session.
+    """
+    pipeline = creer_pipeline_boursier(taille_cache=1, client_calcul=client_calcul)
+
+    def simuler(point):
+        sorties = pipeline.executer(appliquer_point(parametres, point), cibles=["agregation"])
+        metriques = metriques_simulation(sorties)
+        return {nom: metriques[nom] for nom in SORTIES_EMULEES}
+
+    return entrainer_emulateur(simuler, bornes_emulation(parametres), n_points,
+                               graine=parametres["graine"], contexte=contexte_emulation(parametres), rappel=rappel)
@@ -0,0 +1,256 @@
+# entrepot_marche.py
+import os
+import uuid
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from typing import Dict, List, Optional
+
+DOSSIER_ENTREPOT = "data/entrepot_marche"
+
+# Fréquences de rééchantillonnage : (code pandas de période, nombre de périodes par an)
+FREQUENCES = {
+    "journaliere": (None, 252),
+    "hebdomadaire": ("W", 52),
+    "mensuelle": ("M", 12),
+    "trimestrielle": ("Q", 4),
+    "annuelle": ("Y", 1),
+}
+
+COLONNES_JOURNALIERES = {"Date", "Nom_Entreprise", "Cours_Cloture"}
+SCHEMA_JOURNALIER = pa.schema([
+    ("Date", pa.timestamp("s")),
+    ("Nom_Entreprise", pa.string()),
+    ("Cours_Cloture", pa.float64()),
+    ("Dividende", pa.float64()),
+    ("Volume", pa.float64()),
+])
+
+
+def _normaliser_lot(lot: pa.RecordBatch) -> pa.Table:
+    """
+    Met un bloc lu du CSV au schéma de l'entrepôt et ajoute la colonne de partition Annee.
+    """
+    table = pa.Table.from_batches([lot])
+    manquantes = COLONNES_JOURNALIERES - set(table.column_names)
+    if manquantes:
+        raise ValueError(f"Colonnes manquantes dans le fichier journalier : {manquantes}")
+
+    colonnes = {
+        "Date": pc.cast(table["Date"], pa.timestamp("s")),
+        "Nom_Entreprise": pc.utf8_upper(pc.utf8_trim_whitespace(table["Nom_Entreprise"])),
+        "Cours_Cloture": pc.cast(table["Cours_Cloture"], pa.float64()),
+    }
+    for nom in ("Dividende", "Volume"):
+        if nom in table.column_names:
+            colonnes[nom] = pc.fill_null(pc.cast(table[nom], pa.float64()), 0.0)
+        else:
+            colonnes[nom] = pa.array(np.zeros(table.num_rows))
+    table = pa.Table.from_pydict(colonnes, schema=SCHEMA_JOURNALIER)
+    table = table.filter(pc.is_valid(table["Cours_Cloture"]))
+    return table.append_column("Annee", pc.year(table["Date"]))
+
+
+def _compacter_partition(dossier_annee: str, identifiant: str):
+    """
+    Réécrit une partition (année) en un seul fichier sans doublon (Nom_Entreprise, Date) :
+    en cas de réingestion, les lignes du dernier fichier ingéré remplacent les anciennes.
+    """
+    fichiers = sorted(f for f in os.listdir(dossier_annee) if f.endswith(".parquet"))
+    # Fichiers antérieurs d'abord, puis ceux de l'ingestion en cours dans l'ordre des blocs
+    fichiers.sort(key=lambda f: (f.startswith(identifiant), int(f.split("-")[1]) if f.startswith(identifiant) else 0))
+    table = pa.concat_tables([pq.ParquetFile(os.path.join(dossier_annee, f)).read() for f in fichiers])
+    df = table.to_pandas().drop_duplicates(["Nom_Entreprise", "Date"], keep="last").sort_values(["Nom_Entreprise", "Date"])
+
+    temporaire = os.path.join(dossier_annee, f".{identifiant}.tmp")
+    pq.write_table(pa.Table.from_pandas(df, schema=SCHEMA_JOURNALIER, preserve_index=False), temporaire)
+    os.replace(temporaire, os.path.join(dossier_annee, f"{identifiant}-0-0.parquet"))
+    for f in fichiers:
+        if f != f"{identifiant}-0-0.parquet":
+            os.remove(os.path.join(dossier_annee, f))
+
+
+def ingerer_cours_journaliers(fichier: str, dossier_entrepot: str = DOSSIER_ENTREPOT,
+                              taille_bloc: int = 64 << 20, separateur: str = ",") -> int:
+    """
+    Ingère un fichier CSV (éventuellement compressé) de cours journaliers dans l'entrepôt
+    Parquet partitionné par année, bloc par bloc, sans charger le fichier en mémoire.
+
+    Colonnes attendues : Date, Nom_Entreprise, Cours_Cloture ; optionnelles : Dividende
+    (montant détaché ce jour-là), Volume.
+    Les années touchées sont ensuite compactées : réingérer un fichier (ou un fichier qui
+    recouvre des dates déjà présentes) remplace les lignes existantes au lieu de les doubler.
+
+    Returns:
+        int: Nombre de lignes ingérées.
+    """
+    if not os.path.exists(fichier):
+        raise FileNotFoundError(f"Fichier non trouvé : {fichier}")
+
+    lecteur = pv.open_csv(
+        fichier,
+        read_options=pv.ReadOptions(block_size=taille_bloc),
+        parse_options=pv.ParseOptions(delimiter=separateur),
+        convert_options=pv.ConvertOptions(timestamp_parsers=["%Y-%m-%d", "%d/%m/%Y"]),
+    )
+    identifiant = uuid.uuid4().hex[:8]
+    racine = os.path.join(dossier_entrepot, "journalier")
+    n_lignes = 0
+    annees = set()
+    for i, lot in enumerate(lecteur):
+        table = _normaliser_lot(lot)
+        if table.num_rows == 0:
+            continue
+        pq.write_to_dataset(
+            table, root_path=racine, partition_cols=["Annee"],
+            basename_template=f"{identifiant}-{i}-{{i}}.parquet",
+        )
+        annees.update(pc.unique(table["Annee"]).to_pylist())
+        n_lignes += table.num_rows
+
+    for annee in sorted(annees):
+        _compacter_partition(os.path.join(racine, f"Annee={annee}"), identifiant)
+    return n_lignes
+
+
+def signature_entrepot(dossier_entrepot: str = DOSSIER_ENTREPOT) -> Optional[tuple]:
+    """
+    Signature (fichiers, tailles, dates de modification) des partitions de l'entrepôt,
+    pour invalider les caches qui en dépendent ; None si l'entrepôt n'existe pas.
+    """
+    racine = os.path.join(dossier_entrepot, "journalier")
+    if not os.path.isdir(racine):
+        return None
+    signature = []
+    for dossier, _, fichiers in sorted(os.walk(racine)):
+        for f in sorted(fichiers):
+            etat = os.stat(os.path.join(dossier, f))
+            signature.append((os.path.relpath(os.path.join(dossier, f), racine), etat.st_size, etat.st_mtime_ns))
+    return tuple(signature)
+
+
+class EntrepotMarche:
+    """
+    Accès en lecture à l'entrepôt de cours journaliers.
+
+    Les rééchantillonnages se font une partition (année) à la fois : seules les colonnes
+    utiles sont lues et chaque année est réduite à une ligne par titre et par période
+    avant d'être assemblée.
+    """
+
+    def __init__(self, dossier_entrepot: str = DOSSIER_ENTREPOT):
+        chemin = os.path.join(dossier_entrepot, "journalier")
+        if not os.path.isdir(chemin):
+            raise FileNotFoundError(f"Entrepôt introuvable : {chemin}")
+        self.dossier = dossier_entrepot
+        self.dataset = ds.dataset(chemin, format="parquet", partitioning="hive")
+
+    @property
+    def annees(self) -> List[int]:
+        return sorted({int(ds.get_partition_keys(f.partition_expression)["Annee"])
+                       for f in self.dataset.get_fragments()})
+
+    def _filtre(self, titres: Optional[List[str]], annees: Optional[List[int]]):
+        filtre = None
+        if annees is not None:
+            filtre = ds.field("Annee").isin(list(annees))
+        if titres is not None:
+            condition = ds.field("Nom_Entreprise").isin([t.upper() for t in titres])
+            filtre = condition if filtre is None else filtre & condition
+        return filtre
+
+    def lire(self, colonnes: Optional[List[str]] = None, titres: Optional[List[str]] = None,
+             annees: Optional[List[int]] = None) -> pd.DataFrame:
+        """
+        Lit les cours journaliers filtrés (filtres appliqués à la lecture des partitions).
+        """
+        return self.dataset.to_table(columns=colonnes, filter=self._filtre(titres, annees)).to_pandas()
+
+    def reechantillonner(self, frequence: str = "mensuelle", titres: Optional[List[str]] = None,
+                         annees: Optional[List[int]] = None) -> pd.DataFrame:
+        """
+        Dernier cours et dividendes cumulés par titre et par période.
+
+        Returns:
+            pd.DataFrame: Colonnes Nom_Entreprise, Periode, Date, Cours_Cloture, Dividende.
+        """
+        if frequence not in FREQUENCES:
+            raise ValueError(f"Fréquence inconnue : {frequence}")
+        code, _ = FREQUENCES[frequence]
+        colonnes = ["Date", "Nom_Entreprise", "Cours_Cloture", "Dividende"]
+
+        morceaux = []
+        for annee in (annees if annees is not None else self.annees):
+            df = self.lire(colonnes, titres, [annee])
+            if df.empty:
+                continue
+            df = df.sort_values(["Nom_Entreprise", "Date"])
+            df["Periode"] = df["Date"] if code is None else df["Date"].dt.to_period(code).dt.start_time
+            morceaux.append(df.groupby(["Nom_Entreprise", "Periode"], as_index=False).agg(
+                Date=("Date", "last"), Cours_Cloture=("Cours_Cloture", "last"), Dividende=("Dividende", "sum")))
+        if not morceaux:
+            return pd.DataFrame(columns=["Nom_Entreprise", "Periode"] + colonnes[:1] + colonnes[2:])
+
+        # Une période à cheval sur deux années (semaine) apparaît dans deux partitions
+        periodes = pd.concat(morceaux, ignore_index=True).sort_values(["Nom_Entreprise", "Date"])
+        return periodes.groupby(["Nom_Entreprise", "Periode"], as_index=False).agg(
+            Date=("Date", "last"), Cours_Cloture=("Cours_Cloture", "last"), Dividende=("Dividende", "sum"))
+
+    def rendements(self, frequence: str = "mensuelle", titres: Optional[List[str]] = None,
+                   annees: Optional[List[int]] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Rendements totaux (cours + dividendes) et rendements dividendes par période.
+
+        Returns:
+            Dict: totaux et dividendes (DataFrames Periode x Nom_Entreprise).
+        """
+        periodes = self.reechantillonner(frequence, titres, annees)
+        cours = periodes.pivot(index="Periode", columns="Nom_Entreprise", values="Cours_Cloture")
+        dividendes = periodes.pivot(index="Periode", columns="Nom_Entreprise", values="Dividende").fillna(0.0)
+        precedent = cours.shift(1)
+        precedent = precedent.where(precedent != 0)
+        totaux = (cours - precedent + dividendes) / precedent
+        return {"totaux": totaux.iloc[1:], "dividendes": (dividendes / precedent).iloc[1:]}
+
+    def statistiques(self, frequence: str = "mensuelle", titres: Optional[List[str]] = None,
+                     annees: Optional[List[int]] = None, annualiser: bool = True) -> Dict:
+        """
+        Rendement moyen, covariance et rendement dividende moyen estimés à la fréquence
+        demandée, annualisés (x périodes par an) si annualiser.
+
+        Returns:
+            Dict: mu (Series), cov (DataFrame), mu_div (Series), n_observations (Series).
+        """
+        rendements = self.rendements(frequence, titres, annees)
+        facteur = FREQUENCES[frequence][1] if annualiser else 1
+        return {
+            "mu": rendements["totaux"].mean() * facteur,
+            "cov": rendements["totaux"].cov() * facteur,
+            "mu_div": rendements["dividendes"].mean() * facteur,
+            "n_observations": rendements["totaux"].count(),
+        }
+
+    def panneau_annuel(self, referentiel: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Panneau annuel au format de charger_donnees_boursieres (un cours de clôture et un
+        dividende par titre et par année) construit depuis les cours journaliers.
+        Les colonnes descriptives (Secteur, Payeur_Stable, ...) sont reprises du referentiel
+        (par exemple le fichier annuel) lorsqu'il est fourni.
+        """
+        annuel = self.reechantillonner("annuelle")
+        annuel["Annee"] = annuel["Periode"].dt.year
+        annuel = annuel.rename(columns={"Cours_Cloture": "Prix_Cloture_Annuel", "Dividende": "Dividende_Verse"})
+        annuel = annuel.sort_values(["Nom_Entreprise", "Annee"])
+        precedent = annuel.groupby("Nom_Entreprise")["Prix_Cloture_Annuel"].shift(1)
+        annuel["Variation(annee_precedente)"] = (annuel["Prix_Cloture_Annuel"] / precedent - 1) * 100
+        annuel["Rendement_Dividende"] = annuel["Dividende_Verse"] / annuel["Prix_Cloture_Annuel"] * 100
+        annuel = annuel[["Nom_Entreprise", "Annee", "Prix_Cloture_Annuel", "Variation(annee_precedente)",
+                         "Dividende_Verse", "Rendement_Dividende"]]
+        if referentiel is not None:
+            descriptives = [c for c in referentiel.columns if c not in annuel.columns or c in ("Nom_Entreprise", "Annee")]
+            annuel = annuel.merge(referentiel[descriptives], on=["Nom_Entreprise", "Annee"], how="left")
+        return annuel.reset_index(drop=True)
@@ -0,0 +1,56 @@
+# etat_marche.py
+import threading
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from modules.finances.data_loader import charger_donnees_boursieres
+from modules.finances.requete_marche import IndexMarche
+from utils.etat_partage import ressource_fichier
+
+FICHIER_MARCHE_DEFAUT = "data/donnees_brvm.xlsx"
+
+
+class EtatMarche:
+    """
+    Instantané en lecture seule des données de marché d'un classeur : le DataFrame chargé,
+    les panneaux filtrés par période et leurs index (IndexMarche), construits une fois puis
+    partagés par toutes les sessions qui utilisent cet instantané.
+    """
+
+    def __init__(self, fichier: str, donnees: pd.DataFrame):
+        self.fichier = fichier
+        self.donnees = donnees
+        self._panneaux: Dict[Tuple[Optional[int], Optional[int]], pd.DataFrame] = {}
+        self._index: Dict[Tuple[Optional[int], Optional[int]], IndexMarche] = {}
+        self._verrou = threading.Lock()
+
+    def panneau(self, annee_min: Optional[int] = None, annee_max: Optional[int] = None) -> pd.DataFrame:
+        cle = (annee_min, annee_max)
+        with self._verrou:
+            if cle in self._panneaux:
+                return self._panneaux[cle]
+        df = self.donnees
+        if annee_min is not None:
+            df = df[df['Annee'] >= annee_min]
+        if annee_max is not None:
+            df = df[df['Annee'] <= annee_max]
+        with self._verrou:
+            return self._panneaux.setdefault(cle, df.reset_index(drop=True))
+
+    def index(self, annee_min: Optional[int] = None, annee_max: Optional[int] = None) -> IndexMarche:
+        cle = (annee_min, annee_max)
+        with self._verrou:
+            if cle in self._index:
+                return self._index[cle]
+        index = IndexMarche(self.panneau(annee_min, annee_max))
+        with self._verrou:
+            return self._index.setdefault(cle, index)
+
+
+def obtenir_etat_marche(fichier: str = FICHIER_MARCHE_DEFAUT) -> EtatMarche:
+    """
+    Instantané partagé du classeur de marché : lu une fois pour tout le processus et
+    rechargé (puis substitué d'un bloc) quand le fichier est modifié.
+    """
+    return ressource_fichier("marche", fichier, lambda chemin: EtatMarche(chemin, charger_donnees_boursieres(chemin)))
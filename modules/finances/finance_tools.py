@@ -44,6 +44,24 @@ def calculer_rendements_totaux1(df: pd.DataFrame) -> pd.DataFrame:
     
     return df.pivot(index='Annee', columns='Nom_Entreprise', values='Rendement_Total').reset_index()
 
+def calculer_rendements_cours(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calcule les rendements annuels du cours seul = (cours actuel - cours précédent) / cours précédent,
+    sur les mêmes couples (titre, année) que calculer_rendements_totaux.
+
+    Returns:
+        pd.DataFrame: Rendements du cours avec Année en index et Nom_Entreprise en colonnes.
+    """
+
+    df = df.copy()
+    df['Annee'] = df['Annee'].astype(int)
+    df.sort_values(['Nom_Entreprise', 'Annee'], inplace=True)
+    df['Cours_Precedent'] = df.groupby('Nom_Entreprise')['Prix_Cloture_Annuel'].shift(1)
+    df = df[df['Cours_Precedent'].notna() & (df['Cours_Precedent'] != 0)]
+    df['Rendement_Cours'] = (df['Prix_Cloture_Annuel'] - df['Cours_Precedent']) / df['Cours_Precedent']
+
+    return df.pivot(index='Annee', columns='Nom_Entreprise', values='Rendement_Cours')
+
 def calculer_rendements_dividendes(df: pd.DataFrame) -> pd.DataFrame:
     """
     Calcule les rendements dividendes annuels.
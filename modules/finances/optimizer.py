@@ -1,8 +1,22 @@
 import numpy as np
 import pandas as pd
-import cvxpy as cp
-from modules.finances.finance_tools import *
+from modules.finances.finance_tools import extraire_moyenne_dividendes
+from modules.finances.requete_marche import IndexMarche
+from utils.chargement_differe import ModuleDiffere
+from utils.instrumentation import compter, instrumenter, span
 
+# cvxpy n'est importé qu'à la première optimisation en mode cvxpy ou hybride
+cp = ModuleDiffere("cvxpy")
+
+
+class PortefeuilleInfaisable(ValueError):
+    """
+    Aucun portefeuille ne satisfait les contraintes demandées (titres trop peu nombreux
+    après filtrage, objectif de dividende inatteignable...).
+    """
+
+
+@instrumenter("optimiseur")
 def optimiser_portefeuille(
     df,
     rendement_dividende_min=0.02,
@@ -16,7 +30,10 @@ def optimiser_portefeuille(
     poids_max=0.25,
     poids_min=0.05,
     random_state=42,
-    afficher_logs=False
+    afficher_logs=False,
+    index_marche=None,
+    annee_min=None,
+    annee_max=None
 ):
     """
     Optimisation d'un portefeuille BRVM avec pondération dividende vs rendement total.
@@ -24,6 +41,9 @@ def optimiser_portefeuille(
     Paramètres :
     - pond_dividende = 1 : priorité au rendement dividende
     - pond_dividende = 0 : priorité au rendement total
+    - index_marche : IndexMarche de df déjà construit (par exemple EtatMarche.index),
+      sinon construit à chaque appel
+    - annee_min / annee_max : période retenue dans df (fenêtres de backtest)
     """
     # Vérification colonnes nécessaires
     required_cols = [
@@ -34,22 +54,20 @@ def optimiser_portefeuille(
         if col not in df.columns:
             raise ValueError(f"Colonne manquante : {col}")
 
-    df = df.copy()
-    df.dropna(subset=['Prix_Cloture_Annuel', 'Dividende_Verse'], inplace=True)
-
-    if filtrer_stables:
-        df = filtrer_payeurs_stables(df)
+    # Lignes complètes, payeurs stables et rendement dividende moyen minimal en une seule
+    # sélection ; seules les colonnes utiles sont matérialisées
+    with span("optimiseur.selection"):
+        if index_marche is None:
+            index_marche = IndexMarche(df)
+        df = index_marche.panneau_optimiseur(rendement_dividende_min, filtrer_stables=filtrer_stables,
+                                             annee_min=annee_min, annee_max=annee_max)
 
     # Calcul du rendement dividende moyen
     rendements_div = extraire_moyenne_dividendes(df)
-    
-    # Filtrage en amont selon rendement_dividende_min
-    entreprises_valides = rendements_div[rendements_div >= rendement_dividende_min].index.tolist()
-    df = df[df['Nom_Entreprise'].isin(entreprises_valides)]
 
     entreprises = df['Nom_Entreprise'].unique()
     if len(entreprises) < min_entreprises:
-        raise ValueError("Nombre d'entreprises valides insuffisant après filtrage.")
+        raise PortefeuilleInfaisable("Nombre d'entreprises valides insuffisant après filtrage.")
 
     # Recalcul après filtrage
     
@@ -57,7 +75,9 @@ def optimiser_portefeuille(
     rendements_totaux = rendements_div + rendements_cours
     cov_matrix = df.pivot(index='Annee', columns='Nom_Entreprise', values='Variation(annee_precedente)').cov().fillna(0).values
 
+    @instrumenter("optimiseur.montecarlo")
     def monte_carlo():
+        compter("optimiseur.portefeuilles_tires", n_simulations)
         np.random.seed(random_state)
         best_score = -np.inf
         best_w = None
@@ -82,7 +102,7 @@ def optimiser_portefeuille(
                 best_w = w
 
         if best_w is None:
-            raise ValueError("Aucune solution valide trouvée par Monte Carlo.")
+            raise PortefeuilleInfaisable("Aucune solution valide trouvée par Monte Carlo.")
 
         poids = best_w
         entreprises_sel = [entreprises[i] for i in range(n) if poids[i] > 1e-4]
@@ -104,6 +124,7 @@ def optimiser_portefeuille(
         }
         return portf_df, stats
 
+    @instrumenter("optimiseur.cvxpy")
     def cvxpy_optim(df_sub):
         entreprises_sub = df_sub['Nom_Entreprise'].unique()
         n_sub = len(entreprises_sub)
@@ -137,12 +158,13 @@ def optimiser_portefeuille(
 
         probleme = cp.Problem(objectif, contraintes)
         try:
-            probleme.solve(solver=cp.ECOS_BB)
+            with span("optimiseur.cvxpy.resolution", n_titres=n_sub):
+                probleme.solve(solver=cp.ECOS_BB)
         except Exception as e:
             raise ValueError(f"Erreur d'optimisation CVXPY : {e}")
 
         if probleme.status not in ["optimal", "optimal_inaccurate"]:
-            raise ValueError("Optimisation CVXPY échouée.")
+            raise PortefeuilleInfaisable("Optimisation CVXPY échouée.")
 
         poids_opt = w.value
         entreprises_sel = [entreprises_sub[i] for i in range(n_sub) if poids_opt[i] > 1e-4]
@@ -172,6 +194,7 @@ def optimiser_portefeuille(
         try:
             portefeuille, stats = cvxpy_optim(df)
         except ValueError:
+            compter("optimiseur.repli_montecarlo")
             if afficher_logs:
                 print("⚠️ CVXPY échoué, repli sur Monte Carlo.")
             portefeuille, stats = monte_carlo()
@@ -182,6 +205,7 @@ def optimiser_portefeuille(
         try:
             portefeuille, stats = cvxpy_optim(df_sub)
         except ValueError:
+            compter("optimiseur.repli_montecarlo")
             if afficher_logs:
                 print("⚠️ Hybride : CVXPY échoué, retour Monte Carlo.")
             portefeuille, stats = port_mc, stat_mc
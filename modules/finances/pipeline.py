@@ -0,0 +1,385 @@
+# pipeline.py
+import hashlib
+import pickle
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from modules.finances.data_loader import charger_donnees_boursieres
+from modules.finances.entrepot_marche import signature_entrepot
+from modules.finances.etat_marche import EtatMarche, obtenir_etat_marche
+from modules.finances.optimizer import optimiser_portefeuille
+from modules.finances.plan_investissement import preparer_flux_capital
+from modules.finances.simulator_brvm import (
+    agreger_rendements_portefeuille,
+    generer_rendements_titres,
+    preparer_limites_liquidite,
+    preparer_parametres_marche,
+    simuler_capital_agrege,
+    simuler_chaine_regimes,
+    simuler_positions
+)
+from utils.etat_partage import signature_fichier
+from utils.instrumentation import compter, span
+from utils.reduction_graphiques import eventail_quantiles, histogramme
+from utils.reduction_scenarios import N_SCENARIOS_REPRESENTATIFS, reduire_scenarios, tableau_representatifs
+
+
+class Etape:
+    """
+    Étape du pipeline : fonction(parametres, entrees) où parametres ne contient que les
+    paramètres déclarés et entrees les résultats des étapes dont elle dépend.
+    Une étape progressive reçoit en plus rappel(fraction, partiel=None) pour publier
+    son avancement lot par lot. version(parametres), si fournie, entre dans la clé de
+    l'étape : une étape qui lit un fichier est recalculée quand le fichier change.
+    """
+
+    def __init__(self, nom: str, fonction: Callable[..., Any],
+                 parametres: Sequence[str] = (), dependances: Sequence[str] = (),
+                 progressive: bool = False, version: Optional[Callable[[Dict], Any]] = None):
+        self.nom = nom
+        self.fonction = fonction
+        self.parametres = tuple(parametres)
+        self.dependances = tuple(dependances)
+        self.progressive = progressive
+        self.version = version
+
+
+def _empreinte(valeur: Any) -> str:
+    return hashlib.sha1(pickle.dumps(valeur, protocol=4)).hexdigest()
+
+
+class Pipeline:
+    """
+    Graphe d'étapes mémoïsées.
+
+    La clé d'une étape combine ses seuls paramètres déclarés et les clés de ses
+    dépendances (jamais leurs résultats, qui peuvent être volumineux) : modifier un
+    paramètre ne recalcule que les étapes qui l'utilisent et celles situées en aval.
+    Chaque étape garde ses taille_cache derniers résultats.
+    """
+
+    def __init__(self, etapes: List[Etape], taille_cache: int = 4):
+        self.etapes = {etape.nom: etape for etape in etapes}
+        for etape in etapes:
+            for dependance in etape.dependances:
+                if dependance not in self.etapes:
+                    raise ValueError(f"Étape inconnue '{dependance}' requise par '{etape.nom}'")
+        self.taille_cache = taille_cache
+        self._caches = {nom: OrderedDict() for nom in self.etapes}
+        self.etapes_recalculees: List[str] = []
+
+    def _ordre(self, cibles: Sequence[str]) -> List[str]:
+        ordre, visitees = [], set()
+
+        def visiter(nom, pile=()):
+            if nom in pile:
+                raise ValueError(f"Cycle dans le pipeline : {' -> '.join(pile + (nom,))}")
+            if nom in visitees:
+                return
+            for dependance in self.etapes[nom].dependances:
+                visiter(dependance, pile + (nom,))
+            visitees.add(nom)
+            ordre.append(nom)
+
+        for cible in cibles:
+            visiter(cible)
+        return ordre
+
+    def executer(self, parametres: Dict, cibles: Optional[Sequence[str]] = None,
+                 rappel: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+        """
+        Exécute les étapes nécessaires aux cibles (toutes par défaut).
+        rappel(fraction, message, partiel=None) est appelé avant chaque étape et pendant
+        les étapes progressives (voir utils.taches).
+
+        Returns:
+            Dict: résultat de chaque étape exécutée ou relue du cache.
+        """
+        cibles = list(cibles) if cibles is not None else list(self.etapes)
+        resultats, cles = {}, {}
+        self.etapes_recalculees = []
+        ordre = self._ordre(cibles)
+        for i, nom in enumerate(ordre):
+            if rappel is not None:
+                rappel(i / len(ordre), nom)
+            etape = self.etapes[nom]
+            manquants = [p for p in etape.parametres if p not in parametres]
+            if manquants:
+                raise ValueError(f"Paramètres manquants pour l'étape '{nom}' : {manquants}")
+            valeurs = {p: parametres[p] for p in etape.parametres}
+            version = etape.version(valeurs) if etape.version is not None else None
+            cle = _empreinte((nom, valeurs, [cles[d] for d in etape.dependances], version))
+            cache = self._caches[nom]
+            if cle in cache:
+                cache.move_to_end(cle)
+                compter("pipeline.etapes_en_cache")
+            else:
+                entrees = {d: resultats[d] for d in etape.dependances}
+                with span(f"pipeline.{nom}"):
+                    if etape.progressive:
+                        rappel_etape = None if rappel is None else (
+                            lambda f, partiel=None, i=i, nom=nom: rappel((i + f) / len(ordre), nom, partiel))
+                        cache[cle] = etape.fonction(valeurs, entrees, rappel=rappel_etape)
+                    else:
+                        cache[cle] = etape.fonction(valeurs, entrees)
+                self.etapes_recalculees.append(nom)
+                while len(cache) > self.taille_cache:
+                    cache.popitem(last=False)
+            resultats[nom], cles[nom] = cache[cle], cle
+        return resultats
+
+    def vider_cache(self):
+        for cache in self._caches.values():
+            cache.clear()
+
+
+def _charger(p, e):
+    # Instantané partagé par toutes les sessions du processus (modules.finances.etat_marche)
+    return obtenir_etat_marche(p["fichier"])
+
+
+def _charger_local(p, e):
+    # Copie propre au pipeline, sans partage entre sessions
+    return EtatMarche(p["fichier"], charger_donnees_boursieres(p["fichier"]))
+
+
+def _version_fichier(p):
+    return signature_fichier(p["fichier"])
+
+
+def _version_entrepot(p):
+    # Une réingestion dans l'entrepôt relance l'estimation des paramètres des titres
+    if p["dossier_entrepot"] is None:
+        return None
+    return signature_entrepot(p["dossier_entrepot"])
+
+
+def _panneau(p, e):
+    return e["donnees"].panneau(p["annee_min"], p["annee_max"])
+
+
+def _index(p, e):
+    return e["donnees"].index(p["annee_min"], p["annee_max"])
+
+
+def _optimiser(p, e):
+    return optimiser_portefeuille(df=e["panneau"], index_marche=e["index"], **p)
+
+
+def _generer_trajectoires(p, e, rappel=None):
+    portefeuille = e["optimisation"]["portefeuille"]
+    titres = portefeuille['entreprise'].to_list()
+    poids = portefeuille['poids'].to_numpy(dtype=float)
+    parametres_marche = preparer_parametres_marche(e["panneau"], titres, p["dossier_entrepot"], p["frequence_estimation"])
+    rng = np.random.default_rng(p["graine"])
+
+    # Génération par lots de trajectoires ; le partiel publié est l'éventail de la
+    # croissance de 1 FCFA investi sur les trajectoires déjà générées
+    lots = []
+    for debut in range(0, p["n_simulations"], TAILLE_LOT_TRAJECTOIRES):
+        n_lot = min(TAILLE_LOT_TRAJECTOIRES, p["n_simulations"] - debut)
+        regimes_lot = simuler_chaine_regimes(n_lot, p["duree_investissement"], rng)
+        lots.append((regimes_lot,) + generer_rendements_titres(parametres_marche, regimes_lot, rng))
+        if rappel is not None:
+            croissance = np.cumprod(1 + np.concatenate([l[1] for l in lots]) @ poids, axis=1)
+            rappel((debut + n_lot) / p["n_simulations"], partiel=eventail_quantiles(
+                croissance, index=[parametres_marche["derniere_annee"] + a + 1 for a in range(p["duree_investissement"])]))
+    regimes, rendements_titres, dividendes_titres = (np.concatenate(x) for x in zip(*lots))
+    rendement_total, rendement_dividende = agreger_rendements_portefeuille(rendements_titres, dividendes_titres, poids)
+    return {
+        "titres": titres,
+        "poids": poids,
+        "parametres_marche": parametres_marche,
+        "regimes": regimes,
+        "rendements_titres": rendements_titres,
+        "dividendes_titres": dividendes_titres,
+        "rendement_total": rendement_total,
+        "rendement_dividende": rendement_dividende,
+    }
+
+
+def _appliquer_flux(p, e):
+    trajectoires = e["trajectoires"]
+    duree = trajectoires["regimes"].shape[1]
+    plan_capital = preparer_flux_capital(p["mode_financement"], p["params_financement"], duree)
+    injections = np.array([plan_capital["injections_future"].get(a, 0) for a in range(duree)])
+    if p["politique_reequilibrage"] is None:
+        capital, dividendes = simuler_capital_agrege(
+            trajectoires["rendement_total"], trajectoires["rendement_dividende"],
+            plan_capital["capital_initial"], injections, frais_achat=p["frais_achat"],
+            fiscalite_dividendes=p["fiscalite_dividendes"], reinvestir_dividendes=p["reinvestir_dividendes"]
+        )
+        return {"capital": capital, "dividendes": dividendes}
+    prix_initiaux, actions_echangeables = preparer_limites_liquidite(
+        e["panneau"], trajectoires["titres"], p["part_echangeable"])
+    positions = simuler_positions(
+        trajectoires["rendements_titres"], trajectoires["dividendes_titres"], trajectoires["poids"],
+        plan_capital["capital_initial"], injections, politique=p["politique_reequilibrage"],
+        seuil_bande=p["seuil_bande"], frais_achat=p["frais_achat"],
+        fiscalite_dividendes=p["fiscalite_dividendes"], reinvestir_dividendes=p["reinvestir_dividendes"],
+        prix_initiaux=prix_initiaux, actions_echangeables=actions_echangeables
+    )
+    return {"capital": positions["valeur"], "dividendes": positions["dividendes"],
+            "frais": positions["frais"], "rotation": positions["rotation"]}
+
+
+def _agreger(p, e):
+    flux = e["flux"]
+    derniere_annee = e["trajectoires"]["parametres_marche"]["derniere_annee"]
+    annees = [derniere_annee + i + 1 for i in range(flux["capital"].shape[1])]
+    df_capital = pd.DataFrame(flux["capital"], columns=annees)
+    df_dividendes = pd.DataFrame(flux["dividendes"], columns=annees)
+    resume = {
+        "capital_final": np.median(df_capital.iloc[:, -1]),
+        "dividendes_cumules_final": np.median(df_dividendes.sum(axis=1)),
+        "reinvestissement": p["reinvestir_dividendes"],
+    }
+    if "frais" in flux:
+        resume["frais_cumules"] = np.median(flux["frais"].sum(axis=1))
+        resume["rotation_moyenne"] = float(flux["rotation"].mean())
+    return {
+        "valeurs_portefeuille": pd.DataFrame([df_capital.median()]),
+        "dividendes_cumulees": pd.DataFrame([df_dividendes.median()]),
+        "resume": resume,
+        "entreprises": e["optimisation"]["portefeuille"][['entreprise', 'poids']],
+        # Données de graphiques de taille fixe quel que soit le nombre de trajectoires
+        "eventail_capital": eventail_quantiles(df_capital),
+        "eventail_dividendes": eventail_quantiles(df_dividendes.cumsum(axis=1)),
+        "distribution_capital_final": histogramme(df_capital.iloc[:, -1]),
+    }
+
+
+def _reduire_scenarios(p, e):
+    # Trajectoires de capital réduites à quelques scénarios pondérés (exports, rapports,
+    # analyses de stress) ; dividendes et régimes des mêmes scénarios
+    flux = e["flux"]
+    derniere_annee = e["trajectoires"]["parametres_marche"]["derniere_annee"]
+    annees = [derniere_annee + i + 1 for i in range(flux["capital"].shape[1])]
+    reduction = reduire_scenarios(flux["capital"], p["n_scenarios_representatifs"], p["methode_reduction"])
+    return {
+        "reduction": reduction,
+        "capital": tableau_representatifs(pd.DataFrame(flux["capital"], columns=annees), reduction),
+        "dividendes_cumules": tableau_representatifs(
+            pd.DataFrame(flux["dividendes"], columns=annees).cumsum(axis=1), reduction),
+        "regimes": tableau_representatifs(pd.DataFrame(e["trajectoires"]["regimes"], columns=annees), reduction),
+    }
+
+
+def _tables_export(p, e):
+    # Tables à exporter ; le fichier n'est construit qu'à la demande (utils.bouton_export)
+    agregation = e["agregation"]
+    scenarios = e["scenarios"]
+    return {
+        "Portefeuille Optimal": e["optimisation"]["portefeuille"],
+        "Valeurs du Portefeuille": agregation["valeurs_portefeuille"],
+        "Revenus de Dividendes": agregation["dividendes_cumulees"],
+        "Résumé": pd.DataFrame(agregation["resume"].items(), columns=["Clé", "Valeur"]),
+        "Scénarios représentatifs": scenarios["capital"],
+        "Dividendes représentatifs": scenarios["dividendes_cumules"],
+        "Régimes représentatifs": scenarios["regimes"],
+    }
+
+
+TYPE_HISTORIQUE = "bourse"
+
+
+def libelle_simulation(parametres: Dict) -> str:
+    # Libellé court d'une simulation dans l'historique et la page de comparaison
+    libelle = (f"{parametres['mode']} · {parametres['mode_financement']} · {parametres['duree_investissement']} ans"
+               f" · aversion {parametres['aversion_risque']:g} · frais {parametres['frais_achat']:.1%}")
+    if parametres.get("politique_reequilibrage"):
+        libelle += f" · rééquilibrage {parametres['politique_reequilibrage']}"
+    return libelle
+
+
+def sorties_historisables(sorties: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Partie des sorties du pipeline conservée dans l'historique des simulations : portefeuille,
+    agrégats de taille fixe, scénarios représentatifs et tables d'export, mais ni les
+    trajectoires ni les flux.
+    Même structure que les sorties : la page les affiche indifféremment.
+    """
+    return {
+        "optimisation": {"portefeuille": sorties["optimisation"]["portefeuille"]},
+        "agregation": sorties["agregation"],
+        "scenarios": sorties["scenarios"],
+        "export": sorties["export"],
+    }
+
+
+def metriques_simulation(sorties: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Indicateurs comparables d'une simulation à l'autre : résumé médian et bornes P5 / P95
+    du capital final.
+    """
+    agregation = sorties["agregation"]
+    capital_final = agregation["eventail_capital"].iloc[-1]
+    metriques = {cle: float(valeur) for cle, valeur in agregation["resume"].items() if not isinstance(valeur, bool)}
+    metriques.update(capital_final_p5=float(capital_final["P5"]), capital_final_p95=float(capital_final["P95"]),
+                     n_titres=len(sorties["optimisation"]["portefeuille"]))
+    return metriques
+
+
+TAILLE_LOT_TRAJECTOIRES = 250
+
+PARAMETRES_OPTIMISATION = ("rendement_dividende_min", "aversion_risque", "taux_sans_risque",
+                           "filtrer_stables", "min_entreprises", "pond_dividende", "mode")
+PARAMETRES_FLUX = ("mode_financement", "params_financement", "reinvestir_dividendes", "frais_achat",
+                   "fiscalite_dividendes", "politique_reequilibrage", "seuil_bande", "part_echangeable")
+
+PARAMETRES_BOURSIERS_DEFAUT = {
+    "fichier": "data/donnees_brvm.xlsx",
+    "annee_min": None,
+    "annee_max": None,
+    "graine": 1234,
+    "n_simulations": 1000,
+    "politique_reequilibrage": None,
+    "seuil_bande": 0.05,
+    "part_echangeable": 1.0,
+    "n_scenarios_representatifs": N_SCENARIOS_REPRESENTATIFS,
+    "methode_reduction": "kmedoides",
+    "dossier_entrepot": None,
+    "frequence_estimation": "mensuelle",
+}
+
+
+def creer_pipeline_boursier(taille_cache: int = 4, client_calcul=None, etat_partage: bool = True) -> Pipeline:
+    """
+    Pipeline de la simulation boursière :
+    donnees -> panneau, index -> optimisation -> trajectoires -> flux -> agregation, scenarios -> export.
+    L'index du panneau (IndexMarche) est celui de l'instantané de marché, construit une fois
+    par période.
+    Les frais et la fiscalité n'interviennent qu'à partir de l'étape flux : les modifier
+    ne relance ni le chargement, ni l'optimisation, ni la génération des trajectoires.
+    Avec dossier_entrepot, les paramètres des titres sont estimés sur les cours journaliers
+    de l'entrepôt (à frequence_estimation) ; une réingestion relance les trajectoires.
+    Avec un client_calcul (service.client_calcul), l'optimisation est confiée au service
+    de calcul partagé. Avec etat_partage, les données de marché sont l'instantané commun à
+    toutes les sessions, rechargé quand le classeur change ; sinon le pipeline lit sa
+    propre copie.
+    """
+    if client_calcul is None:
+        optimisation = Etape("optimisation", _optimiser, PARAMETRES_OPTIMISATION, ("panneau", "index"))
+    else:
+        optimisation = Etape(
+            "optimisation",
+            lambda p, e: client_calcul.soumettre("optimiser_portefeuille", **p),
+            PARAMETRES_OPTIMISATION + ("fichier", "annee_min", "annee_max"), ("panneau",)
+        )
+    return Pipeline([
+        Etape("donnees", _charger if etat_partage else _charger_local, ("fichier",), version=_version_fichier),
+        Etape("panneau", _panneau, ("annee_min", "annee_max"), ("donnees",)),
+        Etape("index", _index, ("annee_min", "annee_max"), ("donnees",)),
+        optimisation,
+        Etape("trajectoires", _generer_trajectoires,
+              ("duree_investissement", "n_simulations", "graine", "dossier_entrepot", "frequence_estimation"),
+              ("panneau", "optimisation"), progressive=True, version=_version_entrepot),
+        Etape("flux", _appliquer_flux, PARAMETRES_FLUX, ("trajectoires", "panneau")),
+        Etape("agregation", _agreger, ("reinvestir_dividendes",), ("flux", "trajectoires", "optimisation")),
+        Etape("scenarios", _reduire_scenarios, ("n_scenarios_representatifs", "methode_reduction"),
+              ("flux", "trajectoires")),
+        Etape("export", _tables_export, (), ("agregation", "optimisation", "scenarios")),
+    ], taille_cache=taille_cache)
@@ -0,0 +1,162 @@
+# requete_marche.py
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from typing import List, Optional, Sequence
+
+from modules.finances.entrepot_marche import DOSSIER_ENTREPOT
+
+# Colonnes lues par optimiser_portefeuille
+COLONNES_OPTIMISEUR = ["Nom_Entreprise", "Annee", "Prix_Cloture_Annuel", "Dividende_Verse",
+                       "Variation(annee_precedente)", "Rendement_Dividende"]
+
+# Colonnes d'index précalculées, enregistrées avec le panneau annuel
+INDICATEUR_STABLE = "Payeur_Stable_Indicateur"
+INDICATEUR_VALIDE = "Ligne_Valide"
+COLONNES_INDEX = ["Nom_Entreprise", "Secteur", "Annee", "Rendement_Dividende", INDICATEUR_STABLE, INDICATEUR_VALIDE]
+
+
+def _indicateur_stable(serie: pd.Series) -> np.ndarray:
+    return serie.astype(str).str.lower().isin(['true', 'oui']).to_numpy()
+
+
+def _indicateur_valide(df: pd.DataFrame) -> np.ndarray:
+    return (df['Prix_Cloture_Annuel'].notna() & df['Dividende_Verse'].notna()).to_numpy()
+
+
+def enregistrer_panneau_annuel(df: pd.DataFrame, dossier_entrepot: str = DOSSIER_ENTREPOT) -> str:
+    """
+    Enregistre le panneau annuel (format charger_donnees_boursieres) en Parquet avec ses
+    indicateurs précalculés (payeur stable, ligne complète), pour que les requêtes filtrent
+    à la lecture sans retraiter les chaînes de caractères.
+    """
+    df = df.copy()
+    df[INDICATEUR_STABLE] = _indicateur_stable(df['Payeur_Stable'])
+    df[INDICATEUR_VALIDE] = _indicateur_valide(df)
+    chemin = os.path.join(dossier_entrepot, "annuel", "panneau.parquet")
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), chemin)
+    return chemin
+
+
+class IndexMarche:
+    """
+    Index booléens du panneau annuel et requêtes par prédicats.
+
+    Les prédicats par ligne (payeur stable, ligne complète, années, secteurs) sont des
+    masques calculés une seule fois ; les prédicats par entreprise (rendement dividende
+    moyen, historique complet) se résolvent par agrégats numpy sur ces masques. Seules
+    les lignes et colonnes retenues sont ensuite matérialisées, depuis le DataFrame
+    source ou depuis le fichier Parquet (filtre appliqué à la lecture).
+    """
+
+    def __init__(self, df: pd.DataFrame, chemin_parquet: Optional[str] = None):
+        self._df = df.reset_index(drop=True) if chemin_parquet is None else None
+        self.chemin_parquet = chemin_parquet
+        self.codes, self.entreprises = pd.factorize(df['Nom_Entreprise'])
+        self.codes_secteur, self.secteurs = pd.factorize(df['Secteur']) if 'Secteur' in df.columns \
+            else (np.zeros(len(df), dtype=int), pd.Index([None]))
+        self.annee = df['Annee'].to_numpy(dtype=int)
+        self.rendement_dividende = df['Rendement_Dividende'].to_numpy(dtype=float)
+        # Indicateur payeur stable calculé seulement si une requête le demande
+        self._colonne_stable = df[INDICATEUR_STABLE] if INDICATEUR_STABLE in df.columns else df.get('Payeur_Stable')
+        self._stable = None
+        self.valide = df[INDICATEUR_VALIDE].to_numpy(dtype=bool) if INDICATEUR_VALIDE in df.columns \
+            else _indicateur_valide(df)
+
+    @property
+    def stable(self) -> np.ndarray:
+        if self._stable is None:
+            if self._colonne_stable is None:
+                raise ValueError("Colonne manquante : Payeur_Stable")
+            if self._colonne_stable.name == INDICATEUR_STABLE:
+                self._stable = self._colonne_stable.to_numpy(dtype=bool)
+            else:
+                self._stable = _indicateur_stable(self._colonne_stable)
+            self._colonne_stable = None
+        return self._stable
+
+    @classmethod
+    def depuis_entrepot(cls, dossier_entrepot: str = DOSSIER_ENTREPOT) -> "IndexMarche":
+        """
+        Construit l'index en ne lisant que les colonnes d'index du panneau enregistré.
+        """
+        chemin = os.path.join(dossier_entrepot, "annuel", "panneau.parquet")
+        if not os.path.exists(chemin):
+            raise FileNotFoundError(f"Panneau annuel introuvable : {chemin}")
+        return cls(pq.read_table(chemin, columns=COLONNES_INDEX).to_pandas(), chemin_parquet=chemin)
+
+    def selectionner(
+        self,
+        payeurs_stables: bool = False,
+        secteurs: Optional[Sequence[str]] = None,
+        annee_min: Optional[int] = None,
+        annee_max: Optional[int] = None,
+        rendement_dividende_min: Optional[float] = None,
+        historique_complet: bool = False,
+        lignes_completes: bool = True
+    ) -> np.ndarray:
+        """
+        Masque des lignes qui satisfont tous les prédicats. Le rendement dividende moyen et
+        l'historique complet sont évalués sur les lignes retenues par les prédicats de ligne,
+        comme dans optimiser_portefeuille et filtrer_entreprises_valides.
+        """
+        masque = self.valide.copy() if lignes_completes else np.ones(len(self.annee), dtype=bool)
+        if payeurs_stables:
+            masque &= self.stable
+        if secteurs is not None:
+            masque &= np.isin(self.codes_secteur, self.secteurs.get_indexer(list(secteurs)))
+        if annee_min is not None:
+            masque &= self.annee >= annee_min
+        if annee_max is not None:
+            masque &= self.annee <= annee_max
+
+        n_entreprises = len(self.entreprises)
+        if rendement_dividende_min is not None:
+            connu = masque & np.isfinite(self.rendement_dividende)
+            somme = np.bincount(self.codes[connu], weights=self.rendement_dividende[connu], minlength=n_entreprises)
+            nombre = np.bincount(self.codes[connu], minlength=n_entreprises)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                retenue = somme / nombre >= rendement_dividende_min
+            masque &= retenue[self.codes]
+        if historique_complet and masque.any():
+            n_annees = len(np.unique(self.annee[masque]))
+            paires = np.unique(np.stack([self.codes[masque], self.annee[masque]]), axis=1)
+            retenue = np.bincount(paires[0], minlength=n_entreprises) == n_annees
+            masque &= retenue[self.codes]
+        return masque
+
+    def requete(self, colonnes: Optional[List[str]] = None, **predicats) -> pd.DataFrame:
+        """
+        Lignes et colonnes du panneau qui satisfont les prédicats (voir selectionner).
+        """
+        masque = self.selectionner(**predicats)
+        if self._df is not None:
+            if colonnes is None:
+                return self._df.loc[masque].reset_index(drop=True)
+            return self._df.loc[masque, colonnes].reset_index(drop=True)
+
+        # Lecture Parquet : entreprises retenues, années et indicateurs poussés dans le filtre
+        entreprises = list(self.entreprises[np.unique(self.codes[masque])])
+        filtre = ds.field("Nom_Entreprise").isin(entreprises)
+        if predicats.get("lignes_completes", True):
+            filtre &= ds.field(INDICATEUR_VALIDE)
+        if predicats.get("payeurs_stables"):
+            filtre &= ds.field(INDICATEUR_STABLE)
+        if predicats.get("annee_min") is not None:
+            filtre &= ds.field("Annee") >= predicats["annee_min"]
+        if predicats.get("annee_max") is not None:
+            filtre &= ds.field("Annee") <= predicats["annee_max"]
+        return ds.dataset(self.chemin_parquet, format="parquet").to_table(
+            columns=colonnes, filter=filtre).to_pandas()
+
+    def panneau_optimiseur(self, rendement_dividende_min: float, filtrer_stables: bool = True,
+                           colonnes: Sequence[str] = COLONNES_OPTIMISEUR, **predicats) -> pd.DataFrame:
+        """
+        Panneau restreint aux lignes et colonnes dont optimiser_portefeuille a besoin.
+        """
+        return self.requete(list(colonnes), payeurs_stables=filtrer_stables,
+                            rendement_dividende_min=rendement_dividende_min, **predicats)
@@ -0,0 +1,172 @@
+# simulateur_patrimoine.py
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Sequence
+
+from modules.agriculture.simulateur_lot import (
+    PARAMETRES_RENDEMENTS_PRIX,
+    TiragesAgricoles,
+    calculer_flux_lot,
+    calculer_rendements_prix_lot,
+    surfaces_par_defaut
+)
+from modules.finances.plan_investissement import preparer_flux_capital
+from modules.finances.simulator_brvm import (
+    REGIMES,
+    agreger_rendements_portefeuille,
+    generer_rendements_titres,
+    preparer_parametres_marche,
+    simuler_chaine_regimes
+)
+
+# Multiplicateur des prix agricoles par régime macro (favorable, défavorable, crise)
+FACTEURS_PRIX_AGRICOLES_REGIME = (1.0, 0.95, 0.8)
+QUANTILES_PATRIMOINE = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def simuler_patrimoine(
+    df: pd.DataFrame,
+    portefeuille: pd.DataFrame,
+    cultures: List[str],
+    cultures_db: Dict,
+    surface_totale: float,
+    part_serre: float,
+    duree: int,
+    parametres_agricoles: Dict,
+    mode_financement: str = "Apport unique",
+    params_financement: Optional[Dict] = None,
+    n_trajectoires: int = 1000,
+    part_benefices_investie: float = 1.0,
+    couvrir_pertes_par_portefeuille: bool = True,
+    facteurs_prix_regime: Sequence[float] = FACTEURS_PRIX_AGRICOLES_REGIME,
+    reinvestir_dividendes: bool = True,
+    frais_achat: float = 0.012,
+    fiscalite_dividendes: float = 0.15,
+    graine: Optional[int] = 1234
+) -> Dict:
+    """
+    Simulation conjointe exploitation + portefeuille BRVM sur des trajectoires partagées.
+
+    Une même chaîne de régimes macro (favorable / défavorable / crise) pilote les rendements
+    des titres et les prix agricoles (multipliés par facteurs_prix_regime). Le bénéfice net
+    de l'année a de l'exploitation, amortissement de la serre réintégré (la serre est payée en t0
+    sur la trésorerie), est disponible en fin d'année : la part_benefices_investie
+    d'un bénéfice positif est investie en début d'année a + 1 (frais d'achat déduits), le reste
+    s'accumule en trésorerie. Une perte est retirée du portefeuille si
+    couvrir_pertes_par_portefeuille, sinon elle est imputée sur la trésorerie.
+
+    Args:
+        portefeuille (pd.DataFrame): Colonnes 'entreprise' et 'poids' (sortie de optimiser_portefeuille).
+        parametres_agricoles (Dict): Paramètres de calculer_rendements_prix_lot et calculer_flux_lot
+            (voir PARAMETRES_AGRICOLES_DEFAUT), plus aleas_climatiques.
+
+    Returns:
+        Dict: capital_portefeuille, tresorerie_agricole, patrimoine, benefice_agricole et regimes
+        (n_trajectoires x duree), investissement_serre, distribution_finale (DataFrame par trajectoire),
+        bandes (quantiles du patrimoine par année), resume.
+    """
+    params_financement = params_financement or {}
+    rng = np.random.default_rng(graine)
+
+    regimes = simuler_chaine_regimes(n_trajectoires, duree, rng)
+
+    # Marché : rendements de tous les titres pour toutes les trajectoires
+    titres = portefeuille['entreprise'].to_list()
+    poids = portefeuille['poids'].to_numpy(dtype=float)
+    parametres_marche = preparer_parametres_marche(df, titres)
+    rendements_titres, dividendes_titres = generer_rendements_titres(parametres_marche, regimes, rng)
+    rendement_total, rendement_dividende = agreger_rendements_portefeuille(
+        rendements_titres, dividendes_titres, poids
+    )
+
+    # Exploitation : mêmes trajectoires, prix dégradés selon le régime
+    parametres = dict(parametres_agricoles)
+    aleas_climatiques = parametres.pop("aleas_climatiques", {})
+    duree_annee = parametres.pop("duree_annee", 12)
+    tirages = TiragesAgricoles(cultures, cultures_db, n_trajectoires, duree, aleas_climatiques,
+                               graine=int(rng.integers(2 ** 31)), duree_annee=duree_annee)
+    parametres_rp = {k: v for k, v in parametres.items() if k in PARAMETRES_RENDEMENTS_PRIX}
+    parametres_flux = {k: v for k, v in parametres.items() if k not in PARAMETRES_RENDEMENTS_PRIX}
+    rendements, prix = calculer_rendements_prix_lot(tirages, **parametres_rp)
+    prix = prix * np.asarray(facteurs_prix_regime, dtype=float)[regimes][:, :, None, None, None]
+    surfaces = surfaces_par_defaut(tirages, surface_totale, part_serre)
+    flux_agricoles = calculer_flux_lot(tirages, rendements, prix, surfaces,
+                                       surface_totale=surface_totale, **parametres_flux)
+    benefice_agricole = flux_agricoles["benefice_annuel"]
+    # Trésorerie dégagée : l'amortissement de la serre n'est pas décaissé, la serre étant
+    # payée en t0 sur la trésorerie agricole
+    tresorerie_degagee = benefice_agricole + flux_agricoles["amortissement_annuel"]
+    montant_emprunt = parametres_flux.get("montant_emprunt", 0.0) \
+        if parametres_flux.get("mode_financement") == "emprunt" else 0.0
+
+    # Ventilation des bénéfices entre portefeuille et trésorerie
+    versements = np.zeros((n_trajectoires, duree))
+    retraits = np.zeros((n_trajectoires, duree))
+    mouvements_tresorerie = np.where(tresorerie_degagee > 0,
+                                     (1 - part_benefices_investie) * tresorerie_degagee,
+                                     0.0 if couvrir_pertes_par_portefeuille else tresorerie_degagee)
+    versements[:, 1:] = np.maximum(tresorerie_degagee[:, :-1], 0.0) * part_benefices_investie
+    if couvrir_pertes_par_portefeuille:
+        retraits[:, 1:] = np.maximum(-tresorerie_degagee[:, :-1], 0.0)
+    # Le résultat de la dernière année reste en trésorerie (ou s'impute sur le portefeuille final)
+    mouvements_tresorerie[:, -1] = np.where(tresorerie_degagee[:, -1] > 0, tresorerie_degagee[:, -1],
+                                            mouvements_tresorerie[:, -1])
+    tresorerie_agricole = (montant_emprunt - flux_agricoles["investissement_serre"]) \
+        + np.cumsum(mouvements_tresorerie, axis=1)
+
+    # Portefeuille : apports du plan de financement + versements de l'exploitation
+    plan_capital = preparer_flux_capital(mode_financement, params_financement, duree)
+    injections = np.array([plan_capital["injections_future"].get(a, 0.0) for a in range(duree)])
+    capital = np.full(n_trajectoires, float(plan_capital["capital_initial"]))
+    capital_portefeuille = np.empty((n_trajectoires, duree))
+    dividendes_nets = np.empty((n_trajectoires, duree))
+    for annee in range(duree):
+        capital = capital + (injections[annee] + versements[:, annee]) * (1 - frais_achat) - retraits[:, annee]
+        dividendes_nets[:, annee] = capital * rendement_dividende[:, annee] * (1 - fiscalite_dividendes)
+        if reinvestir_dividendes:
+            capital = capital * (1 + rendement_total[:, annee])
+        else:
+            capital = capital * (1 + rendement_total[:, annee] - rendement_dividende[:, annee])
+        capital_portefeuille[:, annee] = capital
+    if couvrir_pertes_par_portefeuille:
+        capital_portefeuille[:, -1] -= np.maximum(-tresorerie_degagee[:, -1], 0.0)
+
+    patrimoine = capital_portefeuille + tresorerie_agricole
+    if not reinvestir_dividendes:
+        patrimoine = patrimoine + np.cumsum(dividendes_nets, axis=1)
+
+    annees = [parametres_marche["derniere_annee"] + a + 1 for a in range(duree)]
+    bandes = pd.DataFrame(np.quantile(patrimoine, QUANTILES_PATRIMOINE, axis=0).T,
+                          columns=[f"P{int(q * 100)}" for q in QUANTILES_PATRIMOINE],
+                          index=pd.Index(annees, name="Annee"))
+
+    distribution_finale = pd.DataFrame({
+        "Trajectoire": np.arange(1, n_trajectoires + 1),
+        "Benefice_agricole_cumule": benefice_agricole.sum(axis=1),
+        "Capital_portefeuille": capital_portefeuille[:, -1],
+        "Tresorerie_agricole": tresorerie_agricole[:, -1],
+        "Patrimoine": patrimoine[:, -1],
+        "Annees_crise": (regimes == REGIMES.index('crise')).sum(axis=1),
+    })
+
+    resume = {
+        "patrimoine_median": float(np.median(patrimoine[:, -1])),
+        "patrimoine_p5": float(np.quantile(patrimoine[:, -1], 0.05)),
+        "proba_patrimoine_negatif": float(np.mean(patrimoine[:, -1] < 0)),
+        "correlation_agricole_portefeuille": float(np.corrcoef(
+            benefice_agricole.sum(axis=1), capital_portefeuille[:, -1])[0, 1]),
+        "dividendes_cumules_median": float(np.median(dividendes_nets.sum(axis=1))),
+    }
+
+    return {
+        "regimes": regimes,
+        "benefice_agricole": benefice_agricole,
+        "capital_portefeuille": capital_portefeuille,
+        "tresorerie_agricole": tresorerie_agricole,
+        "investissement_serre": flux_agricoles["investissement_serre"],
+        "patrimoine": patrimoine,
+        "dividendes": dividendes_nets,
+        "distribution_finale": distribution_finale,
+        "bandes": bandes,
+        "resume": resume,
+    }
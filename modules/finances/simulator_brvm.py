@@ -1,11 +1,306 @@
 import pandas as pd
 import numpy as np
-from typing import Dict
+from typing import Dict, Optional
+from modules.finances.entrepot_marche import EntrepotMarche
 from modules.finances.finance_tools import calculer_rendements_dividendes1, calculer_rendements_totaux1
 from modules.finances.optimizer import optimiser_portefeuille
 from modules.finances.plan_investissement import preparer_flux_capital
-from scipy.stats import t
+from utils.chargement_differe import ModuleDiffere
+from utils.instrumentation import compter, instrumenter
 
+stats = ModuleDiffere("scipy.stats")
+
+PROBA_CRISE = 0.05
+FACTEUR_BAISSE_DIV_CRISE = 0.6
+FACTEUR_BAISSE_PV_CRISE = 0.4
+SEUIL_DOWNSIDE = 0.0
+FACTEUR_DOWNSIDE = 0.7
+DEGRES_LIBERTE_T = 5  # pour loi t multivariée
+
+# Matrice transition Markov 3 états : F, D, C
+REGIMES = ['favorable', 'defavorable', 'crise']
+MATRICE_TRANSITION = {
+    'favorable': [0.75, 0.20, 0.05],
+    'defavorable': [0.25, 0.55, 0.20],
+    'crise': [0.10, 0.20, 0.70],
+}
+# Ajustements de mu, cov et mu_div par régime
+FACTEURS_MU_REGIME = np.array([1.0, 0.8, 0.5])
+FACTEURS_COV_REGIME = np.array([1.0, 1.5, 3.0])
+FACTEURS_DIV_REGIME = np.array([1.0, 0.7, 0.4])
+
+POLITIQUES_REEQUILIBRAGE = ("jamais", "annuel", "bandes")
+
+
+@instrumenter("simulation.chaine_regimes")
+def simuler_chaine_regimes(n_trajectoires: int, n_annees: int, rng: np.random.Generator,
+                           regime_initial: str = 'favorable') -> np.ndarray:
+    """
+    Trajectoires de la chaîne de Markov des régimes (indices dans REGIMES), tirées en bloc.
+
+    Returns:
+        np.ndarray: Régimes de forme (n_trajectoires, n_annees).
+    """
+    cumul = np.cumsum([MATRICE_TRANSITION[r] for r in REGIMES], axis=1)
+    regimes = np.empty((n_trajectoires, n_annees), dtype=np.int64)
+    etat = np.full(n_trajectoires, REGIMES.index(regime_initial))
+    u = rng.random((n_trajectoires, n_annees))
+    for annee in range(n_annees):
+        etat = np.minimum((u[:, annee, None] > cumul[etat]).sum(axis=1), len(REGIMES) - 1)
+        regimes[:, annee] = etat
+    return regimes
+
+
+@instrumenter("simulation.parametres_marche")
+def preparer_parametres_marche(df: pd.DataFrame, titres: list, dossier_entrepot: Optional[str] = None,
+                               frequence_estimation: str = "mensuelle") -> Dict:
+    """
+    Paramètres de simulation des titres : rendements moyens, covariance, rendements
+    dividendes moyens et secteur de chaque titre.
+
+    Avec dossier_entrepot, mu, cov et mu_div sont estimés sur les cours journaliers de
+    l'entrepôt rééchantillonnés à frequence_estimation puis annualisés
+    (EntrepotMarche.statistiques) ; les titres absents de l'entrepôt gardent l'estimation
+    sur le panneau annuel, sans covariance avec les titres de l'entrepôt.
+    """
+    rendements_hist = calculer_rendements_totaux1(df)[["Annee"] + titres]
+    derniere_annee = int(rendements_hist['Annee'].max())
+    rendements_hist = rendements_hist.drop(columns=['Annee'])
+    rendements_div = calculer_rendements_dividendes1(df)[titres]
+    mu, cov, mu_div = rendements_hist.mean(), rendements_hist.cov(), rendements_div.mean()
+    if dossier_entrepot is not None:
+        estimations = EntrepotMarche(dossier_entrepot).statistiques(frequence_estimation, titres)
+        couverts = [t for t in titres if estimations["n_observations"].get(t.upper(), 0) > 1]
+        noms = [t.upper() for t in couverts]
+        mu = mu.copy()
+        mu_div = mu_div.copy()
+        mu[couverts] = estimations["mu"][noms].values
+        mu_div[couverts] = estimations["mu_div"][noms].fillna(0.0).values
+        # Covariance par blocs (entrepôt / panneau annuel), sans covariance croisée,
+        # pour rester semi-définie positive
+        hors_entrepot = [t for t in titres if t not in couverts]
+        cov = pd.DataFrame(0.0, index=titres, columns=titres)
+        cov.loc[couverts, couverts] = estimations["cov"].loc[noms, noms].values
+        cov.loc[hors_entrepot, hors_entrepot] = rendements_hist[hors_entrepot].cov().values
+    secteurs = list(df['Secteur'].unique())
+    secteur_of = {t: df[df['Nom_Entreprise'] == t]['Secteur'].iloc[0] for t in titres}
+    return {
+        "titres": titres,
+        "mu": mu.values,
+        "cov": cov.values,
+        "mu_div": mu_div.values,
+        "secteurs": secteurs,
+        "indice_secteur": np.array([secteurs.index(secteur_of[t]) for t in titres]),
+        "derniere_annee": derniere_annee,
+    }
+
+
+@instrumenter("simulation.rendements_titres")
+def generer_rendements_titres(parametres_marche: Dict, regimes: np.ndarray,
+                              rng: np.random.Generator):
+    """
+    Rendements totaux et dividendes de chaque titre pour toutes les trajectoires en une passe :
+    paramètres par régime, chocs sectoriels persistants (doublés en crise), loi t multivariée
+    et baisses en crise.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: rendements totaux et rendements dividendes
+        de forme (n_trajectoires, n_annees, n_titres).
+    """
+    mu = parametres_marche["mu"]
+    cov = parametres_marche["cov"]
+    mu_div = parametres_marche["mu_div"]
+    indice_secteur = parametres_marche["indice_secteur"]
+    n_trajectoires, n_annees = regimes.shape
+    n_titres = len(mu)
+    crise = regimes == REGIMES.index('crise')
+
+    # Chocs sectoriels AR(1) propres à chaque trajectoire
+    bruit = rng.normal(0, 0.03, (n_trajectoires, n_annees, len(parametres_marche["secteurs"])))
+    chocs = np.empty_like(bruit)
+    choc = np.zeros((n_trajectoires, bruit.shape[2]))
+    for annee in range(n_annees):
+        choc = 0.7 * choc + bruit[:, annee]
+        choc = np.where(crise[:, annee, None], 2 * choc, choc)
+        chocs[:, annee] = choc
+
+    z = stats.t.rvs(df=DEGRES_LIBERTE_T, size=(n_trajectoires, n_annees, n_titres), random_state=rng)
+    rendements = np.empty((n_trajectoires, n_annees, n_titres))
+    for r in range(len(REGIMES)):
+        cov_r = cov * FACTEURS_COV_REGIME[r]
+        try:
+            L = np.linalg.cholesky(cov_r)
+        except np.linalg.LinAlgError:
+            L = np.linalg.cholesky(cov_r + np.eye(n_titres) * 1e-6)
+        masque = regimes == r
+        rendements[masque] = mu * FACTEURS_MU_REGIME[r] + z[masque] @ L.T
+    rendements += chocs[:, :, indice_secteur]
+
+    dividendes = mu_div * FACTEURS_DIV_REGIME[regimes][..., None]
+    rendements = np.where(crise[..., None], rendements * FACTEUR_BAISSE_PV_CRISE, rendements)
+    dividendes = np.where(crise[..., None], dividendes * FACTEUR_BAISSE_DIV_CRISE, dividendes)
+    return rendements, dividendes
+
+
+def agreger_rendements_portefeuille(rendements_titres: np.ndarray, dividendes_titres: np.ndarray,
+                                    poids: np.ndarray):
+    """
+    Rendement total (avec amortissement des baisses) et rendement dividende d'un portefeuille
+    à poids fixes, pour toutes les trajectoires.
+    """
+    rendement_total = rendements_titres @ poids
+    rendement_total = np.where(rendement_total < SEUIL_DOWNSIDE, rendement_total * FACTEUR_DOWNSIDE, rendement_total)
+    return rendement_total, dividendes_titres @ poids
+
+
+@instrumenter("simulation.capital_agrege")
+def simuler_capital_agrege(rendement_total: np.ndarray, rendement_dividende: np.ndarray,
+                           capital_initial: float, injections: np.ndarray, frais_achat: float = 0.012,
+                           fiscalite_dividendes: float = 0.15, reinvestir_dividendes: bool = True):
+    """
+    Capital agrégé et dividendes nets de toutes les trajectoires (rééquilibrage continu) :
+    apports nets de frais d'achat en début d'année, dividendes nets d'impôt sur le capital
+    investi, puis croissance au rendement total (ou hors dividendes s'ils ne sont pas réinvestis).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: capital et dividendes nets (n_trajectoires x n_annees).
+    """
+    n_trajectoires, n_annees = rendement_total.shape
+    capital = np.full(n_trajectoires, float(capital_initial))
+    capital_annuel = np.empty((n_trajectoires, n_annees))
+    dividendes_annuels = np.empty((n_trajectoires, n_annees))
+    for annee in range(n_annees):
+        capital = capital + injections[annee] * (1 - frais_achat)
+        dividendes_annuels[:, annee] = capital * rendement_dividende[:, annee] * (1 - fiscalite_dividendes)
+        if reinvestir_dividendes:
+            capital = capital * (1 + rendement_total[:, annee])
+        else:
+            capital = capital * (1 + rendement_total[:, annee] - rendement_dividende[:, annee])
+        capital_annuel[:, annee] = capital
+    return capital_annuel, dividendes_annuels
+
+
+def preparer_limites_liquidite(df: pd.DataFrame, titres: list, part_echangeable: float = 1.0):
+    """
+    Dernier cours connu et nombre d'actions échangeables par an de chaque titre
+    (part_echangeable x Nombre_Actions_restant de la dernière année disponible).
+    """
+    derniers = df.sort_values('Annee').groupby('Nom_Entreprise').last().reindex(titres)
+    prix = derniers['Prix_Cloture_Annuel'].to_numpy(dtype=float)
+    actions = part_echangeable * derniers['Nombre_Actions_restant'].fillna(0).to_numpy(dtype=float)
+    return prix, actions
+
+
+@instrumenter("simulation.positions")
+def simuler_positions(
+    rendements_titres: np.ndarray,
+    dividendes_titres: np.ndarray,
+    poids: np.ndarray,
+    capital_initial: float,
+    injections: np.ndarray,
+    politique: str = "annuel",
+    seuil_bande: float = 0.05,
+    frais_achat: float = 0.012,
+    fiscalite_dividendes: float = 0.15,
+    reinvestir_dividendes: bool = True,
+    prix_initiaux: Optional[np.ndarray] = None,
+    actions_echangeables: Optional[np.ndarray] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Suivi des positions par titre (en FCFA) sur toutes les trajectoires à la fois.
+
+    En début d'année, l'apport et les liquidités sont investis puis le portefeuille est
+    rééquilibré selon la politique :
+    - "jamais" : les liquidités sont investies selon les poids cibles, sans vente ;
+    - "annuel" : retour aux poids cibles chaque année ;
+    - "bandes" : retour aux poids cibles si un poids s'écarte de plus de seuil_bande,
+      sinon comme "jamais".
+    Les frais_achat s'appliquent à tous les montants échangés. Les échanges de chaque titre
+    sont plafonnés à actions_echangeables x cours courant ; ce qui ne peut être acheté reste
+    en liquidités. Les baisses de portefeuille sont amorties comme dans
+    agreger_rendements_portefeuille (FACTEUR_DOWNSIDE appliqué aux rendements des titres les années où le portefeuille cible
+    baisse). Les dividendes nets réinvestis sont placés à l'ouverture de l'année suivante.
+
+    Returns:
+        Dict: valeur, liquidites, dividendes, frais, rotation (n_trajectoires x n_annees)
+        et positions (n_trajectoires x n_annees x n_titres).
+    """
+    if politique not in POLITIQUES_REEQUILIBRAGE:
+        raise ValueError(f"Politique de rééquilibrage inconnue : {politique}")
+    n_trajectoires, n_annees, n_titres = rendements_titres.shape
+    poids = np.asarray(poids, dtype=float) / np.sum(poids)
+
+    rendement_cible = rendements_titres @ poids
+    amortissement = np.where(rendement_cible < SEUIL_DOWNSIDE, FACTEUR_DOWNSIDE, 1.0)
+    rendements_pv = rendements_titres * amortissement[..., None] - dividendes_titres
+
+    if actions_echangeables is None:
+        limite_actions = np.full(n_titres, np.inf)
+        cours = np.ones((n_trajectoires, n_titres))
+    else:
+        limite_actions = np.asarray(actions_echangeables, dtype=float)
+        cours = np.broadcast_to(np.asarray(prix_initiaux, dtype=float), (n_trajectoires, n_titres)).copy()
+
+    positions = np.zeros((n_trajectoires, n_titres))
+    liquidites = np.full(n_trajectoires, float(capital_initial))
+    sorties = {nom: np.zeros((n_trajectoires, n_annees))
+               for nom in ("valeur", "liquidites", "dividendes", "frais", "rotation")}
+    historique_positions = np.empty((n_trajectoires, n_annees, n_titres))
+
+    for annee in range(n_annees):
+        liquidites = liquidites + injections[annee]
+        valeur_titres = positions.sum(axis=1)
+        valeur = valeur_titres + liquidites
+
+        # Ordres : nouvel argent seul ou retour complet aux poids cibles
+        nouvel_argent = poids * (liquidites / (1 + frais_achat))[:, None]
+        retour_cible = poids * valeur[:, None] - positions
+        if politique == "annuel":
+            ordres = retour_cible
+        elif politique == "jamais":
+            ordres = nouvel_argent
+        else:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ecart = np.abs(positions / valeur_titres[:, None] - poids).max(axis=1)
+            hors_bande = (valeur_titres > 0) & (ecart > seuil_bande)
+            ordres = np.where(hors_bande[:, None], retour_cible, nouvel_argent)
+
+        limite = limite_actions * cours
+        ordres = np.clip(ordres, -limite, limite)
+
+        # Achats financés par les liquidités et les ventes, frais compris
+        ventes = np.maximum(-ordres, 0.0).sum(axis=1)
+        achats = np.maximum(ordres, 0.0).sum(axis=1)
+        disponible = liquidites + ventes * (1 - frais_achat)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            echelle = np.where(achats > 0, np.minimum(1.0, disponible / (achats * (1 + frais_achat))), 1.0)
+        ordres = np.where(ordres > 0, ordres * echelle[:, None], ordres)
+
+        frais = frais_achat * np.abs(ordres).sum(axis=1)
+        liquidites = np.maximum(liquidites - ordres.sum(axis=1) - frais, 0.0)
+        positions = positions + ordres
+
+        # Rendements de l'année
+        dividendes_nets = (positions * dividendes_titres[:, annee]).sum(axis=1) * (1 - fiscalite_dividendes)
+        croissance = np.maximum(1 + rendements_pv[:, annee], 0.0)
+        positions = positions * croissance
+        cours = cours * croissance
+        if reinvestir_dividendes:
+            liquidites = liquidites + dividendes_nets
+
+        sorties["valeur"][:, annee] = positions.sum(axis=1) + liquidites
+        sorties["liquidites"][:, annee] = liquidites
+        sorties["dividendes"][:, annee] = dividendes_nets
+        sorties["frais"][:, annee] = frais
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sorties["rotation"][:, annee] = np.where(valeur > 0, np.abs(ordres).sum(axis=1) / valeur, 0.0)
+        historique_positions[:, annee] = positions
+
+    sorties["positions"] = historique_positions
+    return sorties
+
+
+@instrumenter("simulation")
 def run_simulation(
     df: pd.DataFrame,
     mode_financement: str,
@@ -21,23 +316,27 @@ def run_simulation(
     taux_sans_risque: float = 0.03,
     min_entreprises: int = 5,
     pond_dividende: float = 0.5,
-    mode='hybride'
+    mode='hybride',
+    politique_reequilibrage: Optional[str] = None,
+    seuil_bande: float = 0.05,
+    part_echangeable: float = 1.0,
+    index_marche=None,
+    dossier_entrepot: Optional[str] = None,
+    frequence_estimation: str = "mensuelle"
 ) -> Dict[str, pd.DataFrame]:
+    """
+    Simulation Monte Carlo du portefeuille optimal : régimes (simuler_chaine_regimes) et
+    rendements des titres (generer_rendements_titres) tirés en bloc pour toutes les trajectoires.
 
-    PROBA_CRISE = 0.05
-    FACTEUR_BAISSE_DIV_CRISE = 0.6
-    FACTEUR_BAISSE_PV_CRISE = 0.4
-    SEUIL_DOWNSIDE = 0.0
-    FACTEUR_DOWNSIDE = 0.7
-    DEGRES_LIBERTE_T = 5  # pour loi t multivariée
-
-    # Matrice transition Markov 3 états : F, D, C
-    regimes = ['favorable', 'defavorable', 'crise']
-    trans_mat = {
-        'favorable': [0.75, 0.20, 0.05],
-        'defavorable': [0.25, 0.55, 0.20],
-        'crise': [0.10, 0.20, 0.70],
-    }
+    Sans politique_reequilibrage, le capital agrégé suit les poids optimaux chaque année
+    (rééquilibrage continu et gratuit, simuler_capital_agrege). Avec une politique ("jamais", "annuel", "bandes"),
+    les positions par titre sont suivies par simuler_positions : frais sur les montants
+    échangés et limites de liquidité tirées de Nombre_Actions_restant.
+    index_marche (IndexMarche de df) est transmis à optimiser_portefeuille ; dossier_entrepot
+    et frequence_estimation à preparer_parametres_marche.
+    """
+
+    compter("simulation.trajectoires", n_simulations)
 
     resultat = optimiser_portefeuille(
         df=df,
@@ -47,132 +346,62 @@ def run_simulation(
         filtrer_stables=filtrer_stables,
         min_entreprises=min_entreprises,
         pond_dividende=pond_dividende,
-        mode=mode
+        mode=mode,
+        index_marche=index_marche
     )
 
     df_portefeuille = resultat['portefeuille']
     titres_optimaux = df_portefeuille['entreprise'].to_list()
     poids_optimaux = df_portefeuille['poids'].values
 
-    rendements_hist = calculer_rendements_totaux1(df)[["Annee"] + titres_optimaux]
-    rendements_div = calculer_rendements_dividendes1(df)[["Annee"] + titres_optimaux]
-
-    # Estimation mu/cov par régime sur toute l'historique sans regrouper par régime
-    # Ici on suppose qu'on utilise les mêmes mu/cov (par défaut sur toute la période)
-    mu = rendements_hist.drop(columns=['Annee']).mean().values
-    cov = rendements_hist.drop(columns=['Annee']).cov().values
-    mu_div = rendements_div.drop(columns=['Annee']).mean().values
-
-    # Pour différencier les régimes, on peut faire des ajustements manuels
-    # Exemple simplifié : 
-    mu_fav = mu
-    mu_def = mu * 0.8
-    mu_cri = mu * 0.5
-    cov_fav = cov
-    cov_def = cov * 1.5
-    cov_cri = cov * 3
-    mu_div_fav = mu_div
-    mu_div_def = mu_div * 0.7
-    mu_div_cri = mu_div * 0.4
-
-    secteurs = df['Secteur'].unique()
-    secteur_of = {t: df[df['Nom_Entreprise'] == t]['Secteur'].iloc[0] for t in titres_optimaux}
-    titre_idx = {t: i for i, t in enumerate(titres_optimaux)}
+    # Paramètres estimés sur tout l'historique, ajustés par régime dans generer_rendements_titres
+    parametres_marche = preparer_parametres_marche(df, titres_optimaux, dossier_entrepot, frequence_estimation)
 
     plan_capital = preparer_flux_capital(mode_financement, params_financement, duree_investissement)
     capital_initial = plan_capital["capital_initial"]
     injections = plan_capital["injections_future"]
 
-    np.random.seed(1234)
-    simulations_capital = []
-    simulations_dividendes = []
-
-    # Initialisation chocs sectoriels persistants
-    choc_sectoriel_sim = {s: 0.0 for s in secteurs}
-
-    for _ in range(n_simulations):
-        capital = capital_initial
-        capital_annuel = []
-        dividendes_annuels = []
-        regime_actuel = 'favorable'  # init à favorable
-
-        for annee in range(duree_investissement):
-            injection = injections.get(annee, 0)
-            investissable_net = injection * (1 - frais_achat)
-            capital += investissable_net
-
-            # Transition régime Markov
-            probs = trans_mat[regime_actuel]
-            regime_actuel = np.random.choice(regimes, p=probs)
-
-            # Mise à jour choc sectoriel avec inertie et bruit normal
-            for s in secteurs:
-                bruit = np.random.normal(0, 0.03)
-                choc_sectoriel_sim[s] = 0.7 * choc_sectoriel_sim[s] + bruit
-                if regime_actuel == 'crise':
-                    choc_sectoriel_sim[s] *= 2
-
-            # Choix des paramètres selon régime
-            if regime_actuel == 'favorable':
-                mu_rend = mu_fav.copy()
-                cov_rend = cov_fav.copy()
-                mu_div_rend = mu_div_fav.copy()
-            elif regime_actuel == 'defavorable':
-                mu_rend = mu_def.copy()
-                cov_rend = cov_def.copy()
-                mu_div_rend = mu_div_def.copy()
-            else:
-                mu_rend = mu_cri.copy()
-                cov_rend = cov_cri.copy()
-                mu_div_rend = mu_div_cri.copy()
-
-            # Ajout chocs sectoriels persistants sur mu_rend
-            for titre in titres_optimaux:
-                s = secteur_of[titre]
-                mu_rend[titre_idx[titre]] += choc_sectoriel_sim[s]
-
-            # Simulation rendements t-multivariés
-            try:
-                z = t.rvs(df=DEGRES_LIBERTE_T, size=len(titres_optimaux))
-                L = np.linalg.cholesky(cov_rend)
-                rend_simule = mu_rend + L @ z
-            except np.linalg.LinAlgError:
-                cov_rend += np.eye(len(titres_optimaux)) * 1e-6
-                L = np.linalg.cholesky(cov_rend)
-                rend_simule = mu_rend + L @ z
-
-            div_simule = mu_div_rend
-
-            # Baisse en cas de crise
-            if regime_actuel == 'crise':
-                div_simule *= FACTEUR_BAISSE_DIV_CRISE
-                rend_simule *= FACTEUR_BAISSE_PV_CRISE
-
-            rendement_total = np.dot(rend_simule, poids_optimaux)
-            rendement_dividende = np.dot(div_simule, poids_optimaux)
-
-            if rendement_total < SEUIL_DOWNSIDE:
-                rendement_total *= FACTEUR_DOWNSIDE
-
-            rendement_plus_value = rendement_total - rendement_dividende
-            montant_dividendes_bruts = capital * rendement_dividende
-            montant_dividendes_nets = montant_dividendes_bruts * (1 - fiscalite_dividendes)
-
-            if reinvestir_dividendes:
-                dividendes_annuels.append(montant_dividendes_nets)
-                capital *= (1 + rendement_total)
-            else:
-                capital *= (1 + rendement_plus_value)
-                dividendes_annuels.append(montant_dividendes_nets)
-
-            capital_annuel.append(capital)
-
-        simulations_capital.append(capital_annuel)
-        simulations_dividendes.append(dividendes_annuels)
-
-    annees_simulees = [rendements_hist['Annee'].max() + i + 1 for i in range(duree_investissement)]
-    df_capital = pd.DataFrame(simulations_capital, columns=annees_simulees)
-    df_dividendes = pd.DataFrame(simulations_dividendes, columns=annees_simulees)
+    rng = np.random.default_rng(1234)
+    regimes_simules = simuler_chaine_regimes(n_simulations, duree_investissement, rng)
+    rendements_titres, dividendes_titres = generer_rendements_titres(parametres_marche, regimes_simules, rng)
+    injections_annuelles = np.array([injections.get(annee, 0) for annee in range(duree_investissement)])
+    annees_simulees = [parametres_marche["derniere_annee"] + i + 1 for i in range(duree_investissement)]
+
+    if politique_reequilibrage is not None:
+        prix_initiaux, actions_echangeables = preparer_limites_liquidite(df, titres_optimaux, part_echangeable)
+        positions = simuler_positions(
+            rendements_titres, dividendes_titres, poids_optimaux, capital_initial, injections_annuelles,
+            politique=politique_reequilibrage, seuil_bande=seuil_bande, frais_achat=frais_achat,
+            fiscalite_dividendes=fiscalite_dividendes, reinvestir_dividendes=reinvestir_dividendes,
+            prix_initiaux=prix_initiaux, actions_echangeables=actions_echangeables
+        )
+        df_capital = pd.DataFrame(positions["valeur"], columns=annees_simulees)
+        df_dividendes = pd.DataFrame(positions["dividendes"], columns=annees_simulees)
+        return {
+            "valeurs_portefeuille": pd.DataFrame([df_capital.median()]),
+            "dividendes_cumulees": pd.DataFrame([df_dividendes.median()]),
+            "resume": {
+                "capital_final": np.median(df_capital.iloc[:, -1]),
+                "dividendes_cumules_final": np.median(df_dividendes.sum(axis=1)),
+                "reinvestissement": reinvestir_dividendes,
+                "politique_reequilibrage": politique_reequilibrage,
+                "frais_cumules": np.median(positions["frais"].sum(axis=1)),
+                "rotation_moyenne": float(positions["rotation"].mean()),
+                "liquidites_finales": np.median(positions["liquidites"][:, -1]),
+            },
+            "entreprises": df_portefeuille[['entreprise', 'poids']],
+        }
+
+    rendement_total, rendement_dividende = agreger_rendements_portefeuille(
+        rendements_titres, dividendes_titres, poids_optimaux
+    )
+    capital_annuel, dividendes_annuels = simuler_capital_agrege(
+        rendement_total, rendement_dividende, capital_initial, injections_annuelles,
+        frais_achat=frais_achat, fiscalite_dividendes=fiscalite_dividendes,
+        reinvestir_dividendes=reinvestir_dividendes
+    )
+    df_capital = pd.DataFrame(capital_annuel, columns=annees_simulees)
+    df_dividendes = pd.DataFrame(dividendes_annuels, columns=annees_simulees)
 
     resume = {
         "capital_final": np.median(df_capital.iloc[:, -1]),
@@ -185,4 +414,4 @@ def run_simulation(
         "dividendes_cumulees": pd.DataFrame([df_dividendes.median()]),
         "resume": resume,
         "entreprises": df_portefeuille[['entreprise', 'poids']],
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,330 @@
+# campagne.py
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from config.settings import PARAMETRES_AGRICOLES_DEFAUT
+from service.serveur_calcul import _ETAT_TRAVAILLEUR, _initialiser_travailleur, calculer_dans_travailleur, cle_requete
+from utils.etat_partage import empreinte_contenu, signature_fichier
+
+# Type de scénario d'une campagne -> tâche exécutée par les processus de calcul
+TYPES_SCENARIOS = {
+    "bourse": "run_simulation",
+    "portefeuille": "optimiser_portefeuille",
+    "agricole": "simuler_projet_agricole_multi",
+}
+FICHIER_POINTS_CONTROLE = "points_controle.jsonl"
+FICHIER_RESUME = "resume.parquet"
+DOSSIER_RESULTATS = "resultats"
+
+
+def charger_fichier_config(chemin: str) -> Any:
+    with open(chemin, encoding="utf-8") as f:
+        if chemin.lower().endswith(".json"):
+            return json.load(f)
+        return yaml.safe_load(f)
+
+
+def charger_cultures_db(chemin: Optional[str] = None) -> Dict:
+    """
+    Catalogue des cultures : fichier YAML/JSON fourni par la campagne, sinon config.cultures_db.
+    """
+    if chemin:
+        return charger_fichier_config(chemin)
+    from config import cultures_db
+    return cultures_db
+
+
+def preparer_historique(parametres: Dict) -> Dict:
+    """
+    Remplace le bloc "historique" d'un scénario agricole ({meteo, prix} : fichiers de
+    charger_historique, plus taille_bloc, methode et graine optionnels) par les années
+    météo/prix rééchantillonnées de chaque scénario (scenarios_climat_prix).
+    """
+    historique = parametres.pop("historique", None)
+    if historique:
+        from modules.agriculture.historique_meteo import charger_historique
+        parametres["scenarios_climat_prix"] = charger_historique(historique["meteo"], historique["prix"]).generer_scenarios(
+            parametres["n_scenarios"], parametres["duree_projet"], taille_bloc=historique.get("taille_bloc", 3),
+            methode=historique.get("methode", "mobile"), graine=historique.get("graine")
+        )
+    return parametres
+
+
+def developper_scenarios(campagne: Dict) -> List[Dict]:
+    """
+    Liste des scénarios d'une campagne.
+
+    Chaque entrée de "scenarios" porte un id, un type (bourse, portefeuille, agricole) et
+    des parametres complétés par campagne["defauts"][type] (et PARAMETRES_AGRICOLES_DEFAUT
+    pour les scénarios agricoles, qui acceptent un bloc "historique", voir preparer_historique).
+    Une entrée avec "grille" ({parametre: [valeurs]}) est développée en un scénario par
+    combinaison, d'identifiant id-001, id-002, ...
+    """
+    defauts = campagne.get("defauts") or {}
+    scenarios, identifiants = [], set()
+    for entree in campagne.get("scenarios") or []:
+        type_scenario = entree.get("type")
+        if type_scenario not in TYPES_SCENARIOS:
+            raise ValueError(f"Type de scénario inconnu pour '{entree.get('id')}' : {type_scenario}")
+        base = dict(PARAMETRES_AGRICOLES_DEFAUT) if type_scenario == "agricole" else {}
+        base.update(defauts.get(type_scenario) or {})
+        base.update(entree.get("parametres") or {})
+
+        grille = entree.get("grille") or {}
+        combinaisons = list(itertools.product(*grille.values())) if grille else [()]
+        for i, valeurs in enumerate(combinaisons, start=1):
+            identifiant = str(entree["id"]) if not grille else f"{entree['id']}-{i:03d}"
+            if identifiant in identifiants:
+                raise ValueError(f"Identifiant de scénario en double : {identifiant}")
+            identifiants.add(identifiant)
+            parametres = dict(base, **dict(zip(grille, valeurs)))
+            scenarios.append({
+                "id": identifiant,
+                "type": type_scenario,
+                "parametres": parametres,
+            })
+    if not scenarios:
+        raise ValueError("La campagne ne contient aucun scénario.")
+    return scenarios
+
+
+def _signature_ou_absence(chemin: str) -> Any:
+    try:
+        return signature_fichier(chemin)
+    except OSError:
+        return None
+
+
+def empreinte_scenario(scenario: Dict, fichier_marche: str, cultures_db: Optional[Dict]) -> str:
+    """
+    Empreinte d'un scénario : ses paramètres et les données qu'il lit (signature du classeur
+    de marché ; pour les scénarios agricoles, contenu du catalogue des cultures et signature
+    des fichiers d'historique). Un scénario est recalculé dès que l'une d'elles change.
+    """
+    donnees = {"fichier_marche": _signature_ou_absence(fichier_marche)}
+    if scenario["type"] == "agricole":
+        donnees["cultures_db"] = None if cultures_db is None else empreinte_contenu(cultures_db)
+        historique = scenario["parametres"].get("historique") or {}
+        donnees["historique"] = {cle: _signature_ou_absence(historique[cle])
+                                 for cle in ("meteo", "prix") if cle in historique}
+    return cle_requete(scenario["type"], dict(scenario["parametres"], donnees_lues=donnees))
+
+
+def _valeur_simple(valeur: Any) -> Any:
+    if isinstance(valeur, np.generic):
+        return valeur.item()
+    if valeur is None or isinstance(valeur, (bool, int, float, str)):
+        return valeur
+    return json.dumps(valeur, default=str, ensure_ascii=False)
+
+
+def _tableau_bourse(resultat: Dict) -> Tuple[pd.DataFrame, Dict]:
+    valeurs = resultat["valeurs_portefeuille"].iloc[0]
+    dividendes = resultat["dividendes_cumulees"].iloc[0]
+    tableau = pd.DataFrame({
+        "annee": [int(a) for a in valeurs.index],
+        "valeur_mediane": valeurs.values.astype(float),
+        "dividendes_medians": dividendes.reindex(valeurs.index).values.astype(float),
+    })
+    indicateurs = dict(resultat["resume"], n_titres=len(resultat["entreprises"]))
+    return tableau, indicateurs
+
+
+def _tableau_portefeuille(resultat: Dict) -> Tuple[pd.DataFrame, Dict]:
+    return pd.DataFrame(resultat["portefeuille"]).reset_index(drop=True), dict(resultat["stats"])
+
+
+def _tableau_agricole(resultat: Tuple) -> Tuple[pd.DataFrame, Dict]:
+    df_all = resultat[0]
+    benefices = df_all.groupby("Scenario")["Benefice_net_cycle"].sum()
+    indicateurs = {
+        "benefice_median": benefices.median(),
+        "benefice_p5": benefices.quantile(0.05),
+        "benefice_p95": benefices.quantile(0.95),
+        "probabilite_perte": (benefices < 0).mean(),
+    }
+    return df_all.reset_index(drop=True), indicateurs
+
+
+TABLEAUX_SCENARIOS = {
+    "bourse": _tableau_bourse,
+    "portefeuille": _tableau_portefeuille,
+    "agricole": _tableau_agricole,
+}
+
+
+def _initialiser_travailleur_campagne(fichier_marche: str, cultures_db: Optional[Dict]):
+    _initialiser_travailleur(fichier_marche)
+    _ETAT_TRAVAILLEUR["cultures_db"] = cultures_db
+
+
+def _executer_scenario(scenario: Dict, dossier: str) -> Dict:
+    """
+    Calcule un scénario et écrit son tableau en Parquet ; renvoie la ligne de point de contrôle.
+    """
+    debut = time.time()
+    ligne = {"id": scenario["id"], "type": scenario["type"], "empreinte": scenario["empreinte"]}
+    try:
+        parametres = dict(scenario["parametres"])
+        if scenario["type"] == "agricole":
+            parametres.setdefault("cultures_db", _ETAT_TRAVAILLEUR["cultures_db"])
+            preparer_historique(parametres)
+        resultat = calculer_dans_travailleur(TYPES_SCENARIOS[scenario["type"]], parametres)
+        tableau, indicateurs = TABLEAUX_SCENARIOS[scenario["type"]](resultat)
+        tableau.insert(0, "id_scenario", scenario["id"])
+
+        chemin = chemin_tableau(dossier, scenario)
+        tableau.to_parquet(chemin + ".tmp", index=False)
+        os.replace(chemin + ".tmp", chemin)
+        ligne.update(statut="ok", indicateurs={k: _valeur_simple(v) for k, v in indicateurs.items()})
+    except Exception as e:
+        ligne.update(statut="erreur", erreur=f"{type(e).__name__}: {e}")
+    ligne["duree"] = time.time() - debut
+    return ligne
+
+
+def chemin_tableau(dossier: str, scenario: Dict) -> str:
+    return os.path.join(dossier, scenario["type"], f"{scenario['id']}.parquet")
+
+
+def lire_points_controle(dossier: str) -> Dict[str, Dict]:
+    """
+    Dernière ligne de point de contrôle de chaque scénario (une ligne tronquée par un arrêt
+    brutal est ignorée).
+    """
+    chemin = os.path.join(dossier, FICHIER_POINTS_CONTROLE)
+    points = {}
+    if os.path.exists(chemin):
+        with open(chemin, encoding="utf-8") as f:
+            for texte in f:
+                try:
+                    ligne = json.loads(texte)
+                except json.JSONDecodeError:
+                    continue
+                points[ligne["id"]] = ligne
+    return points
+
+
+def construire_resume(scenarios: List[Dict], points: Dict[str, Dict]) -> pd.DataFrame:
+    lignes = []
+    for scenario in scenarios:
+        point = points.get(scenario["id"])
+        if point is None or point["empreinte"] != scenario["empreinte"]:
+            point = {"statut": "non_execute"}
+        lignes.append({
+            "id_scenario": scenario["id"],
+            "type": scenario["type"],
+            "statut": point["statut"],
+            "duree_s": point.get("duree"),
+            "erreur": point.get("erreur"),
+            "parametres": json.dumps(scenario["parametres"], sort_keys=True, default=str, ensure_ascii=False),
+            **point.get("indicateurs", {}),
+        })
+    return pd.DataFrame(lignes)
+
+
+def executer_campagne(chemin_campagne: str, dossier_sortie: Optional[str] = None,
+                      n_processus: Optional[int] = None, reprendre: bool = True,
+                      fichier_marche: Optional[str] = None) -> pd.DataFrame:
+    """
+    Exécute une campagne de scénarios (fichier YAML ou JSON) sur un pool de processus.
+
+    Chaque scénario terminé écrit son tableau dans <sortie>/<type>/<id>.parquet et une ligne
+    dans points_controle.jsonl : une campagne interrompue reprend là où elle s'était arrêtée
+    (les scénarios qui ont échoué, ou dont les paramètres ou les données ont changé, voir
+    empreinte_scenario, sont recalculés).
+    Le résumé (une ligne par scénario : statut, durée, indicateurs, paramètres) est écrit
+    dans <sortie>/resume.parquet et renvoyé.
+    """
+    campagne = charger_fichier_config(chemin_campagne)
+    scenarios = developper_scenarios(campagne)
+    nom = campagne.get("nom") or os.path.splitext(os.path.basename(chemin_campagne))[0]
+    dossier = dossier_sortie or campagne.get("sortie") or os.path.join(DOSSIER_RESULTATS, nom)
+    for type_scenario in {s["type"] for s in scenarios}:
+        os.makedirs(os.path.join(dossier, type_scenario), exist_ok=True)
+
+    fichier_marche = fichier_marche or campagne.get("fichier_marche", "data/donnees_brvm.xlsx")
+    cultures_db, erreur_cultures = None, None
+    if any(s["type"] == "agricole" for s in scenarios):
+        try:
+            cultures_db = charger_cultures_db(campagne.get("cultures_db"))
+        except (ImportError, OSError, yaml.YAMLError, json.JSONDecodeError) as e:
+            # Sans catalogue des cultures, seuls les scénarios agricoles échouent
+            erreur_cultures = f"Catalogue des cultures indisponible ({type(e).__name__}: {e})"
+    for scenario in scenarios:
+        scenario["empreinte"] = empreinte_scenario(scenario, fichier_marche, cultures_db)
+
+    chemin_points = os.path.join(dossier, FICHIER_POINTS_CONTROLE)
+    if not reprendre and os.path.exists(chemin_points):
+        os.remove(chemin_points)
+    points = lire_points_controle(dossier)
+    a_executer = [
+        s for s in scenarios
+        if not (s["id"] in points and points[s["id"]]["empreinte"] == s["empreinte"]
+                and points[s["id"]]["statut"] == "ok" and os.path.exists(chemin_tableau(dossier, s)))
+    ]
+    print(f"Campagne {nom} : {len(scenarios)} scénarios, {len(scenarios) - len(a_executer)} déjà calculés", flush=True)
+
+    if erreur_cultures is not None:
+        with open(chemin_points, "a", encoding="utf-8") as journal:
+            for scenario in [s for s in a_executer if s["type"] == "agricole"]:
+                ligne = {"id": scenario["id"], "type": scenario["type"], "empreinte": scenario["empreinte"],
+                         "statut": "erreur", "erreur": erreur_cultures, "duree": 0.0}
+                journal.write(json.dumps(ligne, ensure_ascii=False) + "\n")
+                points[ligne["id"]] = ligne
+                print(f"{ligne['id']} : {erreur_cultures}", flush=True)
+        a_executer = [s for s in a_executer if s["type"] != "agricole"]
+
+    if a_executer:
+        n_processus = n_processus or campagne.get("processus") or max(1, (os.cpu_count() or 2) - 1)
+
+        with open(chemin_points, "a", encoding="utf-8") as journal, \
+                ProcessPoolExecutor(max_workers=min(n_processus, len(a_executer)),
+                                    initializer=_initialiser_travailleur_campagne,
+                                    initargs=(fichier_marche, cultures_db)) as pool:
+            futurs = [pool.submit(_executer_scenario, s, dossier) for s in a_executer]
+            try:
+                for k, futur in enumerate(as_completed(futurs), start=1):
+                    ligne = futur.result()
+                    journal.write(json.dumps(ligne, ensure_ascii=False) + "\n")
+                    journal.flush()
+                    points[ligne["id"]] = ligne
+                    etat = ligne["statut"] if ligne["statut"] == "ok" else ligne["erreur"]
+                    print(f"[{k}/{len(a_executer)}] {ligne['id']} : {etat} ({ligne['duree']:.1f} s)", flush=True)
+            except KeyboardInterrupt:
+                for futur in futurs:
+                    futur.cancel()
+                print("Campagne interrompue : relancer la même commande pour la reprendre.", flush=True)
+                raise
+
+    resume = construire_resume(scenarios, points)
+    resume.to_parquet(os.path.join(dossier, FICHIER_RESUME), index=False)
+    return resume
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exécution sans interface d'une campagne de simulations AgriBourseSim")
+    parser.add_argument("campagne", help="fichier de campagne YAML ou JSON")
+    parser.add_argument("--sortie", default=None, help="dossier des résultats (défaut : resultats/<nom>)")
+    parser.add_argument("--processus", type=int, default=None)
+    parser.add_argument("--fichier-marche", default=None)
+    parser.add_argument("--recommencer", action="store_true", help="ignorer les points de contrôle existants")
+    args = parser.parse_args()
+    resume = executer_campagne(args.campagne, args.sortie, args.processus, not args.recommencer, args.fichier_marche)
+    erreurs = resume[resume["statut"] != "ok"]
+    print(f"{len(resume) - len(erreurs)}/{len(resume)} scénarios réussis", flush=True)
+    sys.exit(1 if len(erreurs) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# client_calcul.py
+import json
+import os
+import socket
+import struct
+import threading
+from typing import Any, Optional
+
+from service.format_binaire import decoder_resultat
+from service.serveur_calcul import STATUT_OK
+
+VARIABLE_ADRESSE = "AGRIBOURSE_SERVICE_CALCUL"
+
+
+class ErreurServiceCalcul(Exception):
+    """
+    Erreur renvoyée par le service de calcul (ou service injoignable).
+    """
+
+
+class ClientCalcul:
+    """
+    Client synchrone du service de calcul (une connexion par client, protégée par un verrou
+    pour être partagée entre les threads des tâches de fond).
+    """
+
+    def __init__(self, adresse: str, delai: float = 600.0):
+        self.adresse = adresse
+        self.delai = delai
+        self._socket: Optional[socket.socket] = None
+        self._verrou = threading.Lock()
+
+    def _connecter(self) -> socket.socket:
+        if self.adresse.startswith("unix://"):
+            connexion = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connexion.settimeout(self.delai)
+            connexion.connect(self.adresse[len("unix://"):])
+        else:
+            hote, port = self.adresse[len("tcp://"):].rsplit(":", 1)
+            connexion = socket.create_connection((hote, int(port)), timeout=self.delai)
+        return connexion
+
+    def _lire(self, n: int) -> bytes:
+        morceaux, restant = [], n
+        while restant:
+            morceau = self._socket.recv(min(restant, 1 << 20))
+            if not morceau:
+                raise ErreurServiceCalcul("Connexion interrompue par le service de calcul.")
+            morceaux.append(morceau)
+            restant -= len(morceau)
+        return b"".join(morceaux)
+
+    def _echanger(self, requete: dict) -> Any:
+        contenu = json.dumps(requete, default=str).encode("utf-8")
+        with self._verrou:
+            try:
+                if self._socket is None:
+                    self._socket = self._connecter()
+                self._socket.sendall(struct.pack("<Q", len(contenu)) + contenu)
+                statut, longueur = struct.unpack("<BQ", self._lire(9))
+                reponse = self._lire(longueur)
+            except OSError as e:
+                self.fermer()
+                raise ErreurServiceCalcul(f"Service de calcul injoignable : {e}") from e
+        if statut != STATUT_OK:
+            erreur = json.loads(reponse)
+            # Paramètres refusés par le calcul : même exception qu'en local
+            if erreur["type"] == "PortefeuilleInfaisable":
+                from modules.finances.optimizer import PortefeuilleInfaisable
+                raise PortefeuilleInfaisable(erreur["message"])
+            if erreur["type"] == "ValueError":
+                raise ValueError(erreur["message"])
+            raise ErreurServiceCalcul(f"{erreur['type']}: {erreur['message']}")
+        return decoder_resultat(reponse)
+
+    def soumettre(self, type_tache: str, **parametres) -> Any:
+        """
+        Exécute une tâche (run_simulation, optimiser_portefeuille, simuler_projet_agricole_multi)
+        sur le service ; les paramètres doivent être sérialisables en JSON (sans df, les
+        données de marché étant chargées par le service depuis fichier, à défaut son propre
+        classeur ; annee_min et annee_max les restreignent).
+        """
+        return self._echanger({"type": type_tache, "parametres": parametres})
+
+    def etat(self) -> dict:
+        return self._echanger({"type": "etat"})
+
+    def disponible(self) -> bool:
+        try:
+            self._echanger({"type": "ping"})
+            return True
+        except ErreurServiceCalcul:
+            return False
+
+    def fermer(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+def client_depuis_environnement() -> Optional[ClientCalcul]:
+    """
+    Client du service désigné par AGRIBOURSE_SERVICE_CALCUL, ou None si la variable n'est pas
+    définie ou si le service ne répond pas (calcul local).
+    """
+    adresse = os.environ.get(VARIABLE_ADRESSE)
+    if not adresse:
+        return None
+    client = ClientCalcul(adresse)
+    return client if client.disponible() else None
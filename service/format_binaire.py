@@ -0,0 +1,92 @@
+# format_binaire.py
+import json
+import struct
+from typing import Any, List
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Format des résultats échangés avec le service de calcul :
+# ENTETE_MAGIQUE | longueur de l'en-tête (uint32) | en-tête JSON | tampons binaires
+# L'en-tête décrit l'arborescence (dict, list, tuple, scalaires) et renvoie vers les tampons :
+# DataFrames en flux Arrow IPC compressé, tableaux numpy en octets bruts.
+ENTETE_MAGIQUE = b"ABS1"
+COMPRESSION_ARROW = "zstd" if pa.Codec.is_available("zstd") else None
+
+
+def _scalaire(valeur: Any) -> Any:
+    if isinstance(valeur, np.generic):
+        return valeur.item()
+    if isinstance(valeur, (pd.Timestamp, np.datetime64)):
+        return str(valeur)
+    return valeur
+
+
+def _encoder(objet: Any, tampons: List[bytes]) -> Any:
+    if isinstance(objet, pd.Series):
+        description = _encoder(objet.to_frame(), tampons)
+        description["serie"] = True
+        return description
+    if isinstance(objet, pd.DataFrame):
+        colonnes = [_scalaire(c) for c in objet.columns]
+        table = pa.Table.from_pandas(objet.set_axis([str(c) for c in objet.columns], axis=1), preserve_index=True)
+        puits = pa.BufferOutputStream()
+        with pa.ipc.new_stream(puits, table.schema,
+                               options=pa.ipc.IpcWriteOptions(compression=COMPRESSION_ARROW)) as ecrivain:
+            ecrivain.write_table(table)
+        tampons.append(puits.getvalue().to_pybytes())
+        return {"__type__": "dataframe", "tampon": len(tampons) - 1, "colonnes": colonnes}
+    if isinstance(objet, np.ndarray):
+        tampons.append(np.ascontiguousarray(objet).tobytes())
+        return {"__type__": "ndarray", "tampon": len(tampons) - 1, "dtype": objet.dtype.str, "forme": list(objet.shape)}
+    if isinstance(objet, dict):
+        return {"__type__": "dict", "cles": [_scalaire(k) for k in objet],
+                "valeurs": [_encoder(v, tampons) for v in objet.values()]}
+    if isinstance(objet, (list, tuple)):
+        return {"__type__": "tuple" if isinstance(objet, tuple) else "list",
+                "elements": [_encoder(v, tampons) for v in objet]}
+    return {"__type__": "scalaire", "valeur": _scalaire(objet)}
+
+
+def _decoder(description: Any, tampons: List[memoryview]) -> Any:
+    genre = description["__type__"]
+    if genre == "dataframe":
+        df = pa.ipc.open_stream(pa.py_buffer(tampons[description["tampon"]])).read_all().to_pandas()
+        df.columns = description["colonnes"]
+        return df.iloc[:, 0] if description.get("serie") else df
+    if genre == "ndarray":
+        return np.frombuffer(tampons[description["tampon"]], dtype=description["dtype"]).reshape(description["forme"]).copy()
+    if genre == "dict":
+        return {k: _decoder(v, tampons) for k, v in zip(description["cles"], description["valeurs"])}
+    if genre in ("list", "tuple"):
+        elements = [_decoder(v, tampons) for v in description["elements"]]
+        return tuple(elements) if genre == "tuple" else elements
+    return description["valeur"]
+
+
+def encoder_resultat(objet: Any) -> bytes:
+    """
+    Sérialise un résultat (DataFrames, tableaux numpy, dictionnaires, scalaires) en binaire compact.
+    """
+    tampons: List[bytes] = []
+    description = _encoder(objet, tampons)
+    entete = json.dumps({"racine": description, "tailles": [len(t) for t in tampons]},
+                        ensure_ascii=False).encode("utf-8")
+    return b"".join([ENTETE_MAGIQUE, struct.pack("<I", len(entete)), entete] + tampons)
+
+
+def decoder_resultat(donnees: bytes) -> Any:
+    """
+    Reconstruit un résultat sérialisé par encoder_resultat.
+    """
+    if donnees[:4] != ENTETE_MAGIQUE:
+        raise ValueError("Format binaire inconnu.")
+    (longueur,) = struct.unpack("<I", donnees[4:8])
+    entete = json.loads(bytes(donnees[8:8 + longueur]).decode("utf-8"))
+    vue = memoryview(donnees)
+    tampons, position = [], 8 + longueur
+    for taille in entete["tailles"]:
+        tampons.append(vue[position:position + taille])
+        position += taille
+    return _decoder(entete["racine"], tampons)
@@ -0,0 +1,203 @@
+# serveur_calcul.py
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import signal
+import struct
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+from service.format_binaire import encoder_resultat
+from utils.etat_partage import signature_fichier
+
+ADRESSE_DEFAUT = "unix:///tmp/agribourse_calcul.sock"
+TYPES_TACHES = ("ping", "run_simulation", "optimiser_portefeuille", "simuler_projet_agricole_multi")
+
+# Statut de la réponse : 0 = résultat binaire, 1 = erreur en JSON {"type", "message"}
+STATUT_OK = 0
+STATUT_ERREUR = 1
+
+_ETAT_TRAVAILLEUR = {}
+
+
+def _initialiser_travailleur(fichier_marche: str):
+    """
+    Chargé une fois par processus : imports lourds (cvxpy, scipy) et données de marché
+    (instantané de modules.finances.etat_marche, rechargé si le classeur change).
+    """
+    from modules.finances.etat_marche import obtenir_etat_marche
+    from modules.finances.optimizer import optimiser_portefeuille
+    from modules.finances.simulator_brvm import run_simulation
+    from modules.agriculture.simulator_agri import simuler_projet_agricole_multi
+
+    _ETAT_TRAVAILLEUR["fichier_marche"] = fichier_marche
+    _ETAT_TRAVAILLEUR["etat_marche"] = obtenir_etat_marche
+    obtenir_etat_marche(fichier_marche)
+    _ETAT_TRAVAILLEUR["fonctions"] = {
+        "run_simulation": run_simulation,
+        "optimiser_portefeuille": optimiser_portefeuille,
+        "simuler_projet_agricole_multi": simuler_projet_agricole_multi,
+    }
+
+
+def calculer_dans_travailleur(type_tache: str, parametres: Dict) -> Any:
+    """
+    Exécute une tâche dans un processus initialisé par _initialiser_travailleur
+    (résultat brut, non sérialisé). Les tâches boursières portent sur le classeur
+    parametres["fichier"] s'il est donné, sinon sur celui du service.
+    """
+    parametres = dict(parametres)
+    fonction = _ETAT_TRAVAILLEUR["fonctions"][type_tache]
+    if type_tache == "simuler_projet_agricole_multi":
+        return fonction(**parametres)
+
+    # Classeur de la session appelante, à défaut celui du service (--fichier-marche)
+    etat = _ETAT_TRAVAILLEUR["etat_marche"](parametres.pop("fichier", _ETAT_TRAVAILLEUR["fichier_marche"]))
+    periode = parametres.pop("annee_min", None), parametres.pop("annee_max", None)
+    return fonction(df=etat.panneau(*periode), index_marche=etat.index(*periode), **parametres)
+
+
+def _executer_tache(type_tache: str, parametres: Dict) -> bytes:
+    if type_tache == "ping":
+        return encoder_resultat({"pid": os.getpid()})
+    return encoder_resultat(calculer_dans_travailleur(type_tache, parametres))
+
+
+def cle_requete(type_tache: str, parametres: Dict) -> str:
+    return hashlib.sha1(json.dumps([type_tache, parametres], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+async def lire_trame(lecteur: asyncio.StreamReader) -> bytes:
+    (longueur,) = struct.unpack("<Q", await lecteur.readexactly(8))
+    return await lecteur.readexactly(longueur)
+
+
+def trame(statut: int, contenu: bytes) -> bytes:
+    return struct.pack("<BQ", statut, len(contenu)) + contenu
+
+
+class ServeurCalcul:
+    """
+    Service local de calcul partagé par toutes les sessions Streamlit.
+
+    Les requêtes (JSON : {"type": ..., "parametres": {...}}) sont exécutées sur un pool de
+    processus préchauffés qui gardent les données de marché en mémoire. Les requêtes
+    identiques en cours sont dédupliquées (une seule exécution, résultat partagé) et les
+    taille_cache derniers résultats sont conservés. Les résultats sont renvoyés au format
+    de service.format_binaire.
+    """
+
+    def __init__(self, n_processus: Optional[int] = None, fichier_marche: str = "data/donnees_brvm.xlsx",
+                 taille_cache: int = 32):
+        self.n_processus = n_processus or max(1, (os.cpu_count() or 2) - 1)
+        self.fichier_marche = fichier_marche
+        self.taille_cache = taille_cache
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._en_cours: Dict[str, asyncio.Future] = {}
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._version_marche = None
+        self.statistiques = {"requetes": 0, "executions": 0, "dedupliquees": 0, "cache": 0, "erreurs": 0}
+
+    async def prechauffer(self):
+        """
+        Démarre tous les processus du pool (initialisation comprise) avant la première requête.
+        """
+        self._pool = ProcessPoolExecutor(max_workers=self.n_processus, initializer=_initialiser_travailleur,
+                                         initargs=(self.fichier_marche,))
+        boucle = asyncio.get_running_loop()
+        await asyncio.gather(*[boucle.run_in_executor(self._pool, _executer_tache, "ping", {})
+                               for _ in range(self.n_processus)])
+
+    async def resoudre(self, type_tache: str, parametres: Dict) -> bytes:
+        if type_tache not in TYPES_TACHES:
+            raise ValueError(f"Type de tâche inconnu : {type_tache}")
+        self.statistiques["requetes"] += 1
+        # Classeur de marché modifié : les résultats en cache ne sont plus valides
+        version_marche = signature_fichier(self.fichier_marche)
+        if version_marche != self._version_marche:
+            self._cache.clear()
+            self._version_marche = version_marche
+        cle = cle_requete(type_tache, parametres if "fichier" not in parametres else
+                          dict(parametres, version_fichier=signature_fichier(parametres["fichier"])))
+        if cle in self._cache:
+            self.statistiques["cache"] += 1
+            self._cache.move_to_end(cle)
+            return self._cache[cle]
+        if cle in self._en_cours:
+            self.statistiques["dedupliquees"] += 1
+            return await asyncio.shield(self._en_cours[cle])
+
+        futur = asyncio.get_running_loop().run_in_executor(self._pool, _executer_tache, type_tache, parametres)
+        self._en_cours[cle] = futur
+        self.statistiques["executions"] += 1
+        try:
+            resultat = await futur
+        finally:
+            self._en_cours.pop(cle, None)
+        if type_tache != "ping":
+            self._cache[cle] = resultat
+            while len(self._cache) > self.taille_cache:
+                self._cache.popitem(last=False)
+        return resultat
+
+    async def _traiter_connexion(self, lecteur: asyncio.StreamReader, ecrivain: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    requete = json.loads(await lire_trame(lecteur))
+                except (asyncio.IncompleteReadError, asyncio.CancelledError):
+                    break
+                try:
+                    if requete.get("type") == "etat":
+                        reponse = trame(STATUT_OK, encoder_resultat(dict(self.statistiques, n_processus=self.n_processus)))
+                    else:
+                        reponse = trame(STATUT_OK, await self.resoudre(requete["type"], requete.get("parametres", {})))
+                except Exception as e:
+                    self.statistiques["erreurs"] += 1
+                    erreur = {"type": type(e).__name__, "message": str(e)}
+                    reponse = trame(STATUT_ERREUR, json.dumps(erreur).encode("utf-8"))
+                ecrivain.write(reponse)
+                await ecrivain.drain()
+        finally:
+            ecrivain.close()
+
+    async def servir(self, adresse: str = ADRESSE_DEFAUT):
+        await self.prechauffer()
+        if adresse.startswith("unix://"):
+            chemin = adresse[len("unix://"):]
+            if os.path.exists(chemin):
+                os.remove(chemin)
+            serveur = await asyncio.start_unix_server(self._traiter_connexion, path=chemin)
+        else:
+            hote, port = adresse[len("tcp://"):].rsplit(":", 1)
+            serveur = await asyncio.start_server(self._traiter_connexion, host=hote, port=int(port))
+        print(f"Service de calcul prêt sur {adresse} ({self.n_processus} processus)", flush=True)
+        # Arrêt propre sur SIGTERM : les processus du pool sont arrêtés avec le service
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        try:
+            async with serveur:
+                await serveur.serve_forever()
+        finally:
+            self._pool.shutdown(cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service local de calcul AgriBourseSim")
+    parser.add_argument("--adresse", default=os.environ.get("AGRIBOURSE_SERVICE_CALCUL", ADRESSE_DEFAUT),
+                        help="unix:///chemin.sock ou tcp://hote:port")
+    parser.add_argument("--processus", type=int, default=None)
+    parser.add_argument("--fichier-marche", default="data/donnees_brvm.xlsx")
+    parser.add_argument("--taille-cache", type=int, default=32)
+    args = parser.parse_args()
+    serveur = ServeurCalcul(args.processus, args.fichier_marche, args.taille_cache)
+    try:
+        asyncio.run(serveur.servir(args.adresse))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# test_backtest.py
+import numpy as np
+import pandas as pd
+
+from benchmarks.donnees_synthetiques import generer_panneau_marche
+from modules.finances.backtest import backtester_portefeuille
+
+PARAMETRES = dict(modes=("montecarlo",), taille_fenetre=3, frais_achat=0.01, fiscalite_dividendes=0.2,
+                  n_processus=1, rendement_dividende_min=1, filtrer_stables=False, min_entreprises=3,
+                  n_simulations=300)
+
+
+def _backtest(df):
+    resultat = backtester_portefeuille(df, **PARAMETRES)
+    return resultat["details"]["montecarlo"], resultat["poids"]["montecarlo"]
+
+
+def test_fenetres_sans_anticipation():
+    df = generer_panneau_marche(n_titres=10, n_annees=7, graine=4)
+    detail, poids = _backtest(df)
+
+    assert list(detail["Annee_test"]) == [2020, 2021, 2022, 2023]
+    assert (detail["Fin_estimation"] == detail["Annee_test"] - 1).all()
+    assert (detail["Fin_estimation"] - detail["Debut_estimation"] == 2).all()
+
+    # Modifier la dernière année ne change aucune allocation, seulement le rendement réalisé
+    futur = df.copy()
+    derniere = futur["Annee"] == 2023
+    futur.loc[derniere, "Prix_Cloture_Annuel"] *= 3
+    futur.loc[derniere, "Variation(annee_precedente)"] += 200
+    detail_futur, poids_futur = _backtest(futur)
+    pd.testing.assert_frame_equal(poids_futur, poids)
+    assert detail_futur["Rendement_brut"].iloc[-1] > detail["Rendement_brut"].iloc[-1] + 1
+
+
+def test_frais_impot_et_titre_sans_cours():
+    df = generer_panneau_marche(n_titres=10, n_annees=7, graine=4)
+    detail, poids = _backtest(df)
+
+    # Première année : tout est acheté depuis l'encaisse
+    premiere = detail.iloc[0]
+    assert np.isclose(premiere["Frais"], PARAMETRES["frais_achat"])
+    panneau = df.pivot(index="Annee", columns="Nom_Entreprise")
+    dividende = (panneau["Dividende_Verse"].loc[2020] / panneau["Prix_Cloture_Annuel"].loc[2019])[poids.columns]
+    assert np.isclose(premiere["Impot_dividendes"], PARAMETRES["fiscalite_dividendes"] * poids.loc[2020] @ dividende)
+    np.testing.assert_allclose(detail["Rendement_net"],
+                               detail["Rendement_brut"] - detail["Impot_dividendes"] - detail["Frais"])
+
+    # Un titre détenu sans cours l'année test n'est pas compté à 0 % : il sort du portefeuille
+    titre = poids.loc[2021].idxmax()
+    detail_manquant, poids_manquant = _backtest(df[~((df["Nom_Entreprise"] == titre) & (df["Annee"] == 2021))])
+    assert detail_manquant.loc[1, "Titres_sans_cours"] == 1
+    assert poids_manquant.loc[2021, titre] == 0
+    assert np.isclose(poids_manquant.loc[2021].sum(), 1.0)
+    assert (detail["Titres_sans_cours"] == 0).all()
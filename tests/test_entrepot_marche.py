@@ -0,0 +1,36 @@
+# test_entrepot_marche.py
+import numpy as np
+import pandas as pd
+
+from modules.finances.entrepot_marche import EntrepotMarche, ingerer_cours_journaliers
+
+
+def _ecrire_cours_journaliers(chemin):
+    dates = pd.bdate_range("2022-11-01", "2023-02-28")
+    lignes = []
+    for titre, cours in (("SONATEL", 15000.0), ("orange ci", 9000.0)):
+        dividendes = np.zeros(len(dates))
+        dividendes[[10, 60]] = 500.0
+        lignes.append(pd.DataFrame({"Date": dates.strftime("%Y-%m-%d"), "Nom_Entreprise": titre,
+                                    "Cours_Cloture": cours * (1 + 0.001 * np.arange(len(dates))),
+                                    "Dividende": dividendes}))
+    pd.concat(lignes).to_csv(chemin, index=False)
+    return 2 * len(dates)
+
+
+def test_reingestion_sans_doublon(tmp_path):
+    fichier = tmp_path / "cours.csv"
+    n_lignes = _ecrire_cours_journaliers(fichier)
+    dossier = str(tmp_path / "entrepot")
+
+    assert ingerer_cours_journaliers(str(fichier), dossier) == n_lignes
+    une_fois = EntrepotMarche(dossier).reechantillonner("mensuelle")
+    ingerer_cours_journaliers(str(fichier), dossier)
+    entrepot = EntrepotMarche(dossier)
+
+    assert len(entrepot.lire()) == n_lignes
+    assert entrepot.annees == [2022, 2023]
+    deux_fois = entrepot.reechantillonner("mensuelle")
+    pd.testing.assert_frame_equal(deux_fois, une_fois)
+    # Deux détachements de 500 par titre sur la période
+    assert deux_fois.groupby("Nom_Entreprise")["Dividende"].sum().to_dict() == {"ORANGE CI": 1000.0, "SONATEL": 1000.0}
@@ -0,0 +1,19 @@
+# test_optimiseur_surfaces.py
+from benchmarks.donnees_synthetiques import generer_catalogue_cultures
+from config.settings import PARAMETRES_AGRICOLES_DEFAUT
+from modules.agriculture.optimiseur_surfaces import optimiser_allocation_surfaces
+
+
+def test_culture_deficitaire_abandonnee():
+    catalogue = generer_catalogue_cultures(n_cultures=4, part_serre=0.0)
+    # Prix de vente quasi nul : la culture ne couvre jamais ses coûts fixes
+    catalogue["culture_004"]["plein_champ"]["prix"] = 1
+    parametres = dict(PARAMETRES_AGRICOLES_DEFAUT)
+    aleas = parametres.pop("aleas_climatiques")
+
+    resultat = optimiser_allocation_surfaces(list(catalogue), catalogue, surface_totale=10.0, duree_projet=5,
+                                             aleas_climatiques=aleas, n_scenarios=100, n_candidats=200,
+                                             **parametres)
+
+    assert "culture_004" not in set(resultat["allocation"]["Culture"])
+    assert resultat["van_esperee"] > resultat["reference"]["van_esperee"]
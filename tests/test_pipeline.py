@@ -0,0 +1,42 @@
+# test_pipeline.py
+import os
+
+from benchmarks.donnees_synthetiques import ecrire_classeur_marche, generer_panneau_marche
+from modules.finances.pipeline import PARAMETRES_BOURSIERS_DEFAUT, creer_pipeline_boursier
+
+TOUTES_LES_ETAPES = ["donnees", "panneau", "index", "optimisation", "trajectoires", "flux",
+                     "agregation", "scenarios", "export"]
+
+
+def _parametres(fichier):
+    return dict(
+        PARAMETRES_BOURSIERS_DEFAUT, fichier=fichier, n_simulations=200, rendement_dividende_min=1,
+        aversion_risque=3.0, taux_sans_risque=0.03, filtrer_stables=False, min_entreprises=3,
+        pond_dividende=0.5, mode="montecarlo", duree_investissement=5, mode_financement="Apport unique",
+        params_financement={"apport_unique": 1_000_000}, reinvestir_dividendes=True, frais_achat=0.012,
+        fiscalite_dividendes=0.15
+    )
+
+
+def test_etapes_recalculees(tmp_path):
+    fichier = ecrire_classeur_marche(generer_panneau_marche(n_titres=12, n_annees=6, graine=1),
+                                     str(tmp_path / "marche.xlsx"))
+    pipeline = creer_pipeline_boursier(etat_partage=False)
+    parametres = _parametres(fichier)
+
+    pipeline.executer(parametres)
+    assert sorted(pipeline.etapes_recalculees) == sorted(TOUTES_LES_ETAPES)
+    pipeline.executer(parametres)
+    assert pipeline.etapes_recalculees == []
+
+    # Frais et fiscalité : ni chargement, ni optimisation, ni trajectoires
+    for changement in ({"frais_achat": 0.02}, {"fiscalite_dividendes": 0.10}):
+        parametres.update(changement)
+        pipeline.executer(parametres)
+        assert sorted(pipeline.etapes_recalculees) == ["agregation", "export", "flux", "scenarios"]
+
+    # Nouvelle signature du classeur : tout ce qui en dépend est recalculé
+    ecrire_classeur_marche(generer_panneau_marche(n_titres=12, n_annees=6, graine=2), fichier)
+    os.utime(fichier, ns=(os.stat(fichier).st_atime_ns, os.stat(fichier).st_mtime_ns + 10 ** 9))
+    pipeline.executer(parametres)
+    assert sorted(pipeline.etapes_recalculees) == sorted(TOUTES_LES_ETAPES)
@@ -0,0 +1,29 @@
+# test_sensibilite.py
+import numpy as np
+
+from modules.agriculture.sensibilite import criblage_morris, indices_sobol
+
+
+def _ishigami(points, a=7.0, b=0.1):
+    x1, x2, x3 = points.T
+    return (np.sin(x1) + a * np.sin(x2) ** 2 + b * x3 ** 4 * np.sin(x1))[:, None]
+
+
+def test_sobol_ishigami():
+    bornes = np.array([[-np.pi, np.pi]] * 3)
+    s1, s1_ic, st, st_ic = indices_sobol(_ishigami, bornes, n_base=4096, n_bootstrap=50, graine=3)
+
+    # Valeurs analytiques de la fonction d'Ishigami (a = 7, b = 0.1)
+    np.testing.assert_allclose(s1[:, 0], [0.3139, 0.4424, 0.0], atol=0.03)
+    np.testing.assert_allclose(st[:, 0], [0.5576, 0.4424, 0.2437], atol=0.03)
+    assert (s1_ic > 0).all() and (st_ic > 0).all()
+
+
+def test_morris_fonction_lineaire():
+    # Effets élémentaires exacts : coefficient x largeur de l'intervalle, sans dispersion
+    coefficients = np.array([3.0, -1.0, 0.0, 0.5])
+    bornes = np.array([[0.0, 1.0], [10.0, 20.0], [0.0, 5.0], [-2.0, 2.0]])
+    effets = criblage_morris(lambda points: (points @ coefficients)[:, None], bornes, n_trajectoires=8, graine=1)
+
+    assert effets.shape == (8, 4, 1)
+    np.testing.assert_allclose(effets[:, :, 0], np.broadcast_to(coefficients * [1.0, 10.0, 5.0, 4.0], (8, 4)))
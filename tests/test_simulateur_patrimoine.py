@@ -0,0 +1,30 @@
+# test_simulateur_patrimoine.py
+import numpy as np
+import pandas as pd
+
+from benchmarks.donnees_synthetiques import generer_catalogue_cultures, generer_panneau_marche
+from config.settings import PARAMETRES_AGRICOLES_DEFAUT
+from modules.finances.simulateur_patrimoine import simuler_patrimoine
+
+
+def _simuler(cout_serre_unite: float) -> dict:
+    df = generer_panneau_marche(n_titres=6, n_annees=6)
+    titres = sorted(df["Nom_Entreprise"].unique())[:3]
+    portefeuille = pd.DataFrame({"entreprise": titres, "poids": [0.5, 0.3, 0.2]})
+    catalogue = generer_catalogue_cultures(n_cultures=4)
+    parametres = dict(PARAMETRES_AGRICOLES_DEFAUT, cout_serre_unite=cout_serre_unite)
+    return simuler_patrimoine(df, portefeuille, list(catalogue), catalogue, surface_totale=10.0,
+                              part_serre=0.3, duree=6, parametres_agricoles=parametres,
+                              params_financement={"apport_unique": 1_000_000}, n_trajectoires=200, graine=7)
+
+
+def test_cout_serre_deduit_une_seule_fois():
+    # Surface au-delà du seuil d'exonération : l'amortissement n'a pas d'effet fiscal, seul
+    # l'achat de la serre en t0 doit séparer les deux patrimoines
+    avec_serre = _simuler(PARAMETRES_AGRICOLES_DEFAUT["cout_serre_unite"])
+    serre_gratuite = _simuler(0.0)
+
+    assert avec_serre["investissement_serre"] > 0
+    np.testing.assert_allclose(serre_gratuite["patrimoine"] - avec_serre["patrimoine"],
+                               avec_serre["investissement_serre"], rtol=1e-9)
+    np.testing.assert_allclose(serre_gratuite["capital_portefeuille"], avec_serre["capital_portefeuille"])
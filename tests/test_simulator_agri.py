@@ -0,0 +1,78 @@
+# test_simulator_agri.py
+import numpy as np
+
+from benchmarks.donnees_synthetiques import (
+    generer_catalogue_cultures,
+    generer_historique_climat_prix,
+    parametres_projet_agricole
+)
+from config.settings import PARAMETRES_AGRICOLES_DEFAUT
+from modules.agriculture.historique_meteo import HistoriqueClimatPrix
+from modules.agriculture.simulateur_lot import (
+    TiragesAgricoles,
+    calculer_rendements_prix_lot,
+    simuler_lot,
+    surfaces_par_defaut
+)
+from modules.agriculture.simulator_agri import simuler_projet_agricole_multi
+from modules.agriculture.tresorerie_mensuelle import simuler_tresorerie_agricole
+
+
+def test_multi_identique_au_moteur_vectorise():
+    parametres = parametres_projet_agricole(generer_catalogue_cultures(n_cultures=4))
+    n_scenarios = 60
+
+    df_all, scen_min, scen_max, _ = simuler_projet_agricole_multi(n_scenarios=n_scenarios, graine=11, **parametres)
+
+    tirages = TiragesAgricoles(parametres["cultures"], parametres["cultures_db"], n_scenarios,
+                               parametres["duree_projet"], parametres["aleas_climatiques"], graine=11)
+    surfaces = surfaces_par_defaut(tirages, parametres["surface_totale"], parametres["part_serre"])
+    autres = {k: v for k, v in parametres.items()
+              if k not in ("surface_totale", "duree_projet", "part_serre", "cultures", "cultures_db", "aleas_climatiques")}
+    lot = simuler_lot(tirages, surfaces, **autres)
+
+    benefices = df_all.groupby("Scenario")["Benefice_net_cycle"].sum().to_numpy()
+    # Écarts d'arrondi à l'unité par cycle seulement
+    assert np.abs(benefices - lot["benefice_total"]).max() <= len(df_all) / n_scenarios
+    annuels = df_all.pivot_table(index="Scenario", columns="Année", values="Benefice_net_cycle", aggfunc="sum")
+    np.testing.assert_allclose(annuels.to_numpy(), lot["benefice_annuel"], atol=len(df_all) / n_scenarios)
+    assert scen_min["Benefice_net_cycle"].sum() == benefices.min()
+    assert scen_max["Benefice_net_cycle"].sum() == benefices.max()
+
+
+def test_rendements_ajustes_par_historique_reechantillonne():
+    catalogue = generer_catalogue_cultures(n_cultures=3)
+    meteo, prix = generer_historique_climat_prix(list(catalogue), n_annees=20)
+    # Une année sur deux sous le seuil de pluie
+    meteo["Pluie_annuelle"] = np.where(np.arange(20) % 2, 800.0, 1400.0)
+    historique = HistoriqueClimatPrix(meteo["Annee"].to_numpy(), list(meteo.columns[1:]), meteo.iloc[:, 1:].to_numpy(),
+                                      list(prix.columns[1:]), prix.iloc[:, 1:].to_numpy())
+    scenarios = historique.generer_scenarios(40, 5, graine=2)
+    tirages = TiragesAgricoles(list(catalogue), catalogue, 40, 5, PARAMETRES_AGRICOLES_DEFAUT["aleas_climatiques"], graine=2)
+
+    rendements, prix_lot = calculer_rendements_prix_lot(tirages, 1000, 30.0, 0.3, scenarios_climat_prix=scenarios)
+    corr_climat, corr_prix = scenarios.matrices_correlation(tirages.cultures)
+    attendus = calculer_rendements_prix_lot(tirages, 1000, 30.0, 0.3, pluie=scenarios.serie_meteo("Pluie_annuelle"),
+                                            temp=scenarios.serie_meteo("Temp_moyenne"),
+                                            matrice_corr_climat=corr_climat, matrice_corr_prix=corr_prix)
+
+    np.testing.assert_allclose(rendements, attendus[0])
+    np.testing.assert_allclose(prix_lot, attendus[1])
+    ajustes = scenarios.ajuster_rendements(tirages.parametres["rendement"], tirages.parametres["sensibilite_climat"],
+                                           1000, 30.0)
+    annees_seches = scenarios.serie_meteo("Pluie_annuelle") < 1000
+    assert (ajustes[annees_seches] <= tirages.parametres["rendement"]).all()
+    assert ajustes[annees_seches].sum() < tirages.parametres["rendement"].sum() * annees_seches.sum()
+
+
+def test_stockage_identique_au_grand_livre():
+    parametres = parametres_projet_agricole(generer_catalogue_cultures(n_cultures=3))
+    parametres.update(mode_financement="autofinancement", montant_emprunt=0, part_stockee=0.4, duree_stockage_mois=6)
+
+    df_all, _, _, _ = simuler_projet_agricole_multi(n_scenarios=30, graine=5, **parametres)
+    tresorerie = simuler_tresorerie_agricole(n_scenarios=30, graine=5, **parametres)
+
+    # Mêmes ventes (récolte et stock après 6 mois de pertes), à l'arrondi par cycle près
+    ventes = df_all.groupby("Scenario")["CA_cycle"].sum().to_numpy()
+    np.testing.assert_allclose(ventes, tresorerie["encaissements"].sum(axis=1), atol=len(df_all) / 30)
+    assert (df_all["Vente_stock_kg"] <= 0.4 * 0.9 ** 6 * df_all["Production_cycle_kg"] + 1e-6).all()
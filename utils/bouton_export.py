@@ -0,0 +1,29 @@
+# bouton_export.py
+from typing import Any, Dict, Optional, Sequence
+
+import streamlit as st
+
+from utils.export_tools import FORMATS_EXPORT, exporter_resultats
+
+
+def bouton_export(resultats: Dict[str, Any], nom_fichier: str, cle: str,
+                  formats: Sequence[str] = ("xlsx", "parquet", "csv", "pdf"),
+                  graphiques: Optional[Dict[str, Any]] = None):
+    """
+    Choix du format et bouton de téléchargement des résultats. L'export n'est construit
+    qu'au clic (génération différée de st.download_button), jamais à chaque réexécution
+    de la page. graphiques (titre -> figure ou données) n'est utilisé que par le rapport PDF.
+    """
+    col1, col2 = st.columns([2, 1], vertical_alignment="bottom")
+    format_export = col1.selectbox("Format d'export", formats, key=f"format_{cle}",
+                                   format_func=lambda f: FORMATS_EXPORT[f]["libelle"])
+    infos = FORMATS_EXPORT[format_export]
+    options = {"graphiques": graphiques} if format_export == "pdf" else {}
+    col2.download_button(
+        label="📥 Exporter",
+        data=lambda: exporter_resultats(resultats, format_export, **options),
+        file_name=f"{nom_fichier}.{infos['extension']}",
+        mime=infos["mime"],
+        key=f"telecharger_{cle}",
+        on_click="ignore"
+    )
@@ -0,0 +1,31 @@
+# chargement_differe.py
+import importlib
+from types import ModuleType
+from typing import Optional
+
+
+class ModuleDiffere:
+    """
+    Façade d'un module lourd (cvxpy, scipy.stats, fpdf...) importé au premier accès à
+    l'un de ses attributs : `cp = ModuleDiffere("cvxpy")` puis `cp.Variable(n)`.
+    L'ouverture d'une page qui n'utilise pas le module ne paie pas son import.
+    """
+
+    def __init__(self, nom: str):
+        self._nom = nom
+        self._module: Optional[ModuleType] = None
+
+    def charger(self) -> ModuleType:
+        if self._module is None:
+            self._module = importlib.import_module(self._nom)
+        return self._module
+
+    @property
+    def charge(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attribut: str):
+        return getattr(self.charger(), attribut)
+
+    def __repr__(self) -> str:
+        return f"<ModuleDiffere {self._nom} ({'chargé' if self.charge else 'non chargé'})>"
@@ -0,0 +1,207 @@
+# emulateur.py
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from utils.chargement_differe import ModuleDiffere
+from utils.instrumentation import compter, instrumenter
+
+linalg = ModuleDiffere("scipy.linalg")
+optimize = ModuleDiffere("scipy.optimize")
+
+# Bornes des hyperparamètres (en log) : longueurs de corrélation sur les entrées ramenées
+# à [0, 1], variance du signal et bruit relatifs aux sorties centrées réduites
+BORNES_LOG_LONGUEUR = (np.log(0.05), np.log(20.0))
+BORNES_LOG_VARIANCE = (np.log(1e-2), np.log(1e2))
+BORNES_LOG_BRUIT = (np.log(1e-8), np.log(1.0))
+Z_95 = 1.959964
+
+
+def plan_hypercube_latin(bornes: Dict[str, Tuple[float, float]], n_points: int, graine: int = 0,
+                         n_candidats: int = 20) -> pd.DataFrame:
+    """
+    Plan d'expériences en hypercube latin : chaque entrée est découpée en n_points
+    strates occupées une fois chacune. Parmi n_candidats tirages, le plan retenu maximise
+    la plus petite distance entre deux points (critère maximin).
+    """
+    rng = np.random.default_rng(graine)
+    d = len(bornes)
+    meilleur, meilleure_distance = None, -np.inf
+    for _ in range(n_candidats):
+        strates = np.argsort(rng.random((n_points, d)), axis=0)
+        plan = (strates + rng.random((n_points, d))) / n_points
+        ecarts = plan[:, None, :] - plan[None, :, :]
+        distances = np.sqrt((ecarts ** 2).sum(axis=-1))[np.triu_indices(n_points, 1)]
+        distance = distances.min() if len(distances) else 0.0
+        if distance > meilleure_distance:
+            meilleur, meilleure_distance = plan, distance
+    bas = np.array([b[0] for b in bornes.values()], dtype=float)
+    haut = np.array([b[1] for b in bornes.values()], dtype=float)
+    return pd.DataFrame(bas + meilleur * (haut - bas), columns=list(bornes))
+
+
+def _noyau(xa: np.ndarray, xb: np.ndarray, longueurs: np.ndarray, variance: float) -> np.ndarray:
+    ecarts = (xa[:, None, :] - xb[None, :, :]) / longueurs
+    return variance * np.exp(-0.5 * (ecarts ** 2).sum(axis=-1))
+
+
+def _log_vraisemblance_negative(theta: np.ndarray, x: np.ndarray, y: np.ndarray) -> float:
+    d = x.shape[1]
+    longueurs, variance, bruit = np.exp(theta[:d]), np.exp(theta[d]), np.exp(theta[d + 1])
+    k = _noyau(x, x, longueurs, variance) + (bruit + 1e-10) * np.eye(len(x))
+    try:
+        facteur = linalg.cho_factor(k, lower=True)
+    except np.linalg.LinAlgError:
+        return 1e10
+    alpha = linalg.cho_solve(facteur, y)
+    return float(0.5 * y @ alpha + np.log(np.diag(facteur[0])).sum() + 0.5 * len(x) * np.log(2 * np.pi))
+
+
+class _ProcessusGaussien:
+    """
+    Régression par processus gaussien d'une sortie centrée réduite : noyau gaussien à une
+    longueur de corrélation par entrée, bruit (pépite) estimé pour absorber le bruit
+    Monte Carlo du simulateur. Hyperparamètres au maximum de vraisemblance marginale.
+    """
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, n_departs: int = 4, graine: int = 0):
+        d = x.shape[1]
+        bornes = [BORNES_LOG_LONGUEUR] * d + [BORNES_LOG_VARIANCE, BORNES_LOG_BRUIT]
+        rng = np.random.default_rng(graine)
+        departs = [np.r_[np.full(d, np.log(0.5)), 0.0, np.log(1e-3)]]
+        departs += [np.array([rng.uniform(*b) for b in bornes]) for _ in range(n_departs - 1)]
+        meilleur = min((optimize.minimize(_log_vraisemblance_negative, depart, args=(x, y), method="L-BFGS-B",
+                                          bounds=bornes)
+                        for depart in departs), key=lambda r: r.fun)
+        self.longueurs = np.exp(meilleur.x[:d])
+        self.variance = float(np.exp(meilleur.x[d]))
+        self.bruit = float(np.exp(meilleur.x[d + 1])) + 1e-10
+        self.x = x
+        k = _noyau(x, x, self.longueurs, self.variance) + self.bruit * np.eye(len(x))
+        self._facteur = linalg.cho_factor(k, lower=True)
+        self._alpha = linalg.cho_solve(self._facteur, y)
+
+    def predire(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Moyenne et variance de la sortie du simulateur (bruit Monte Carlo compris)
+        k_croise = _noyau(x, self.x, self.longueurs, self.variance)
+        moyenne = k_croise @ self._alpha
+        v = linalg.cho_solve(self._facteur, k_croise.T)
+        variance = self.variance + self.bruit - np.einsum("ij,ji->i", k_croise, v)
+        return moyenne, np.maximum(variance, 1e-12)
+
+    def validation_croisee(self) -> Tuple[np.ndarray, np.ndarray]:
+        # Erreurs et variances de validation croisée « un point exclu », en forme close
+        inverse = linalg.cho_solve(self._facteur, np.eye(len(self.x)))
+        diagonale = np.diag(inverse)
+        return self._alpha / diagonale, 1.0 / diagonale
+
+
+class Emulateur:
+    """
+    Émulateur (modèle de substitution) d'un simulateur coûteux : par sortie, une tendance
+    linéaire des entrées et une régression par processus gaussien de l'écart à cette
+    tendance, ajustées sur un plan d'expériences. Répond en quelques millisecondes avec
+    un intervalle à 95 %, et publie sa propre erreur de validation croisée sur les
+    points du plan.
+
+    contexte identifie les réglages non émulés (figés pendant l'entraînement) : l'émulateur
+    n'est valable que pour ce contexte.
+    """
+
+    def __init__(self, bornes: Dict[str, Tuple[float, float]], contexte: Any = None):
+        self.bornes = dict(bornes)
+        self.contexte = contexte
+        self._bas = np.array([b[0] for b in self.bornes.values()], dtype=float)
+        self._etendue = np.array([b[1] - b[0] for b in self.bornes.values()], dtype=float)
+        self._etendue[self._etendue == 0] = 1.0
+        self.modeles: Dict[str, _ProcessusGaussien] = {}
+        self.validation: Optional[pd.DataFrame] = None
+        self.n_points = 0
+        self.duree_entrainement: Optional[float] = None
+
+    def _normaliser(self, plan: pd.DataFrame) -> np.ndarray:
+        return (plan[list(self.bornes)].to_numpy(dtype=float) - self._bas) / self._etendue
+
+    @instrumenter("emulateur.ajustement")
+    def ajuster(self, plan: pd.DataFrame, reponses: pd.DataFrame) -> "Emulateur":
+        """
+        Ajuste tendance et processus gaussien par colonne de reponses (une ligne par point
+        du plan) et calcule l'erreur de validation croisée de chacun.
+        """
+        x = self._normaliser(plan)
+        self.n_points = len(x)
+        tendance = np.column_stack([np.ones(len(x)), x])
+        self._coefficients, self._ecarts = {}, {}
+        lignes = {}
+        for sortie in reponses.columns:
+            y = reponses[sortie].to_numpy(dtype=float)
+            coefficients = np.linalg.lstsq(tendance, y, rcond=None)[0]
+            residus = y - tendance @ coefficients
+            ecart = residus.std() or y.std() or 1.0
+            self._coefficients[sortie], self._ecarts[sortie] = coefficients, ecart
+            modele = _ProcessusGaussien(x, residus / ecart)
+            self.modeles[sortie] = modele
+            # Validation croisée à tendance fixée : erreur sur chaque point exclu du processus
+            erreurs, variances = modele.validation_croisee()
+            erreurs, ecarts_loo = erreurs * ecart, np.sqrt(variances) * ecart
+            dispersion = y.std() or 1.0
+            lignes[sortie] = {
+                "rmse": float(np.sqrt(np.mean(erreurs ** 2))),
+                "erreur_max": float(np.abs(erreurs).max()),
+                "erreur_relative": float(np.sqrt(np.mean(erreurs ** 2)) / dispersion),
+                "couverture_95": float(np.mean(np.abs(erreurs) <= Z_95 * ecarts_loo)),
+            }
+        self.validation = pd.DataFrame(lignes).T
+        return self
+
+    def dans_domaine(self, point: Dict[str, float]) -> bool:
+        return all(bas <= point[nom] <= haut for nom, (bas, haut) in self.bornes.items())
+
+    def predire(self, point: Dict[str, float]) -> pd.DataFrame:
+        """
+        Prédiction en un point : une ligne par sortie, colonnes prediction, ecart_type,
+        borne_basse et borne_haute (intervalle à 95 %). Hors des bornes du plan, l'écart
+        type croît mais la prédiction reste une extrapolation (voir dans_domaine).
+        """
+        x = self._normaliser(pd.DataFrame([point]))
+        tendance = np.column_stack([np.ones(len(x)), x])
+        lignes = {}
+        for sortie, modele in self.modeles.items():
+            moyenne, variance = modele.predire(x)
+            prediction = (tendance @ self._coefficients[sortie])[0] + self._ecarts[sortie] * moyenne[0]
+            ecart_type = self._ecarts[sortie] * np.sqrt(variance[0])
+            lignes[sortie] = {"prediction": prediction, "ecart_type": ecart_type,
+                              "borne_basse": prediction - Z_95 * ecart_type,
+                              "borne_haute": prediction + Z_95 * ecart_type}
+        compter("emulateur.predictions")
+        return pd.DataFrame(lignes).T
+
+
+def entrainer_emulateur(simuler: Callable[[Dict[str, float]], Dict[str, float]],
+                        bornes: Dict[str, Tuple[float, float]], n_points: int = 20, graine: int = 0,
+                        contexte: Any = None, rappel: Optional[Callable[..., None]] = None) -> Emulateur:
+    """
+    Évalue simuler(point) -> {sortie: valeur} sur un plan en hypercube latin de n_points
+    points puis ajuste l'émulateur. Un point où le simulateur lève ValueError (ex. aucun
+    portefeuille admissible) est écarté du plan. rappel suit la convention de utils.taches.
+    """
+    debut = time.perf_counter()
+    plan = plan_hypercube_latin(bornes, n_points, graine)
+    points, reponses = [], []
+    for i, point in enumerate(plan.to_dict("records")):
+        if rappel is not None:
+            rappel(i / (n_points + 1), f"Plan d'expériences : simulation {i + 1}/{n_points}")
+        try:
+            reponses.append(simuler(point))
+        except ValueError:
+            compter("emulateur.points_ecartes")
+            continue
+        points.append(point)
+    if len(points) < len(bornes) + 2:
+        raise ValueError(f"Trop peu de points exploitables dans le plan d'expériences ({len(points)}/{n_points}).")
+    if rappel is not None:
+        rappel(n_points / (n_points + 1), "Ajustement de l'émulateur")
+    emulateur = Emulateur(bornes, contexte).ajuster(pd.DataFrame(points), pd.DataFrame(reponses))
+    emulateur.duree_entrainement = time.perf_counter() - debut
+    return emulateur
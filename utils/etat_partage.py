@@ -0,0 +1,121 @@
+# etat_partage.py
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+from utils.instrumentation import compter
+
+journal = logging.getLogger(__name__)
+
+
+class _Entree:
+    def __init__(self, signature: Hashable, valeur: Any, version: int):
+        self.signature = signature
+        self.valeur = valeur
+        self.version = version
+        self.charge_le = time.time()
+
+
+# Registre du processus : toutes les sessions Streamlit (et tous les fils d'un travailleur)
+# lisent les mêmes instantanés. Une entrée n'est jamais modifiée, seulement remplacée.
+_RESSOURCES: Dict[Tuple[str, str], _Entree] = {}
+_ECHECS: Dict[Tuple[str, str], Hashable] = {}
+_VERROU = threading.Lock()
+_VERROUS_CHARGEMENT: Dict[Tuple[str, str], threading.Lock] = {}
+
+
+def signature_fichier(chemin: str) -> Tuple[int, int]:
+    """
+    Date de modification (ns) et taille d'un fichier : change dès que le fichier est réécrit.
+    """
+    etat = os.stat(chemin)
+    return etat.st_mtime_ns, etat.st_size
+
+
+def empreinte_contenu(contenu: Any) -> str:
+    return hashlib.sha1(pickle.dumps(contenu, protocol=4)).hexdigest()
+
+
+def _verrou_chargement(cle: Tuple[str, str]) -> threading.Lock:
+    with _VERROU:
+        return _VERROUS_CHARGEMENT.setdefault(cle, threading.Lock())
+
+
+def _obtenir(cle: Tuple[str, str], signature: Hashable, charger: Callable[[], Any],
+             garder_si_echec: bool = True) -> Any:
+    entree = _RESSOURCES.get(cle)
+    if entree is not None and entree.signature == signature:
+        return entree.valeur
+    # Un seul chargement par ressource : les sessions arrivées pendant le chargement
+    # attendent puis lisent le résultat au lieu de recharger chacune de leur côté
+    with _verrou_chargement(cle):
+        entree = _RESSOURCES.get(cle)
+        if entree is not None and (entree.signature == signature or _ECHECS.get(cle) == signature):
+            return entree.valeur
+        try:
+            valeur = charger()
+        except Exception:
+            if entree is None or not garder_si_echec:
+                raise
+            # Fichier en cours d'écriture ou invalide : l'instantané précédent reste servi
+            # jusqu'à la prochaine modification du fichier
+            _ECHECS[cle] = signature
+            journal.warning("Rechargement de %s impossible, version précédente conservée", cle[1], exc_info=True)
+            return entree.valeur
+        with _VERROU:
+            _RESSOURCES[cle] = _Entree(signature, valeur, 1 if entree is None else entree.version + 1)
+            _ECHECS.pop(cle, None)
+        compter("etat_partage.chargements")
+        return valeur
+
+
+def ressource_fichier(nom: str, chemin: str, chargeur: Callable[[str], Any]) -> Any:
+    """
+    Ressource en lecture seule construite par chargeur(chemin) et partagée par toutes les
+    sessions du processus : elle n'est chargée qu'une fois par version du fichier. Quand le
+    fichier change, la nouvelle version est chargée puis substituée d'un bloc ; les calculs
+    en cours gardent l'instantané qu'ils ont déjà obtenu. Si le rechargement échoue, la
+    version précédente continue d'être servie.
+
+    La valeur renvoyée ne doit pas être modifiée (les DataFrames pandas sont en
+    copie à l'écriture : une modification locale ne touche pas l'instantané partagé).
+    """
+    cle = (nom, os.path.abspath(chemin))
+    try:
+        signature = signature_fichier(chemin)
+    except FileNotFoundError:
+        entree = _RESSOURCES.get(cle)
+        if entree is None:
+            raise
+        return entree.valeur
+    return _obtenir(cle, signature, lambda: chargeur(chemin))
+
+
+def ressource_contenu(nom: str, contenu: Any, chargeur: Callable[[Any], Any]) -> Any:
+    """
+    Variante de ressource_fichier pour une ressource dérivée d'un objet en mémoire (ex.
+    catalogue de cultures compilé) : rechargée quand l'empreinte du contenu change.
+    """
+    return _obtenir((nom, ""), empreinte_contenu(contenu), lambda: chargeur(contenu), garder_si_echec=False)
+
+
+def etat_ressources() -> List[Dict[str, Any]]:
+    """
+    Ressources partagées chargées dans le processus : nom, source, version, date de chargement.
+    """
+    with _VERROU:
+        entrees = list(_RESSOURCES.items())
+    return [{"nom": nom, "source": source, "version": entree.version,
+             "charge_le": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entree.charge_le)),
+             "echec_rechargement": (nom, source) in _ECHECS}
+            for (nom, source), entree in entrees]
+
+
+def vider_ressources():
+    with _VERROU:
+        _RESSOURCES.clear()
+        _ECHECS.clear()
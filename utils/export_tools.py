@@ -1,78 +1,187 @@
 # export_tools.py
-import pandas as pd
+import gzip
 import io
-from fpdf import FPDF
-import matplotlib.pyplot as plt
-from PIL import Image
+import re
+import tempfile
+import zipfile
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.chargement_differe import ModuleDiffere
+from utils.instrumentation import compter, instrumenter, span
+
+# fpdf n'est importé qu'à la première génération de PDF, openpyxl au premier export Excel
+rapport_pdf = ModuleDiffere("utils.rapport_pdf")
+openpyxl = ModuleDiffere("openpyxl")
+
+LIMITE_LIGNES_EXCEL = 1_048_576
+LONGUEUR_MAX_NOM_FEUILLE = 31
+TAILLE_BLOC_EXPORT = 50_000
+# Taille au-delà de laquelle les fichiers d'export en construction passent en fichier temporaire
+TAILLE_MEMOIRE_EXPORT = 32 * 2 ** 20
+
+FORMATS_EXPORT = {
+    "xlsx": {"libelle": "Excel (.xlsx)", "extension": "xlsx",
+             "mime": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"},
+    "parquet": {"libelle": "Parquet (archive .zip)", "extension": "parquet.zip", "mime": "application/zip"},
+    "csv": {"libelle": "CSV compressé (archive .zip)", "extension": "csv.zip", "mime": "application/zip"},
+    "pdf": {"libelle": "Rapport PDF", "extension": "pdf", "mime": "application/pdf"},
+}
+
+
+def _en_tableau(contenu: Any) -> pd.DataFrame:
+    """
+    DataFrame exportable : l'index est conservé comme colonne(s) s'il porte de l'information,
+    les dictionnaires deviennent une table Clé / Valeur.
+    """
+    if isinstance(contenu, pd.Series):
+        contenu = contenu.to_frame()
+    if isinstance(contenu, dict):
+        return pd.DataFrame([(k, v if np.isscalar(v) or v is None else str(v)) for k, v in contenu.items()],
+                            columns=["Clé", "Valeur"])
+    if not isinstance(contenu.index, pd.RangeIndex) or contenu.index.name is not None:
+        contenu = contenu.reset_index()
+    return contenu.set_axis([str(c) for c in contenu.columns], axis=1)
+
+
+def tables_exportables(resultats: Dict[str, Any]) -> Iterator[Tuple[str, pd.DataFrame]]:
+    for nom, contenu in resultats.items():
+        if isinstance(contenu, (pd.DataFrame, pd.Series, dict)):
+            yield str(nom), _en_tableau(contenu)
+
+
+def _nom_feuille(nom: str, partie: int, noms_pris: set) -> str:
+    nom = re.sub(r"[\[\]:*?/\\]", "_", nom).strip("'") or "Feuille"
+    suffixe = f" ({partie})" if partie > 1 else ""
+    candidat = nom[:LONGUEUR_MAX_NOM_FEUILLE - len(suffixe)] + suffixe
+    i = 2
+    while candidat.lower() in noms_pris:
+        suffixe_doublon = f"~{i}"
+        candidat = nom[:LONGUEUR_MAX_NOM_FEUILLE - len(suffixe) - len(suffixe_doublon)] + suffixe_doublon + suffixe
+        i += 1
+    noms_pris.add(candidat.lower())
+    return candidat
+
+
+def _lignes_excel(bloc: pd.DataFrame) -> Iterator[list]:
+    # Les NaN/NaT n'ont pas de représentation Excel : cellules vides
+    valeurs = bloc.astype(object).where(bloc.notna(), None)
+    for ligne in valeurs.itertuples(index=False, name=None):
+        yield list(ligne)
+
+
+@instrumenter("export.excel")
+def ecrire_excel_flux(resultats: Dict[str, Any], destination: BinaryIO,
+                      taille_bloc: int = TAILLE_BLOC_EXPORT, lignes_max_feuille: int = LIMITE_LIGNES_EXCEL - 1):
+    """
+    Écrit les tables de resultats dans un classeur Excel en mode écriture seule d'openpyxl :
+    les lignes sont écrites par blocs de taille_bloc sans construire le modèle objet du
+    classeur, et une table plus longue que lignes_max_feuille est répartie sur plusieurs
+    feuilles « Nom (2) », « Nom (3) »... avec l'en-tête répété.
+    """
+    classeur = openpyxl.Workbook(write_only=True)
+    noms_pris: set = set()
+    for nom, tableau in tables_exportables(resultats):
+        compter("export.lignes", len(tableau))
+        n_parties = max(1, -(-len(tableau) // lignes_max_feuille))
+        for partie in range(n_parties):
+            feuille = classeur.create_sheet(_nom_feuille(nom, partie + 1, noms_pris))
+            feuille.append(list(tableau.columns))
+            fin_partie = min(len(tableau), (partie + 1) * lignes_max_feuille)
+            for debut in range(partie * lignes_max_feuille, fin_partie, taille_bloc):
+                for ligne in _lignes_excel(tableau.iloc[debut:min(debut + taille_bloc, fin_partie)]):
+                    feuille.append(ligne)
+    if not noms_pris:
+        classeur.create_sheet("Vide")
+    with span("export.excel.compression"):
+        classeur.save(destination)
+
+
+def _colonnes_typees(tableau: pd.DataFrame) -> pd.DataFrame:
+    # Parquet exige un type par colonne : les colonnes objet mêlant nombres et textes
+    # (tables Clé / Valeur) sont exportées en texte
+    mixtes = [c for c in tableau.columns if tableau[c].dtype == object
+              and len({type(v) for v in tableau[c].dropna()}) > 1]
+    return tableau.astype({c: str for c in mixtes}) if mixtes else tableau
+
+
+@instrumenter("export.parquet")
+def ecrire_paquet_parquet(resultats: Dict[str, Any], destination: BinaryIO):
+    """
+    Archive zip d'un fichier Parquet par table (compression zstd, archive non recompressée).
+    """
+    with zipfile.ZipFile(destination, "w", compression=zipfile.ZIP_STORED) as archive:
+        for nom, tableau in tables_exportables(resultats):
+            compter("export.lignes", len(tableau))
+            with archive.open(f"{nom}.parquet", "w", force_zip64=True) as entree:
+                _colonnes_typees(tableau).to_parquet(entree, index=False, compression="zstd")
+
+
+@instrumenter("export.csv")
+def ecrire_paquet_csv(resultats: Dict[str, Any], destination: BinaryIO, taille_bloc: int = TAILLE_BLOC_EXPORT):
+    """
+    Archive zip d'un fichier CSV compressé en gzip par table, écrit par blocs de taille_bloc.
+    """
+    with zipfile.ZipFile(destination, "w", compression=zipfile.ZIP_STORED) as archive:
+        for nom, tableau in tables_exportables(resultats):
+            compter("export.lignes", len(tableau))
+            with archive.open(f"{nom}.csv.gz", "w", force_zip64=True) as entree, \
+                    gzip.GzipFile(fileobj=entree, mode="wb", compresslevel=6) as compresse, \
+                    io.TextIOWrapper(compresse, encoding="utf-8", newline="") as texte:
+                for debut in range(0, max(len(tableau), 1), taille_bloc):
+                    tableau.iloc[debut:debut + taille_bloc].to_csv(texte, index=False, header=debut == 0)
+
+
+def ecrire_rapport_pdf(resultats: Dict[str, Any], destination: BinaryIO, graphiques: Optional[Dict[str, Any]] = None):
+    """
+    Rapport PDF (tables longues résumées, graphiques rendus en mémoire), voir utils.rapport_pdf.
+    """
+    destination.write(export_pdf(resultats, graphiques))
+
+
+ECRIVAINS_EXPORT = {
+    "xlsx": ecrire_excel_flux,
+    "parquet": ecrire_paquet_parquet,
+    "csv": ecrire_paquet_csv,
+    "pdf": ecrire_rapport_pdf,
+}
+
+
+def exporter_resultats(resultats: Dict[str, Any], format_export: str = "xlsx", **options) -> BinaryIO:
+    """
+    Construit l'export au format demandé (xlsx, parquet, csv, pdf) dans un fichier temporaire
+    gardé en mémoire tant qu'il reste petit ; renvoie le fichier, rembobiné. Les options
+    sont transmises à l'écrivain du format (ex. graphiques pour le PDF).
+    """
+    if format_export not in ECRIVAINS_EXPORT:
+        raise ValueError(f"Format d'export inconnu : {format_export}")
+    fichier = tempfile.SpooledTemporaryFile(max_size=TAILLE_MEMOIRE_EXPORT)
+    ECRIVAINS_EXPORT[format_export](resultats, fichier, **options)
+    fichier.seek(0)
+    return fichier
 
 
 def export_excel(resultats: dict, nom_fichier: str = "export.xlsx") -> bytes:
     """
     Génère un fichier Excel à partir des résultats de simulation.
     """
-    buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-        for nom_feuille, df in resultats.items():
-            if isinstance(df, pd.DataFrame):
-                df.to_excel(writer, sheet_name=nom_feuille)
-    buffer.seek(0)
-    return buffer.getvalue()
-
-
-class PDF(FPDF):
-    def header(self):
-        self.set_font("Arial", "B", 14)
-        self.cell(0, 10, "Rapport de Simulation", ln=True, align="C")
-        self.ln(10)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font("Arial", "I", 8)
-        self.cell(0, 10, f"Page {self.page_no()}", align="C")
-
-    def chapter_title(self, title):
-        self.set_font("Arial", "B", 12)
-        self.cell(0, 10, title, ln=True, align="L")
-        self.ln(5)
-
-    def chapter_body(self, content):
-        self.set_font("Arial", "", 10)
-        self.multi_cell(0, 10, content)
-        self.ln()
-
-    def add_table(self, dataframe: pd.DataFrame):
-        self.set_font("Arial", "", 9)
-        col_width = self.w / (len(dataframe.columns) + 1)
-        for col in dataframe.columns:
-            self.cell(col_width, 10, col, 1)
-        self.ln()
-        for _, row in dataframe.iterrows():
-            for item in row:
-                self.cell(col_width, 10, str(item), 1)
-            self.ln()
-
-    def add_image(self, image_path):
-        self.image(image_path, w=self.w - 40)
-        self.ln()
+    with exporter_resultats(resultats, "xlsx") as fichier:
+        return fichier.read()
 
 
+@instrumenter("export.pdf")
 def export_pdf(resultats: dict, graphiques: dict = None, nom_fichier: str = "export.pdf") -> bytes:
-    pdf = PDF()
-    pdf.add_page()
-
-    for titre, contenu in resultats.items():
-        pdf.chapter_title(titre)
-        if isinstance(contenu, pd.DataFrame):
-            pdf.add_table(contenu)
-        elif isinstance(contenu, str):
-            pdf.chapter_body(contenu)
-
-    if graphiques:
-        for nom_fig, fig in graphiques.items():
-            image_path = f"/tmp/{nom_fig}.png"
-            fig.savefig(image_path)
-            pdf.add_page()
-            pdf.chapter_title(f"Graphique : {nom_fig}")
-            pdf.add_image(image_path)
-
-    return pdf.output(dest='S').encode('latin1')
\ No newline at end of file
+    """
+    Génère le rapport PDF des résultats ; graphiques associe un titre à une figure matplotlib
+    ou à des données (Series / DataFrame) tracées en courbes.
+    """
+    return rapport_pdf.generer_pdf(resultats, graphiques)
+
+
+def __getattr__(nom):
+    # utils.export_tools.PDF reste disponible sans importer fpdf au chargement du module
+    if nom == "PDF":
+        return rapport_pdf.PDF
+    raise AttributeError(f"module 'utils.export_tools' has no attribute '{nom}'")
@@ -0,0 +1,212 @@
+# historique_simulations.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import pandas as pd
+
+from service.format_binaire import decoder_resultat, encoder_resultat
+from utils.instrumentation import compter, instrumenter
+
+# Base locale de l'historique, ex. AGRIBOURSE_HISTORIQUE=/srv/agribourse/historique.sqlite
+VARIABLE_HISTORIQUE = "AGRIBOURSE_HISTORIQUE"
+FICHIER_HISTORIQUE_DEFAUT = "data/historique/simulations.sqlite"
+# Rétention : au-delà, les simulations consultées le moins récemment sont supprimées
+NB_MAX_SIMULATIONS = 200
+TAILLE_MAX_RESULTATS = 256 * 2 ** 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS simulations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    empreinte TEXT NOT NULL,
+    libelle TEXT NOT NULL,
+    cree_le REAL NOT NULL,
+    consulte_le REAL NOT NULL,
+    parametres TEXT NOT NULL,
+    metriques TEXT NOT NULL,
+    resultats BLOB NOT NULL,
+    taille INTEGER NOT NULL,
+    UNIQUE (type, empreinte)
+);
+CREATE INDEX IF NOT EXISTS simulations_consultation ON simulations (consulte_le);
+"""
+
+
+def _json(valeur: Any) -> str:
+    # Numpy, dates et autres objets non JSON sont enregistrés sous forme de texte
+    def convertir(objet):
+        return objet.item() if hasattr(objet, "item") else str(objet)
+    return json.dumps(valeur, sort_keys=True, ensure_ascii=False, default=convertir)
+
+
+def empreinte_simulation(type_simulation: str, parametres: Dict, version: Any = None) -> str:
+    """
+    Empreinte d'une spécification de simulation : type, paramètres d'entrée et version
+    des données utilisées (ex. signature du classeur de marché). Deux spécifications
+    identiques sur les mêmes données ont la même empreinte.
+    """
+    return hashlib.sha1(_json([type_simulation, parametres, version]).encode("utf-8")).hexdigest()
+
+
+class HistoriqueSimulations:
+    """
+    Historique local des simulations : une ligne SQLite par simulation avec ses paramètres
+    et ses métriques en JSON, et ses résultats (portefeuille, éventails de quantiles...)
+    dans un blob colonnaire compressé (service.format_binaire, Arrow IPC zstd). Les
+    métriques se lisent sans décoder les blobs ; une connexion par opération, la base
+    est partagée par toutes les sessions et tous les processus.
+    """
+
+    def __init__(self, chemin: str = FICHIER_HISTORIQUE_DEFAUT, nb_max: int = NB_MAX_SIMULATIONS,
+                 taille_max: int = TAILLE_MAX_RESULTATS):
+        self.chemin = chemin
+        self.nb_max = nb_max
+        self.taille_max = taille_max
+        dossier = os.path.dirname(chemin)
+        if dossier:
+            os.makedirs(dossier, exist_ok=True)
+        with self._connexion() as connexion:
+            connexion.execute("PRAGMA journal_mode=WAL")
+            connexion.executescript(SCHEMA)
+
+    @contextmanager
+    def _connexion(self) -> Iterator[sqlite3.Connection]:
+        # Transaction validée en sortie de bloc (annulée sur exception), connexion fermée
+        connexion = sqlite3.connect(self.chemin, timeout=30)
+        connexion.row_factory = sqlite3.Row
+        try:
+            with connexion:
+                yield connexion
+        finally:
+            connexion.close()
+
+    def _entree(self, ligne: sqlite3.Row, avec_resultats: bool = True) -> Dict[str, Any]:
+        entree = {
+            "id": ligne["id"],
+            "type": ligne["type"],
+            "empreinte": ligne["empreinte"],
+            "libelle": ligne["libelle"],
+            "cree_le": pd.Timestamp.fromtimestamp(ligne["cree_le"]),
+            "parametres": json.loads(ligne["parametres"]),
+            "metriques": json.loads(ligne["metriques"]),
+            "taille": ligne["taille"],
+        }
+        if avec_resultats:
+            entree["resultats"] = decoder_resultat(ligne["resultats"])
+        return entree
+
+    @instrumenter("historique.recherche")
+    def rechercher(self, type_simulation: str, parametres: Dict, version: Any = None) -> Optional[Dict[str, Any]]:
+        """
+        Simulation déjà enregistrée pour cette spécification, résultats décodés ; None sinon.
+        """
+        empreinte = empreinte_simulation(type_simulation, parametres, version)
+        with self._connexion() as connexion:
+            ligne = connexion.execute("SELECT * FROM simulations WHERE type = ? AND empreinte = ?",
+                                      (type_simulation, empreinte)).fetchone()
+            if ligne is None:
+                return None
+            connexion.execute("UPDATE simulations SET consulte_le = ? WHERE id = ?", (time.time(), ligne["id"]))
+        compter("historique.relectures")
+        return self._entree(ligne)
+
+    @instrumenter("historique.enregistrement")
+    def enregistrer(self, type_simulation: str, parametres: Dict, resultats: Dict[str, Any],
+                    metriques: Optional[Dict[str, Any]] = None, version: Any = None,
+                    libelle: str = "") -> int:
+        """
+        Enregistre (ou remplace) la simulation de cette spécification puis applique la
+        rétention. resultats ne doit contenir que des données de taille réduite
+        (éventails, histogrammes, portefeuille), pas les trajectoires.
+
+        Returns:
+            int: identifiant de la simulation.
+        """
+        empreinte = empreinte_simulation(type_simulation, parametres, version)
+        blob = encoder_resultat(resultats)
+        maintenant = time.time()
+        with self._connexion() as connexion:
+            connexion.execute("DELETE FROM simulations WHERE type = ? AND empreinte = ?", (type_simulation, empreinte))
+            curseur = connexion.execute(
+                "INSERT INTO simulations (type, empreinte, libelle, cree_le, consulte_le, parametres, metriques, "
+                "resultats, taille) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (type_simulation, empreinte, libelle, maintenant, maintenant, _json(parametres),
+                 _json(metriques or {}), blob, len(blob)))
+            identifiant = curseur.lastrowid
+            self._appliquer_retention(connexion)
+        compter("historique.octets_ecrits", len(blob))
+        return identifiant
+
+    def _appliquer_retention(self, connexion: sqlite3.Connection):
+        # Parcours du plus récemment consulté au plus ancien : on garde tant que les
+        # deux limites sont respectées, le reste est supprimé
+        lignes = connexion.execute("SELECT id, taille FROM simulations ORDER BY consulte_le DESC").fetchall()
+        a_supprimer, total = [], 0
+        for rang, ligne in enumerate(lignes):
+            total += ligne["taille"]
+            if rang >= self.nb_max or (rang > 0 and total > self.taille_max):
+                a_supprimer.append((ligne["id"],))
+        if a_supprimer:
+            connexion.executemany("DELETE FROM simulations WHERE id = ?", a_supprimer)
+            compter("historique.suppressions", len(a_supprimer))
+
+    def lister(self, type_simulation: Optional[str] = None) -> pd.DataFrame:
+        """
+        Simulations enregistrées, plus récentes d'abord : identifiant, date, libellé,
+        taille et une colonne par métrique. Les blobs ne sont pas lus.
+        """
+        requete = "SELECT id, type, empreinte, libelle, cree_le, parametres, metriques, taille FROM simulations"
+        arguments: tuple = ()
+        if type_simulation is not None:
+            requete += " WHERE type = ?"
+            arguments = (type_simulation,)
+        with self._connexion() as connexion:
+            lignes = connexion.execute(requete + " ORDER BY cree_le DESC", arguments).fetchall()
+        entrees = [self._entree(ligne, avec_resultats=False) for ligne in lignes]
+        colonnes = ["id", "type", "cree_le", "libelle", "taille"]
+        if not entrees:
+            return pd.DataFrame(columns=colonnes)
+        tableau = pd.DataFrame([{c: e[c] for c in colonnes} for e in entrees])
+        metriques = pd.DataFrame([e["metriques"] for e in entrees])
+        return pd.concat([tableau, metriques], axis=1).set_index("id")
+
+    def charger(self, identifiants: Sequence[int]) -> List[Dict[str, Any]]:
+        """
+        Simulations enregistrées avec leurs résultats décodés, dans l'ordre des identifiants
+        (ceux qui n'existent plus sont ignorés).
+        """
+        identifiants = [int(i) for i in identifiants]
+        if not identifiants:
+            return []
+        with self._connexion() as connexion:
+            lignes = connexion.execute(
+                f"SELECT * FROM simulations WHERE id IN ({', '.join('?' * len(identifiants))})",
+                identifiants).fetchall()
+        par_id = {ligne["id"]: ligne for ligne in lignes}
+        return [self._entree(par_id[i]) for i in identifiants if i in par_id]
+
+    def supprimer(self, identifiants: Sequence[int]):
+        with self._connexion() as connexion:
+            connexion.executemany("DELETE FROM simulations WHERE id = ?", [(int(i),) for i in identifiants])
+
+
+_HISTORIQUES: Dict[str, HistoriqueSimulations] = {}
+_VERROU = threading.Lock()
+
+
+def obtenir_historique(chemin: Optional[str] = None) -> HistoriqueSimulations:
+    """
+    Historique du processus, par défaut le fichier désigné par AGRIBOURSE_HISTORIQUE
+    ou data/historique/simulations.sqlite.
+    """
+    chemin = os.path.abspath(chemin or os.environ.get(VARIABLE_HISTORIQUE, FICHIER_HISTORIQUE_DEFAUT))
+    with _VERROU:
+        if chemin not in _HISTORIQUES:
+            _HISTORIQUES[chemin] = HistoriqueSimulations(chemin)
+        return _HISTORIQUES[chemin]
@@ -0,0 +1,214 @@
+# instrumentation.py
+import contextvars
+import cProfile
+import functools
+import io
+import itertools
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Options activées pour toutes les exécutions, ex. AGRIBOURSE_INSTRUMENTATION=memoire,profil
+VARIABLE_OPTIONS = "AGRIBOURSE_INSTRUMENTATION"
+DOSSIER_PROFILS = "data/profils"
+N_FONCTIONS_PROFIL = 25
+
+_RAPPORT_COURANT: contextvars.ContextVar = contextvars.ContextVar("rapport_execution", default=None)
+_SPAN_COURANT: contextvars.ContextVar = contextvars.ContextVar("span_courant", default=None)
+_IDENTIFIANTS_SPANS = itertools.count(1)
+
+
+def options_environnement() -> Dict[str, bool]:
+    options = {o.strip() for o in os.environ.get(VARIABLE_OPTIONS, "").split(",")}
+    return {"memoire": "memoire" in options, "profil": "profil" in options}
+
+
+class RapportExecution:
+    """
+    Mesures d'une exécution : spans (durée, parent, variation de mémoire si tracemalloc est
+    actif), compteurs, pic mémoire et profil cProfile optionnels.
+    """
+
+    def __init__(self, nom: str, memoire: bool = False, profil: bool = False):
+        self.nom = nom
+        self.memoire = memoire
+        self.profil = profil
+        self.debut = time.time()
+        self.duree: Optional[float] = None
+        self.statut = "en_cours"
+        self.erreur: Optional[str] = None
+        self.spans: List[Dict] = []
+        self.compteurs: Dict[str, float] = {}
+        self.memoire_pic: Optional[int] = None
+        self.fichier_profil: Optional[str] = None
+        self.profil_texte: Optional[str] = None
+        self._origine = time.perf_counter()
+        self._verrou = threading.Lock()
+
+    def ajouter_span(self, span: Dict):
+        with self._verrou:
+            self.spans.append(span)
+
+    def compter(self, nom: str, valeur: float = 1):
+        with self._verrou:
+            self.compteurs[nom] = self.compteurs.get(nom, 0) + valeur
+
+    def resume(self) -> List[Dict]:
+        """
+        Spans agrégés par nom, triés par durée totale : appels, durée totale, durée propre
+        (hors spans enfants), durée maximale et part de la durée de l'exécution.
+        """
+        with self._verrou:
+            spans = list(self.spans)
+        enfants: Dict[int, float] = {}
+        for span in spans:
+            if span["parent"] is not None:
+                enfants[span["parent"]] = enfants.get(span["parent"], 0.0) + span["duree"]
+        agregats: Dict[str, Dict] = {}
+        for span in spans:
+            agregat = agregats.setdefault(span["nom"], {"etape": span["nom"], "appels": 0, "duree_totale": 0.0,
+                                                        "duree_propre": 0.0, "duree_max": 0.0})
+            agregat["appels"] += 1
+            agregat["duree_totale"] += span["duree"]
+            agregat["duree_propre"] += span["duree"] - enfants.get(span["id"], 0.0)
+            agregat["duree_max"] = max(agregat["duree_max"], span["duree"])
+        duree = self.duree or (time.perf_counter() - self._origine)
+        for agregat in agregats.values():
+            agregat["part"] = agregat["duree_totale"] / duree if duree > 0 else 0.0
+        return sorted(agregats.values(), key=lambda a: a["duree_totale"], reverse=True)
+
+    def en_dict(self) -> Dict[str, Any]:
+        with self._verrou:
+            spans, compteurs = list(self.spans), dict(self.compteurs)
+        return {
+            "nom": self.nom,
+            "debut": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.debut)),
+            "duree": self.duree,
+            "statut": self.statut,
+            "erreur": self.erreur,
+            "memoire_pic": self.memoire_pic,
+            "compteurs": compteurs,
+            "etapes": self.resume(),
+            "spans": spans,
+            "fichier_profil": self.fichier_profil,
+            "profil": self.profil_texte,
+        }
+
+
+@contextmanager
+def enregistrer_execution(nom: str, memoire: Optional[bool] = None,
+                          profil: Optional[bool] = None) -> Iterator[RapportExecution]:
+    """
+    Ouvre un rapport d'exécution : les spans et compteurs émis dans ce bloc (même thread,
+    même contexte) y sont enregistrés. memoire active tracemalloc (pic de l'ensemble du
+    processus, donc approximatif si plusieurs calculs tournent en parallèle) ; profil
+    enregistre un profil cProfile du thread dans DOSSIER_PROFILS. Les options non précisées
+    suivent AGRIBOURSE_INSTRUMENTATION.
+    """
+    options = options_environnement()
+    rapport = RapportExecution(nom, options["memoire"] if memoire is None else memoire,
+                               options["profil"] if profil is None else profil)
+    jeton_rapport = _RAPPORT_COURANT.set(rapport)
+    jeton_span = _SPAN_COURANT.set(None)
+
+    trace_propre = False
+    if rapport.memoire:
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.start()
+            trace_propre = True
+
+    profileur = None
+    if rapport.profil:
+        profileur = cProfile.Profile()
+        try:
+            profileur.enable()
+        except ValueError:
+            # Un autre profileur est déjà actif dans ce processus
+            profileur = None
+
+    try:
+        yield rapport
+        rapport.statut = "terminee"
+    except BaseException as e:
+        rapport.statut = "erreur"
+        rapport.erreur = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        rapport.duree = time.perf_counter() - rapport._origine
+        if rapport.memoire:
+            rapport.memoire_pic = tracemalloc.get_traced_memory()[1]
+            if trace_propre:
+                tracemalloc.stop()
+        if profileur is not None:
+            profileur.disable()
+            os.makedirs(DOSSIER_PROFILS, exist_ok=True)
+            rapport.fichier_profil = os.path.join(
+                DOSSIER_PROFILS, f"{nom}_{time.strftime('%Y%m%d_%H%M%S')}_{threading.get_ident()}.prof")
+            profileur.dump_stats(rapport.fichier_profil)
+            sortie = io.StringIO()
+            pstats.Stats(profileur, stream=sortie).sort_stats("cumulative").print_stats(N_FONCTIONS_PROFIL)
+            rapport.profil_texte = sortie.getvalue()
+        _SPAN_COURANT.reset(jeton_span)
+        _RAPPORT_COURANT.reset(jeton_rapport)
+
+
+def rapport_courant() -> Optional[RapportExecution]:
+    return _RAPPORT_COURANT.get()
+
+
+@contextmanager
+def span(nom: str, **attributs) -> Iterator[None]:
+    """
+    Mesure un bloc de code dans le rapport d'exécution courant (sans effet hors rapport).
+    """
+    rapport = _RAPPORT_COURANT.get()
+    if rapport is None:
+        yield
+        return
+    parent = _SPAN_COURANT.get()
+    identifiant = next(_IDENTIFIANTS_SPANS)
+    jeton = _SPAN_COURANT.set(identifiant)
+    memoire_avant = tracemalloc.get_traced_memory()[0] if rapport.memoire and tracemalloc.is_tracing() else None
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        fin = time.perf_counter()
+        _SPAN_COURANT.reset(jeton)
+        enregistrement = {"id": identifiant, "nom": nom, "parent": parent,
+                          "debut": debut - rapport._origine, "duree": fin - debut}
+        if memoire_avant is not None and tracemalloc.is_tracing():
+            enregistrement["memoire_delta"] = tracemalloc.get_traced_memory()[0] - memoire_avant
+        if attributs:
+            enregistrement["attributs"] = attributs
+        rapport.ajouter_span(enregistrement)
+
+
+def instrumenter(nom: str) -> Callable:
+    """
+    Décorateur : chaque appel de la fonction est un span du rapport courant.
+    """
+    def decorateur(fonction):
+        @functools.wraps(fonction)
+        def enveloppe(*args, **kwargs):
+            if _RAPPORT_COURANT.get() is None:
+                return fonction(*args, **kwargs)
+            with span(nom):
+                return fonction(*args, **kwargs)
+        return enveloppe
+    return decorateur
+
+
+def compter(nom: str, valeur: float = 1):
+    """
+    Incrémente un compteur du rapport courant (sans effet hors rapport).
+    """
+    rapport = _RAPPORT_COURANT.get()
+    if rapport is not None:
+        rapport.compter(nom, valeur)
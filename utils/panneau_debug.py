@@ -0,0 +1,62 @@
+# panneau_debug.py
+import json
+import os
+
+import streamlit as st
+
+from utils.etat_partage import etat_ressources
+from utils.taches import taches_session
+
+
+def afficher_panneau_debug():
+    """
+    Panneau de la barre latérale : options de mesure des prochains calculs (mémoire,
+    profil cProfile) et rapport d'instrumentation des calculs de la session. N'importe
+    ni pandas ni les modules de calcul : il est affiché dès la page d'accueil.
+    """
+    with st.sidebar.expander("🛠️ Débogage", expanded=False):
+        st.session_state["options_instrumentation"] = {
+            "memoire": st.checkbox("Mesurer le pic mémoire (tracemalloc)", key="instrumentation_memoire"),
+            "profil": st.checkbox("Profil cProfile", key="instrumentation_profil"),
+        }
+
+        ressources = etat_ressources()
+        if ressources:
+            st.caption("Données partagées du processus : " + " · ".join(
+                f"{r['nom']} v{r['version']} ({r['charge_le']}{', rechargement en échec' if r['echec_rechargement'] else ''})"
+                for r in ressources))
+
+        taches = [t for t in taches_session().values() if t.rapport is not None]
+        if not taches:
+            st.caption("Aucun calcul mesuré dans cette session.")
+            return
+
+        for tache in sorted(taches, key=lambda t: t.rapport.debut, reverse=True):
+            rapport = tache.rapport.en_dict()
+            duree = f"{rapport['duree']:.2f} s" if rapport["duree"] is not None else "en cours"
+            memoire = f", pic {rapport['memoire_pic'] / 2 ** 20:.0f} Mo" if rapport["memoire_pic"] else ""
+            st.markdown(f"**{rapport['nom']}** — {rapport['statut']}, {duree}{memoire}")
+            if rapport["erreur"]:
+                st.caption(rapport["erreur"])
+            if rapport["etapes"]:
+                st.dataframe(
+                    rapport["etapes"], hide_index=True,
+                    column_order=["etape", "appels", "duree_totale", "duree_propre", "part"],
+                    column_config={
+                        "duree_totale": st.column_config.NumberColumn(format="%.3f s"),
+                        "duree_propre": st.column_config.NumberColumn(format="%.3f s"),
+                        "part": st.column_config.NumberColumn(format="percent"),
+                    }
+                )
+            if rapport["compteurs"]:
+                st.caption(" · ".join(f"{nom} : {valeur:,.0f}" for nom, valeur in rapport["compteurs"].items()))
+
+            st.download_button("📄 Rapport JSON", json.dumps(rapport, default=str, ensure_ascii=False, indent=2),
+                               file_name=f"rapport_{rapport['nom']}.json", mime="application/json",
+                               key=f"rapport_{tache.nom}")
+            if rapport["fichier_profil"] and os.path.exists(rapport["fichier_profil"]):
+                with open(rapport["fichier_profil"], "rb") as f:
+                    st.download_button("⏱️ Profil cProfile", f.read(), file_name=os.path.basename(rapport["fichier_profil"]),
+                                       key=f"profil_{tache.nom}")
+                if st.checkbox("Afficher les fonctions les plus coûteuses", key=f"voir_profil_{tache.nom}"):
+                    st.code(rapport["profil"])
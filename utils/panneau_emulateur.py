@@ -0,0 +1,72 @@
+# panneau_emulateur.py
+import time
+from typing import Callable, Dict
+
+import streamlit as st
+
+from utils.taches import lancer_tache, obtenir_tache, suivre_tache
+
+
+def panneau_emulateur(cle: str, point: Dict[str, float], contexte: str, entrainer: Callable[..., object],
+                      libelles: Dict[str, str], formats: Dict[str, str], n_points_defaut: int = 20) -> bool:
+    """
+    Aperçu instantané des indicateurs par l'émulateur (utils.emulateur) : réponse à chaque
+    mouvement des réglages, avec intervalle à 95 % et erreur de validation croisée.
+    entrainer(n_points, rappel=None) renvoie un Emulateur ; il est exécuté en tâche de fond
+    et l'émulateur obtenu reste le résultat de cette tâche. Un émulateur entraîné avec
+    d'autres réglages non émulés (contexte) est ignoré.
+
+    Returns:
+        bool: True si l'utilisateur demande la simulation exacte.
+    """
+    st.subheader("⚡ Aperçu instantané")
+    nom_tache = f"emulateur_{cle}"
+    tache = obtenir_tache(nom_tache)
+    emulateur = tache.resultat if tache is not None and tache.etat == "terminee" else None
+    if emulateur is not None and emulateur.contexte != contexte:
+        emulateur = None
+
+    if tache is not None and not tache.terminee:
+        st.caption("Entraînement de l'émulateur sur un plan d'expériences...")
+        suivre_tache(tache)
+        return False
+    if tache is not None and tache.etat == "erreur":
+        st.error(f"L'entraînement de l'émulateur a échoué : {tache.erreur.splitlines()[0]}")
+
+    col1, col2 = st.columns([2, 1], vertical_alignment="bottom")
+    n_points = col1.number_input("Simulations du plan d'expériences", min_value=8, max_value=200,
+                                 value=n_points_defaut, step=4, key=f"points_{cle}")
+    if emulateur is None:
+        st.caption("Entraînez l'émulateur pour prévoir les indicateurs à chaque réglage sans relancer "
+                   "de simulation" + (" (des réglages non émulés ont changé)." if tache is not None else "."))
+    if col2.button("🧠 Entraîner l'émulateur" if emulateur is None else "🔁 Réentraîner", key=f"entrainer_{cle}"):
+        suivre_tache(lancer_tache(nom_tache, entrainer, n_points=int(n_points)))
+        return False
+    if emulateur is None:
+        return False
+
+    debut = time.perf_counter()
+    prediction = emulateur.predire(point)
+    duree = time.perf_counter() - debut
+
+    colonnes = st.columns(len(prediction))
+    for colonne, (sortie, ligne) in zip(colonnes, prediction.iterrows()):
+        format_sortie = formats.get(sortie, "{:,.2f}")
+        colonne.metric(libelles.get(sortie, sortie), format_sortie.format(ligne["prediction"]),
+                       help=f"Intervalle à 95 % : {format_sortie.format(ligne['borne_basse'])} à "
+                            f"{format_sortie.format(ligne['borne_haute'])}")
+        colonne.caption(f"± {format_sortie.format(ligne['borne_haute'] - ligne['prediction'])}")
+
+    st.caption(f"Prédiction en {duree * 1000:.1f} ms · émulateur entraîné sur {emulateur.n_points} simulations "
+               f"en {emulateur.duree_entrainement:.0f} s · erreur de validation croisée jusqu'à "
+               f"{emulateur.validation['erreur_relative'].max():.0%} de la dispersion des indicateurs.")
+    if not emulateur.dans_domaine(point):
+        st.warning("Réglages hors du domaine d'entraînement : prédiction extrapolée, peu fiable.")
+    with st.expander("Précision de l'émulateur"):
+        st.dataframe(emulateur.validation.rename(index=libelles), column_config={
+            "erreur_relative": st.column_config.NumberColumn(format="percent"),
+            "couverture_95": st.column_config.NumberColumn(format="percent"),
+        })
+        st.caption("Validation croisée sur les points du plan : chaque point est prédit sans lui-même. "
+                   "La couverture est la part de ces points tombant dans l'intervalle à 95 % annoncé.")
+    return st.button("✅ Confirmer par la simulation exacte", key=f"confirmer_{cle}")
@@ -0,0 +1,265 @@
+# rapport_pdf.py
+import contextvars
+import io
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from fpdf import FPDF
+from PIL import Image
+
+from utils.chargement_differe import ModuleDiffere
+from utils.export_tools import _en_tableau
+from utils.instrumentation import compter, instrumenter, span
+from utils.reduction_graphiques import sous_echantillonner
+
+# matplotlib n'est importé que si le rapport contient des graphiques
+figure_mpl = ModuleDiffere("matplotlib.figure")
+backend_agg = ModuleDiffere("matplotlib.backends.backend_agg")
+
+# Au-delà de LIGNES_MAX_TABLEAU lignes, une table est résumée (statistiques + aperçu)
+LIGNES_MAX_TABLEAU = 40
+LIGNES_APERCU = 10
+QUANTILES_RESUME = {"P5": 0.05, "Médiane": 0.5, "P95": 0.95}
+TAILLE_POLICE_TABLEAU = 8
+HAUTEUR_LIGNE = 6
+LARGEUR_MIN_COLONNE = 12
+LARGEUR_MAX_COLONNE = 60
+CARACTERES_MAX_CELLULE = 40
+POINTS_MAX_GRAPHIQUE = 1500
+RESOLUTION_GRAPHIQUES = 110
+N_FILS_GRAPHIQUES = 4
+
+
+def _latin1(texte: Any) -> str:
+    # Les polices standard de fpdf ne couvrent que le latin-1
+    return str(texte).encode("latin-1", "replace").decode("latin-1")
+
+
+def _formater_colonne(serie: pd.Series) -> List[str]:
+    """
+    Textes des cellules d'une colonne, formatés colonne par colonne (pas cellule par cellule) ;
+    les valeurs manquantes sont des cellules vides.
+    """
+    if pd.api.types.is_bool_dtype(serie):
+        textes = serie.map({True: "Oui", False: "Non"}).astype(object)
+    elif pd.api.types.is_integer_dtype(serie):
+        textes = serie.map("{:,}".format)
+    elif pd.api.types.is_float_dtype(serie):
+        textes = pd.Series([f"{v:,.0f}" if abs(v) >= 1000 or v.is_integer() else f"{v:.4g}"
+                            for v in serie.to_numpy(dtype=float)], index=serie.index)
+    elif pd.api.types.is_datetime64_any_dtype(serie):
+        textes = serie.dt.strftime("%Y-%m-%d")
+    else:
+        textes = serie.astype(str)
+    textes = textes.where(serie.notna(), "").astype(str)
+    return [_latin1(t if len(t) <= CARACTERES_MAX_CELLULE else t[:CARACTERES_MAX_CELLULE - 3] + "...")
+            for t in textes]
+
+
+def resumer_tableau(tableau: pd.DataFrame) -> pd.DataFrame:
+    """
+    Statistiques par colonne numérique d'une table trop longue pour être imprimée :
+    moyenne, écart-type, minimum, quantiles et maximum, calculés en un passage vectorisé.
+    """
+    numeriques = tableau.select_dtypes("number")
+    if numeriques.empty:
+        return pd.DataFrame({"Colonne": tableau.columns, "Valeurs distinctes": tableau.nunique().to_numpy()})
+    valeurs = numeriques.to_numpy(dtype=float)
+    with np.errstate(all="ignore"):
+        quantiles = np.nanquantile(valeurs, list(QUANTILES_RESUME.values()), axis=0)
+        resume = pd.DataFrame({
+            "Colonne": numeriques.columns,
+            "Moyenne": np.nanmean(valeurs, axis=0),
+            "Écart-type": np.nanstd(valeurs, axis=0),
+            "Min": np.nanmin(valeurs, axis=0),
+            **{nom: quantiles[i] for i, nom in enumerate(QUANTILES_RESUME)},
+            "Max": np.nanmax(valeurs, axis=0),
+        })
+    return resume
+
+
+def _figure_donnees(nom: str, donnees):
+    """
+    Graphique en courbes d'une Series / d'un DataFrame, construit sans pyplot (utilisable
+    depuis plusieurs fils) et réduit à POINTS_MAX_GRAPHIQUE points par LTTB.
+    """
+    if isinstance(donnees, pd.Series):
+        donnees = donnees.to_frame()
+    donnees = sous_echantillonner(donnees, POINTS_MAX_GRAPHIQUE)
+    figure = figure_mpl.Figure(figsize=(8, 3.6))
+    backend_agg.FigureCanvasAgg(figure)
+    axe = figure.add_subplot()
+    for colonne in donnees.columns[:12]:
+        axe.plot(donnees.index, donnees[colonne].to_numpy(), label=str(colonne), linewidth=1.2)
+    if len(donnees.columns) > 1:
+        axe.legend(fontsize=7, loc="best")
+    axe.set_title(nom, fontsize=10)
+    axe.grid(alpha=0.3)
+    figure.tight_layout()
+    return figure
+
+
+def rendre_graphique(nom: str, graphique) -> bytes:
+    """
+    Rend un graphique (figure matplotlib, ou données à tracer) en JPEG dans un tampon mémoire.
+    """
+    with span("export.pdf.graphique", graphique=nom):
+        figure = graphique if hasattr(graphique, "savefig") else _figure_donnees(nom, graphique)
+        tampon = io.BytesIO()
+        figure.savefig(tampon, format="jpeg", dpi=RESOLUTION_GRAPHIQUES, pil_kwargs={"quality": 85})
+        return tampon.getvalue()
+
+
+def rendre_graphiques(graphiques: Dict[str, Any]) -> Dict[str, bytes]:
+    """
+    Rendu des graphiques en parallèle (un fil par figure, N_FILS_GRAPHIQUES au plus) ;
+    chaque tâche hérite du contexte d'instrumentation de l'appelant.
+    """
+    if len(graphiques) <= 1:
+        return {nom: rendre_graphique(nom, g) for nom, g in graphiques.items()}
+    with ThreadPoolExecutor(max_workers=min(N_FILS_GRAPHIQUES, len(graphiques))) as executeur:
+        futurs = {nom: executeur.submit(contextvars.copy_context().run, rendre_graphique, nom, g)
+                  for nom, g in graphiques.items()}
+        return {nom: futur.result() for nom, futur in futurs.items()}
+
+
+class PDF(FPDF):
+    def header(self):
+        self.set_font("Arial", "B", 14)
+        self.cell(0, 10, "Rapport de Simulation", ln=True, align="C")
+        self.ln(10)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font("Arial", "I", 8)
+        self.cell(0, 10, f"Page {self.page_no()}", align="C")
+
+    @property
+    def largeur_utile(self) -> float:
+        return self.w - self.l_margin - self.r_margin
+
+    def chapter_title(self, title):
+        if self.y + 15 + 2 * HAUTEUR_LIGNE > self.page_break_trigger:
+            self.add_page()
+        self.set_font("Arial", "B", 12)
+        self.cell(0, 10, _latin1(title), ln=True, align="L")
+        self.ln(5)
+
+    def chapter_body(self, content):
+        self.set_font("Arial", "", 10)
+        self.multi_cell(0, HAUTEUR_LIGNE, _latin1(content))
+        self.ln()
+
+    def _groupes_colonnes(self, largeurs: List[float]) -> List[List[int]]:
+        # Colonnes réparties en groupes tenant dans la largeur de la page ; la première
+        # colonne (identifiant de ligne) est répétée en tête de chaque groupe
+        groupes, courant, total = [], [0], largeurs[0]
+        for j in range(1, len(largeurs)):
+            if total + largeurs[j] > self.largeur_utile and len(courant) > 1:
+                groupes.append(courant)
+                courant, total = [0], largeurs[0]
+            courant.append(j)
+            total += largeurs[j]
+        groupes.append(courant)
+        return groupes
+
+    def _ligne_tableau(self, textes: List[str], largeurs: List[float], entete: bool):
+        self.set_font("Arial", "B" if entete else "", TAILLE_POLICE_TABLEAU)
+        for texte, largeur in zip(textes, largeurs):
+            self.cell(largeur, HAUTEUR_LIGNE, texte, 1, 0, "C" if entete else "R", fill=entete)
+        self.ln()
+
+    def add_table(self, dataframe: pd.DataFrame):
+        """
+        Imprime une table par blocs : colonnes dimensionnées sur leur contenu et réparties
+        en groupes qui tiennent dans la page, en-tête répété à chaque saut de page.
+        """
+        entetes = [_latin1(c) for c in dataframe.columns]
+        cellules = [_formater_colonne(dataframe.iloc[:, j]) for j in range(len(entetes))]
+        compter("export.pdf.cellules", len(dataframe) * len(entetes))
+        self.set_font("Arial", "B", TAILLE_POLICE_TABLEAU)
+        largeurs = [min(LARGEUR_MAX_COLONNE, max(LARGEUR_MIN_COLONNE, self.get_string_width(entete) + 4,
+                                                 max((self.get_string_width(t) for t in colonne), default=0) + 4))
+                    for entete, colonne in zip(entetes, cellules)]
+        lignes = list(zip(*cellules)) if cellules else []
+        self.set_fill_color(230, 230, 230)
+        for groupe in self._groupes_colonnes(largeurs) if largeurs else []:
+            largeurs_groupe = [largeurs[j] for j in groupe]
+            if self.y + 2 * HAUTEUR_LIGNE > self.page_break_trigger:
+                self.add_page()
+            self._ligne_tableau([entetes[j] for j in groupe], largeurs_groupe, True)
+            for ligne in lignes:
+                if self.y + HAUTEUR_LIGNE > self.page_break_trigger:
+                    self.add_page()
+                    self._ligne_tableau([entetes[j] for j in groupe], largeurs_groupe, True)
+                self._ligne_tableau([ligne[j] for j in groupe], largeurs_groupe, False)
+            self.ln(4)
+
+    def add_summarized_table(self, dataframe: pd.DataFrame):
+        """
+        Table courte imprimée telle quelle ; table longue résumée par ses statistiques
+        par colonne et un aperçu de ses premières lignes.
+        """
+        if len(dataframe) <= LIGNES_MAX_TABLEAU:
+            self.add_table(dataframe)
+            return
+        self.chapter_body(f"Table de {len(dataframe):,} lignes et {len(dataframe.columns)} colonnes : "
+                          f"statistiques par colonne et aperçu des {LIGNES_APERCU} premières lignes "
+                          "(données complètes dans les exports Excel, Parquet ou CSV).")
+        resume = resumer_tableau(dataframe)
+        self.add_table(resume.head(LIGNES_MAX_TABLEAU))
+        if len(resume) > LIGNES_MAX_TABLEAU:
+            self.chapter_body(f"... {len(resume) - LIGNES_MAX_TABLEAU} autres colonnes.")
+        self.add_table(dataframe.head(LIGNES_APERCU))
+
+    def add_image(self, image_path):
+        self.image(image_path, w=self.largeur_utile)
+        self.ln()
+
+    def add_image_memoire(self, nom: str, donnees_jpeg: bytes):
+        """
+        Insère une image JPEG déjà en mémoire : elle est enregistrée directement dans la
+        table d'images du document, sans fichier intermédiaire.
+        """
+        cle = f"memoire:{nom}"
+        if cle not in self.images:
+            with Image.open(io.BytesIO(donnees_jpeg)) as image:
+                largeur, hauteur = image.size
+                espace = {"L": "DeviceGray", "CMYK": "DeviceCMYK"}.get(image.mode, "DeviceRGB")
+            self.images[cle] = {"i": len(self.images) + 1, "w": largeur, "h": hauteur, "cs": espace,
+                                "bpc": 8, "f": "DCTDecode", "data": donnees_jpeg}
+        info = self.images[cle]
+        if self.y + self.largeur_utile * info["h"] / info["w"] > self.page_break_trigger:
+            self.add_page()
+        self.image(cle, w=self.largeur_utile)
+        self.ln()
+
+
+@instrumenter("export.pdf.document")
+def generer_pdf(resultats: dict, graphiques: Optional[dict] = None) -> bytes:
+    """
+    Rapport PDF : une section par entrée de resultats (texte, table, dictionnaire), les
+    tables longues étant résumées, puis les graphiques rendus en mémoire et en parallèle.
+    """
+    images = rendre_graphiques(graphiques) if graphiques else {}
+
+    pdf = PDF()
+    pdf.add_page()
+
+    with span("export.pdf.tables"):
+        for titre, contenu in resultats.items():
+            if isinstance(contenu, str):
+                pdf.chapter_title(titre)
+                pdf.chapter_body(contenu)
+            elif isinstance(contenu, (pd.DataFrame, pd.Series, dict)):
+                pdf.chapter_title(titre)
+                pdf.add_summarized_table(_en_tableau(contenu))
+
+    for nom, image in images.items():
+        pdf.chapter_title(f"Graphique : {nom}")
+        pdf.add_image_memoire(nom, image)
+
+    with span("export.pdf.ecriture"):
+        return pdf.output(dest='S').encode('latin1')
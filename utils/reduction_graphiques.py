@@ -0,0 +1,134 @@
+# reduction_graphiques.py
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+# Tailles fixes des données envoyées au navigateur, quel que soit le nombre de scénarios
+N_CLASSES_HISTOGRAMME = 40
+N_POINTS_DENSITE = 200
+N_POINTS_SERIE = 1000
+QUANTILES_EVENTAIL = {"P5": 0.05, "P25": 0.25, "P50": 0.5, "P75": 0.75, "P95": 0.95}
+
+
+def _valeurs_finies(valeurs) -> np.ndarray:
+    valeurs = np.asarray(valeurs, dtype=float).ravel()
+    return valeurs[np.isfinite(valeurs)]
+
+
+def _arrondir_centres(centres: np.ndarray, largeur: float) -> np.ndarray:
+    # Libellés arrondis au dixième de la largeur de classe : lisibles sans déplacer les classes
+    if largeur <= 0:
+        return centres
+    return np.round(centres, int(1 - np.floor(np.log10(largeur))))
+
+
+def histogramme(valeurs, n_classes: int = N_CLASSES_HISTOGRAMME, nom: str = "Scénarios",
+                quantiles_bornes: Sequence[float] = (0.001, 0.999)) -> pd.DataFrame:
+    """
+    Histogramme de n_classes classes indexé par le centre des classes. L'étendue est bornée
+    aux quantiles quantiles_bornes pour qu'une valeur extrême n'écrase pas la distribution ;
+    les valeurs au-delà sont comptées dans les classes extrêmes.
+    """
+    valeurs = _valeurs_finies(valeurs)
+    if len(valeurs) == 0:
+        return pd.DataFrame({nom: np.zeros(0, dtype=int)})
+    bas, haut = np.quantile(valeurs, quantiles_bornes)
+    if haut <= bas:
+        bas, haut = valeurs.min() - 0.5, valeurs.max() + 0.5
+    comptes, bornes = np.histogram(np.clip(valeurs, bas, haut), bins=n_classes, range=(bas, haut))
+    centres = _arrondir_centres((bornes[:-1] + bornes[1:]) / 2, bornes[1] - bornes[0])
+    return pd.DataFrame({nom: comptes}, index=centres)
+
+
+def largeur_silverman(valeurs: np.ndarray) -> float:
+    ecart_type = np.std(valeurs)
+    iqr = np.subtract(*np.quantile(valeurs, [0.75, 0.25]))
+    dispersion = min(ecart_type, iqr / 1.34) if iqr > 0 else ecart_type
+    return 0.9 * dispersion * len(valeurs) ** -0.2
+
+
+def densite_kde(valeurs, n_points: int = N_POINTS_DENSITE, largeur: Optional[float] = None,
+                nom: str = "Densité") -> pd.DataFrame:
+    """
+    Densité à noyau gaussien évaluée sur une grille de n_points points. Les valeurs sont
+    d'abord réparties linéairement sur la grille puis convoluées avec le noyau, en
+    O(n + n_points²) au lieu de O(n × n_points). largeur par défaut : règle de Silverman.
+    """
+    valeurs = _valeurs_finies(valeurs)
+    if len(valeurs) < 2 or np.ptp(valeurs) == 0:
+        return pd.DataFrame({nom: np.zeros(0)})
+    largeur = largeur or largeur_silverman(valeurs) or np.ptp(valeurs) / n_points
+    grille = np.linspace(valeurs.min() - 3 * largeur, valeurs.max() + 3 * largeur, n_points)
+    pas = grille[1] - grille[0]
+
+    position = (valeurs - grille[0]) / pas
+    gauche = np.clip(np.floor(position).astype(int), 0, n_points - 2)
+    fraction = position - gauche
+    poids = np.bincount(gauche, 1 - fraction, n_points) + np.bincount(gauche + 1, fraction, n_points)
+
+    demi = min(int(np.ceil(4 * largeur / pas)), (n_points - 1) // 2)
+    noyau = np.exp(-0.5 * (np.arange(-demi, demi + 1) * pas / largeur) ** 2)
+    densite = np.convolve(poids, noyau, mode="same") / (len(valeurs) * largeur * np.sqrt(2 * np.pi))
+    return pd.DataFrame({nom: densite}, index=_arrondir_centres(grille, pas))
+
+
+def indices_lttb(x: np.ndarray, y: np.ndarray, n_points: int) -> np.ndarray:
+    """
+    Indices retenus par Largest-Triangle-Three-Buckets : premier et dernier points, puis dans
+    chaque seau le point formant le plus grand triangle avec le point retenu précédent et
+    la moyenne du seau suivant. Conserve pics et creux, contrairement à un pas régulier.
+    """
+    n = len(y)
+    if n_points >= n or n_points < 3:
+        return np.arange(n)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    bornes = np.linspace(1, n - 1, n_points - 1).astype(int)
+    indices = np.empty(n_points, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(n_points - 2):
+        debut, fin = bornes[i], bornes[i + 1]
+        if i + 2 < len(bornes):
+            x_suivant = x[fin:bornes[i + 2]].mean()
+            y_suivant = y[fin:bornes[i + 2]].mean()
+        else:
+            x_suivant, y_suivant = x[n - 1], y[n - 1]
+        aires = np.abs((x[a] - x_suivant) * (y[debut:fin] - y[a]) - (x[a] - x[debut:fin]) * (y_suivant - y[a]))
+        a = debut + int(np.argmax(aires))
+        indices[i + 1] = a
+    return indices
+
+
+def sous_echantillonner(donnees: Union[pd.Series, pd.DataFrame], n_points: int = N_POINTS_SERIE,
+                        colonne: Optional[str] = None) -> Union[pd.Series, pd.DataFrame]:
+    """
+    Réduit une série longue à n_points points par LTTB. Pour un DataFrame (ex. éventail de
+    quantiles), les lignes sont choisies sur colonne, par défaut la colonne centrale, et
+    toutes les colonnes sont conservées à ces lignes.
+    """
+    if len(donnees) <= n_points:
+        return donnees
+    if isinstance(donnees, pd.DataFrame):
+        reference = donnees[colonne] if colonne is not None else donnees.iloc[:, len(donnees.columns) // 2]
+    else:
+        reference = donnees
+    index = donnees.index
+    x = index.to_numpy(dtype=float) if pd.api.types.is_numeric_dtype(index) else np.arange(len(index), dtype=float)
+    return donnees.iloc[indices_lttb(x, reference.to_numpy(dtype=float), n_points)]
+
+
+def eventail_quantiles(trajectoires, index: Optional[Sequence] = None,
+                       quantiles: Dict[str, float] = QUANTILES_EVENTAIL,
+                       n_points: int = N_POINTS_SERIE) -> pd.DataFrame:
+    """
+    Éventail de quantiles de trajectoires (une ligne par trajectoire, une colonne par date) :
+    une colonne par quantile, une ligne par date, sous-échantillonné à n_points dates.
+    Pour un DataFrame, les dates sont ses colonnes.
+    """
+    if isinstance(trajectoires, pd.DataFrame):
+        index = trajectoires.columns if index is None else index
+    valeurs = np.asarray(trajectoires, dtype=float)
+    with np.errstate(all="ignore"):
+        niveaux = np.nanquantile(valeurs, list(quantiles.values()), axis=0).T
+    return sous_echantillonner(pd.DataFrame(niveaux, columns=list(quantiles), index=index), n_points)
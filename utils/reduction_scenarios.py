@@ -0,0 +1,193 @@
+# reduction_scenarios.py
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.instrumentation import instrumenter
+
+N_SCENARIOS_REPRESENTATIFS = 10
+METHODES_REDUCTION = ("kmedoides", "selection_avant")
+# Candidats évalués ensemble par la sélection avant : bloc de n x TAILLE_BLOC_CANDIDATS distances
+TAILLE_BLOC_CANDIDATS = 512
+# Scénarios évalués par bloc de lignes dans les calculs de coût (bloc de TAILLE_BLOC_SCENARIOS x candidats)
+TAILLE_BLOC_SCENARIOS = 4096
+# Nombre maximal de candidats médoïdes : au-delà, un échantillon tiré selon les probabilités
+# des scénarios (le coût reste en O(n x N_CANDIDATS_MAX) au lieu de O(n²))
+N_CANDIDATS_MAX = 1024
+
+
+def _distances(x: np.ndarray, centres: np.ndarray, carres_x: np.ndarray) -> np.ndarray:
+    # Distances euclidiennes (n, m) entre trajectoires, sans tableau intermédiaire (n, m, T)
+    carres = carres_x[:, None] + (centres ** 2).sum(axis=1)[None, :] - 2 * x @ centres.T
+    return np.sqrt(np.maximum(carres, 0.0))
+
+
+def _echantillon_candidats(indices: np.ndarray, p: np.ndarray, rng: np.random.Generator,
+                           n_max: int = N_CANDIDATS_MAX) -> np.ndarray:
+    # Tous les indices s'ils sont assez peu nombreux, sinon n_max tirés sans remise selon p
+    if len(indices) <= n_max:
+        return indices
+    poids = p[indices]
+    if np.count_nonzero(poids) < n_max:
+        return np.sort(rng.choice(indices, size=n_max, replace=False))
+    return np.sort(rng.choice(indices, size=n_max, replace=False, p=poids / poids.sum()))
+
+
+def _couts_candidats(x: np.ndarray, p: np.ndarray, carres: np.ndarray, candidats: np.ndarray,
+                     distances_min: Optional[np.ndarray] = None,
+                     taille_bloc: int = TAILLE_BLOC_SCENARIOS) -> np.ndarray:
+    """
+    Coût de transport pondéré par p de chaque candidat : somme des distances des scénarios
+    au candidat, ou au plus proche du candidat et des points déjà retenus (distances_min).
+    Les scénarios sont parcourus par blocs de lignes.
+    """
+    couts = np.zeros(len(candidats))
+    for debut in range(0, len(x), taille_bloc):
+        bloc = slice(debut, debut + taille_bloc)
+        distances = _distances(x[bloc], x[candidats], carres[bloc])
+        if distances_min is not None:
+            distances = np.minimum(distances_min[bloc, None], distances)
+        couts += p[bloc] @ distances
+    return couts
+
+
+def _initialiser_kpp(x: np.ndarray, p: np.ndarray, k: int, carres: np.ndarray,
+                     rng: np.random.Generator) -> np.ndarray:
+    # Initialisation k-means++ : chaque médoïde tiré proportionnellement à p × distance²
+    choisis = [int(rng.choice(len(x), p=p))]
+    distances_min = _distances(x, x[choisis], carres)[:, 0]
+    for _ in range(1, k):
+        masse = p * distances_min ** 2
+        if masse.sum() <= 0:
+            break
+        choisis.append(int(rng.choice(len(x), p=masse / masse.sum())))
+        distances_min = np.minimum(distances_min, _distances(x, x[choisis[-1:]], carres)[:, 0])
+    return np.array(choisis)
+
+
+def _kmedoides(x: np.ndarray, p: np.ndarray, k: int, carres: np.ndarray, graine: int,
+               n_iterations: int) -> np.ndarray:
+    """
+    k-médoïdes par itérations alternées : affectation au médoïde le plus proche puis, dans
+    chaque groupe, choix du membre minimisant la somme pondérée des distances aux autres.
+    Les candidats d'un groupe sont limités à N_CANDIDATS_MAX membres tirés selon p (plus le
+    médoïde courant, si bien que le coût ne peut qu'être amélioré) : chaque mise à jour coûte
+    O(taille du groupe x N_CANDIDATS_MAX) distances, calculées par blocs.
+    """
+    rng = np.random.default_rng(graine)
+    medoides = _initialiser_kpp(x, p, k, carres, rng)
+    for _ in range(n_iterations):
+        affectation = np.argmin(_distances(x, x[medoides], carres), axis=1)
+        nouveaux = medoides.copy()
+        for j in range(len(medoides)):
+            membres = np.flatnonzero(affectation == j)
+            if len(membres) == 0:
+                continue
+            candidats = np.union1d(_echantillon_candidats(membres, p, rng), medoides[j:j + 1])
+            couts = _couts_candidats(x[membres], p[membres], carres[membres], candidats=np.searchsorted(membres, candidats))
+            nouveaux[j] = candidats[np.argmin(couts)]
+        if np.array_equal(nouveaux, medoides):
+            break
+        medoides = nouveaux
+    return medoides
+
+
+def _selection_avant(x: np.ndarray, p: np.ndarray, k: int, carres: np.ndarray, graine: int,
+                     taille_bloc: int = TAILLE_BLOC_CANDIDATS) -> np.ndarray:
+    """
+    Sélection avant rapide (Heitsch et Römisch) : à chaque étape, ajoute le scénario qui
+    réduit le plus la distance de transport entre la distribution complète et l'ensemble
+    retenu. Les candidats (au plus N_CANDIDATS_MAX scénarios tirés selon p) sont évalués
+    par blocs de taille_bloc colonnes : O(k x n x N_CANDIDATS_MAX) distances au lieu de O(k x n²).
+    """
+    n = len(x)
+    tous = _echantillon_candidats(np.arange(n), p, np.random.default_rng(graine))
+    distances_min = np.full(n, np.inf)
+    choisis = []
+    for _ in range(k):
+        meilleur, meilleur_cout = -1, np.inf
+        for debut in range(0, len(tous), taille_bloc):
+            candidats = tous[debut:debut + taille_bloc]
+            couts = _couts_candidats(x, p, carres, candidats, distances_min)
+            couts[np.isin(candidats, choisis)] = np.inf
+            j = int(np.argmin(couts))
+            if couts[j] < meilleur_cout:
+                meilleur, meilleur_cout = int(candidats[j]), couts[j]
+        choisis.append(meilleur)
+        distances_min = np.minimum(distances_min, _distances(x, x[[meilleur]], carres)[:, 0])
+    return np.array(choisis)
+
+
+@instrumenter("reduction_scenarios")
+def reduire_scenarios(trajectoires, n_representatifs: int = N_SCENARIOS_REPRESENTATIFS,
+                      methode: str = "kmedoides", probabilites: Optional[np.ndarray] = None,
+                      graine: int = 0, n_iterations: int = 50) -> Dict:
+    """
+    Réduit des trajectoires simulées (une ligne par scénario, une colonne par date) à
+    n_representatifs scénarios représentatifs pondérés : k-médoïdes (methode="kmedoides")
+    ou sélection avant ("selection_avant"). Chaque scénario transmet sa probabilité au
+    représentatif le plus proche (distance euclidienne entre trajectoires). Au-delà de
+    N_CANDIDATS_MAX scénarios, les représentatifs sont cherchés parmi un échantillon tiré
+    selon les probabilités (graine) ; toutes les trajectoires restent prises en compte
+    dans les coûts.
+
+    Returns:
+        Dict: indices des représentatifs (triés par valeur finale), poids, affectation de
+        chaque scénario à un représentatif, distance de transport entre distribution
+        complète et réduite, et cette distance rapportée à celle d'un représentant unique
+        (la trajectoire moyenne).
+    """
+    if methode not in METHODES_REDUCTION:
+        raise ValueError(f"Méthode de réduction inconnue : {methode}")
+    x = np.nan_to_num(np.asarray(trajectoires, dtype=float).reshape(len(trajectoires), -1))
+    n = len(x)
+    if n == 0:
+        raise ValueError("Aucune trajectoire à réduire.")
+    p = np.full(n, 1.0 / n) if probabilites is None else np.asarray(probabilites, dtype=float) / np.sum(probabilites)
+    k = min(n_representatifs, n)
+    carres = (x ** 2).sum(axis=1)
+
+    if methode == "kmedoides":
+        indices = _kmedoides(x, p, k, carres, graine, n_iterations)
+    else:
+        indices = _selection_avant(x, p, k, carres, graine)
+    indices = np.unique(indices)
+    indices = indices[np.argsort(x[indices, -1], kind="stable")]
+
+    distances = _distances(x, x[indices], carres)
+    affectation = np.argmin(distances, axis=1)
+    poids = np.bincount(affectation, weights=p, minlength=len(indices))
+    distance = float(p @ distances[np.arange(n), affectation])
+    reference = float(p @ _distances(x, (p @ x)[None, :], carres)[:, 0])
+    return {
+        "indices": indices,
+        "poids": poids,
+        "affectation": affectation,
+        "distance": distance,
+        "distance_relative": distance / reference if reference > 0 else 0.0,
+    }
+
+
+def tableau_representatifs(trajectoires: pd.DataFrame, reduction: Dict, nom: str = "S") -> pd.DataFrame:
+    """
+    Trajectoires des scénarios représentatifs (une ligne chacun, colonnes de trajectoires)
+    précédées de leur poids et du numéro du scénario d'origine. Les lignes sont nommées
+    S1, S2... dans l'ordre des valeurs finales.
+    """
+    lignes = trajectoires.iloc[reduction["indices"]]
+    tableau = lignes.set_axis([f"{nom}{i + 1}" for i in range(len(lignes))], axis=0)
+    tableau.insert(0, "Poids", reduction["poids"])
+    tableau.insert(0, "Scénario d'origine", lignes.index.to_numpy())
+    tableau.index.name = "Représentatif"
+    return tableau
+
+
+def trajectoires_representatives(tableau: pd.DataFrame) -> pd.DataFrame:
+    """
+    Données de graphique d'un tableau_representatifs : une colonne par représentatif
+    libellée avec son poids, une ligne par date.
+    """
+    trajectoires = tableau.drop(columns=["Scénario d'origine", "Poids"]).T
+    trajectoires.columns = [f"{nom} ({poids:.0%})" for nom, poids in tableau["Poids"].items()]
+    return trajectoires
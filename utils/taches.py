@@ -0,0 +1,150 @@
+# taches.py
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import streamlit as st
+
+from utils.instrumentation import RapportExecution, enregistrer_execution
+
+# Pool partagé par toutes les sessions : les calculs numpy relâchent le GIL
+_EXECUTEUR = ThreadPoolExecutor(max_workers=max(2, (os.cpu_count() or 2) // 2), thread_name_prefix="tache")
+
+ETATS_FINAUX = ("terminee", "annulee", "erreur")
+
+
+class TacheAnnulee(Exception):
+    """
+    Levée dans la tâche par rappel() lorsque l'utilisateur a demandé l'annulation.
+    """
+
+
+class Tache:
+    """
+    Calcul exécuté en arrière-plan.
+
+    La fonction reçoit un argument rappel(fraction, message="", partiel=None) à appeler
+    entre deux lots de calcul : il publie l'avancement et un résultat partiel, et lève
+    TacheAnnulee si l'annulation a été demandée. En cas d'échec, exception conserve
+    l'exception levée et erreur son message suivi de la trace. Les spans émis pendant le calcul sont
+    enregistrés dans rapport (voir utils.instrumentation).
+    """
+
+    def __init__(self, nom: str, fonction: Callable[..., Any], *args,
+                 instrumentation: Optional[Dict[str, bool]] = None, **kwargs):
+        self.nom = nom
+        self.instrumentation = instrumentation or {}
+        self.rapport: Optional[RapportExecution] = None
+        self.etat = "en_attente"
+        self.progression = 0.0
+        self.message = ""
+        self.partiel = None
+        self.resultat = None
+        self.erreur: Optional[str] = None
+        self.exception: Optional[Exception] = None
+        self.debut = time.time()
+        self.fin: Optional[float] = None
+        self._verrou = threading.Lock()
+        self._annulation = threading.Event()
+        self._futur = _EXECUTEUR.submit(self._executer, fonction, args, kwargs)
+
+    def rappel(self, fraction: float, message: str = "", partiel: Any = None):
+        if self._annulation.is_set():
+            raise TacheAnnulee()
+        with self._verrou:
+            self.progression = min(max(float(fraction), 0.0), 1.0)
+            self.message = message
+            if partiel is not None:
+                self.partiel = partiel
+
+    def _executer(self, fonction, args, kwargs):
+        with self._verrou:
+            self.etat = "en_cours"
+        try:
+            with enregistrer_execution(self.nom, **self.instrumentation) as self.rapport:
+                resultat = fonction(*args, rappel=self.rappel, **kwargs)
+            with self._verrou:
+                self.resultat, self.etat, self.progression = resultat, "terminee", 1.0
+        except TacheAnnulee:
+            with self._verrou:
+                self.etat = "annulee"
+        except Exception as e:
+            with self._verrou:
+                self.etat = "erreur"
+                self.exception = e
+                self.erreur = f"{e}\n{traceback.format_exc()}"
+        finally:
+            self.fin = time.time()
+
+    def annuler(self):
+        self._annulation.set()
+        self._futur.cancel()
+
+    @property
+    def terminee(self) -> bool:
+        return self.etat in ETATS_FINAUX
+
+    def instantane(self) -> Dict:
+        """
+        Copie cohérente de l'état, lisible depuis le script Streamlit.
+        """
+        with self._verrou:
+            return {"etat": self.etat, "progression": self.progression, "message": self.message,
+                    "partiel": self.partiel, "erreur": self.erreur,
+                    "duree": (self.fin or time.time()) - self.debut}
+
+
+def taches_session() -> Dict[str, Tache]:
+    if "taches" not in st.session_state:
+        st.session_state["taches"] = {}
+    return st.session_state["taches"]
+
+
+def lancer_tache(nom: str, fonction: Callable[..., Any], *args, **kwargs) -> Tache:
+    """
+    Lance une tâche liée à la session ; une tâche du même nom encore en cours est annulée.
+    """
+    taches = taches_session()
+    if nom in taches and not taches[nom].terminee:
+        taches[nom].annuler()
+    taches[nom] = Tache(nom, fonction, *args, instrumentation=st.session_state.get("options_instrumentation"), **kwargs)
+    return taches[nom]
+
+
+def obtenir_tache(nom: str) -> Optional[Tache]:
+    return taches_session().get(nom)
+
+
+def oublier_tache(nom: str):
+    """
+    Retire la tâche de la session (annulée si elle est encore en cours), ex. quand son
+    résultat est remplacé par une simulation relue de l'historique.
+    """
+    tache = taches_session().pop(nom, None)
+    if tache is not None and not tache.terminee:
+        tache.annuler()
+
+
+def suivre_tache(tache: Tache, rendu_partiel: Optional[Callable[[Any], None]] = None,
+                 intervalle: float = 0.5):
+    """
+    Affiche l'avancement d'une tâche en cours (barre de progression, résultat partiel,
+    bouton d'annulation). Seul ce fragment est réexécuté pendant le calcul ; la page
+    entière est relancée une fois la tâche terminée pour afficher les résultats.
+    """
+    @st.fragment(run_every=intervalle)
+    def fragment():
+        etat = tache.instantane()
+        if tache.terminee:
+            st.rerun(scope="app")
+        st.progress(etat["progression"], text=f"{etat['message']} ({etat['duree']:.0f} s)")
+        if rendu_partiel is not None and etat["partiel"] is not None:
+            rendu_partiel(etat["partiel"])
+        if st.button("⏹️ Annuler", key=f"annuler_{tache.nom}"):
+            tache.annuler()
+            st.rerun(scope="app")
+
+    fragment()